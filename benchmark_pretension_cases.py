@@ -0,0 +1,373 @@
+"""
+Регрессионный бенчмарк претензий по корпусу папок с эталонами.
+
+Для каждой папки (PDF + ПРЕТЕНЗИЯ.docx) выполняет тот же сценарий, что
+compare_pretension_case.py, и дополнительно замеряет время по этапам,
+пиковую память, число обращений к LLM/OCR/HTTP (счётчики tracing,
+http_calls — все запросы) и попадания в кэши. Кейс называется по имени
+папки, а при совпадении имён — по пути с родительскими папками.
+Результаты сохраняются в таблицы benchmark_runs/benchmark_results
+CaseRegistry, отчёт сравнивает прогон с предыдущим.
+"""
+
+import argparse
+import functools
+import json
+import multiprocessing
+import resource
+import subprocess
+import time
+import traceback
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import compare_pretension_case as compare
+import main as m
+import tracing
+from case_registry import CaseRegistry
+
+# Этапы сценария → функции compare_pretension_case, время которых суммируется
+BENCHMARK_STAGES = {
+    "extraction": ["extract_pdf_pages"],
+    "ocr": ["apply_vision_ocr_to_pages"],
+    "sliding_window": ["parse_documents_with_sliding_window"],
+    "llm_fallback": ["apply_llm_fallback"],
+    "document_groups": ["build_document_groups"],
+    "documents": [
+        "extract_applications_from_pages",
+        "extract_invoices_from_pages",
+        "extract_upd_from_pages",
+        "extract_cargo_docs_from_pages",
+        "extract_cdek_shipments_from_pages",
+        "extract_postal_shipments_from_pages",
+        "extract_application_payment_terms",
+        "extract_payment_terms_from_text",
+        "extract_parties_from_pages",
+    ],
+    "groups": ["build_pretension_groups", "assign_shipments_to_groups"],
+    "parties": ["apply_extracted_parties"],
+    "interest": [
+        "calculate_pretension_interest_schedule",
+        "calculate_pretension_interest",
+    ],
+    "docx": ["create_pretension_document"],
+}
+
+# Кэши main, статистика которых попадает в отчёт
+BENCHMARK_CACHES = {
+    "dadata_party": "_DADATA_CACHE",
+    "dadata_court": "_DADATA_COURT_CACHE",
+    "russian_post": "_RUSSIAN_POST_CACHE",
+}
+
+
+
+class CaseMetrics:
+    """Время этапов одного кейса."""
+
+    def __init__(self) -> None:
+        self.stage_timings: Dict[str, float] = defaultdict(float)
+
+    def timed(self, stage: str, func: Callable[..., Any]) -> Callable[..., Any]:
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.stage_timings[stage] += time.perf_counter() - started
+        return wrapper
+
+
+def install_instrumentation(metrics: CaseMetrics) -> None:
+    """
+    Оборачивает этапы сценария (в процессе кейса). HTTP-запросы считает
+    tracing внутри трассы кейса.
+    """
+    for stage, names in BENCHMARK_STAGES.items():
+        for name in names:
+            func = getattr(compare, name, None)
+            if func is not None:
+                setattr(compare, name, metrics.timed(stage, func))
+
+
+def cache_stats() -> Dict[str, Dict[str, int]]:
+    stats = {}
+    for name, attr in BENCHMARK_CACHES.items():
+        cache = getattr(m, attr, None)
+        if cache is not None:
+            stats[name] = cache.stats()
+    return stats
+
+
+def run_case(case: Dict[str, Any]) -> Dict[str, Any]:
+    """Выполняется в отдельном процессе: замеры одного кейса."""
+    metrics = CaseMetrics()
+    install_instrumentation(metrics)
+    caches_before = cache_stats()
+    result: Dict[str, Any] = {
+        "case_name": case["case_name"],
+        "folder_path": case["folder"],
+        "status": "ok",
+        "error": "",
+    }
+    started = time.perf_counter()
+    root: Optional[tracing.Span] = None
+    try:
+        with tracing.trace("benchmark_case", case=case["case_name"]) as root:
+            comparison = compare.run_comparison(
+                Path(case["folder"]),
+                Path(case["output_dir"]),
+                fill_from_manual=case["fill_from_manual"],
+            )
+        result["diff_lines"] = comparison["diff_lines"]
+        result["missing_count"] = len(comparison["missing_fields"])
+        result["comparison"] = {
+            key: str(value) if isinstance(value, Path) else value
+            for key, value in comparison.items()
+            if key != "claim_data"
+        }
+        result["snapshot"] = compare.build_snapshot(comparison["claim_data"])
+    except Exception as exc:
+        result["status"] = "failed"
+        result["error"] = f"{type(exc).__name__}: {exc}"
+        result["traceback"] = traceback.format_exc()
+    result["total_seconds"] = round(time.perf_counter() - started, 3)
+    result["peak_memory_kb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    counters: Dict[str, Any] = {
+        name: int(value)
+        for name, value in (root.total_counters() if root is not None else {}).items()
+    }
+    for name, after in cache_stats().items():
+        before = caches_before.get(name, {})
+        counters[f"{name}_cache_hits"] = after["hits"] - before.get("hits", 0)
+        counters[f"{name}_cache_misses"] = after["misses"] - before.get("misses", 0)
+    result["counters"] = counters
+    result["stage_timings"] = {
+        stage: round(seconds, 3)
+        for stage, seconds in metrics.stage_timings.items()
+    }
+    return result
+
+
+def collect_case_folders(paths: List[str]) -> List[Path]:
+    """Папка с ПРЕТЕНЗИЯ.docx — кейс; иначе кейсами считаются её подпапки."""
+    folders: List[Path] = []
+    for raw in paths:
+        path = Path(raw)
+        if (path / "ПРЕТЕНЗИЯ.docx").exists():
+            folders.append(path)
+            continue
+        if path.is_dir():
+            folders.extend(
+                sub for sub in sorted(path.iterdir())
+                if sub.is_dir() and (sub / "ПРЕТЕНЗИЯ.docx").exists()
+            )
+    return folders
+
+
+def case_names(folders: List[Path]) -> Dict[Path, str]:
+    """
+    Уникальные имена кейсов: имя папки, а для совпадающих имён — путь
+    с таким числом родительских папок, при котором имена различаются.
+    """
+    resolved = {folder: folder.resolve() for folder in folders}
+    names: Dict[Path, str] = {}
+    depth = 1
+    pending = list(dict.fromkeys(folders))
+    while pending:
+        candidates = {
+            folder: "/".join(resolved[folder].parts[-depth:]) for folder in pending
+        }
+        counts = defaultdict(int)
+        for name in candidates.values():
+            counts[name] += 1
+        unresolved = []
+        for folder, name in candidates.items():
+            if counts[name] == 1 or depth >= len(resolved[folder].parts):
+                names[folder] = name
+            else:
+                unresolved.append(folder)
+        pending = unresolved
+        depth += 1
+    return names
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=Path(__file__).resolve().parent,
+            stderr=subprocess.DEVNULL,
+            text=True,
+        ).strip()
+    except Exception:
+        return ""
+
+
+def find_regressions(
+    current: Dict[str, Dict[str, Any]],
+    baseline: Dict[str, Dict[str, Any]],
+    time_threshold: float,
+    memory_threshold: float,
+    min_seconds: float,
+) -> List[str]:
+    """Сравнивает результаты прогонов по кейсам, присутствующим в обоих."""
+    regressions: List[str] = []
+    for name, item in current.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        if base["status"] == "ok" and item["status"] != "ok":
+            regressions.append(f"{name}: ошибка — {item['error']}")
+            continue
+        if item["status"] != "ok" or base["status"] != "ok":
+            continue
+        base_time = base.get("total_seconds") or 0.0
+        cur_time = item.get("total_seconds") or 0.0
+        if (
+            cur_time - base_time >= min_seconds
+            and cur_time > base_time * (1 + time_threshold)
+        ):
+            regressions.append(
+                f"{name}: время {base_time:.2f}s → {cur_time:.2f}s"
+            )
+        base_mem = base.get("peak_memory_kb") or 0
+        cur_mem = item.get("peak_memory_kb") or 0
+        if base_mem and cur_mem > base_mem * (1 + memory_threshold):
+            regressions.append(
+                f"{name}: память {base_mem // 1024} МБ → {cur_mem // 1024} МБ"
+            )
+        if (item.get("diff_lines") or 0) > (base.get("diff_lines") or 0):
+            regressions.append(
+                f"{name}: строк различий {base.get('diff_lines')} → "
+                f"{item.get('diff_lines')}"
+            )
+        if (item.get("missing_count") or 0) > (base.get("missing_count") or 0):
+            regressions.append(
+                f"{name}: незаполненных полей {base.get('missing_count')} → "
+                f"{item.get('missing_count')}"
+            )
+    return regressions
+
+
+def print_report(
+    results: Dict[str, Dict[str, Any]],
+    regressions: List[str],
+    baseline_run: Optional[int],
+) -> None:
+    for name, item in results.items():
+        if item["status"] != "ok":
+            print(f"{name}: ОШИБКА {item['error']}")
+            continue
+        slowest = sorted(
+            item["stage_timings"].items(),
+            key=lambda pair: pair[1],
+            reverse=True
+        )[:3]
+        stages = ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in slowest)
+        print(
+            f"{name}: {item['total_seconds']:.2f}s, "
+            f"{item['peak_memory_kb'] // 1024} МБ, "
+            f"различий {item['diff_lines']}, этапы: {stages}, "
+            f"счётчики: {json.dumps(item['counters'], ensure_ascii=False)}"
+        )
+    if baseline_run is None:
+        print("Предыдущего прогона нет, сравнение не выполнялось.")
+    elif regressions:
+        print(f"Регрессии относительно прогона #{baseline_run}:")
+        for line in regressions:
+            print(f"  - {line}")
+    else:
+        print(f"Регрессий относительно прогона #{baseline_run} нет.")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Бенчмарк претензий по корпусу кейсов с сохранением в SQLite."
+    )
+    parser.add_argument(
+        "folders",
+        nargs="+",
+        help="Папки кейсов (PDF + ПРЕТЕНЗИЯ.docx) или каталоги с такими папками",
+    )
+    parser.add_argument("--db", help="Путь к SQLite реестру кейсов")
+    parser.add_argument("--label", default="", help="Метка прогона (сравнение с той же меткой)")
+    parser.add_argument("--notes", default="", help="Комментарий к прогону")
+    parser.add_argument("--output-dir", default="isk_outputs/benchmark", help="Папка для выходных файлов")
+    parser.add_argument("--no-fill", action="store_true", help="Не заполнять поля из ручной претензии")
+    parser.add_argument("--baseline-run", type=int, help="Номер прогона для сравнения")
+    parser.add_argument("--time-threshold", type=float, default=0.2, help="Допустимый рост времени (доля)")
+    parser.add_argument("--memory-threshold", type=float, default=0.2, help="Допустимый рост памяти (доля)")
+    parser.add_argument("--min-seconds", type=float, default=0.5, help="Игнорировать замедления меньше N секунд")
+    args = parser.parse_args()
+
+    folders = list(dict.fromkeys(collect_case_folders(args.folders)))
+    if not folders:
+        print("Не найдено папок с ПРЕТЕНЗИЯ.docx")
+        return 1
+    names = case_names(folders)
+
+    registry = CaseRegistry(args.db)
+    run_id = registry.add_benchmark_run(args.label, git_revision(), args.notes)
+    started = time.perf_counter()
+    results: Dict[str, Dict[str, Any]] = {}
+    # Каждый кейс — в отдельном процессе: изолированные пиковая память и счётчики
+    context = multiprocessing.get_context("fork")
+    with context.Pool(processes=1, maxtasksperchild=1) as pool:
+        for folder in folders:
+            case = {
+                "case_name": names[folder],
+                "folder": str(folder),
+                "output_dir": str(Path(args.output_dir) / names[folder]),
+                "fill_from_manual": not args.no_fill,
+            }
+            print(f"Кейс {names[folder]}...", flush=True)
+            item = pool.apply(run_case, (case,))
+            case_id = None
+            if item["status"] == "ok":
+                comparison = dict(item["comparison"])
+                comparison["folder"] = folder
+                comparison["claim_data"] = item["snapshot"]
+                case_id = compare.record_comparison(registry, comparison)
+            registry.add_benchmark_result(
+                run_id,
+                case_name=item["case_name"],
+                folder_path=item["folder_path"],
+                status=item["status"],
+                case_id=case_id,
+                error=item["error"],
+                total_seconds=item["total_seconds"],
+                peak_memory_kb=item["peak_memory_kb"],
+                diff_lines=item.get("diff_lines"),
+                missing_count=item.get("missing_count"),
+                stage_timings=item["stage_timings"],
+                counters=item["counters"],
+            )
+            results[item["case_name"]] = item
+    registry.finish_benchmark_run(run_id, round(time.perf_counter() - started, 3))
+
+    baseline_run = args.baseline_run or registry.get_previous_benchmark_run(
+        run_id,
+        label=args.label or None
+    )
+    regressions: List[str] = []
+    if baseline_run is not None:
+        regressions = find_regressions(
+            registry.get_benchmark_results(run_id),
+            registry.get_benchmark_results(baseline_run),
+            args.time_threshold,
+            args.memory_threshold,
+            args.min_seconds,
+        )
+    registry.close()
+
+    print(f"Прогон #{run_id}")
+    print_report(results, regressions, baseline_run)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -9,11 +9,7 @@ import re
 from datetime import datetime, timedelta
 from typing import Any, Dict, List, Optional, Tuple
 
-logging.basicConfig(
-    level=logging.INFO,
-    filename='bot.log',
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
+from value_parsing import parse_exact_date
 
 
 def _is_leap_year(year: int) -> bool:
@@ -129,10 +125,9 @@ def _parse_periods_from_rows(
 
         date_from_idx, date_from_text = date_cells[0]
         date_to_idx, date_to_text = date_cells[1]
-        try:
-            date_from = datetime.strptime(date_from_text, '%d.%m.%Y')
-            date_to = datetime.strptime(date_to_text, '%d.%m.%Y')
-        except Exception:
+        date_from = parse_exact_date(date_from_text)
+        date_to = parse_exact_date(date_to_text)
+        if not date_from or not date_to:
             continue
 
         days = None
@@ -195,10 +190,7 @@ def extract_interest_table_rows(docx_path: str) -> List[List[str]]:
 
 
 def _parse_date_value(value: str) -> Optional[datetime]:
-    try:
-        return datetime.strptime(value.strip(), "%d.%m.%Y")
-    except Exception:
-        return None
+    return parse_exact_date(value)
 
 
 def _format_decimal_ru(value: float, decimals: int = 2) -> str:
@@ -331,8 +323,10 @@ def _load_cached_rates(
                 rate_value = item[1]
             if not date_str or rate_value is None:
                 continue
+            date_from = parse_exact_date(str(date_str))
+            if not date_from:
+                continue
             try:
-                date_from = datetime.strptime(str(date_str), "%d.%m.%Y")
                 rate = float(str(rate_value).replace(',', '.'))
             except Exception:
                 continue
@@ -393,7 +387,9 @@ def _fetch_rates_from_395gk(
         rate_match = re.search(r'\d+(?:[.,]\d+)?', cells[1])
         if not date_match or not rate_match:
             continue
-        date_from = datetime.strptime(date_match.group(0), "%d.%m.%Y")
+        date_from = parse_exact_date(date_match.group(0))
+        if not date_from:
+            continue
         rate = float(rate_match.group(0).replace(',', '.'))
         rates.append((date_from, rate))
 
@@ -478,7 +474,9 @@ def get_key_rates_from_395gk() -> List[Tuple[datetime, datetime, float]]:
     else:
         for date_str, rate_str in rates_data:
             try:
-                date_from = datetime.strptime(date_str, "%d.%m.%Y")
+                date_from = parse_exact_date(date_str)
+                if date_from is None:
+                    raise ValueError("некорректная дата")
                 rate = float(rate_str.replace(",", "."))
                 key_rates.append((date_from, rate))
             except Exception as e:
@@ -563,6 +561,59 @@ def calc_395_on_periods(
     return round(total_interest, 2), detailed_calc
 
 
+def _period_date(value: Any) -> Optional[datetime]:
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, str):
+        return _parse_date_value(value)
+    return None
+
+
+def summarize_interest_periods(
+    details: List[Dict[str, Any]]
+) -> List[Dict[str, Any]]:
+    """
+    Сводит подряд идущие периоды с одинаковой ставкой в одну строку.
+
+    Для очень длинных расчётов: объединяются только периоды с той же
+    задолженностью и тем же числом дней в году, так что в сводной строке
+    долг × ставка × дни / дни в году по-прежнему равны процентам. Увеличение
+    долга и смена года (365/366) начинают новую строку, как и разрыв
+    в датах или нераспознаваемые даты. Итог процентов не меняется.
+    """
+    summary: List[Dict[str, Any]] = []
+    last_end: Optional[datetime] = None
+    for row in details:
+        start = _period_date(row.get('date_from'))
+        end = _period_date(row.get('date_to'))
+        current = summary[-1] if summary else None
+        if (
+            current is not None
+            and start is not None
+            and last_end is not None
+            and start == last_end + timedelta(days=1)
+            and row.get('rate') == current.get('rate')
+            and row.get('sum') == current.get('sum')
+            and row.get('year_days') == current.get('year_days')
+            and not row.get('increase_sum')
+        ):
+            current['date_to'] = row.get('date_to')
+            current['days'] = (current.get('days') or 0) + (row.get('days') or 0)
+            current['interest'] = (
+                float(current.get('interest') or 0.0)
+                + float(row.get('interest') or 0.0)
+            )
+            if row.get('formula'):
+                current['formula'] = ' + '.join(
+                    part for part in (current.get('formula'), row['formula']) if part
+                )
+            current['merged_periods'] = current.get('merged_periods', 1) + 1
+        else:
+            summary.append(dict(row))
+        last_end = end
+    return summary
+
+
 def calculate_full_395(
     docx_path: str,
     today: Optional[datetime] = None,
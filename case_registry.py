@@ -2,7 +2,7 @@ import json
 import os
 import sqlite3
 from datetime import datetime
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional
 
 DEFAULT_DB_PATH = os.getenv(
     "CASE_REGISTRY_PATH",
@@ -53,9 +53,45 @@ class CaseRegistry:
                 )
                 """
             )
+            self.conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS benchmark_runs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    created_at TEXT NOT NULL,
+                    label TEXT,
+                    git_revision TEXT,
+                    notes TEXT,
+                    total_seconds REAL
+                )
+                """
+            )
+            self.conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS benchmark_results (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    run_id INTEGER NOT NULL,
+                    case_id INTEGER,
+                    case_name TEXT,
+                    folder_path TEXT,
+                    status TEXT,
+                    error TEXT,
+                    total_seconds REAL,
+                    peak_memory_kb INTEGER,
+                    diff_lines INTEGER,
+                    missing_count INTEGER,
+                    stage_timings TEXT,
+                    counters TEXT,
+                    FOREIGN KEY(run_id) REFERENCES benchmark_runs(id),
+                    FOREIGN KEY(case_id) REFERENCES cases(id)
+                )
+                """
+            )
             self.conn.execute(
                 "CREATE INDEX IF NOT EXISTS idx_cases_name ON cases(case_name)"
             )
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_bench_results_run_id ON benchmark_results(run_id)"
+            )
             self.conn.execute(
                 "CREATE INDEX IF NOT EXISTS idx_case_obs_case_id ON case_observations(case_id)"
             )
@@ -147,5 +183,112 @@ class CaseRegistry:
                 ),
             )
 
+    def add_benchmark_run(
+        self,
+        label: str = "",
+        git_revision: str = "",
+        notes: str = "",
+    ) -> int:
+        created_at = datetime.utcnow().isoformat(timespec="seconds")
+        with self.conn:
+            cursor = self.conn.execute(
+                """
+                INSERT INTO benchmark_runs (
+                    created_at,
+                    label,
+                    git_revision,
+                    notes
+                ) VALUES (?, ?, ?, ?)
+                """,
+                (created_at, label, git_revision, notes),
+            )
+        return int(cursor.lastrowid)
+
+    def finish_benchmark_run(self, run_id: int, total_seconds: float) -> None:
+        with self.conn:
+            self.conn.execute(
+                "UPDATE benchmark_runs SET total_seconds = ? WHERE id = ?",
+                (total_seconds, run_id),
+            )
+
+    def add_benchmark_result(
+        self,
+        run_id: int,
+        case_name: str,
+        folder_path: str,
+        status: str,
+        case_id: Optional[int] = None,
+        error: str = "",
+        total_seconds: float = 0.0,
+        peak_memory_kb: int = 0,
+        diff_lines: Optional[int] = None,
+        missing_count: Optional[int] = None,
+        stage_timings: Optional[Dict[str, Any]] = None,
+        counters: Optional[Dict[str, Any]] = None,
+    ) -> int:
+        with self.conn:
+            cursor = self.conn.execute(
+                """
+                INSERT INTO benchmark_results (
+                    run_id,
+                    case_id,
+                    case_name,
+                    folder_path,
+                    status,
+                    error,
+                    total_seconds,
+                    peak_memory_kb,
+                    diff_lines,
+                    missing_count,
+                    stage_timings,
+                    counters
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    run_id,
+                    case_id,
+                    case_name,
+                    folder_path,
+                    status,
+                    error,
+                    total_seconds,
+                    peak_memory_kb,
+                    diff_lines,
+                    missing_count,
+                    json.dumps(stage_timings or {}, ensure_ascii=False),
+                    json.dumps(counters or {}, ensure_ascii=False),
+                ),
+            )
+        return int(cursor.lastrowid)
+
+    def get_previous_benchmark_run(
+        self,
+        run_id: int,
+        label: Optional[str] = None,
+    ) -> Optional[int]:
+        query = "SELECT id FROM benchmark_runs WHERE id < ?"
+        params: List[Any] = [run_id]
+        if label:
+            query += " AND label = ?"
+            params.append(label)
+        row = self.conn.execute(
+            query + " ORDER BY id DESC LIMIT 1",
+            params,
+        ).fetchone()
+        return int(row["id"]) if row else None
+
+    def get_benchmark_results(self, run_id: int) -> Dict[str, Dict[str, Any]]:
+        rows = self.conn.execute(
+            "SELECT * FROM benchmark_results WHERE run_id = ? ORDER BY id",
+            (run_id,),
+        ).fetchall()
+        results: Dict[str, Dict[str, Any]] = {}
+        for row in rows:
+            item = dict(row)
+            item["stage_timings"] = json.loads(item.get("stage_timings") or "{}")
+            item["counters"] = json.loads(item.get("counters") or "{}")
+            results[item["case_name"]] = item
+        return results
+
     def close(self) -> None:
         self.conn.close()
@@ -7,6 +7,7 @@ from typing import Any, Dict, List, Optional, Tuple
 
 from docx import Document
 
+import tracing
 from case_registry import CaseRegistry
 from main import (
     add_working_days,
@@ -246,8 +247,10 @@ def fill_claim_from_manual(
     return filled_fields
 
 
+@tracing.traced("build_claim")
 def build_claim_from_folder(folder: Path) -> Tuple[Dict[str, Any], List[Dict[str, Any]], List[str]]:
     pdfs = sorted(folder.glob("*.pdf"))
+    tracing.stage("extraction", files=len(pdfs))
     combined_texts: List[str] = []
     all_pages: List[str] = []
 
@@ -259,12 +262,18 @@ def build_claim_from_folder(folder: Path) -> Tuple[Dict[str, Any], List[Dict[str
         blocks = [f"[Страница {idx + 1}]\n{page}" for idx, page in enumerate(pages)]
         combined_texts.append(f"=== {pdf.name} ===\n" + "\n\n".join(blocks))
 
+    tracing.count("pages", len(all_pages))
+
     combined_text = "\n\n".join(combined_texts)
+    tracing.stage("sliding_window")
     claim_data = parse_documents_with_sliding_window(combined_text)
+    tracing.stage("llm_fallback")
     claim_data = apply_llm_fallback(combined_text, claim_data)
+    tracing.stage("document_groups")
     claim_data["document_groups"] = build_document_groups(combined_text, claim_data)
     claim_data["source_files"] = [pdf.name for pdf in pdfs]
 
+    tracing.stage("documents")
     applications = extract_applications_from_pages(all_pages)
     invoices = extract_invoices_from_pages(all_pages)
     upd_docs = extract_upd_from_pages(all_pages)
@@ -272,6 +281,7 @@ def build_claim_from_folder(folder: Path) -> Tuple[Dict[str, Any], List[Dict[str
     shipments = extract_cdek_shipments_from_pages(all_pages)
     shipments.extend(extract_postal_shipments_from_pages(all_pages))
 
+    tracing.stage("groups")
     payment_terms_by_application = extract_application_payment_terms(all_pages, applications)
     groups = build_pretension_groups(
         applications,
@@ -309,6 +319,7 @@ def build_claim_from_folder(folder: Path) -> Tuple[Dict[str, Any], List[Dict[str
     if payment_days:
         claim_data["payment_days"] = str(payment_days)
 
+    tracing.stage("parties")
     parties = extract_parties_from_pages(all_pages)
     if parties:
         apply_extracted_parties(claim_data, parties)
@@ -511,24 +522,14 @@ def build_snapshot(data: Dict[str, Any]) -> Dict[str, Any]:
     return {key: data.get(key) for key in keys if key in data}
 
 
-def main() -> int:
-    parser = argparse.ArgumentParser(
-        description="Сравнивает претензию с эталоном и сохраняет кейс в SQLite."
-    )
-    parser.add_argument(
-        "folder",
-        nargs="?",
-        default="Претензия и документы к ней",
-        help="Папка с PDF и ПРЕТЕНЗИЯ.docx",
-    )
-    parser.add_argument("--db", help="Путь к SQLite реестру кейсов")
-    parser.add_argument("--case-name", help="Название кейса")
-    parser.add_argument("--output-dir", default="isk_outputs", help="Папка для выходных файлов")
-    parser.add_argument("--no-fill", action="store_true", help="Не заполнять поля из ручной претензии")
-    parser.add_argument("--notes", default="", help="Комментарий для кейса")
-    args = parser.parse_args()
-
-    folder = Path(args.folder)
+@tracing.traced("compare_pretension_case")
+def run_comparison(
+    folder: Path,
+    output_dir: Path,
+    fill_from_manual: bool = True,
+    generated_name: str = "pretension_generated_compare.docx",
+    diff_name: str = "pretension_diff_compare.txt",
+) -> Dict[str, Any]:
     manual_docx = folder / "ПРЕТЕНЗИЯ.docx"
     if not manual_docx.exists():
         raise FileNotFoundError(f"Не найден файл: {manual_docx}")
@@ -538,7 +539,8 @@ def main() -> int:
     manual_fields, price_values, shipment_pairs = extract_manual_fields(manual_lines)
 
     filled_fields: List[str] = []
-    if not args.no_fill:
+    tracing.stage("fill_from_manual")
+    if fill_from_manual:
         filled_fields = fill_claim_from_manual(
             claim_data,
             groups,
@@ -549,11 +551,12 @@ def main() -> int:
 
     claim_data["pretension_groups"] = groups
 
-    output_dir = Path(args.output_dir)
     output_dir.mkdir(parents=True, exist_ok=True)
-    output_docx = output_dir / "pretension_generated_compare.docx"
+    output_docx = output_dir / generated_name
+    tracing.stage("docx")
     generate_pretension_docx(claim_data, groups, output_docx)
 
+    tracing.stage("diff")
     manual_text = extract_docx_text(manual_docx)
     generated_text = extract_docx_text(output_docx)
 
@@ -564,27 +567,69 @@ def main() -> int:
             lineterm="",
         )
     )
-    diff_path = output_dir / "pretension_diff_compare.txt"
+    diff_path = output_dir / diff_name
     diff_path.write_text("\n".join(diff_lines), encoding="utf-8")
-
-    registry = CaseRegistry(args.db)
-    summary = {
+    return {
+        "folder": folder,
+        "manual_docx": manual_docx,
+        "generated_docx": output_docx,
+        "diff_path": diff_path,
+        "diff_lines": len(diff_lines),
+        "claim_data": claim_data,
         "missing_fields": missing_fields,
         "filled_fields": filled_fields,
-        "diff_lines": len(diff_lines),
+        "manual_fields": manual_fields,
+    }
+
+
+def record_comparison(
+    registry: CaseRegistry,
+    result: Dict[str, Any],
+    case_name: Optional[str] = None,
+) -> int:
+    summary = {
+        "missing_fields": result["missing_fields"],
+        "filled_fields": result["filled_fields"],
+        "diff_lines": result["diff_lines"],
     }
-    case_id = registry.add_case(
-        case_name=args.case_name or folder.name,
-        folder_path=str(folder),
-        manual_docx_path=str(manual_docx),
-        generated_docx_path=str(output_docx),
-        diff_path=str(diff_path),
-        missing_fields={"missing": missing_fields},
-        filled_fields={"filled": filled_fields},
-        extracted_fields=build_snapshot(claim_data),
-        manual_fields=manual_fields,
+    return registry.add_case(
+        case_name=case_name or result["folder"].name,
+        folder_path=str(result["folder"]),
+        manual_docx_path=str(result["manual_docx"]),
+        generated_docx_path=str(result["generated_docx"]),
+        diff_path=str(result["diff_path"]),
+        missing_fields={"missing": result["missing_fields"]},
+        filled_fields={"filled": result["filled_fields"]},
+        extracted_fields=build_snapshot(result["claim_data"]),
+        manual_fields=result["manual_fields"],
         summary=json.dumps(summary, ensure_ascii=False),
     )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Сравнивает претензию с эталоном и сохраняет кейс в SQLite."
+    )
+    parser.add_argument(
+        "folder",
+        nargs="?",
+        default="Претензия и документы к ней",
+        help="Папка с PDF и ПРЕТЕНЗИЯ.docx",
+    )
+    parser.add_argument("--db", help="Путь к SQLite реестру кейсов")
+    parser.add_argument("--case-name", help="Название кейса")
+    parser.add_argument("--output-dir", default="isk_outputs", help="Папка для выходных файлов")
+    parser.add_argument("--no-fill", action="store_true", help="Не заполнять поля из ручной претензии")
+    parser.add_argument("--notes", default="", help="Комментарий для кейса")
+    args = parser.parse_args()
+
+    result = run_comparison(
+        Path(args.folder),
+        Path(args.output_dir),
+        fill_from_manual=not args.no_fill,
+    )
+    registry = CaseRegistry(args.db)
+    case_id = record_comparison(registry, result, args.case_name)
     if args.notes:
         registry.add_observation(
             case_id=case_id,
@@ -593,10 +638,10 @@ def main() -> int:
         )
     registry.close()
 
-    print(f"Generated: {output_docx}")
-    print(f"Diff: {diff_path}")
-    print(f"Missing fields: {missing_fields}")
-    print(f"Filled fields: {filled_fields}")
+    print(f"Generated: {result['generated_docx']}")
+    print(f"Diff: {result['diff_path']}")
+    print(f"Missing fields: {result['missing_fields']}")
+    print(f"Filled fields: {result['filled_fields']}")
     return 0
 
 
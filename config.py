@@ -468,8 +468,13 @@ def get_court_by_city(city: str) -> Tuple[str, str]:
     Returns:
         Кортеж (название суда, адрес суда)
     """
-    city_lower = city.lower()
+    from court_index import find_court_region
+
+    match = find_court_region(city)
+    if match:
+        return match.court['name'], match.court['address']
 
+    city_lower = city.lower()
     for court_city, court_info in COURTS_DATABASE.items():
         if (city_lower in court_city.lower() or
                 court_city.lower() in city_lower):
@@ -0,0 +1,280 @@
+"""
+Локальный справочник арбитражных судов.
+
+Записи строятся из базы судов (courts_database.json) и дополняются
+карточками DaData: наименование и юридический адрес, код суда, сайт.
+Справочник хранится в JSON (COURT_DIRECTORY_PATH) и читается в память
+один раз, поэтому определение суда не требует сети. import_dadata()
+обновляет записи пачкой; start_refresh() делает это в фоне для записей
+старше COURT_DIRECTORY_MAX_AGE_DAYS. Запросы идут с паузой
+COURT_DIRECTORY_REQUEST_PAUSE, а первый проход — не раньше
+COURT_DIRECTORY_START_DELAY после запуска. Карточка сохраняется, только
+если её наименование совпадает с судом региона.
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+import time
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from lookup_cache import env_float
+
+logger = logging.getLogger(__name__)
+
+# fetch(name) -> (карточка суда, исходная подсказка DaData) или None
+CourtFetcher = Callable[[str], Optional[Tuple[Dict[str, Any], Dict[str, Any]]]]
+
+COURT_DIRECTORY_PATH = os.getenv(
+    "COURT_DIRECTORY_PATH",
+    os.path.join(os.path.dirname(__file__), "court_directory.json")
+)
+COURT_DIRECTORY_MAX_AGE_DAYS = env_float("COURT_DIRECTORY_MAX_AGE_DAYS", 30)
+# Период фонового обновления; 0 — не обновлять в фоне
+COURT_DIRECTORY_REFRESH_HOURS = env_float("COURT_DIRECTORY_REFRESH_HOURS", 24)
+# Пауза между запросами к DaData и задержка первого фонового прохода, сек.
+COURT_DIRECTORY_REQUEST_PAUSE = env_float("COURT_DIRECTORY_REQUEST_PAUSE", 2)
+COURT_DIRECTORY_START_DELAY = env_float("COURT_DIRECTORY_START_DELAY", 60)
+
+# Поля карточки суда (как в parse_dadata_court)
+COURT_FIELDS = ("name", "address", "code", "court_type", "court_type_name", "website")
+
+_QUOTES_RE = re.compile(r'[«»"\']')
+_SPACES_RE = re.compile(r'\s+')
+# Сокращения в наименованиях судов DaData («Арбитражный суд г. Москвы»)
+_NAME_ABBREVIATIONS = (
+    (re.compile(r'\bг\.\s*'), 'города '),
+    (re.compile(r'\bобл\.'), 'области'),
+    (re.compile(r'\bресп\.'), 'республики'),
+)
+
+
+def normalize_court_name(name: Optional[str]) -> str:
+    """Ключ для поиска суда по наименованию."""
+    text = _QUOTES_RE.sub('', str(name or '')).lower().replace('ё', 'е')
+    for pattern, replacement in _NAME_ABBREVIATIONS:
+        text = pattern.sub(replacement, text)
+    return _SPACES_RE.sub(' ', text).strip()
+
+
+class CourtDirectory:
+    """Справочник судов по регионам: база судов плюс карточки DaData."""
+
+    def __init__(self, path: Optional[str], courts: Dict[str, Dict[str, str]]) -> None:
+        self.path = path
+        self._courts = courts
+        self._records: Dict[str, Dict[str, Any]] = {}
+        self._by_name: Dict[str, str] = {}
+        self._by_code: Dict[str, str] = {}
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _index(self, region: str, record: Dict[str, Any]) -> None:
+        for name in (record.get("name"), record.get("base_name")):
+            key = normalize_court_name(name)
+            if key:
+                self._by_name[key] = region
+        if record.get("code"):
+            self._by_code[str(record["code"])] = region
+
+    def _load(self) -> None:
+        if self._loaded:
+            return
+        self._loaded = True
+        for region, info in self._courts.items():
+            self._records[region] = {
+                "region": region,
+                "name": info.get("name", ""),
+                "address": info.get("address", ""),
+                "base_name": info.get("name", ""),
+            }
+        stored: Dict[str, Any] = {}
+        if self.path and os.path.exists(self.path):
+            try:
+                with open(self.path, "r", encoding="utf-8") as handle:
+                    stored = json.load(handle)
+            except Exception as exc:
+                logger.warning("Ошибка чтения справочника судов %s: %s", self.path, exc)
+        if isinstance(stored, dict):
+            for region, record in stored.items():
+                if region in self._records and isinstance(record, dict):
+                    self._records[region].update(record)
+                    self._records[region]["base_name"] = self._courts[region].get("name", "")
+        for region, record in self._records.items():
+            self._index(region, record)
+
+    def save(self) -> None:
+        """Сохраняет записи с карточками DaData."""
+        if not self.path:
+            return
+        with self._lock:
+            self._load()
+            payload = {
+                region: {key: value for key, value in record.items() if key != "base_name"}
+                for region, record in self._records.items()
+                if record.get("refreshed_at")
+            }
+            try:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                tmp_path = f"{self.path}.tmp"
+                with open(tmp_path, "w", encoding="utf-8") as handle:
+                    json.dump(payload, handle, ensure_ascii=False, indent=2)
+                os.replace(tmp_path, self.path)
+            except Exception as exc:
+                logger.warning("Ошибка сохранения справочника судов %s: %s", self.path, exc)
+
+    def region_for(self, court_name: Optional[str]) -> Optional[str]:
+        with self._lock:
+            self._load()
+            return self._by_name.get(normalize_court_name(court_name))
+
+    def lookup(self, court_name: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Запись суда по наименованию (из базы или DaData); None — суда нет."""
+        with self._lock:
+            region = self.region_for(court_name)
+            return dict(self._records[region]) if region else None
+
+    def lookup_code(self, code: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Запись суда по коду DaData."""
+        with self._lock:
+            self._load()
+            region = self._by_code.get(str(code or "").strip())
+            return dict(self._records[region]) if region else None
+
+    def update(
+        self,
+        region: str,
+        card: Dict[str, Any],
+        suggestion: Optional[Dict[str, Any]] = None,
+        persist: bool = True
+    ) -> bool:
+        """
+        Дополняет запись региона карточкой DaData. Карточка другого суда
+        (нечёткая подсказка) не сохраняется — возвращается False.
+        """
+        with self._lock:
+            self._load()
+            record = self._records.get(region)
+            if record is None:
+                return False
+            card_name = normalize_court_name(card.get("name"))
+            known_names = {
+                normalize_court_name(record.get("base_name")),
+                normalize_court_name(record.get("name")),
+            }
+            if not card_name or card_name not in known_names:
+                logger.warning(
+                    "Карточка DaData «%s» не совпадает с судом «%s», не сохранена",
+                    card.get("name"),
+                    record.get("base_name")
+                )
+                return False
+            for field in COURT_FIELDS:
+                if card.get(field):
+                    record[field] = card[field]
+            if suggestion is not None:
+                record["suggestion"] = suggestion
+            record["refreshed_at"] = time.time()
+            self._index(region, record)
+            if persist:
+                self.save()
+            return True
+
+    def stale_regions(self, max_age_seconds: float, now: Optional[float] = None) -> List[str]:
+        """Регионы без карточки DaData или с карточкой старше max_age_seconds."""
+        now = time.time() if now is None else now
+        with self._lock:
+            self._load()
+            return [
+                region for region, record in self._records.items()
+                if now - float(record.get("refreshed_at") or 0) > max_age_seconds
+            ]
+
+    def import_dadata(
+        self,
+        fetch: CourtFetcher,
+        max_age_seconds: float = 0,
+        pause_seconds: float = 0
+    ) -> int:
+        """
+        Запрашивает карточки для устаревших записей (все — при
+        max_age_seconds=0) с паузой pause_seconds между запросами и
+        сохраняет справочник один раз. fetch(name) возвращает (карточка,
+        исходная подсказка) или None. Возвращает число обновлённых записей.
+        """
+        updated = 0
+        for index, region in enumerate(self.stale_regions(max_age_seconds)):
+            if index and pause_seconds > 0 and self._stop.wait(pause_seconds):
+                break
+            with self._lock:
+                base_name = self._records[region]["base_name"]
+            try:
+                result = fetch(base_name)
+            except Exception as exc:
+                logger.warning("Не удалось обновить суд %s: %s", base_name, exc)
+                continue
+            if not result:
+                continue
+            card, suggestion = result
+            if self.update(region, card, suggestion, persist=False):
+                updated += 1
+        if updated:
+            self.save()
+        logger.info("Справочник судов: обновлено записей %s", updated)
+        return updated
+
+    def start_refresh(
+        self,
+        fetch: CourtFetcher,
+        interval_seconds: float,
+        max_age_seconds: float,
+        pause_seconds: float = 0,
+        start_delay: float = 0
+    ) -> Optional[threading.Thread]:
+        """
+        Фоновое обновление: через start_delay после запуска, затем раз
+        в interval_seconds; запросы — с паузой pause_seconds.
+        """
+        if interval_seconds <= 0:
+            return None
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return self._thread
+            self._stop.clear()
+
+            def run() -> None:
+                if start_delay > 0 and self._stop.wait(start_delay):
+                    return
+                while True:
+                    try:
+                        self.import_dadata(fetch, max_age_seconds, pause_seconds)
+                    except Exception as exc:
+                        logger.warning("Ошибка обновления справочника судов: %s", exc)
+                    if self._stop.wait(interval_seconds):
+                        return
+
+            self._thread = threading.Thread(
+                target=run,
+                name="court-directory-refresh",
+                daemon=True
+            )
+            self._thread.start()
+            return self._thread
+
+    def stop_refresh(self) -> None:
+        self._stop.set()
+
+
+@lru_cache(maxsize=1)
+def default_directory() -> CourtDirectory:
+    """Справочник по базе судов из courts_code и файлу COURT_DIRECTORY_PATH."""
+    from courts_code import ARBITRATION_COURTS
+
+    return CourtDirectory(COURT_DIRECTORY_PATH, ARBITRATION_COURTS)
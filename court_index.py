@@ -0,0 +1,321 @@
+"""
+Индекс для определения арбитражного суда по адресу.
+
+Названия регионов (с падежными и сокращёнными формами: «Московской
+обл.», «Краснодарского края»), города из CITY_TO_REGION и первые три
+цифры почтового индекса сводятся в словарь по первому слову фразы.
+Адрес разбивается на слова один раз, поэтому поиск идёт за один проход
+по адресу, а не по всем записям базы судов. Совпадение по слову
+целиком: «ул. Кирова» не даёт Кировскую область, «Алтайский край» —
+Республику Алтай. Результаты для повторяющихся адресов кэшируются.
+"""
+
+import logging
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from lookup_cache import env_int
+
+logger = logging.getLogger(__name__)
+
+COURT_INDEX_CACHE_SIZE = env_int("COURT_INDEX_CACHE_SIZE", 4096)
+
+# Первые три цифры почтового индекса → регион (ключ базы судов)
+POSTAL_PREFIX_RANGES: Tuple[Tuple[int, int, str], ...] = (
+    (101, 129, "Москва"),
+    (140, 144, "Московская область"),
+    (150, 152, "Ярославская область"),
+    (153, 155, "Ивановская область"),
+    (156, 157, "Костромская область"),
+    (160, 162, "Вологодская область"),
+    (163, 165, "Архангельская область"),
+    (166, 166, "Ненецкий автономный округ"),
+    (167, 169, "Коми"),
+    (170, 172, "Тверская область"),
+    (173, 175, "Новгородская область"),
+    (180, 182, "Псковская область"),
+    (183, 184, "Мурманская область"),
+    (185, 186, "Карелия"),
+    (187, 188, "Ленинградская область"),
+    (190, 199, "Санкт-Петербург"),
+    (214, 216, "Смоленская область"),
+    (236, 238, "Калининградская область"),
+    (241, 243, "Брянская область"),
+    (248, 249, "Калужская область"),
+    (295, 299, "Крым"),
+    (300, 301, "Тульская область"),
+    (302, 303, "Орловская область"),
+    (305, 307, "Курская область"),
+    (308, 309, "Белгородская область"),
+    (344, 347, "Ростовская область"),
+    (350, 354, "Краснодарский край"),
+    (355, 357, "Ставропольский край"),
+    (358, 359, "Калмыкия"),
+    (360, 361, "Кабардино-Балкария"),
+    (362, 363, "Северная Осетия"),
+    (364, 366, "Чечня"),
+    (367, 368, "Дагестан"),
+    (369, 369, "Карачаево-Черкесия"),
+    (385, 385, "Адыгея"),
+    (386, 386, "Ингушетия"),
+    (390, 391, "Рязанская область"),
+    (392, 393, "Тамбовская область"),
+    (394, 397, "Воронежская область"),
+    (398, 399, "Липецкая область"),
+    (400, 404, "Волгоградская область"),
+    (410, 413, "Саратовская область"),
+    (414, 416, "Астраханская область"),
+    (420, 423, "Татарстан"),
+    (424, 425, "Марий Эл"),
+    (426, 427, "Удмуртия"),
+    (428, 429, "Чувашия"),
+    (430, 431, "Мордовия"),
+    (432, 433, "Ульяновская область"),
+    (440, 442, "Пензенская область"),
+    (443, 446, "Самарская область"),
+    (450, 453, "Башкортостан"),
+    (454, 457, "Челябинская область"),
+    (460, 462, "Оренбургская область"),
+    (600, 602, "Владимирская область"),
+    (603, 607, "Нижегородская область"),
+    (610, 613, "Кировская область"),
+    (614, 619, "Пермский край"),
+    (620, 624, "Свердловская область"),
+    (625, 627, "Тюменская область"),
+    (628, 628, "Ханты-Мансийский автономный округ"),
+    (629, 629, "Ямало-Ненецкий автономный округ"),
+    (630, 633, "Новосибирская область"),
+    (634, 636, "Томская область"),
+    (640, 641, "Курганская область"),
+    (644, 646, "Омская область"),
+    (649, 649, "Алтай"),
+    (650, 654, "Кемеровская область"),
+    (655, 655, "Хакасия"),
+    (656, 659, "Алтайский край"),
+    (660, 663, "Красноярский край"),
+    (664, 666, "Иркутская область"),
+    (667, 668, "Тыва"),
+    (670, 671, "Бурятия"),
+    (672, 674, "Забайкальский край"),
+    (675, 676, "Амурская область"),
+    (677, 678, "Саха"),
+    (679, 679, "Еврейская автономная область"),
+    (680, 682, "Хабаровский край"),
+    (683, 684, "Камчатский край"),
+    (685, 686, "Магаданская область"),
+    (689, 689, "Чукотский автономный округ"),
+    (690, 692, "Приморский край"),
+    (693, 694, "Сахалинская область"),
+)
+
+# Официальные и разговорные названия, которых нет среди ключей базы
+REGION_ALIASES: Dict[str, str] = {
+    "удмуртская республика": "Удмуртия",
+    "чувашская республика": "Чувашия",
+    "чеченская республика": "Чечня",
+    "кабардино-балкарская республика": "Кабардино-Балкария",
+    "карачаево-черкесская республика": "Карачаево-Черкесия",
+    "якутия": "Саха",
+    "алания": "Северная Осетия",
+    "тува": "Тыва",
+    "югра": "Ханты-Мансийский автономный округ",
+    "хмао": "Ханты-Мансийский автономный округ",
+    "янао": "Ямало-Ненецкий автономный округ",
+    "кузбасс": "Кемеровская область",
+}
+
+_WORD_RE = re.compile(r'[а-яa-z0-9]+(?:-[а-яa-z0-9]+)*')
+_POSTAL_RE = re.compile(r'(?<!\d)(\d{6})(?!\d)')
+
+_KIND_PRIORITY = {"region": 0, "city": 1}
+
+
+@dataclass(frozen=True)
+class CourtMatch:
+    """Найденный суд и то, по чему он найден."""
+    region: str
+    court: Dict[str, str]
+    evidence: str
+    source: str  # region / city / postal
+
+
+def _normalize(text: str) -> str:
+    return text.lower().replace("ё", "е")
+
+
+def _words(text: str) -> List[re.Match]:
+    return list(_WORD_RE.finditer(_normalize(text)))
+
+
+def _adjective_forms(word: str) -> List[str]:
+    """Именительный, родительный и предложный падеж прилагательного."""
+    for ending, forms in (
+        ("ая", ("ая", "ой")),
+        ("яя", ("яя", "ей")),
+        ("ий", ("ий", "ого", "ом")),
+        ("ый", ("ый", "ого", "ом")),
+    ):
+        if word.endswith(ending):
+            stem = word[:-len(ending)]
+            return [stem + form for form in forms]
+    return [word]
+
+
+def _noun_forms(word: str) -> List[str]:
+    """Падежные формы названия-существительного («Москва» → «Москвы»)."""
+    if word.endswith(("ия", "ея")):
+        return [word, word[:-1] + "и"]
+    if word.endswith(("а", "я")):
+        return [word, word[:-1] + "ы", word[:-1] + "и", word[:-1] + "е"]
+    if word[-1] not in "аеиоуыэюяйь":
+        return [word, word + "а", word + "е", word + "у"]
+    return [word]
+
+
+def _inflected_heads(adjectives: List[str]) -> List[Tuple[str, ...]]:
+    """Прилагательные в одном падеже: «Еврейская автономная», «Еврейской автономной»."""
+    forms = [_adjective_forms(word) for word in adjectives]
+    return list(dict.fromkeys(
+        tuple(word_forms[min(case, len(word_forms) - 1)] for word_forms in forms)
+        for case in range(3)
+    ))
+
+
+def region_phrases(region: str) -> List[Tuple[str, ...]]:
+    """Варианты написания региона в адресе в виде кортежей слов."""
+    words = [match.group(0) for match in _words(region)]
+    if not words:
+        return []
+    tail, adjectives = words[-1], words[:-1]
+    if tail == "округ" and adjectives[-1:] == ["автономный"]:
+        heads = _inflected_heads(adjectives[:-1])
+        tails = [("автономный", "округ"), ("автономного", "округа"), ("ао",)]
+    elif tail == "область" and adjectives:
+        heads = _inflected_heads(adjectives)
+        tails = [("область",), ("области",), ("обл",)]
+        if adjectives[-1] == "автономная":
+            # «Еврейская АО»
+            heads += [tuple(adjectives[:-1])]
+            tails += [("ао",)]
+    elif tail == "край" and adjectives:
+        heads = _inflected_heads(adjectives)
+        tails = [("край",), ("края",), ("крае",), ("кр",)]
+    elif tail == "республика" and adjectives:
+        heads = _inflected_heads(adjectives)
+        tails = [("республика",), ("республики",), ("респ",)]
+    elif len(words) == 1:
+        return [(form,) for form in _noun_forms(tail)]
+    else:
+        return [tuple(words)]
+    return list(dict.fromkeys(head + tail_form for head in heads for tail_form in tails))
+
+
+class CourtIndex:
+    """Индекс «слова адреса → регион → суд» по базе судов и справочнику городов."""
+
+    def __init__(
+        self,
+        courts: Dict[str, Dict[str, str]],
+        city_to_region: Dict[str, str],
+        aliases: Optional[Dict[str, str]] = None
+    ) -> None:
+        self.courts = courts
+        self._phrases: Dict[str, List[Tuple[Tuple[str, ...], str, str]]] = {}
+        for region in courts:
+            for phrase in region_phrases(region):
+                self._add(phrase, region, "region")
+        for alias, region in (REGION_ALIASES if aliases is None else aliases).items():
+            if region in courts:
+                for phrase in region_phrases(alias):
+                    self._add(phrase, region, "region")
+        for city, region in city_to_region.items():
+            if region in courts:
+                self._add(tuple(m.group(0) for m in _words(city)), region, "city")
+        # В одной позиции сначала регионы, среди них — более длинные фразы
+        for candidates in self._phrases.values():
+            candidates.sort(key=lambda item: (_KIND_PRIORITY[item[2]], -len(item[0])))
+        self._postal: Dict[str, str] = {}
+        for low, high, region in POSTAL_PREFIX_RANGES:
+            if region in courts:
+                for prefix in range(low, high + 1):
+                    self._postal[f"{prefix:03d}"] = region
+
+    def _add(self, phrase: Tuple[str, ...], region: str, kind: str) -> None:
+        if not phrase:
+            return
+        entries = self._phrases.setdefault(phrase[0], [])
+        if not any(existing == phrase and existing_kind == kind for existing, _, existing_kind in entries):
+            entries.append((phrase, region, kind))
+
+    def _match(self, region: str, evidence: str, source: str) -> CourtMatch:
+        return CourtMatch(region, self.courts[region], evidence, source)
+
+    def resolve(self, address: str, use_postal: bool = True) -> Optional[CourtMatch]:
+        """
+        Суд по адресу: первое упоминание региона, иначе первого города,
+        иначе почтовый индекс. None, если ничего не найдено.
+        """
+        if not address:
+            return None
+        normalized = _normalize(address)
+        # Для фрагмента-доказательства — исходное написание адреса
+        original = address if len(address) == len(normalized) else normalized
+        words = list(_WORD_RE.finditer(normalized))
+        tokens = [match.group(0) for match in words]
+        city: Optional[CourtMatch] = None
+        for position, token in enumerate(tokens):
+            for phrase, region, kind in self._phrases.get(token, ()):
+                end = position + len(phrase)
+                if tuple(tokens[position:end]) != phrase:
+                    continue
+                evidence = original[words[position].start():words[end - 1].end()]
+                if kind == "region":
+                    return self._match(region, evidence, kind)
+                if city is None:
+                    city = self._match(region, evidence, kind)
+                break
+        if city is not None:
+            return city
+        if use_postal:
+            for match in _POSTAL_RE.finditer(normalized):
+                region = self._postal.get(match.group(1)[:3])
+                if region:
+                    return self._match(region, match.group(1), "postal")
+        return None
+
+    def find_region(self, text: str) -> Optional[CourtMatch]:
+        """Суд по названию региона или города («Свердловской области», «Казань»)."""
+        if not text:
+            return None
+        stripped = text.strip()
+        if stripped in self.courts:
+            return self._match(stripped, stripped, "region")
+        return self.resolve(stripped, use_postal=False)
+
+
+@lru_cache(maxsize=1)
+def default_index() -> CourtIndex:
+    """Индекс по базе судов и справочнику городов из courts_code."""
+    from courts_code import ARBITRATION_COURTS, CITY_TO_REGION
+
+    return CourtIndex(ARBITRATION_COURTS, CITY_TO_REGION)
+
+
+@lru_cache(maxsize=COURT_INDEX_CACHE_SIZE)
+def resolve_court_address(address: str) -> Optional[CourtMatch]:
+    """Суд по адресу ответчика через индекс по умолчанию (с кэшем)."""
+    match = default_index().resolve(address)
+    if match:
+        logger.debug(
+            "Суд по адресу %r: %s (%s: %s)",
+            address, match.region, match.source, match.evidence
+        )
+    return match
+
+
+@lru_cache(maxsize=COURT_INDEX_CACHE_SIZE)
+def find_court_region(text: str) -> Optional[CourtMatch]:
+    """Суд по названию региона или города через индекс по умолчанию (с кэшем)."""
+    return default_index().find_region(text)
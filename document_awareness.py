@@ -22,8 +22,9 @@ from decimal import Decimal, ROUND_HALF_UP
 from typing import Any, Dict, List, Optional, Tuple
 
 import requests
-from dotenv import load_dotenv
-import os
+
+from settings import get_settings
+from value_parsing import format_date, parse_amount_text, parse_numeric_date
 
 logger = logging.getLogger(__name__)
 
@@ -101,31 +102,14 @@ class DocumentAwarenessResult:
 # Конфигурация LLM
 # =============================================================================
 
-def _get_env(name: str, default: str = "") -> str:
-    value = os.getenv(name)
-    return value if value is not None else default
-
-
 def get_llm_config() -> Dict[str, Any]:
-    """Загружает конфигурацию LLM из переменных окружения."""
-    load_dotenv()
-    base_url = (
-        _get_env("OLLAMA_BASE_URL")
-        or _get_env("OLLAMA_HOST")
-        or ""
-    ).strip()
-    enabled_raw = os.getenv("LLM_ENABLED")
-    if enabled_raw is None:
-        enabled = bool(base_url)
-    else:
-        enabled = enabled_raw.lower() in ("1", "true", "yes", "on")
-    model = _get_env("OLLAMA_MODEL", "qwen2.5:7b-instruct").strip()
-    timeout = int(_get_env("OLLAMA_TIMEOUT", "60"))
+    """Конфигурация LLM из настроек процесса."""
+    settings = get_settings()
     return {
-        "enabled": enabled,
-        "base_url": base_url.rstrip("/"),
-        "model": model,
-        "timeout": timeout,
+        "enabled": settings.enabled(settings.llm_enabled),
+        "base_url": settings.base_url,
+        "model": settings.llm_model or "qwen2.5:7b-instruct",
+        "timeout": settings.llm_timeout or 60,
     }
 
 
@@ -236,26 +220,12 @@ COUNTER_CLAIM_PATTERNS = [
 
 def _parse_amount(text: str) -> Optional[Decimal]:
     """Парсит сумму из текста."""
-    if not text:
-        return None
-    # Убираем пробелы и заменяем запятую на точку
-    cleaned = re.sub(r'\s+', '', str(text)).replace(',', '.')
-    # Убираем "руб", "р" и прочее
-    cleaned = re.sub(r'[а-яА-Яa-zA-Z\.]+$', '', cleaned)
-    try:
-        return Decimal(cleaned)
-    except Exception:
-        return None
+    return parse_amount_text(text)
 
 
 def _parse_date(text: str) -> Optional[str]:
     """Парсит дату из текста в формат ДД.ММ.ГГГГ."""
-    if not text:
-        return None
-    match = re.search(r'(\d{2})[./](\d{2})[./](\d{4})', text)
-    if match:
-        return f"{match.group(1)}.{match.group(2)}.{match.group(3)}"
-    return None
+    return format_date(parse_numeric_date(text)) or None
 
 
 # =============================================================================
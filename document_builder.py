@@ -0,0 +1,144 @@
+"""
+Параллельная сборка независимых DOCX одного запроса.
+
+Иск, опись Ф107 и доверенность не зависят друг от друга: каждый
+загружает свой шаблон, заменяет плейсхолдеры и сериализует документ.
+DocumentBuildPipeline запускает их в пуле процессов (python-docx упирается
+в CPU и GIL) и отдаёт готовые документы по одному, не дожидаясь остальных.
+Карты замен считаются заранее в основном процессе и передаются в задачи.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import pickle
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Callable, Dict, Optional, Set, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+_POOL_UNAVAILABLE = object()
+
+
+@dataclass
+class DocumentJob:
+    """Задача сборки одного документа: func(*args, **kwargs) -> байты или путь."""
+
+    name: str
+    func: Callable[..., Union[str, bytes]]
+    args: Tuple[Any, ...] = ()
+    kwargs: Dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class BuiltDocument:
+    """Результат задачи: содержимое документа (или путь к файлу) либо исключение."""
+
+    name: str
+    content: Optional[Union[str, bytes]] = None
+    error: Optional[BaseException] = None
+
+
+class DocumentBuildPipeline:
+    """Пул процессов для сборки документов; без пула — потоки event loop."""
+
+    def __init__(self, max_workers: int = 3) -> None:
+        self.max_workers = max(0, int(max_workers or 0))
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pending: Set[Future] = set()
+        self._lock = threading.Lock()
+
+    def _get_pool(self) -> Optional[ProcessPoolExecutor]:
+        if self.max_workers < 2:
+            return None
+        with self._lock:
+            if self._pool is None:
+                # spawn: бот многопоточный, fork там небезопасен
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._pool
+
+    def _reset_pool(self) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+            pending, self._pending = self._pending, set()
+        # cancel_futures у shutdown() есть только с Python 3.9
+        for future in pending:
+            future.cancel()
+        if pool is not None:
+            pool.shutdown(wait=False)
+
+    def shutdown(self) -> None:
+        """Останавливает пул; задачи, не начатые процессами, отменяются."""
+        self._reset_pool()
+
+    def _forget(self, future: Future) -> None:
+        with self._lock:
+            self._pending.discard(future)
+
+    async def _run_in_pool(self, call: "_JobCall") -> Any:
+        """Результат из пула процессов; _POOL_UNAVAILABLE, если пул не справился."""
+        pool = self._get_pool()
+        if pool is None:
+            return _POOL_UNAVAILABLE
+        try:
+            # Ошибки запуска процессов — здесь, ошибки самой задачи — при ожидании
+            future = pool.submit(call)
+        except (BrokenProcessPool, OSError, RuntimeError) as exc:
+            logger.warning("Пул сборки документов недоступен: %s", exc)
+            self._reset_pool()
+            return _POOL_UNAVAILABLE
+        with self._lock:
+            self._pending.add(future)
+        future.add_done_callback(self._forget)
+        try:
+            return await asyncio.wrap_future(future)
+        except BrokenProcessPool as exc:
+            logger.warning("Пул сборки документов недоступен: %s", exc)
+            self._reset_pool()
+        except pickle.PicklingError as exc:
+            logger.warning("Задачу нельзя передать в пул: %s", exc)
+        return _POOL_UNAVAILABLE
+
+    async def _run(self, job: DocumentJob) -> BuiltDocument:
+        call = _JobCall(job.func, job.args, job.kwargs)
+        try:
+            content = await self._run_in_pool(call)
+            if content is _POOL_UNAVAILABLE:
+                loop = asyncio.get_running_loop()
+                content = await loop.run_in_executor(None, call)
+            return BuiltDocument(job.name, content=content)
+        except Exception as exc:
+            return BuiltDocument(job.name, error=exc)
+
+    async def stream(self, *jobs: DocumentJob) -> AsyncIterator[BuiltDocument]:
+        """Запускает задачи одновременно и отдаёт результаты по мере готовности."""
+        tasks = [asyncio.ensure_future(self._run(job)) for job in jobs]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+
+
+class _JobCall:
+    """Вызов задачи, который можно передать в другой процесс."""
+
+    def __init__(
+        self,
+        func: Callable[..., Union[str, bytes]],
+        args: Tuple[Any, ...],
+        kwargs: Dict[str, Any]
+    ):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+
+    def __call__(self) -> Union[str, bytes]:
+        return self.func(*self.args, **self.kwargs)
@@ -16,14 +16,14 @@
 """
 
 import logging
-import os
 import re
 from dataclasses import dataclass, field
-from datetime import datetime, timedelta
+from datetime import timedelta
 from enum import Enum
 from typing import Any, Dict, List, Optional, Tuple
 
-import pdfplumber
+from pdf_extractor import PdfSource, load_document
+from value_parsing import parse_date
 
 logger = logging.getLogger(__name__)
 
@@ -139,12 +139,6 @@ DATE_PATTERNS = [
     r'(\d{1,2})\s+(?:января|февраля|марта|апреля|мая|июня|июля|августа|сентября|октября|ноября|декабря)\s+(\d{4})',
 ]
 
-MONTH_NAMES = {
-    'января': 1, 'февраля': 2, 'марта': 3, 'апреля': 4,
-    'мая': 5, 'июня': 6, 'июля': 7, 'августа': 8,
-    'сентября': 9, 'октября': 10, 'ноября': 11, 'декабря': 12
-}
-
 
 # =============================================================================
 # Классы данных
@@ -275,51 +269,6 @@ def normalize_driver_name(name: str) -> str:
     return name
 
 
-def parse_date(text: str) -> Optional[datetime]:
-    """Парсит дату из текста."""
-    if not text:
-        return None
-
-    # DD.MM.YYYY
-    match = re.search(r'(\d{1,2})[./](\d{1,2})[./](\d{4})', text)
-    if match:
-        try:
-            day, month, year = int(match.group(1)), int(match.group(2)), int(match.group(3))
-            return datetime(year, month, day)
-        except ValueError:
-            pass
-
-    # DD.MM.YY
-    match = re.search(r'(\d{1,2})[./](\d{1,2})[./](\d{2})\b', text)
-    if match:
-        try:
-            day, month, year = int(match.group(1)), int(match.group(2)), int(match.group(3))
-            year = 2000 + year if year < 50 else 1900 + year
-            return datetime(year, month, day)
-        except ValueError:
-            pass
-
-    # "DD месяца YYYY"
-    for month_name, month_num in MONTH_NAMES.items():
-        pattern = rf'(\d{{1,2}})\s+{month_name}\s+(\d{{4}})'
-        match = re.search(pattern, text, re.IGNORECASE)
-        if match:
-            try:
-                day, year = int(match.group(1)), int(match.group(2))
-                return datetime(year, month_num, day)
-            except ValueError:
-                pass
-
-    return None
-
-
-def format_date(dt: Optional[datetime]) -> str:
-    """Форматирует дату в строку DD.MM.YYYY."""
-    if not dt:
-        return ""
-    return dt.strftime("%d.%m.%Y")
-
-
 def dates_match(date1: str, date2: str, tolerance_days: int = 1) -> bool:
     """
     Проверяет, совпадают ли даты (с допуском).
@@ -979,67 +928,64 @@ def match_documents_to_applications(
 # =============================================================================
 
 def process_pdf(
-    pdf_path: str,
+    pdf_path: PdfSource,
     applications: List[ApplicationInfo]
 ) -> MatchingReport:
     """
     Обрабатывает PDF и сопоставляет документы с заявками.
 
     Args:
-        pdf_path: Путь к PDF файлу
+        pdf_path: Путь к PDF файлу или ExtractedDocument
         applications: Список заявок для сопоставления
 
     Returns:
         MatchingReport с результатами сопоставления
     """
     report = MatchingReport()
-    report.source_file = os.path.basename(pdf_path)
 
     try:
-        with pdfplumber.open(pdf_path) as pdf:
-            pages = []
-            for page in pdf.pages:
-                text = page.extract_text() or ""
-                pages.append(text)
-
-            report.total_pages = len(pages)
-
-            # Определяем границы документов
-            boundaries = detect_document_boundaries(pages)
-
-            # Создаём объекты документов
-            for start, end, doc_type in boundaries:
-                doc = ParsedDocument()
-                doc.page_start = start
-                doc.page_end = end
-                doc.doc_type = doc_type
-                doc.source_file = report.source_file
-
-                # Собираем текст всех страниц документа
-                doc_text = "\n".join(pages[start-1:end])
-                doc.raw_text = doc_text
-
-                # Извлекаем идентификаторы
-                doc.identifiers = extract_identifiers(doc_text, doc_type)
-
-                report.documents.append(doc)
-
-            # Сопоставляем с заявками
-            report.results = match_documents_to_applications(
-                report.documents,
-                applications
-            )
+        document = load_document(pdf_path, text_only=True)
+        report.source_file = document.source_file
+        pages = document.page_texts
 
-            # Собираем несопоставленные
-            report.unmatched_documents = [
-                r.document for r in report.results if not r.is_matched
-            ]
+        report.total_pages = len(pages)
 
-            if report.unmatched_documents:
-                report.warnings.append(
-                    f"Не удалось сопоставить {len(report.unmatched_documents)} "
-                    f"документ(ов)"
-                )
+        # Определяем границы документов
+        boundaries = detect_document_boundaries(pages)
+
+        # Создаём объекты документов
+        for start, end, doc_type in boundaries:
+            doc = ParsedDocument()
+            doc.page_start = start
+            doc.page_end = end
+            doc.doc_type = doc_type
+            doc.source_file = report.source_file
+
+            # Собираем текст всех страниц документа
+            doc_text = "\n".join(pages[start-1:end])
+            doc.raw_text = doc_text
+
+            # Извлекаем идентификаторы
+            doc.identifiers = extract_identifiers(doc_text, doc_type)
+
+            report.documents.append(doc)
+
+        # Сопоставляем с заявками
+        report.results = match_documents_to_applications(
+            report.documents,
+            applications
+        )
+
+        # Собираем несопоставленные
+        report.unmatched_documents = [
+            r.document for r in report.results if not r.is_matched
+        ]
+
+        if report.unmatched_documents:
+            report.warnings.append(
+                f"Не удалось сопоставить {len(report.unmatched_documents)} "
+                f"документ(ов)"
+            )
 
     except Exception as e:
         logger.error(f"Error processing PDF {pdf_path}: {e}")
@@ -0,0 +1,104 @@
+"""
+Вывод сформированных DOCX.
+
+Документы сериализуются в память и отправляются в Telegram прямо из
+буфера, без файлов в каталоге проекта. При заданном DOCUMENT_ARCHIVE_DIR
+копия сохраняется в архив; её файлы старше DOCUMENT_ARCHIVE_DAYS удаляются.
+Чистка трогает только имена вида <префикс>_<uuid hex>.docx, которые пишет
+archive_document, поэтому прочие файлы каталога не страдают.
+"""
+
+import io
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from typing import Optional, Union
+
+from lookup_cache import env_float
+
+logger = logging.getLogger(__name__)
+
+DOCUMENT_ARCHIVE_DIR = os.getenv("DOCUMENT_ARCHIVE_DIR", "")
+DOCUMENT_ARCHIVE_DAYS = env_float("DOCUMENT_ARCHIVE_DAYS", 30)
+# Чистка архива не чаще раза в час
+_PURGE_INTERVAL = 3600.0
+_last_purge: Optional[float] = None
+_purge_lock = threading.Lock()
+# Имя файла, записанного archive_document
+_ARCHIVE_NAME_RE = re.compile(r'^.+_[0-9a-f]{32}\.docx$')
+
+
+def document_bytes(doc) -> bytes:
+    """Содержимое документа python-docx в виде DOCX."""
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
+
+
+def purge_archive(directory: str, max_age_days: float, now: Optional[float] = None) -> int:
+    """
+    Удаляет из архива документы старше max_age_days (только файлы,
+    записанные archive_document); возвращает их число.
+    """
+    if max_age_days <= 0 or not os.path.isdir(directory):
+        return 0
+    cutoff = (now if now is not None else time.time()) - max_age_days * 86400
+    removed = 0
+    for entry in os.scandir(directory):
+        try:
+            if not _ARCHIVE_NAME_RE.match(entry.name):
+                continue
+            if entry.is_file() and entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+                removed += 1
+        except OSError as exc:
+            logger.warning("Не удалось удалить %s из архива: %s", entry.path, exc)
+    return removed
+
+
+def archive_document(
+    data: bytes,
+    prefix: str,
+    directory: Optional[str] = None
+) -> Optional[str]:
+    """Сохраняет копию документа в архив, если он настроен."""
+    global _last_purge
+    directory = DOCUMENT_ARCHIVE_DIR if directory is None else directory
+    if not directory:
+        return None
+    try:
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{prefix}_{uuid.uuid4().hex}.docx")
+        with open(path, "wb") as handle:
+            handle.write(data)
+    except OSError as exc:
+        logger.warning("Не удалось сохранить документ в архив: %s", exc)
+        return None
+    with _purge_lock:
+        now = time.monotonic()
+        due = _last_purge is None or now - _last_purge >= _PURGE_INTERVAL
+        if due:
+            _last_purge = now
+    if due:
+        purge_archive(directory, DOCUMENT_ARCHIVE_DAYS)
+    return path
+
+
+def render_document(
+    doc,
+    prefix: str,
+    output_path: Optional[str] = None
+) -> Union[str, bytes]:
+    """
+    Файл по output_path, если он задан (возвращается путь), иначе байты
+    документа (с копией в архив, если он настроен).
+    """
+    if output_path is not None:
+        doc.save(output_path)
+        return output_path
+    data = document_bytes(doc)
+    archive_document(data, prefix)
+    return data
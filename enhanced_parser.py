@@ -8,7 +8,7 @@
 import logging
 import re
 from dataclasses import dataclass, field
-from typing import Dict, List, Optional, Tuple
+from typing import Callable, Dict, List, Optional, Tuple
 
 from data_recovery import DataRecovery
 from validators import DataValidator, EntityType
@@ -40,6 +40,68 @@ class ParsingResult:
         self.extraction_methods[field] = method
 
 
+class ExtractionPlan:
+    """
+    Скомпилированный набор паттернов по полям.
+
+    Для каждого поля паттерны проверяются в порядке приоритета, берётся
+    первый, чьё значение принимает converter поля. Результат одного
+    scan() переиспользуется для всех полей (истец, ответчик, суммы),
+    вместе со значением возвращается имя сработавшего паттерна.
+    """
+
+    def __init__(
+        self,
+        fields: Dict[str, List[str]],
+        ignore_case: Tuple[str, ...] = (),
+        converters: Optional[Dict[str, Callable[[str], Optional[str]]]] = None
+    ):
+        self.fields = fields
+        self.converters = converters or {}
+        self._compiled: Dict[str, List[re.Pattern]] = {
+            field_name: [
+                re.compile(pattern, re.IGNORECASE if field_name in ignore_case else 0)
+                for pattern in patterns
+            ]
+            for field_name, patterns in fields.items()
+        }
+
+    def scan(self, text: str) -> Dict[str, Tuple[str, str]]:
+        """{поле: (значение, имя паттерна вида 'inn_0')}"""
+        found: Dict[str, Tuple[str, str]] = {}
+        for field_name, patterns in self._compiled.items():
+            converter = self.converters.get(field_name)
+            for idx, compiled in enumerate(patterns):
+                match = compiled.search(text)
+                if match is None:
+                    continue
+                value = match.group(1)
+                if converter is not None:
+                    value = converter(value)
+                    if value is None:
+                        continue
+                found[field_name] = (value, f"{field_name}_{idx}")
+                break
+        return found
+
+
+def _format_debt(raw: str) -> Optional[str]:
+    try:
+        debt = float(raw.replace(' ', '').replace(',', '.'))
+    except ValueError:
+        return None
+    return f"{debt:,.0f}".replace(',', ' ')
+
+
+ENTITY_FIELDS = ('inn', 'kpp', 'ogrn')
+DEBT_PATTERNS = [
+    r'Стоимость услуг по договор[^0-9]*составила\s*([0-9\s,]+)\s*рубл',
+    r'размер задолженности[^0-9]*составляет\s*([0-9\s,]+)\s*рубл',
+    r'задолженность[^0-9]*в размере\s*([0-9\s,]+)\s*рубл',
+]
+POSTCODE_RE = re.compile(r'\d{6}')
+
+
 class EnhancedParser:
     """
     Улучшенный парсер с многоуровневой стратегией извлечения.
@@ -95,6 +157,18 @@ class EnhancedParser:
             r'место\s+нахождения\s*[:\s]*([^,\n]+(?:,[^,\n]+){2,})',
         ]
 
+        # Реквизиты и суммы извлекаются одним проходом
+        self.entity_plan = ExtractionPlan({
+            'inn': self.inn_patterns,
+            'kpp': self.kpp_patterns,
+            'ogrn': self.ogrn_patterns,
+        })
+        self.document_plan = ExtractionPlan(
+            {**self.entity_plan.fields, 'debt': DEBT_PATTERNS},
+            ignore_case=('debt',),
+            converters={'debt': _format_debt}
+        )
+
     def parse_with_strategy(self, text: str) -> ParsingResult:
         """
         Основной метод парсинга с многоуровневой стратегией.
@@ -107,9 +181,7 @@ class EnhancedParser:
         """
         result = ParsingResult(data={})
 
-        logger.info("=" * 60)
-        logger.info("Начало многоуровневого парсинга")
-        logger.info("=" * 60)
+        logger.debug("Начало многоуровневого парсинга")
 
         # Уровень 1: Прямое извлечение
         self._level1_direct_extraction(text, result)
@@ -126,10 +198,10 @@ class EnhancedParser:
         # Финальная проверка
         self._final_check(result)
 
-        logger.info("=" * 60)
-        logger.info(f"Парсинг завершен. Confidence: {result.confidence:.2f}")
-        logger.info(f"Warnings: {len(result.warnings)}, Errors: {len(result.errors)}")
-        logger.info("=" * 60)
+        logger.debug(
+            f"Парсинг завершен. Confidence: {result.confidence:.2f}, "
+            f"warnings: {len(result.warnings)}, errors: {len(result.errors)}"
+        )
 
         return result
 
@@ -139,22 +211,18 @@ class EnhancedParser:
         """
         logger.info("Уровень 1: Прямое извлечение данных")
 
-        # Извлечение реквизитов ответчика
-        defendant_data = self._extract_entity_data(text, 'defendant')
-        if defendant_data:
-            result.data.update(defendant_data)
-            result.set_extraction_method('defendant', 'direct')
-            logger.info(f"Извлечены данные ответчика: {list(defendant_data.keys())}")
+        found = self.document_plan.scan(text)
 
-        # Извлечение реквизитов истца
-        plaintiff_data = self._extract_entity_data(text, 'plaintiff')
-        if plaintiff_data:
-            result.data.update(plaintiff_data)
-            result.set_extraction_method('plaintiff', 'direct')
-            logger.info(f"Извлечены данные истца: {list(plaintiff_data.keys())}")
+        # Извлечение реквизитов ответчика и истца (общий проход по тексту)
+        for entity, title in (('defendant', 'ответчика'), ('plaintiff', 'истца')):
+            entity_data = self._extract_entity_data(text, entity, found, result)
+            if entity_data:
+                result.data.update(entity_data)
+                result.set_extraction_method(entity, 'direct')
+                logger.info(f"Извлечены данные {title}: {list(entity_data.keys())}")
 
         # Извлечение финансовых данных
-        financial_data = self._extract_financial_data(text)
+        financial_data = self._extract_financial_data(text, found, result)
         if financial_data:
             result.data.update(financial_data)
             result.set_extraction_method('financial', 'direct')
@@ -198,142 +266,81 @@ class EnhancedParser:
                 logger.debug(f"Найдена секция истца: {line}")
 
             # Извлечение реквизитов в зависимости от секции
-            if current_section == 'defendant':
-                self._extract_defendant_from_line(line, result)
-            elif current_section == 'plaintiff':
-                self._extract_plaintiff_from_line(line, result)
-
-    def _extract_defendant_from_line(self, line: str, result: ParsingResult):
-        """Извлекает данные ответчика из строки"""
-        # Извлечение ИНН
-        if 'defendant_inn' not in result.data:
-            for pattern in self.inn_patterns:
-                match = re.search(pattern, line)
-                if match:
-                    result.data['defendant_inn'] = match.group(1)
-                    logger.debug(f"Извлечен ИНН ответчика: {match.group(1)}")
-                    break
-
-        # Извлечение КПП
-        if 'defendant_kpp' not in result.data:
-            for pattern in self.kpp_patterns:
-                match = re.search(pattern, line)
-                if match:
-                    result.data['defendant_kpp'] = match.group(1)
-                    logger.debug(f"Извлечен КПП ответчика: {match.group(1)}")
-                    break
-
-        # Извлечение ОГРН
-        if 'defendant_ogrn' not in result.data:
-            for pattern in self.ogrn_patterns:
-                match = re.search(pattern, line)
-                if match:
-                    result.data['defendant_ogrn'] = match.group(1)
-                    logger.debug(f"Извлечен ОГРН ответчика: {match.group(1)}")
-                    break
+            if current_section is not None:
+                self._extract_entity_from_line(line, result, current_section)
+
+    def _extract_entity_from_line(self, line: str, result: ParsingResult, entity: str):
+        """Извлекает данные истца или ответчика из строки заголовка"""
+        prefix = f'{entity}_'
+        missing = [name for name in ENTITY_FIELDS if f'{prefix}{name}' not in result.data]
+        if missing:
+            found = self.entity_plan.scan(line)
+            for name in missing:
+                if name in found:
+                    value, source = found[name]
+                    result.data[f'{prefix}{name}'] = value
+                    result.set_extraction_method(f'{prefix}{name}', f'contextual:{source}')
+                    logger.debug(f"Извлечен {name} {entity}: {value}")
 
         # Извлечение адреса
-        if 'defendant_address' not in result.data:
-            if re.match(r'\d{6}', line) and not any(x in line for x in ['ИНН', 'КПП', 'ОГРН']):
-                result.data['defendant_address'] = line
-                logger.debug(f"Извлечен адрес ответчика: {line}")
-
-    def _extract_plaintiff_from_line(self, line: str, result: ParsingResult):
-        """Извлекает данные истца из строки"""
-        # Аналогично _extract_defendant_from_line, но для истца
-        if 'plaintiff_inn' not in result.data:
-            for pattern in self.inn_patterns:
-                match = re.search(pattern, line)
-                if match:
-                    result.data['plaintiff_inn'] = match.group(1)
-                    logger.debug(f"Извлечен ИНН истца: {match.group(1)}")
-                    break
-
-        if 'plaintiff_kpp' not in result.data:
-            for pattern in self.kpp_patterns:
-                match = re.search(pattern, line)
-                if match:
-                    result.data['plaintiff_kpp'] = match.group(1)
-                    logger.debug(f"Извлечен КПП истца: {match.group(1)}")
-                    break
-
-        if 'plaintiff_ogrn' not in result.data:
-            for pattern in self.ogrn_patterns:
-                match = re.search(pattern, line)
-                if match:
-                    result.data['plaintiff_ogrn'] = match.group(1)
-                    logger.debug(f"Извлечен ОГРН истца: {match.group(1)}")
-                    break
-
-        if 'plaintiff_address' not in result.data:
-            if re.match(r'\d{6}', line) and not any(x in line for x in ['ИНН', 'КПП', 'ОГРН']):
-                result.data['plaintiff_address'] = line
-                logger.debug(f"Извлечен адрес истца: {line}")
-
-    def _extract_entity_data(self, text: str, entity: str) -> Dict[str, str]:
+        if f'{prefix}address' not in result.data:
+            if POSTCODE_RE.match(line) and not any(x in line for x in ['ИНН', 'КПП', 'ОГРН']):
+                result.data[f'{prefix}address'] = line
+                logger.debug(f"Извлечен адрес {entity}: {line}")
+
+    def _extract_entity_data(
+        self,
+        text: str,
+        entity: str,
+        found: Optional[Dict[str, Tuple[str, str]]] = None,
+        result: Optional[ParsingResult] = None
+    ) -> Dict[str, str]:
         """
         Извлекает данные организации (истца или ответчика).
 
         Args:
             text: Текст документа
             entity: 'plaintiff' или 'defendant'
+            found: Готовый результат ExtractionPlan.scan по text
+            result: Куда записать, каким паттерном найдено поле
 
         Returns:
             Словарь с данными организации
         """
+        if found is None:
+            found = self.entity_plan.scan(text)
         data = {}
         prefix = f'{entity}_'
-
-        # Извлечение ИНН
-        for pattern in self.inn_patterns:
-            match = re.search(pattern, text)
-            if match:
-                data[f'{prefix}inn'] = match.group(1)
-                break
-
-        # Извлечение КПП
-        for pattern in self.kpp_patterns:
-            match = re.search(pattern, text)
-            if match:
-                data[f'{prefix}kpp'] = match.group(1)
-                break
-
-        # Извлечение ОГРН
-        for pattern in self.ogrn_patterns:
-            match = re.search(pattern, text)
-            if match:
-                data[f'{prefix}ogrn'] = match.group(1)
-                break
-
+        for name in ENTITY_FIELDS:
+            if name in found:
+                value, source = found[name]
+                data[f'{prefix}{name}'] = value
+                if result is not None:
+                    result.set_extraction_method(f'{prefix}{name}', f'direct:{source}')
         return data
 
-    def _extract_financial_data(self, text: str) -> Dict[str, str]:
+    def _extract_financial_data(
+        self,
+        text: str,
+        found: Optional[Dict[str, Tuple[str, str]]] = None,
+        result: Optional[ParsingResult] = None
+    ) -> Dict[str, str]:
         """
         Извлекает финансовые данные из текста.
 
         Returns:
             Словарь с финансовыми данными
         """
+        if found is None:
+            found = self.document_plan.scan(text)
         data = {}
 
-        # Извлечение суммы задолженности
-        debt_patterns = [
-            r'Стоимость услуг по договор[^0-9]*составила\s*([0-9\s,]+)\s*рубл',
-            r'размер задолженности[^0-9]*составляет\s*([0-9\s,]+)\s*рубл',
-            r'задолженность[^0-9]*в размере\s*([0-9\s,]+)\s*рубл',
-        ]
-
-        for pattern in debt_patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                debt_str = match.group(1).replace(' ', '').replace(',', '.')
-                try:
-                    debt = float(debt_str)
-                    data['debt'] = f"{debt:,.0f}".replace(',', ' ')
-                    logger.debug(f"Извлечена сумма долга: {data['debt']}")
-                    break
-                except ValueError:
-                    continue
+        # Сумма задолженности: первый паттерн, значение которого разбирается
+        if 'debt' in found:
+            data['debt'], source = found['debt']
+            if result is not None:
+                result.set_extraction_method('debt', f'direct:{source}')
+            logger.debug(f"Извлечена сумма долга: {data['debt']}")
 
         return data
 
@@ -14,14 +14,17 @@
 
 import json
 import logging
+import multiprocessing
 import os
 import re
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from dataclasses import dataclass, field, asdict
 from decimal import Decimal
 from typing import Any, Dict, List, Optional, Tuple
 
-import pdfplumber
-
 from document_matcher import (
     ApplicationInfo,
     MatchingReport,
@@ -29,43 +32,46 @@ from document_matcher import (
     format_report as format_matching_report,
     ConfidenceLevel,
 )
+from lookup_cache import env_int
+from pdf_extractor import ExtractedDocument, PdfSource, load_document, remember_document
+from value_parsing import (
+    format_date,
+    parse_amount_text,
+    parse_numeric_date,
+    parse_ru_text_date,
+)
 
 logger = logging.getLogger(__name__)
 
+# Пул процессов для разбора пакетов документов (pdfplumber упирается в CPU)
+PACKAGE_WORKERS = env_int("PACKAGE_PARSE_WORKERS", min(4, os.cpu_count() or 1))
+_PACKAGE_POOL: Optional[ProcessPoolExecutor] = None
+_PACKAGE_POOL_LOCK = threading.Lock()
+
 
 # =============================================================================
 # LLM парсинг через Ollama
 # =============================================================================
 
 def _get_llm_config() -> Dict[str, Any]:
-    """Получает конфигурацию Ollama из переменных окружения."""
-    from dotenv import load_dotenv
-    load_dotenv()
-
-    base_url = (
-        os.getenv("OLLAMA_BASE_URL", "")
-        or os.getenv("OLLAMA_HOST", "")
-    ).strip().rstrip("/")
-
-    enabled_raw = os.getenv("LLM_ENABLED")
-    enabled = (
-        enabled_raw.lower() in ("1", "true", "yes", "on")
-        if enabled_raw else bool(base_url)
-    )
+    """Конфигурация Ollama из настроек процесса."""
+    from settings import get_settings
+    settings = get_settings()
 
     # Для парсинга документов лучше использовать 14b модель
     # qwen2.5:14b-instruct - хорошо понимает структуру документов
-    model = os.getenv(
-        "OLLAMA_MODEL_LARGE",
-        os.getenv("OLLAMA_MODEL", "qwen2.5:14b-instruct")
-    ).strip()
+    model = (
+        settings.llm_model_large
+        or settings.llm_model
+        or "qwen2.5:14b-instruct"
+    )
 
     return {
-        "enabled": enabled,
-        "base_url": base_url,
+        "enabled": settings.enabled(settings.llm_enabled),
+        "base_url": settings.base_url,
         "model": model,
-        "timeout": int(os.getenv("OLLAMA_TIMEOUT", "180")),  # Увеличен для 14b
-        "max_chars": int(os.getenv("OLLAMA_MAX_CHARS", "15000")),
+        "timeout": settings.llm_timeout or 180,  # Увеличен для 14b
+        "max_chars": settings.llm_max_chars or 15000,
     }
 
 
@@ -307,14 +313,9 @@ def get_tracking_dates_from_api(track_number: str) -> Tuple[str, str]:
         Tuple[send_date, received_date] в формате ДД.ММ.ГГГГ
     """
     try:
-        from main import (
-            fetch_russian_post_operations,
-            extract_tracking_dates,
-            RussianPostTrackingError
-        )
-        operations = fetch_russian_post_operations(track_number)
-        send_date, received_date = extract_tracking_dates(operations)
-        return send_date or "", received_date or ""
+        from main import fetch_russian_post_tracking
+        tracking = fetch_russian_post_tracking(track_number)
+        return tracking.get("send_date") or "", tracking.get("receive_date") or ""
     except ImportError:
         logger.warning("Не удалось импортировать функции API Почты России")
         return "", ""
@@ -323,6 +324,32 @@ def get_tracking_dates_from_api(track_number: str) -> Tuple[str, str]:
         return "", ""
 
 
+def get_tracking_dates_batch_from_api(
+    track_numbers: List[str]
+) -> Dict[str, Tuple[str, str]]:
+    """
+    Параллельно получает даты отправки и получения для набора трек-номеров.
+
+    Returns:
+        {трек: (send_date, received_date)} только для успешных запросов
+    """
+    try:
+        from main import fetch_russian_post_tracking_batch, normalize_tracking_number
+    except ImportError:
+        logger.warning("Не удалось импортировать функции API Почты России")
+        return {}
+    result: Dict[str, Tuple[str, str]] = {}
+    tracking = fetch_russian_post_tracking_batch(list(track_numbers))
+    for track in track_numbers:
+        data = tracking.get(normalize_tracking_number(track))
+        if isinstance(data, Exception) or data is None:
+            if data is not None:
+                logger.warning(f"Ошибка получения данных по треку {track}: {data}")
+            continue
+        result[track] = (data.get("send_date") or "", data.get("receive_date") or "")
+    return result
+
+
 # =============================================================================
 # Структуры данных
 # =============================================================================
@@ -454,31 +481,12 @@ class ExternalClaimData:
 
 def _parse_amount(text: str) -> Decimal:
     """Парсит сумму из текста."""
-    if not text:
-        return Decimal("0")
-    # Убираем всё кроме цифр, точки и запятой
-    cleaned = re.sub(r'[^\d.,]', '', str(text))
-    cleaned = cleaned.replace(',', '.')
-    # Убираем лишние точки (оставляем последнюю как десятичный разделитель)
-    parts = cleaned.split('.')
-    if len(parts) > 2:
-        cleaned = ''.join(parts[:-1]) + '.' + parts[-1]
-    try:
-        return Decimal(cleaned)
-    except:
-        return Decimal("0")
+    return parse_amount_text(text) or Decimal("0")
 
 
 def _parse_date(text: str) -> str:
     """Парсит дату из текста в формат ДД.ММ.ГГГГ."""
-    if not text:
-        return ""
-    # Ищем дату в формате ДД.ММ.ГГГГ
-    match = re.search(r'(\d{1,2})[./](\d{1,2})[./](\d{4})', text)
-    if match:
-        day, month, year = match.groups()
-        return f"{int(day):02d}.{int(month):02d}.{year}"
-    return ""
+    return format_date(parse_numeric_date(text))
 
 
 def _extract_inn(text: str) -> str:
@@ -927,10 +935,13 @@ def extract_document_links_from_claim(text: str) -> List[dict]:
 # Парсинг комплекта документов (СП файл)
 # =============================================================================
 
-def parse_document_package(pdf_path: str) -> Dict[str, Any]:
+def parse_document_package(pdf_path: PdfSource) -> Dict[str, Any]:
     """
     Парсит комплект документов из PDF файла (заявка + накладная + трек).
 
+    Args:
+        pdf_path: Путь к PDF или уже разобранный ExtractedDocument
+
     Returns:
         Dict с данными: application, waybill, postal, invoice
     """
@@ -939,51 +950,18 @@ def parse_document_package(pdf_path: str) -> Dict[str, Any]:
         "waybills": [],
         "postal_shipments": [],
         "invoice": None,
-        "source_file": os.path.basename(pdf_path)
+        "source_file": os.path.basename(
+            pdf_path.path if isinstance(pdf_path, ExtractedDocument) else pdf_path
+        )
     }
 
     try:
-        with pdfplumber.open(pdf_path) as pdf:
-            all_text = ""
-            for i, page in enumerate(pdf.pages):
-                page_text = page.extract_text() or ""
-                all_text += f"\n\n=== PAGE {i+1} ===\n{page_text}"
-
-                # Определяем тип страницы и парсим
-                page_lower = page_text.lower()
-
-                # Заявка (берём только первую найденную)
-                if result["application"] is None:
-                    if 'реквизиты заявки' in page_lower:
-                        app = _parse_application_page(page_text, i + 1)
-                        if app and app.number:
-                            result["application"] = app
-                            app.source_file = result["source_file"]
-                            app.source_page = i + 1
-
-                # Транспортная накладная
-                if 'транспортная накладная' in page_lower and 'грузоотправитель' in page_lower:
-                    wb = _parse_waybill_page(page_text, i + 1)
-                    if wb and wb.number:
-                        wb.source_file = result["source_file"]
-                        wb.source_page = i + 1
-                        result["waybills"].append(wb)
-
-                # Почтовое отслеживание
-                if 'почт' in page_lower and ('отслеживан' in page_lower or 'идентификатор' in page_lower):
-                    postal = _parse_postal_tracking_page(page_text, i + 1)
-                    if postal and postal.track_number:
-                        postal.source_file = result["source_file"]
-                        postal.source_page = i + 1
-                        result["postal_shipments"].append(postal)
-
-                # Счёт на оплату
-                if 'счет на оплату' in page_lower or 'счёт на оплату' in page_lower:
-                    invoice = _parse_invoice_page(page_text, i + 1)
-                    if invoice:
-                        result["invoice"] = invoice
-
-            result["full_text"] = all_text
+        document = load_document(pdf_path, text_only=True)
+        text_parts = []
+        for i, page_text in enumerate(document.page_texts):
+            text_parts.append(f"\n\n=== PAGE {i+1} ===\n{page_text}")
+            _dispatch_package_page(result, page_text, i + 1)
+        result["full_text"] = "".join(text_parts)
 
     except Exception as e:
         logger.error(f"Error parsing document package {pdf_path}: {e}")
@@ -991,16 +969,155 @@ def parse_document_package(pdf_path: str) -> Dict[str, Any]:
     return result
 
 
-def parse_document_packages(pdf_paths: List[str]) -> List[Dict[str, Any]]:
+def _dispatch_package_page(result: Dict[str, Any], page_text: str, page_num: int) -> None:
+    """Определяет тип страницы пакета и разбирает её в result."""
+    page_lower = page_text.lower()
+
+    # Заявка (берём только первую найденную)
+    if result["application"] is None:
+        if 'реквизиты заявки' in page_lower:
+            app = _parse_application_page(page_text, page_num)
+            if app and app.number:
+                result["application"] = app
+                app.source_file = result["source_file"]
+                app.source_page = page_num
+
+    # Транспортная накладная
+    if 'транспортная накладная' in page_lower and 'грузоотправитель' in page_lower:
+        wb = _parse_waybill_page(page_text, page_num)
+        if wb and wb.number:
+            wb.source_file = result["source_file"]
+            wb.source_page = page_num
+            result["waybills"].append(wb)
+
+    # Почтовое отслеживание
+    if 'почт' in page_lower and ('отслеживан' in page_lower or 'идентификатор' in page_lower):
+        postal = _parse_postal_tracking_page(page_text, page_num)
+        if postal and postal.track_number:
+            postal.source_file = result["source_file"]
+            postal.source_page = page_num
+            result["postal_shipments"].append(postal)
+
+    # Счёт на оплату
+    if 'счет на оплату' in page_lower or 'счёт на оплату' in page_lower:
+        invoice = _parse_invoice_page(page_text, page_num)
+        if invoice:
+            result["invoice"] = invoice
+
+
+def _parse_package_job(
+    pdf_path: str
+) -> Tuple[Dict[str, Any], Optional[ExtractedDocument]]:
+    """
+    Задача пула: пакет и текст страниц для кэша родителя. Таблицы и
+    прочие данные страниц не передаются — сопоставлению нужен только текст.
+    """
+    package = parse_document_package(pdf_path)
+    try:
+        document = load_document(pdf_path).texts_only()
+    except Exception:
+        document = None
+    return package, document
+
+
+def _get_package_pool() -> ProcessPoolExecutor:
+    global _PACKAGE_POOL
+    with _PACKAGE_POOL_LOCK:
+        if _PACKAGE_POOL is None:
+            # spawn: вызывается из потоков бота, fork там небезопасен
+            _PACKAGE_POOL = ProcessPoolExecutor(
+                max_workers=PACKAGE_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _PACKAGE_POOL
+
+
+def shutdown_package_pool() -> None:
+    """Останавливает пул разбора пакетов (при ошибке пула и при выходе)."""
+    global _PACKAGE_POOL
+    with _PACKAGE_POOL_LOCK:
+        pool, _PACKAGE_POOL = _PACKAGE_POOL, None
+    if pool is not None:
+        # cancel_futures у shutdown() есть только с Python 3.9
+        pool.shutdown(wait=False)
+
+
+def _collect_package_job(
+    job_result: Tuple[Dict[str, Any], Optional[ExtractedDocument]]
+) -> Dict[str, Any]:
+    package, document = job_result
+    # Страницы, разобранные в дочернем процессе, доступны и здесь
+    if document is not None and document.pages:
+        remember_document(document)
+    return package
+
+
+def parse_document_package_in_pool(pdf_path: str) -> Dict[str, Any]:
+    """
+    Разбирает один пакет в пуле процессов и дожидается результата.
+
+    Бот вызывает её из фоновых потоков обработки загрузок: каждый файл
+    начинает разбираться сразу после загрузки, а сам разбор идёт в
+    отдельном процессе и не держит GIL потоков бота. Без пула
+    (PACKAGE_PARSE_WORKERS=1 или пул сломан) — в текущем процессе.
+    """
+    if PACKAGE_WORKERS > 1:
+        try:
+            future = _get_package_pool().submit(_parse_package_job, pdf_path)
+            return _collect_package_job(future.result())
+        except (BrokenProcessPool, OSError) as e:
+            logger.warning(f"Process pool unavailable, parsing in-process: {e}")
+            shutdown_package_pool()
+    return parse_document_package(pdf_path)
+
+
+def _map_package_jobs(
+    pool: ProcessPoolExecutor,
+    pdf_paths: List[str],
+    limit: int
+) -> List[Dict[str, Any]]:
+    """Разбор в пуле не более limit пакетов одновременно, в порядке pdf_paths."""
+    futures: deque = deque()
+    packages: List[Dict[str, Any]] = []
+    try:
+        for pdf_path in pdf_paths:
+            if len(futures) >= limit:
+                packages.append(_collect_package_job(futures.popleft().result()))
+            futures.append(pool.submit(_parse_package_job, pdf_path))
+        while futures:
+            packages.append(_collect_package_job(futures.popleft().result()))
+    finally:
+        for future in futures:
+            future.cancel()
+    return packages
+
+
+def parse_document_packages(
+    pdf_paths: List[str],
+    max_workers: Optional[int] = None
+) -> List[Dict[str, Any]]:
     """
     Парсит список пакетов документов.
 
+    Пакеты разбираются в общем пуле процессов; результаты возвращаются
+    в порядке pdf_paths. Если пул недоступен — последовательно.
+
     Args:
         pdf_paths: Список путей к PDF файлам
+        max_workers: Сколько пакетов разбирать одновременно (по умолчанию
+            и не больше PACKAGE_PARSE_WORKERS — размера общего пула)
 
     Returns:
         Список распарсенных пакетов документов
     """
+    workers = PACKAGE_WORKERS if max_workers is None else min(max_workers, PACKAGE_WORKERS)
+    if len(pdf_paths) > 1 and workers > 1:
+        try:
+            return _map_package_jobs(_get_package_pool(), pdf_paths, workers)
+        except (BrokenProcessPool, OSError) as e:
+            logger.warning(f"Process pool unavailable, parsing serially: {e}")
+            shutdown_package_pool()
+
     packages = []
     for pdf_path in pdf_paths:
         try:
@@ -1175,7 +1292,7 @@ def _parse_postal_tracking_page(text: str, page_num: int) -> Optional[PostalShip
         text, re.IGNORECASE
     )
     if send_match:
-        shipment.send_date = _parse_russian_date(send_match.group(1))
+        shipment.send_date = format_date(parse_ru_text_date(send_match.group(1)))
 
     # Дата получения - ищем "Адресату по ОК коду" или "Вручение"
     # Формат: "23 июня 2025, 12:07 Адресату по ОК коду"
@@ -1187,32 +1304,12 @@ def _parse_postal_tracking_page(text: str, page_num: int) -> Optional[PostalShip
     for pattern in receive_patterns:
         receive_match = re.search(pattern, text)
         if receive_match:
-            shipment.received_date = _parse_russian_date(receive_match.group(1))
+            shipment.received_date = format_date(parse_ru_text_date(receive_match.group(1)))
             break
 
     return shipment if shipment.track_number else None
 
 
-def _parse_russian_date(text: str) -> str:
-    """Парсит дату в русском формате (23 июня 2025) в ДД.ММ.ГГГГ."""
-    months = {
-        'января': '01', 'февраля': '02', 'марта': '03', 'апреля': '04',
-        'мая': '05', 'июня': '06', 'июля': '07', 'августа': '08',
-        'сентября': '09', 'октября': '10', 'ноября': '11', 'декабря': '12'
-    }
-
-    match = re.search(r'(\d{1,2})\s+([а-яё]+)\s+(\d{4})', text, re.IGNORECASE)
-    if match:
-        day = int(match.group(1))
-        month_name = match.group(2).lower()
-        year = match.group(3)
-
-        month = months.get(month_name, '01')
-        return f"{day:02d}.{month}.{year}"
-
-    return ""
-
-
 def _parse_invoice_page(text: str, page_num: int) -> Optional[Dict[str, Any]]:
     """Парсит страницу со счётом на оплату."""
     invoice = {}
@@ -1614,20 +1711,17 @@ def enrich_with_postal_api(
 
     # Получаем даты по трекам через API
     track_dates = {}
-    for track in tracks_to_fetch:
-        try:
-            send_date, received_date = get_tracking_dates_from_api(track)
-            if send_date or received_date:
-                track_dates[track] = {
-                    'send_date': send_date,
-                    'received_date': received_date
-                }
-                logger.info(
-                    f"Трек {track}: отправлено {send_date}, "
-                    f"получено {received_date}"
-                )
-        except Exception as e:
-            logger.warning(f"Ошибка получения данных по треку {track}: {e}")
+    fetched = get_tracking_dates_batch_from_api(sorted(tracks_to_fetch))
+    for track, (send_date, received_date) in fetched.items():
+        if send_date or received_date:
+            track_dates[track] = {
+                'send_date': send_date,
+                'received_date': received_date
+            }
+            logger.info(
+                f"Трек {track}: отправлено {send_date}, "
+                f"получено {received_date}"
+            )
 
     # Обновляем даты в заявках
     for app in applications:
@@ -1710,9 +1804,10 @@ def parse_external_claim(
     # Парсим претензию
     claim_text = ""
     try:
-        with pdfplumber.open(claim_pdf_path) as pdf:
-            for page in pdf.pages:
-                claim_text += (page.extract_text() or "") + "\n\n"
+        claim_text = "".join(
+            page_text + "\n\n"
+            for page_text in load_document(claim_pdf_path, text_only=True).page_texts
+        )
     except Exception as e:
         logger.error(f"Error reading claim PDF: {e}")
         result.warnings.append(f"Ошибка чтения претензии: {e}")
@@ -1758,11 +1853,13 @@ def parse_external_claim(
     # Парсим пакеты документов
     document_packages = []
     if document_pdf_paths:
-        for pdf_path in document_pdf_paths:
-            result.source_files.append(os.path.basename(pdf_path))
-            package = parse_document_package(pdf_path)
-            if package:
-                document_packages.append(package)
+        result.source_files.extend(
+            os.path.basename(pdf_path) for pdf_path in document_pdf_paths
+        )
+        document_packages = [
+            package for package in parse_document_packages(document_pdf_paths)
+            if package
+        ]
 
     # Извлекаем связи между документами из текста претензии
     doc_links = extract_document_links_from_claim(claim_text)
@@ -1800,15 +1897,15 @@ def parse_external_claim(
     return result
 
 
-def _parse_legal_services(pdf_path: str) -> Optional[LegalServices]:
+def _parse_legal_services(pdf_path: PdfSource) -> Optional[LegalServices]:
     """Парсит договор юридических услуг."""
     legal = LegalServices()
 
     try:
-        with pdfplumber.open(pdf_path) as pdf:
-            text = ""
-            for page in pdf.pages:
-                text += (page.extract_text() or "") + "\n\n"
+        text = "".join(
+            page_text + "\n\n"
+            for page_text in load_document(pdf_path, text_only=True).page_texts
+        )
     except Exception as e:
         logger.error(f"Error reading legal services PDF: {e}")
         return None
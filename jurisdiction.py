@@ -9,6 +9,7 @@ from enum import Enum
 from typing import Dict, List, Optional, Tuple
 
 from config import COURTS_DATABASE
+from court_index import find_court_region, resolve_court_address
 
 logger = logging.getLogger(__name__)
 
@@ -144,13 +145,13 @@ class JurisdictionDetector:
         Returns:
             Словарь с данными суда или None
         """
-        region_lower = region.lower().strip()
-
-        # Точное совпадение
-        if region in COURTS_DATABASE:
-            return COURTS_DATABASE[region]
+        match = find_court_region(region)
+        if match:
+            logger.debug(f"Найдено совпадение: {region} -> {match.region} ({match.evidence})")
+            return match.court
 
-        # Нечеткий поиск
+        # Нечеткий поиск по части названия (ручной ввод: «свердл»)
+        region_lower = region.lower().strip()
         for court_region, court_info in COURTS_DATABASE.items():
             if region_lower in court_region.lower() or court_region.lower() in region_lower:
                 logger.debug(f"Найдено совпадение: {region} -> {court_region}")
@@ -169,30 +170,10 @@ class JurisdictionDetector:
         Returns:
             JurisdictionInfo
         """
-        from courts_code import ARBITRATION_COURTS, CITY_TO_REGION
-
         try:
-            defendant_address_lower = defendant_address.lower()
-
-            # Сначала ищем по названию региона
-            court_name = None
-            court_address = None
-
-            for region, court_info in ARBITRATION_COURTS.items():
-                if region.lower() in defendant_address_lower:
-                    court_name = court_info["name"]
-                    court_address = court_info["address"]
-                    break
-
-            # Если регион не найден, ищем по городам
-            if not court_name:
-                for city, region in CITY_TO_REGION.items():
-                    if city in defendant_address_lower:
-                        if region in ARBITRATION_COURTS:
-                            court_info = ARBITRATION_COURTS[region]
-                            court_name = court_info["name"]
-                            court_address = court_info["address"]
-                            break
+            match = resolve_court_address(defendant_address)
+            court_name = match.court["name"] if match else None
+            court_address = match.court["address"] if match else None
 
             # Если ничего не найдено
             if not court_name:
@@ -15,71 +15,41 @@ from datetime import datetime
 from typing import Any, Dict, List, Optional, Tuple
 
 import requests
-from dotenv import load_dotenv
 
+from settings import get_settings
 from validators import DataValidator
+from value_parsing import parse_exact_date
 
 logger = logging.getLogger(__name__)
 
 
-def _get_env(name: str, default: str = "") -> str:
-    value = os.getenv(name)
-    return value if value is not None else default
-
-
 def get_llm_config() -> Dict[str, Any]:
     """
-    Загружает конфигурацию LLM из переменных окружения.
+    Конфигурация LLM из настроек процесса (см. settings.get_settings).
     """
-    load_dotenv()
-    base_url = (
-        _get_env("OLLAMA_BASE_URL")
-        or _get_env("OLLAMA_HOST")
-        or ""
-    ).strip()
-    enabled_raw = os.getenv("LLM_ENABLED")
-    if enabled_raw is None:
-        enabled = bool(base_url)
-    else:
-        enabled = enabled_raw.lower() in ("1", "true", "yes", "on")
-    model = _get_env("OLLAMA_MODEL", "qwen2.5:7b-instruct").strip()
-    timeout = int(_get_env("OLLAMA_TIMEOUT", "60"))  # Увеличен для 14b модели
-    max_chars = int(_get_env("OLLAMA_MAX_CHARS", "12000"))
+    settings = get_settings()
     return {
-        "enabled": enabled,
-        "base_url": base_url.rstrip("/"),
-        "model": model,
-        "timeout": timeout,
-        "max_chars": max_chars,
+        "enabled": settings.enabled(settings.llm_enabled),
+        "base_url": settings.base_url,
+        "model": settings.llm_model or "qwen2.5:7b-instruct",
+        "timeout": settings.llm_timeout or 60,  # Увеличен для 14b модели
+        "max_chars": settings.llm_max_chars or 12000,
     }
 
 
 def get_vision_config() -> Dict[str, Any]:
     """
-    Загружает конфигурацию Vision LLM из переменных окружения.
+    Конфигурация Vision LLM из настроек процесса.
     """
-    load_dotenv()
-    base_url = (
-        _get_env("OLLAMA_BASE_URL")
-        or _get_env("OLLAMA_HOST")
-        or ""
-    ).strip()
-    enabled_raw = os.getenv("LLM_VISION_ENABLED")
-    if enabled_raw is None:
-        enabled_raw = os.getenv("LLM_ENABLED")
-    if enabled_raw is None:
-        enabled = bool(base_url)
-    else:
-        enabled = enabled_raw.lower() in ("1", "true", "yes", "on")
-    model = _get_env("OLLAMA_VISION_MODEL", "").strip()
-    timeout = int(_get_env("OLLAMA_VISION_TIMEOUT", "120"))
-    max_pages = int(_get_env("OLLAMA_VISION_MAX_PAGES", "5"))
+    settings = get_settings()
+    model = settings.vision_model or ""
+    enabled = settings.enabled(settings.vision_enabled, settings.llm_enabled)
     return {
         "enabled": enabled and bool(model),
-        "base_url": base_url.rstrip("/"),
+        "base_url": settings.base_url,
         "model": model,
-        "timeout": timeout,
-        "max_pages": max_pages,
+        "timeout": settings.vision_timeout,
+        "max_pages": settings.vision_max_pages,
     }
 
 
@@ -370,14 +340,9 @@ def _clean_date(value: Any) -> Optional[str]:
     if not text:
         return None
     match = re.search(r"\d{2}\.\d{2}\.\d{4}", text)
-    if not match:
+    if not match or not parse_exact_date(match.group(0)):
         return None
-    date_str = match.group(0)
-    try:
-        datetime.strptime(date_str, "%d.%m.%Y")
-    except ValueError:
-        return None
-    return date_str
+    return match.group(0)
 
 
 def _clean_amount(value: Any) -> Optional[str]:
@@ -439,9 +404,7 @@ def _digits_in_text(value: str, text: str) -> bool:
 def _date_in_text(value: str, text: str) -> bool:
     if not value or not text:
         return False
-    try:
-        datetime.strptime(value, "%d.%m.%Y")
-    except ValueError:
+    if not parse_exact_date(value):
         return False
     return re.search(
         rf"(?<!\d){re.escape(value)}(?!\d)", text
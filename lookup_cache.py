@@ -0,0 +1,190 @@
+"""
+Персистентный кэш результатов внешних запросов (DaData, Почта России и т.п.).
+
+Хранит записи в JSON-файле, ограничивает размер по принципу LRU
+и удаляет записи старше заданного TTL. Здесь же ограничитель частоты
+запросов для параллельных обращений к внешним API.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class PersistentCache:
+    """Потокобезопасный LRU-кэш с TTL и сохранением на диск."""
+
+    def __init__(
+        self,
+        path: Optional[str],
+        ttl_seconds: float = 0,
+        max_entries: int = 0,
+    ) -> None:
+        self.path = path
+        self.ttl_seconds = float(ttl_seconds or 0)
+        self.max_entries = int(max_entries or 0)
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._hits = 0
+        self._misses = 0
+
+    def _is_expired(self, entry: Dict[str, Any], now: float) -> bool:
+        ttl = entry.get("ttl")
+        ttl = self.ttl_seconds if ttl is None else float(ttl)
+        if ttl <= 0:
+            return False
+        return now - float(entry.get("ts") or 0) > ttl
+
+    def _load(self) -> None:
+        if self._loaded:
+            return
+        self._loaded = True
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as handle:
+                payload = json.load(handle)
+        except Exception as exc:
+            logger.warning("Ошибка чтения кэша %s: %s", self.path, exc)
+            return
+        if not isinstance(payload, dict):
+            return
+        now = time.time()
+        for key, entry in payload.items():
+            if not isinstance(entry, dict) or "value" not in entry:
+                continue
+            if self._is_expired(entry, now):
+                continue
+            self._entries[key] = entry
+        self._evict()
+
+    def _evict(self) -> None:
+        if self.max_entries <= 0:
+            return
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _persist(self) -> None:
+        if not self.path:
+            return
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as handle:
+                json.dump(self._entries, handle, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except Exception as exc:
+            logger.warning("Ошибка сохранения кэша %s: %s", self.path, exc)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            self._load()
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return default
+            if self._is_expired(entry, time.time()):
+                del self._entries[key]
+                self._misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry["value"]
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            self._load()
+            entry = self._entries.get(key)
+            return entry is not None and not self._is_expired(entry, time.time())
+
+    def set(
+        self,
+        key: str,
+        value: Any,
+        ttl_seconds: Optional[float] = None,
+        persist: bool = True,
+    ) -> None:
+        """Сохраняет значение; ttl_seconds переопределяет TTL записи."""
+        with self._lock:
+            self._load()
+            entry: Dict[str, Any] = {"ts": time.time(), "value": value}
+            if ttl_seconds is not None:
+                entry["ttl"] = float(ttl_seconds)
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            self._evict()
+            if persist:
+                self._persist()
+
+    def flush(self) -> None:
+        with self._lock:
+            if self._loaded:
+                self._persist()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._loaded = True
+            self._persist()
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._load()
+            return len(self._entries)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self._hits,
+                "misses": self._misses,
+            }
+
+
+class RateLimiter:
+    """Ограничивает частоту вызовов: не чаще rate_per_second в секунду."""
+
+    def __init__(self, rate_per_second: float = 0) -> None:
+        self.interval = 1.0 / rate_per_second if rate_per_second > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def wait(self) -> None:
+        if self.interval <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+def env_float(name: str, default: float) -> float:
+    raw = os.getenv(name, "").strip()
+    if not raw:
+        return default
+    try:
+        return float(raw)
+    except ValueError:
+        return default
+
+
+def env_int(name: str, default: int) -> int:
+    raw = os.getenv(name, "").strip()
+    if not raw:
+        return default
+    try:
+        return int(raw)
+    except ValueError:
+        return default
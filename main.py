@@ -3,33 +3,47 @@
 автоматизации расчёта процентов по ст. 395 ГК РФ.
 """
 
+import atexit
+import copy
 import json
 import logging
 import os
 import re
 import shutil
+import threading
+import time
 import uuid
-from collections import Counter
+from bisect import bisect_right
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from datetime import date, datetime, timedelta
-from decimal import Decimal, InvalidOperation, ROUND_DOWN, ROUND_HALF_UP
-from typing import Any, Dict, List, Optional, Set, Tuple
+from decimal import Decimal, ROUND_DOWN, ROUND_HALF_UP
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple, Union
 from xml.etree import ElementTree as ET
 
 import requests
+import tracing
 from docx import Document
 from docx.enum.text import WD_ALIGN_PARAGRAPH
+from docx.oxml import OxmlElement
 from docx.oxml.ns import qn
 from docx.shared import Pt
 from dotenv import load_dotenv
-from telegram import (InlineKeyboardButton, InlineKeyboardMarkup, InputFile,
-                      Update)
-from telegram.ext import (Application, CallbackQueryHandler, CommandHandler,
-                          ContextTypes, ConversationHandler, MessageHandler,
-                          filters)
 
 from cal import calculate_duty
 from calc_395 import (calc_395_on_periods, calculate_full_395,
-                      get_key_rates_from_395gk, split_period_by_key_rate)
+                      get_key_rates_from_395gk, split_period_by_key_rate,
+                      summarize_interest_periods)
+from court_directory import (
+    COURT_DIRECTORY_MAX_AGE_DAYS,
+    COURT_DIRECTORY_REFRESH_HOURS,
+    COURT_DIRECTORY_REQUEST_PAUSE,
+    COURT_DIRECTORY_START_DELAY,
+    default_directory,
+)
+from court_index import resolve_court_address
+from lookup_cache import PersistentCache, RateLimiter, env_float, env_int
 from llm_fallback import (
     apply_llm_fallback,
     extract_document_groups_llm,
@@ -50,10 +64,21 @@ from document_awareness import (
     adjust_claim_data,
     generate_awareness_text_block,
 )
+from document_builder import DocumentBuildPipeline, DocumentJob
+from document_output import render_document
+from docx_tables import RowTemplate, append_rows, style_table_run
+from pretension_pipeline import Stage, StagedPipeline
+from session_store import ExtractionStore, file_digest
+from settings import install_reload_signal
 from sliding_window_parser import parse_documents_with_sliding_window
+from upload_pipeline import UploadPipeline
+from value_parsing import (coerce_date, parse_amount, parse_amount_decimal,
+                           parse_date_str, parse_iso_date, parse_ru_month,
+                           parse_ru_text_date, parse_short_date)
 from external_claim_parser import (
     parse_external_claim,
-    parse_document_packages,
+    parse_document_package_in_pool,
+    shutdown_package_pool,
     link_documents_full,
     ExternalClaimData,
 )
@@ -69,6 +94,33 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 logger.info("Bot script started")
 
+# Фоновое извлечение текста из загруженных файлов (до команды «готово»)
+UPLOAD_PIPELINE = UploadPipeline(
+    env_int("UPLOAD_WORKERS", 2),
+    job_ttl=env_float("UPLOAD_JOB_TTL", 3600),
+)
+
+# Состояние диалогов и результаты извлечения переживают перезапуск бота
+SESSION_STATE_DIR = os.getenv(
+    "SESSION_STATE_DIR",
+    os.path.join(os.path.dirname(__file__), "session_state")
+)
+SESSION_TTL_SECONDS = env_float("SESSION_TTL_HOURS", 48) * 3600
+EXTRACTION_STORE = ExtractionStore(
+    os.path.join(SESSION_STATE_DIR, "extraction"),
+    ttl_seconds=SESSION_TTL_SECONDS
+)
+
+# Иск, Ф107 и доверенность собираются параллельно в отдельных процессах
+DOCUMENT_BUILDER = DocumentBuildPipeline(
+    env_int("DOCUMENT_BUILD_WORKERS", min(3, os.cpu_count() or 1))
+)
+# Процессы пула не должны пережить интерпретатор (скрипты и тесты без бота)
+atexit.register(DOCUMENT_BUILDER.shutdown)
+
+# Значение ConversationHandler.END: telegram загружается только при запуске бота
+CONVERSATION_END = -1
+
 # Состояния диалога
 (
     ASK_FLOW,
@@ -133,6 +185,53 @@ PRETENSION_FIELD_DEFS = {
     },
 }
 
+# Поля отправки документов, которые хранятся и в группах претензии
+PRETENSION_GROUP_SHIPPING_FIELDS = ("docs_received_date", "docs_track_number")
+
+# Подписи полей для правки готовой претензии («поле: значение»)
+PRETENSION_FIELD_ALIASES = {
+    "истец": "plaintiff_name",
+    "отправитель": "plaintiff_name",
+    "ответчик": "defendant_name",
+    "должник": "defendant_name",
+    "получатель": "defendant_name",
+    "долг": "debt",
+    "сумма": "debt",
+    "сумма долга": "debt",
+    "срок оплаты": "payment_days",
+    "срок": "payment_days",
+    "способ отправки": "shipping_method",
+    "отправка": "shipping_method",
+    "трек": "docs_track_number",
+    "трек-номер": "docs_track_number",
+    "трек номер": "docs_track_number",
+    "дата получения": "docs_received_date",
+    "даты получения": "docs_received_date",
+}
+
+
+def pretension_edit_help() -> str:
+    """Подсказка со списком полей, доступных для правки."""
+    labels: Dict[str, str] = {}
+    for label, key in PRETENSION_FIELD_ALIASES.items():
+        labels.setdefault(key, label)
+    return (
+        "Не понял, какое поле исправить. Доступные поля: "
+        + ", ".join(labels.values())
+        + ". Отправьте правку в виде «поле: значение» или напишите «готово»."
+    )
+
+
+def parse_pretension_field_edit(text: str) -> Tuple[Optional[str], str]:
+    """Разбирает правку вида «поле: значение» в (ключ поля, значение)."""
+    label, sep, value = (text or "").partition(":")
+    if not sep:
+        return None, ""
+    key = PRETENSION_FIELD_ALIASES.get(
+        re.sub(r"\s+", " ", label).strip().lower()
+    )
+    return key, value.strip()
+
 
 def resolve_court_from_dadata(
     court_name: str,
@@ -140,6 +239,10 @@ def resolve_court_from_dadata(
 ) -> Tuple[str, str]:
     if not court_name:
         return court_name, court_address
+    # Карточка из справочника судов — без обращения к сети
+    record = COURT_DIRECTORY.lookup(court_name)
+    if record and record.get("refreshed_at"):
+        return record.get("name") or court_name, record.get("address") or court_address
     suggestion = fetch_dadata_court_suggest(
         court_name,
         court_type="AS"
@@ -162,27 +265,12 @@ def get_court_by_address(defendant_address: str) -> Tuple[str, str]:
     Returns:
         Кортеж (название суда, адрес суда)
     """
-    from courts_code import ARBITRATION_COURTS, CITY_TO_REGION
-
-    defendant_address_lower = defendant_address.lower()
-
-    # Сначала ищем по названию региона
-    for region, court_info in ARBITRATION_COURTS.items():
-        if region.lower() in defendant_address_lower:
-            return resolve_court_from_dadata(
-                court_info["name"],
-                court_info["address"]
-            )
-
-    # Если регион не найден, ищем по городам
-    for city, region in CITY_TO_REGION.items():
-        if city in defendant_address_lower:
-            if region in ARBITRATION_COURTS:
-                court_info = ARBITRATION_COURTS[region]
-                return resolve_court_from_dadata(
-                    court_info["name"],
-                    court_info["address"]
-                )
+    match = resolve_court_address(defendant_address or "")
+    if match:
+        return resolve_court_from_dadata(
+            match.court["name"],
+            match.court["address"]
+        )
 
     # Если ничего не найдено, возвращаем общий ответ
     return resolve_court_from_dadata(
@@ -191,10 +279,34 @@ def get_court_by_address(defendant_address: str) -> Tuple[str, str]:
     )
 
 
-def insert_interest_table(doc, details, total_interest: Optional[float] = None):
+# Свернуть подряд идущие периоды с одной ставкой, если строк больше порога (0 — никогда)
+INTEREST_TABLE_SUMMARY_ROWS = env_int("INTEREST_TABLE_SUMMARY_ROWS", 0)
+
+
+def _interest_table_details(details, summarize: Optional[bool]):
+    details = list(details or [])
+    if summarize is None:
+        summarize = 0 < INTEREST_TABLE_SUMMARY_ROWS < len(details)
+    return summarize_interest_periods(details) if summarize else details
+
+
+def _format_table_date(value) -> str:
+    if isinstance(value, datetime):
+        return value.strftime('%d.%m.%Y')
+    return value or ''
+
+
+def insert_interest_table(
+    doc,
+    details,
+    total_interest: Optional[float] = None,
+    summarize: Optional[bool] = None
+):
     """
     Вставляет таблицу процентов в документ
     Word вместо маркера {interest_table}.
+    summarize — свернуть периоды с одной ставкой (по умолчанию по
+    INTEREST_TABLE_SUMMARY_ROWS).
     """
     placeholders = ['{{interest_table}}', '{interest_table}']
     headers = [
@@ -209,41 +321,28 @@ def insert_interest_table(doc, details, total_interest: Optional[float] = None):
                 cell.text = header
                 for p in cell.paragraphs:
                     for run in p.runs:
-                        run.font.size = Pt(10)
-                        run.font.name = 'Times New Roman'
-                        run._element.rPr.rFonts.set(
-                            qn('w:eastAsia'), 'Times New Roman'
-                        )
-            for row in details:
-                cells = table.add_row().cells
-                row_sum = row.get('sum', 0.0)
-                date_from = row.get('date_from', '')
-                date_to = row.get('date_to', '')
-                if isinstance(date_from, datetime):
-                    date_from = date_from.strftime('%d.%m.%Y')
-                if isinstance(date_to, datetime):
-                    date_to = date_to.strftime('%d.%m.%Y')
-                cells[0].text = f"{row_sum:,.2f}".replace(',', ' ')
-                cells[1].text = f"{date_from} г." if date_from else ''
-                cells[2].text = f"{date_to} г." if date_to else ''
-                cells[3].text = str(row.get('days', ''))
-                cells[4].text = str(row.get('rate', ''))
-                cells[5].text = str(row.get('formula', ''))
-                cells[6].text = f"{row.get('interest', 0.0):,.2f}".replace(',', ' ')
-                for cell in cells:
-                    for p in cell.paragraphs:
-                        for run in p.runs:
-                            run.font.size = Pt(10)
-                            run.font.name = 'Times New Roman'
-                            run._element.rPr.rFonts.set(
-                                qn('w:eastAsia'), 'Times New Roman'
-                            )
+                        style_table_run(run)
+            rows = _interest_table_details(details, summarize)
+            values = []
+            for row in rows:
+                date_from = _format_table_date(row.get('date_from', ''))
+                date_to = _format_table_date(row.get('date_to', ''))
+                values.append((
+                    f"{row.get('sum', 0.0):,.2f}".replace(',', ' '),
+                    f"{date_from} г." if date_from else '',
+                    f"{date_to} г." if date_to else '',
+                    str(row.get('days', '')),
+                    str(row.get('rate', '')),
+                    str(row.get('formula', '')),
+                    f"{row.get('interest', 0.0):,.2f}".replace(',', ' '),
+                ))
+            append_rows(table, RowTemplate(table), values)
             if total_interest is None:
                 total_interest = sum(
                     float(row.get('interest', 0.0) or 0.0)
-                    for row in details
+                    for row in rows
                 )
-            if details or total_interest:
+            if rows or total_interest:
                 total_row = table.add_row().cells
                 label_cell = total_row[0].merge(total_row[5])
                 label_cell.text = 'Итого процентов'
@@ -251,12 +350,7 @@ def insert_interest_table(doc, details, total_interest: Optional[float] = None):
                 for cell in total_row:
                     for p in cell.paragraphs:
                         for run in p.runs:
-                            run.font.size = Pt(10)
-                            run.font.name = 'Times New Roman'
-                            run.bold = True
-                            run._element.rPr.rFonts.set(
-                                qn('w:eastAsia'), 'Times New Roman'
-                            )
+                            style_table_run(run, bold=True)
             p = paragraph._element
             p.addnext(table._element)
             for placeholder in placeholders:
@@ -287,35 +381,33 @@ def insert_interest_table_from_rows(doc, table_rows: List[List[str]]) -> bool:
         for cell in row.cells:
             for p in cell.paragraphs:
                 for run in p.runs:
-                    run.font.size = Pt(10)
-                    run.font.name = 'Times New Roman'
-                    run.bold = bold
-                    run._element.rPr.rFonts.set(
-                        qn('w:eastAsia'), 'Times New Roman'
-                    )
+                    style_table_run(run, bold=bold)
 
+    rows: List[List[str]] = []
     last_row_index = len(table_rows) - 1
     for row_index, row_values in enumerate(table_rows):
-        cells = table.add_row().cells
-        for col_index in range(max_cols):
-            value = row_values[col_index] if col_index < len(row_values) else ''
-            cells[col_index].text = value
+        cells = [
+            row_values[col_index] if col_index < len(row_values) else ''
+            for col_index in range(max_cols)
+        ]
         if row_index == 0 and max_cols >= 11:
-            if cells[1].text == cells[2].text:
-                cells[2].text = ''
-            if cells[1].text == cells[3].text:
-                cells[3].text = ''
-            if cells[4].text == cells[5].text:
-                cells[5].text = ''
-            if cells[6].text == cells[7].text:
-                cells[7].text = ''
-        if row_index == last_row_index and cells[0].text.strip().lower().startswith('итого'):
-            if cells[0].text == cells[1].text:
-                cells[1].text = ''
-            if cells[0].text == cells[2].text:
-                cells[2].text = ''
-        is_header = row_index <= 2
-        style_row(table.rows[row_index], bold=is_header)
+            if cells[1] == cells[2]:
+                cells[2] = ''
+            if cells[1] == cells[3]:
+                cells[3] = ''
+            if cells[4] == cells[5]:
+                cells[5] = ''
+            if cells[6] == cells[7]:
+                cells[7] = ''
+        if row_index == last_row_index and cells[0].strip().lower().startswith('итого'):
+            if cells[0] == cells[1]:
+                cells[1] = ''
+            if cells[0] == cells[2]:
+                cells[2] = ''
+        rows.append(cells)
+    # Первые три строки — шапка таблицы
+    append_rows(table, RowTemplate(table, bold=True), rows[:3])
+    append_rows(table, RowTemplate(table, bold=False), rows[3:])
 
     # Merge header groups if values are repeated
     if len(table.rows) > 0 and max_cols >= 11:
@@ -349,7 +441,8 @@ def insert_pretension_interest_table(
     doc,
     details,
     total_interest: Optional[float] = None,
-    note: Optional[str] = None
+    note: Optional[str] = None,
+    summarize: Optional[bool] = None
 ):
     placeholders = ['{{interest_table}}', '{interest_table}']
     if not details and (total_interest is None or float(total_interest or 0) <= 0):
@@ -391,55 +484,42 @@ def insert_pretension_interest_table(
         for idx, cell in enumerate(index_row, start=1):
             cell.text = f"[{idx}]"
 
-        def style_cell(cell):
-            for p in cell.paragraphs:
-                for run in p.runs:
-                    run.font.size = Pt(10)
-                    run.font.name = 'Times New Roman'
-                    run._element.rPr.rFonts.set(
-                        qn('w:eastAsia'), 'Times New Roman'
-                    )
-
         for row in table.rows:
             for cell in row.cells:
-                style_cell(cell)
-
-        for row in details:
-            cells = table.add_row().cells
-            date_from = row.get('date_from')
-            date_to = row.get('date_to')
-            if isinstance(date_from, datetime):
-                date_from = date_from.strftime('%d.%m.%Y')
-            if isinstance(date_to, datetime):
-                date_to = date_to.strftime('%d.%m.%Y')
+                for p in cell.paragraphs:
+                    for run in p.runs:
+                        style_table_run(run)
+
+        rows = _interest_table_details(details, summarize)
+        values = []
+        for row in rows:
+            date_from = _format_table_date(row.get('date_from'))
+            date_to = _format_table_date(row.get('date_to'))
             increase_sum = row.get('increase_sum') or 0.0
-            increase_date = row.get('increase_date')
-            if isinstance(increase_date, datetime):
-                increase_date = increase_date.strftime('%d.%m.%Y')
+            increase_date = _format_table_date(row.get('increase_date'))
             rate = row.get('rate', 0.0)
-            rate_text = f"{rate:.2f}".replace('.', ',') + "%"
-            interest_text = format_money(row.get('interest', 0.0), 2).replace('.', ',')
-            cells[0].text = format_money(row.get('sum', 0.0), 2).replace('.', ',')
-            cells[1].text = f"{date_from} г." if date_from else ''
-            cells[2].text = f"{date_to} г." if date_to else ''
-            cells[3].text = str(row.get('days', ''))
-            cells[4].text = (
-                format_money(increase_sum, 2).replace('.', ',')
-                if increase_sum else '0'
-            )
-            cells[5].text = increase_date or '-'
-            cells[6].text = rate_text
-            cells[7].text = str(row.get('year_days', ''))
-            cells[8].text = interest_text
-            for cell in cells:
-                style_cell(cell)
+            values.append((
+                format_money(row.get('sum', 0.0), 2).replace('.', ','),
+                f"{date_from} г." if date_from else '',
+                f"{date_to} г." if date_to else '',
+                str(row.get('days', '')),
+                (
+                    format_money(increase_sum, 2).replace('.', ',')
+                    if increase_sum else '0'
+                ),
+                increase_date or '-',
+                f"{rate:.2f}".replace('.', ',') + "%",
+                str(row.get('year_days', '')),
+                format_money(row.get('interest', 0.0), 2).replace('.', ','),
+            ))
+        append_rows(table, RowTemplate(table), values)
 
         if total_interest is None:
             total_interest = sum(
                 float(item.get('interest', 0.0) or 0.0)
-                for item in details
+                for item in rows
             )
-        if details or total_interest:
+        if rows or total_interest:
             total_row = table.add_row().cells
             label_cell = total_row[0].merge(total_row[7])
             label_cell.text = 'Итого процентов'
@@ -447,12 +527,7 @@ def insert_pretension_interest_table(
             for cell in total_row:
                 for p in cell.paragraphs:
                     for run in p.runs:
-                        run.font.size = Pt(10)
-                        run.font.name = 'Times New Roman'
-                        run.bold = True
-                        run._element.rPr.rFonts.set(
-                            qn('w:eastAsia'), 'Times New Roman'
-                        )
+                        style_table_run(run, bold=True)
 
         p = paragraph._element
         p.addnext(table._element)
@@ -503,8 +578,27 @@ class RussianPostTrackingError(Exception):
     pass
 
 
-_DADATA_CACHE: Dict[str, Dict[str, Any]] = {}
-_DADATA_COURT_CACHE: Dict[str, Dict[str, Any]] = {}
+DADATA_CACHE_TTL_DAYS = env_float("DADATA_CACHE_TTL_DAYS", 30.0)
+# «Не найдено» (пустой ответ DaData) кэшируется на короткий срок: в кэше лежит {}
+DADATA_MISS_TTL_HOURS = env_float("DADATA_MISS_TTL_HOURS", 6.0)
+_DADATA_CACHE = PersistentCache(
+    os.getenv(
+        "DADATA_PARTY_CACHE_PATH",
+        os.path.join(os.path.dirname(__file__), "dadata_party_cache.json")
+    ),
+    ttl_seconds=DADATA_CACHE_TTL_DAYS * 86400,
+    max_entries=env_int("DADATA_CACHE_MAX_ENTRIES", 5000),
+)
+_DADATA_COURT_CACHE = PersistentCache(
+    os.getenv(
+        "DADATA_COURT_CACHE_PATH",
+        os.path.join(os.path.dirname(__file__), "dadata_court_cache.json")
+    ),
+    ttl_seconds=DADATA_CACHE_TTL_DAYS * 86400,
+    max_entries=env_int("DADATA_CACHE_MAX_ENTRIES", 5000),
+)
+# Справочник судов: база судов плюс сохранённые карточки DaData
+COURT_DIRECTORY = default_directory()
 
 
 def get_russian_post_config() -> Dict[str, object]:
@@ -594,17 +688,29 @@ def normalize_shipping_source(value: Optional[str]) -> str:
     return cleaned
 
 
-def fetch_dadata_party_by_inn(
+def dadata_party_cache_key(
     inn: str,
     kpp: Optional[str] = None,
     branch_type: str = "MAIN"
+) -> str:
+    inn_clean = re.sub(r"[^\d]", "", str(inn or ""))
+    kpp_clean = re.sub(r"[^\d]", "", str(kpp or ""))
+    return f"{inn_clean}:{kpp_clean}:{branch_type or ''}"
+
+
+def fetch_dadata_party_by_inn(
+    inn: str,
+    kpp: Optional[str] = None,
+    branch_type: str = "MAIN",
+    persist: bool = True
 ) -> Optional[Dict[str, Any]]:
     inn_clean = re.sub(r"[^\d]", "", str(inn or ""))
     if not is_valid_inn(inn_clean):
         return None
-    cache_key = f"{inn_clean}:{kpp or ''}:{branch_type}"
-    if cache_key in _DADATA_CACHE:
-        return _DADATA_CACHE[cache_key]
+    cache_key = dadata_party_cache_key(inn_clean, kpp, branch_type)
+    cached = _DADATA_CACHE.get(cache_key)
+    if cached is not None:
+        return cached or None
 
     config = get_dadata_config()
     if not config.get("enabled"):
@@ -643,13 +749,16 @@ def fetch_dadata_party_by_inn(
         suggestions = data.get("suggestions")
     if suggestions is None and isinstance(data, list):
         suggestions = data
-    if not suggestions:
-        return None
-
-    suggestion = suggestions[0]
+    suggestion = suggestions[0] if suggestions else None
     if isinstance(suggestion, dict):
-        _DADATA_CACHE[cache_key] = suggestion
+        _DADATA_CACHE.set(cache_key, suggestion, persist=persist)
         return suggestion
+    _DADATA_CACHE.set(
+        cache_key,
+        {},
+        ttl_seconds=DADATA_MISS_TTL_HOURS * 3600,
+        persist=persist
+    )
     return None
 
 
@@ -693,24 +802,157 @@ def parse_dadata_party(suggestion: Dict[str, Any]) -> Dict[str, str]:
     }
 
 
-def fetch_dadata_court_suggest(
-    query: str,
-    court_type: Optional[str] = None
-) -> Optional[Dict[str, Any]]:
-    if not query:
-        return None
-    cache_key = f"suggest:{query}:{court_type or ''}"
-    if cache_key in _DADATA_COURT_CACHE:
-        return _DADATA_COURT_CACHE[cache_key]
+def collect_party_lookups(
+    parties: Optional[Dict[str, Dict[str, str]]] = None,
+    claim_data: Optional[Dict[str, Any]] = None,
+    external_data: Optional[Any] = None
+) -> List[Tuple[str, Optional[str]]]:
+    """
+    Собирает уникальные пары (ИНН, КПП) сторон из извлечённых данных,
+    claim_data и внешней претензии для пакетного запроса в DaData.
+    """
+    lookups: List[Tuple[str, Optional[str]]] = []
+    seen: Set[Tuple[str, Optional[str]]] = set()
+
+    def add(inn_value: Any, kpp_value: Any = None) -> None:
+        inn_clean = re.sub(r"[^\d]", "", str(inn_value or ""))
+        if not is_valid_inn(inn_clean):
+            return
+        kpp_clean = re.sub(r"[^\d]", "", str(kpp_value or "")) or None
+        key = (inn_clean, kpp_clean)
+        if key in seen:
+            return
+        seen.add(key)
+        lookups.append(key)
+
+    for payload in (parties or {}).values():
+        if isinstance(payload, dict):
+            add(payload.get("inn"), payload.get("kpp"))
+    if claim_data:
+        for prefix in ("plaintiff", "defendant"):
+            add(claim_data.get(f"{prefix}_inn"), claim_data.get(f"{prefix}_kpp"))
+    if external_data is not None:
+        for party in (
+            getattr(external_data, "plaintiff", None),
+            getattr(external_data, "defendant", None),
+        ):
+            if party is not None:
+                add(getattr(party, "inn", ""), getattr(party, "kpp", ""))
+    return lookups
+
+
+def resolve_dadata_parties(
+    lookups: List[Tuple[str, Optional[str]]],
+    branch_type: str = "MAIN"
+) -> Dict[str, Optional[Dict[str, Any]]]:
+    """
+    Параллельно запрашивает в DaData стороны, которых ещё нет в кэше.
+
+    Для пар с КПП, не найденных по КПП, повторяет запрос только по ИНН
+    (как enrich_party_with_dadata). Возвращает словарь
+    {ключ кэша: подсказка DaData или None}.
+    """
+    results: Dict[str, Optional[Dict[str, Any]]] = {}
+    pending: List[Tuple[str, Optional[str]]] = []
+    for inn_value, kpp_value in lookups:
+        key = dadata_party_cache_key(inn_value, kpp_value, branch_type)
+        if key in results:
+            continue
+        cached = _DADATA_CACHE.get(key)
+        results[key] = cached or None
+        if cached is None:
+            pending.append((inn_value, kpp_value))
+
+    if not pending or not get_dadata_config().get("enabled"):
+        return results
+
+    def fetch(item: Tuple[str, Optional[str]]) -> Optional[Dict[str, Any]]:
+        return fetch_dadata_party_by_inn(
+            item[0],
+            kpp=item[1],
+            branch_type=branch_type,
+            persist=False
+        )
+
+    max_workers = max(1, env_int("DADATA_MAX_WORKERS", 4))
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(pending))) as pool:
+        fetched = list(pool.map(tracing.bind(fetch), pending))
+        retry = [
+            (inn_value, None)
+            for (inn_value, kpp_value), suggestion in zip(pending, fetched)
+            if suggestion is None and kpp_value
+            and dadata_party_cache_key(inn_value, None, branch_type) not in results
+        ]
+        retry = list(dict.fromkeys(retry))
+        retried = list(pool.map(tracing.bind(fetch), retry)) if retry else []
+
+    for (inn_value, kpp_value), suggestion in zip(pending + retry, fetched + retried):
+        results[dadata_party_cache_key(inn_value, kpp_value, branch_type)] = suggestion
+    _DADATA_CACHE.flush()
+    return results
+
+
+def enrich_party_with_dadata(
+    claim_data: Dict[str, Any],
+    prefix: str,
+    resolved: Optional[Dict[str, Optional[Dict[str, Any]]]] = None
+) -> None:
+    inn_value = re.sub(r"[^\d]", "", str(claim_data.get(f"{prefix}_inn") or ""))
+    if not is_valid_inn(inn_value):
+        return
+    kpp_value = re.sub(r"[^\d]", "", str(claim_data.get(f"{prefix}_kpp") or "")) or None
+
+    def lookup(kpp: Optional[str]) -> Optional[Dict[str, Any]]:
+        key = dadata_party_cache_key(inn_value, kpp, "MAIN")
+        if resolved is not None and key in resolved:
+            return resolved[key]
+        return fetch_dadata_party_by_inn(inn_value, kpp=kpp, branch_type="MAIN")
+
+    suggestion = lookup(kpp_value)
+    if not suggestion and kpp_value:
+        suggestion = lookup(None)
+    if not suggestion:
+        return
+    parsed = parse_dadata_party(suggestion)
+    if parsed.get("inn") and parsed.get("inn") != inn_value:
+        return
+    if parsed.get("name"):
+        claim_data[f"{prefix}_name"] = normalize_company_name(parsed.get("name", ""))
+    if parsed.get("kpp"):
+        claim_data[f"{prefix}_kpp"] = parsed["kpp"]
+    if parsed.get("ogrn"):
+        claim_data[f"{prefix}_ogrn"] = parsed["ogrn"]
+    # Для ИП адрес берём из документа, не из DaData
+    if parsed.get("type") != "INDIVIDUAL" and parsed.get("address"):
+        claim_data[f"{prefix}_address"] = parsed["address"]
+
+
+def enrich_parties_with_dadata(
+    claim_data: Dict[str, Any],
+    parties: Optional[Dict[str, Dict[str, str]]] = None,
+    external_data: Optional[Any] = None
+) -> None:
+    resolved = resolve_dadata_parties(
+        collect_party_lookups(
+            parties=parties,
+            claim_data=claim_data,
+            external_data=external_data
+        )
+    )
+    enrich_party_with_dadata(claim_data, "plaintiff", resolved)
+    enrich_party_with_dadata(claim_data, "defendant", resolved)
+
 
+def _post_dadata_court(
+    endpoint_key: str,
+    payload: Dict[str, Any],
+    label: str
+) -> Optional[Dict[str, Any]]:
+    """Первая подсказка DaData; {} — DaData ответила, но ничего не нашла."""
     config = get_dadata_court_config()
     if not config.get("enabled"):
         return None
 
-    payload: Dict[str, Any] = {"query": query}
-    if court_type:
-        payload["filters"] = [{"court_type": court_type}]
-
     headers = {
         "Content-Type": "application/json",
         "Accept": "application/json",
@@ -721,7 +963,7 @@ def fetch_dadata_court_suggest(
 
     try:
         resp = requests.post(
-            str(config["suggest_endpoint"]),
+            str(config[endpoint_key]),
             json=payload,
             headers=headers,
             timeout=int(config.get("timeout") or 15)
@@ -729,7 +971,7 @@ def fetch_dadata_court_suggest(
         resp.raise_for_status()
         data = resp.json()
     except Exception as exc:
-        logger.warning("Dadata court suggest failed for '%s': %s", query, exc)
+        logger.warning("%s failed for '%s': %s", label, payload.get("query"), exc)
         return None
 
     suggestions = None
@@ -737,63 +979,76 @@ def fetch_dadata_court_suggest(
         suggestions = data.get("suggestions")
     if suggestions is None and isinstance(data, list):
         suggestions = data
-    if not suggestions:
-        return None
+    suggestion = suggestions[0] if suggestions else None
+    return suggestion if isinstance(suggestion, dict) else {}
 
-    suggestion = suggestions[0]
-    if isinstance(suggestion, dict):
-        _DADATA_COURT_CACHE[cache_key] = suggestion
-        return suggestion
-    return None
 
+def request_dadata_court_suggest(
+    query: str,
+    court_type: Optional[str] = None
+) -> Optional[Dict[str, Any]]:
+    """Запрос подсказки DaData по суду без справочника и кэша ({} — не найден)."""
+    if not query:
+        return None
+    payload: Dict[str, Any] = {"query": query}
+    if court_type:
+        payload["filters"] = [{"court_type": court_type}]
+    return _post_dadata_court("suggest_endpoint", payload, "Dadata court suggest")
 
-def fetch_dadata_court_by_code(code: str) -> Optional[Dict[str, Any]]:
-    code_clean = (code or "").strip()
-    if not code_clean:
+
+def fetch_dadata_court_suggest(
+    query: str,
+    court_type: Optional[str] = None
+) -> Optional[Dict[str, Any]]:
+    if not query:
         return None
-    cache_key = f"code:{code_clean}"
-    if cache_key in _DADATA_COURT_CACHE:
-        return _DADATA_COURT_CACHE[cache_key]
+    record = COURT_DIRECTORY.lookup(query)
+    if record and record.get("suggestion"):
+        if (record.get("court_type") or court_type) == court_type:
+            return record["suggestion"]
+    cache_key = f"suggest:{query}:{court_type or ''}"
+    cached = _DADATA_COURT_CACHE.get(cache_key)
+    if cached is not None:
+        return cached or None
 
-    config = get_dadata_court_config()
-    if not config.get("enabled"):
+    suggestion = request_dadata_court_suggest(query, court_type)
+    if suggestion is None:
+        return None
+    if not suggestion:
+        _DADATA_COURT_CACHE.set(cache_key, {}, ttl_seconds=DADATA_MISS_TTL_HOURS * 3600)
         return None
+    _DADATA_COURT_CACHE.set(cache_key, suggestion)
+    region = COURT_DIRECTORY.region_for(query)
+    if region and court_type == "AS":
+        COURT_DIRECTORY.update(region, parse_dadata_court(suggestion), suggestion)
+    return suggestion
 
-    payload: Dict[str, Any] = {"query": code_clean}
-    headers = {
-        "Content-Type": "application/json",
-        "Accept": "application/json",
-        "Authorization": f"Token {config['token']}",
-    }
-    if config.get("secret"):
-        headers["X-Secret"] = str(config["secret"])
 
-    try:
-        resp = requests.post(
-            str(config["find_endpoint"]),
-            json=payload,
-            headers=headers,
-            timeout=int(config.get("timeout") or 15)
-        )
-        resp.raise_for_status()
-        data = resp.json()
-    except Exception as exc:
-        logger.warning("Dadata court findById failed for '%s': %s", code_clean, exc)
+def fetch_dadata_court_by_code(code: str) -> Optional[Dict[str, Any]]:
+    code_clean = (code or "").strip()
+    if not code_clean:
         return None
+    record = COURT_DIRECTORY.lookup_code(code_clean)
+    if record and record.get("suggestion"):
+        return record["suggestion"]
+    cache_key = f"code:{code_clean}"
+    cached = _DADATA_COURT_CACHE.get(cache_key)
+    if cached is not None:
+        return cached or None
 
-    suggestions = None
-    if isinstance(data, dict):
-        suggestions = data.get("suggestions")
-    if suggestions is None and isinstance(data, list):
-        suggestions = data
-    if not suggestions:
+    suggestion = _post_dadata_court(
+        "find_endpoint",
+        {"query": code_clean},
+        "Dadata court findById"
+    )
+    if suggestion is None:
         return None
-
-    suggestion = suggestions[0]
-    if isinstance(suggestion, dict):
-        _DADATA_COURT_CACHE[cache_key] = suggestion
-        return suggestion
-    return None
+    _DADATA_COURT_CACHE.set(
+        cache_key,
+        suggestion,
+        ttl_seconds=None if suggestion else DADATA_MISS_TTL_HOURS * 3600
+    )
+    return suggestion or None
 
 
 def parse_dadata_court(suggestion: Dict[str, Any]) -> Dict[str, str]:
@@ -810,6 +1065,42 @@ def parse_dadata_court(suggestion: Dict[str, Any]) -> Dict[str, str]:
     }
 
 
+def _fetch_court_card(
+    court_name: str
+) -> Optional[Tuple[Dict[str, str], Dict[str, Any]]]:
+    suggestion = request_dadata_court_suggest(court_name, court_type="AS")
+    if not suggestion:
+        return None
+    return parse_dadata_court(suggestion), suggestion
+
+
+def refresh_court_directory(max_age_days: Optional[float] = None) -> int:
+    """
+    Обновляет карточки DaData в справочнике судов: все записи или
+    только старше max_age_days. Возвращает число обновлённых записей.
+    """
+    max_age = 0.0 if max_age_days is None else max_age_days * 86400
+    return COURT_DIRECTORY.import_dadata(
+        _fetch_court_card,
+        max_age,
+        COURT_DIRECTORY_REQUEST_PAUSE
+    )
+
+
+def start_court_directory_refresh() -> None:
+    """Фоновое обновление справочника судов, если DaData настроена."""
+    if not get_dadata_court_config().get("enabled"):
+        logging.info("Dadata не настроена, справочник судов работает без обновления")
+        return
+    COURT_DIRECTORY.start_refresh(
+        _fetch_court_card,
+        COURT_DIRECTORY_REFRESH_HOURS * 3600,
+        COURT_DIRECTORY_MAX_AGE_DAYS * 86400,
+        pause_seconds=COURT_DIRECTORY_REQUEST_PAUSE,
+        start_delay=COURT_DIRECTORY_START_DELAY
+    )
+
+
 def build_russian_post_request(barcode: str, config: Dict[str, object]) -> str:
     language = config.get("language", "RUS")
     message_type = config.get("message_type", "0")
@@ -961,6 +1252,145 @@ def extract_tracking_dates(records: List[Dict[str, object]]) -> Tuple[Optional[s
     return send_str, receive_str
 
 
+_RUSSIAN_POST_CACHE = PersistentCache(
+    os.getenv(
+        "RUSSIAN_POST_CACHE_PATH",
+        os.path.join(os.path.dirname(__file__), "russian_post_cache.json")
+    ),
+    max_entries=env_int("RUSSIAN_POST_CACHE_MAX_ENTRIES", 10000),
+)
+RUSSIAN_POST_TRANSIT_TTL = env_float("RUSSIAN_POST_TRANSIT_TTL_MINUTES", 60.0) * 60
+_RUSSIAN_POST_LIMITER = RateLimiter(env_float("RUSSIAN_POST_RATE_LIMIT", 5.0))
+
+
+def _serialize_tracking_records(
+    records: List[Dict[str, object]]
+) -> List[Dict[str, object]]:
+    return [
+        {**record, "date": record["date"].isoformat()}
+        for record in records
+        if isinstance(record.get("date"), datetime)
+    ]
+
+
+def _deserialize_tracking_records(
+    records: List[Dict[str, object]]
+) -> List[Dict[str, object]]:
+    result = []
+    for record in records or []:
+        try:
+            oper_date = datetime.fromisoformat(str(record.get("date")))
+        except ValueError:
+            continue
+        result.append({**record, "date": oper_date})
+    return result
+
+
+def fetch_russian_post_tracking(
+    barcode: str,
+    use_cache: bool = True
+) -> Dict[str, Any]:
+    """
+    Возвращает историю и даты отправления/вручения по трек-номеру.
+
+    Результат: {"records": [...], "send_date": str|None,
+    "receive_date": str|None, "delivered": bool}.
+    Врученные отправления кэшируются без срока (история уже не меняется),
+    находящиеся в пути — на RUSSIAN_POST_TRANSIT_TTL_MINUTES.
+    """
+    track_number = normalize_tracking_number(barcode)
+    if use_cache:
+        cached = _RUSSIAN_POST_CACHE.get(track_number)
+        if cached is not None:
+            return {
+                **cached,
+                "records": _deserialize_tracking_records(cached.get("records")),
+            }
+
+    _RUSSIAN_POST_LIMITER.wait()
+    records = fetch_russian_post_operations(track_number)
+    send_date, receive_date = extract_tracking_dates(records)
+    result = {
+        "records": records,
+        "send_date": send_date,
+        "receive_date": receive_date,
+        "delivered": bool(receive_date),
+    }
+    _RUSSIAN_POST_CACHE.set(
+        track_number,
+        {**result, "records": _serialize_tracking_records(records)},
+        ttl_seconds=None if receive_date else RUSSIAN_POST_TRANSIT_TTL,
+    )
+    return result
+
+
+def fetch_russian_post_tracking_batch(
+    barcodes: List[str],
+    use_cache: bool = True
+) -> Dict[str, Any]:
+    """
+    Параллельно запрашивает несколько трек-номеров с ограничением частоты.
+
+    Возвращает {трек: результат fetch_russian_post_tracking} либо
+    {трек: RussianPostTrackingError} для неудачных запросов.
+    """
+    track_numbers = list(dict.fromkeys(
+        normalize_tracking_number(barcode) for barcode in barcodes if barcode
+    ))
+    results: Dict[str, Any] = {}
+    if not track_numbers:
+        return results
+
+    def fetch(track_number: str) -> Any:
+        try:
+            return fetch_russian_post_tracking(track_number, use_cache=use_cache)
+        except RussianPostTrackingError as exc:
+            return exc
+        except Exception as exc:
+            return RussianPostTrackingError(str(exc))
+
+    max_workers = max(1, env_int("RUSSIAN_POST_MAX_WORKERS", 4))
+    with ThreadPoolExecutor(
+        max_workers=min(max_workers, len(track_numbers))
+    ) as pool:
+        for track_number, result in zip(
+            track_numbers, pool.map(tracing.bind(fetch), track_numbers)
+        ):
+            results[track_number] = result
+    return results
+
+
+def apply_tracking_to_shipments(shipments: List[Dict[str, Any]]) -> None:
+    """Дополняет почтовые отправления датами из API Почты России."""
+    track_numbers = [
+        shipment.get("track_number") or ""
+        for shipment in shipments
+        if normalize_shipping_source(shipment.get("source")) == "post"
+        and is_valid_tracking_number(shipment.get("track_number") or "")
+    ]
+    tracking = fetch_russian_post_tracking_batch(track_numbers)
+    for shipment in shipments:
+        if normalize_shipping_source(shipment.get("source")) != "post":
+            continue
+        track_number = normalize_tracking_number(shipment.get("track_number") or "")
+        result = tracking.get(track_number)
+        if result is None:
+            continue
+        if isinstance(result, Exception):
+            logger.warning(
+                f"Не удалось получить данные по треку {track_number}: {result}"
+            )
+            continue
+        shipment["api_records"] = len(result.get("records") or [])
+        receive_date = result.get("receive_date")
+        send_date = result.get("send_date")
+        if receive_date:
+            shipment["received_date"] = parse_date_str(receive_date) or receive_date
+            shipment["received_date_str"] = receive_date
+        if send_date:
+            shipment["send_date"] = send_date
+
+
 def format_header_paragraph(paragraph, label, value, postfix=None):
     paragraph.clear()
     paragraph.alignment = WD_ALIGN_PARAGRAPH.LEFT
@@ -1081,18 +1511,6 @@ def add_prefix_if_missing(value: str, prefix: str) -> str:
     return f"{prefix}{trimmed}"
 
 
-def parse_amount(value: Optional[str], default: float = 0.0) -> float:
-    if value is None:
-        return default
-    if isinstance(value, (int, float)):
-        return float(value)
-    cleaned = re.sub(r'\s+', '', str(value)).replace(',', '.')
-    try:
-        return float(cleaned)
-    except ValueError:
-        return default
-
-
 def extract_last_amount_from_text(text: str) -> Optional[float]:
     if not text:
         return None
@@ -1130,23 +1548,6 @@ def replace_ruble_words(text: str) -> str:
     return re.sub(pattern, repl, text)
 
 
-def parse_amount_decimal(
-    value: Optional[str],
-    default: Decimal = Decimal("0")
-) -> Decimal:
-    if value is None:
-        return default
-    if isinstance(value, Decimal):
-        return value
-    if isinstance(value, (int, float)):
-        return Decimal(str(value))
-    cleaned = re.sub(r'\s+', '', str(value)).replace(',', '.')
-    try:
-        return Decimal(cleaned)
-    except InvalidOperation:
-        return default
-
-
 def normalize_payment_terms(text: str) -> str:
     if not text:
         return text
@@ -1750,43 +2151,10 @@ def generate_payment_terms(claim_data: dict) -> str:
     )
 
 
-def parse_date_str(value: Optional[str]) -> Optional[datetime]:
-    if not value:
-        return None
-    cleaned = str(value)
-    cleaned = cleaned.replace("О", "0").replace("о", "0").replace("O", "0")
-    match = re.search(r'\d{2}\.\d{2}\.\d{4}', cleaned)
-    if not match:
-        return None
-    try:
-        return datetime.strptime(match.group(0), "%d.%m.%Y")
-    except ValueError:
-        return None
-
-
-def parse_ru_text_date(value: Optional[str]) -> Optional[datetime]:
-    if not value:
-        return None
-    match = re.search(
-        r'(\d{1,2})\s+([А-Яа-яЁё\.]+)\s+(\d{4})',
-        str(value)
-    )
-    if not match:
-        return None
-    day_raw, month_raw, year_raw = match.groups()
-    month = _parse_ru_month(month_raw)
-    if not month:
-        return None
-    try:
-        return datetime(int(year_raw), month, int(day_raw))
-    except ValueError:
-        return None
-
-
-def format_money(amount: float, decimals: int = 2) -> str:
-    if decimals <= 0:
-        return f"{amount:,.0f}".replace(',', ' ')
-    return f"{amount:,.{decimals}f}".replace(',', ' ')
+def format_money(amount: float, decimals: int = 2) -> str:
+    if decimals <= 0:
+        return f"{amount:,.0f}".replace(',', ' ')
+    return f"{amount:,.{decimals}f}".replace(',', ' ')
 
 
 def format_money_ru(amount: float, decimals: int = 2) -> str:
@@ -1823,26 +2191,7 @@ VISION_OCR_CACHE = os.path.join(
     os.path.dirname(__file__),
     "vision_ocr_cache.json"
 )
-
-
-def _parse_iso_date(value: Optional[str]) -> Optional[datetime.date]:
-    if not value:
-        return None
-    raw = str(value).strip()
-    if not raw:
-        return None
-    raw = raw.replace("Z", "+00:00")
-    try:
-        return datetime.fromisoformat(raw).date()
-    except ValueError:
-        match = re.match(r"(\\d{4})-(\\d{2})-(\\d{2})", raw)
-        if not match:
-            return None
-        year, month, day = match.groups()
-        try:
-            return datetime(int(year), int(month), int(day)).date()
-        except ValueError:
-            return None
+_VISION_OCR_CACHE_LOCK = threading.Lock()
 
 
 def fetch_calendar_holidays(year: int) -> Dict[datetime.date, bool]:
@@ -1858,7 +2207,7 @@ def fetch_calendar_holidays(year: int) -> Dict[datetime.date, bool]:
                 date_str = item.get("date")
             else:
                 date_str = str(item)
-            date_obj = _parse_iso_date(date_str) or _coerce_date(date_str)
+            date_obj = parse_iso_date(date_str) or coerce_date(date_str)
             if date_obj:
                 result[date_obj.date() if isinstance(date_obj, datetime) else date_obj] = False
     return result
@@ -1949,39 +2298,6 @@ class CalendarLookup(dict):
             logging.warning("Ошибка сохранения календаря рабочих дней: %s", exc)
 
 
-def _parse_ru_month(value: str) -> Optional[int]:
-    normalized = str(value).strip().lower().rstrip(".")
-    mapping = {
-        "января": 1,
-        "янв": 1,
-        "февраля": 2,
-        "фев": 2,
-        "марта": 3,
-        "мар": 3,
-        "апреля": 4,
-        "апр": 4,
-        "мая": 5,
-        "май": 5,
-        "июня": 6,
-        "июн": 6,
-        "июля": 7,
-        "июл": 7,
-        "августа": 8,
-        "авг": 8,
-        "сентября": 9,
-        "сен": 9,
-        "сент": 9,
-        "октября": 10,
-        "окт": 10,
-        "ноября": 11,
-        "ноя": 11,
-        "нояб": 11,
-        "декабря": 12,
-        "дек": 12,
-    }
-    return mapping.get(normalized)
-
-
 def fetch_work_calendar(year: int) -> Dict[datetime.date, bool]:
     """Fallback: parse work calendar from HTML if API is unavailable."""
     url = (
@@ -2000,7 +2316,7 @@ def fetch_work_calendar(year: int) -> Dict[datetime.date, bool]:
     calendar: Dict[datetime.date, bool] = {}
     for match in pattern.finditer(html):
         day_raw, month_raw, year_raw, kind = match.groups()
-        month = _parse_ru_month(month_raw)
+        month = parse_ru_month(month_raw)
         if not month:
             continue
         try:
@@ -2026,13 +2342,9 @@ def load_work_calendar(year: int) -> Dict[datetime.date, bool]:
                 raw = payload[str(year)]
                 if isinstance(raw, dict):
                     for key, value in raw.items():
-                        try:
-                            date_obj = datetime.strptime(
-                                key, "%Y-%m-%d"
-                            ).date()
-                        except ValueError:
-                            continue
-                        cached[date_obj] = bool(value)
+                        date_obj = parse_iso_date(key)
+                        if date_obj:
+                            cached[date_obj] = bool(value)
     except Exception as exc:
         logging.warning("Ошибка чтения календаря рабочих дней: %s", exc)
 
@@ -2131,12 +2443,15 @@ def add_working_days(
     return current
 
 
-def extract_pdf_pages(file_path: str) -> Tuple[List[str], List[int]]:
+def extract_pdf_pages(file_path) -> Tuple[List[str], List[int]]:
     """
     Извлекает текст из PDF с использованием гибридного подхода:
     1. pdfplumber (лучше для таблиц)
     2. PyMuPDF как fallback
     3. Vision LLM для страниц с низким качеством (если доступен)
+
+    file_path — путь или pdf_extractor.ExtractedDocument (разбор
+    кэшируется по хэшу файла и общий с external_claim_parser).
     """
     # Пробуем использовать улучшенный экстрактор
     try:
@@ -2161,7 +2476,7 @@ def extract_pdf_pages(file_path: str) -> Tuple[List[str], List[int]]:
         raise RuntimeError(
             f"Не удалось импортировать PyMuPDF для чтения PDF: {exc}"
         ) from exc
-    doc = fitz.open(file_path)
+    doc = fitz.open(getattr(file_path, "path", file_path))
     pages = []
     low_text_pages: List[int] = []
     min_chars = 40
@@ -2776,11 +3091,30 @@ def _load_vision_ocr_cache() -> Dict[str, Any]:
 
 
 def _save_vision_ocr_cache(cache: Dict[str, Any]) -> None:
-    try:
-        with open(VISION_OCR_CACHE, "w", encoding="utf-8") as handle:
-            json.dump(cache, handle, ensure_ascii=False, indent=2)
-    except Exception as exc:
-        logging.warning("Ошибка сохранения кэша OCR: %s", exc)
+    # Файлы могут распознаваться параллельно: сливаем страницы с тем,
+    # что уже успели записать другие потоки, а не перезаписываем их.
+    with _VISION_OCR_CACHE_LOCK:
+        try:
+            current = _load_vision_ocr_cache()
+            merged_files = current.setdefault("files", {})
+            for signature, bucket in (cache.get("files") or {}).items():
+                if not isinstance(bucket, dict):
+                    continue
+                target = merged_files.setdefault(signature, {"pages": {}})
+                if not isinstance(target, dict):
+                    target = merged_files[signature] = {"pages": {}}
+                for key, value in bucket.items():
+                    if key == "pages" and isinstance(value, dict):
+                        target.setdefault("pages", {}).update(value)
+                    else:
+                        target[key] = value
+            for key, value in cache.items():
+                if key != "files":
+                    current[key] = value
+            with open(VISION_OCR_CACHE, "w", encoding="utf-8") as handle:
+                json.dump(current, handle, ensure_ascii=False, indent=2)
+        except Exception as exc:
+            logging.warning("Ошибка сохранения кэша OCR: %s", exc)
 
 
 def _page_text_seems_sufficient(text: str, file_path: str) -> bool:
@@ -5242,29 +5576,6 @@ def apply_extracted_parties(
                 else:
                     claim_data[target] = payload.get(key)
 
-    def enrich_with_dadata(prefix: str) -> None:
-        inn_value = re.sub(r"[^\d]", "", str(claim_data.get(f"{prefix}_inn") or ""))
-        if not is_valid_inn(inn_value):
-            return
-        kpp_value = re.sub(r"[^\d]", "", str(claim_data.get(f"{prefix}_kpp") or "")) or None
-        suggestion = fetch_dadata_party_by_inn(inn_value, kpp=kpp_value, branch_type="MAIN")
-        if not suggestion and kpp_value:
-            suggestion = fetch_dadata_party_by_inn(inn_value, kpp=None, branch_type="MAIN")
-        if not suggestion:
-            return
-        parsed = parse_dadata_party(suggestion)
-        if parsed.get("inn") and parsed.get("inn") != inn_value:
-            return
-        if parsed.get("name"):
-            claim_data[f"{prefix}_name"] = normalize_company_name(parsed.get("name", ""))
-        if parsed.get("kpp"):
-            claim_data[f"{prefix}_kpp"] = parsed["kpp"]
-        if parsed.get("ogrn"):
-            claim_data[f"{prefix}_ogrn"] = parsed["ogrn"]
-        # Для ИП адрес берём из документа, не из DaData
-        if parsed.get("type") != "INDIVIDUAL" and parsed.get("address"):
-            claim_data[f"{prefix}_address"] = parsed["address"]
-
     current_plaintiff = normalize_party_name(
         claim_data.get("plaintiff_name")
     )
@@ -5330,98 +5641,137 @@ def apply_extracted_parties(
     apply_fields("plaintiff", extracted_plaintiff, override_plaintiff)
     apply_fields("defendant", extracted_defendant, override_defendant)
 
-    enrich_with_dadata("plaintiff")
-    enrich_with_dadata("defendant")
+    enrich_parties_with_dadata(claim_data)
 
 
-def assign_invoices_to_applications(
-    applications: List[Dict[str, Any]],
-    invoices: List[Dict[str, Any]]
-) -> Dict[str, Dict[str, Any]]:
-    assignment: Dict[str, Dict[str, Any]] = {}
-    available = invoices.copy()
+@dataclass
+class DocumentRecord:
+    """
+    Заявка, счёт, УПД или накладная с полями сопоставления, разобранными
+    один раз: даты — datetime, сумма — float, ФИО, госномера и адреса —
+    нормализованные ключи. Исходный словарь хранится в source.
+    """
+    __slots__ = (
+        "source", "number", "application_number", "date", "load_date",
+        "unload_date", "amount", "driver_key", "driver_surname",
+        "vehicle_key", "trailer_key", "load_tokens", "unload_tokens",
+        "sender_key", "receiver_key",
+    )
+    source: Dict[str, Any]
+    number: str
+    application_number: str
+    date: Optional[datetime]
+    load_date: Optional[datetime]
+    unload_date: Optional[datetime]
+    amount: float
+    driver_key: str
+    driver_surname: str
+    vehicle_key: str
+    trailer_key: str
+    load_tokens: Set[str]
+    unload_tokens: Set[str]
+    sender_key: str
+    receiver_key: str
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "DocumentRecord":
+        driver_name = data.get("driver_name")
+        return cls(
+            source=data,
+            number=normalize_application_number(data.get("number")),
+            application_number=normalize_application_number(data.get("application_number")),
+            date=coerce_date(data.get("date")),
+            load_date=coerce_date(data.get("load_date")),
+            unload_date=coerce_date(data.get("unload_date")),
+            amount=_record_amount(data.get("amount")),
+            driver_key=normalize_person_key(driver_name),
+            driver_surname=_person_surname(driver_name),
+            vehicle_key=normalize_vehicle_plate(data.get("vehicle_plate")),
+            trailer_key=normalize_vehicle_plate(data.get("trailer_plate")),
+            load_tokens=normalize_address_tokens(data.get("load_address")),
+            unload_tokens=normalize_address_tokens(data.get("unload_address")),
+            sender_key=normalize_person_key(data.get("sender_name")),
+            receiver_key=normalize_person_key(data.get("receiver_name")),
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Документ в прежнем виде словаря."""
+        return self.source
+
+
+def _record_amount(value: Any) -> float:
+    try:
+        return float(value or 0.0)
+    except (TypeError, ValueError):
+        return 0.0
 
-    def score_doc_to_application(doc: Dict[str, Any], app: Dict[str, Any]) -> Tuple[int, List[str]]:
-        def _surname(value: Optional[str]) -> str:
-            if not value:
-                return ""
-            token = str(value).strip().split()[0]
-            return re.sub(r'[^a-zа-я]', '', token.lower())
-
-        def _score_date_relaxed(first, second, full_points: int, near_points: int, near_days: int = 3) -> int:
-            first_dt = _coerce_date(first)
-            second_dt = _coerce_date(second)
-            if not first_dt or not second_dt:
-                return 0
-            delta = abs((first_dt - second_dt).days)
-            if delta == 0:
-                return full_points
-            if delta <= near_days:
-                return near_points
-            return 0
-
-        score = 0
-        reasons: List[str] = []
-
-        app_number = app.get("number")
-        doc_app_number = doc.get("application_number")
-        if app_number and doc_app_number and app_number == doc_app_number:
-            score += 25
-            reasons.append("номер заявки")
-
-        load_score = _score_date_relaxed(
-            doc.get("load_date"),
-            app.get("load_date"),
-            10,
-            5,
-            3,
-        )
-        if load_score:
-            score += load_score
-            reasons.append("дата погрузки")
-
-        unload_score = _score_date_relaxed(
-            doc.get("unload_date"),
-            app.get("unload_date"),
-            8,
-            4,
-            3,
-        )
-        if unload_score:
-            score += unload_score
-            reasons.append("дата разгрузки")
-
-        doc_score = _score_date_relaxed(
-            doc.get("date"),
-            app.get("date"),
-            4,
-            2,
-            3,
-        )
-        if doc_score:
-            score += doc_score
-            reasons.append("дата документа")
-
-        doc_driver = normalize_person_key(doc.get("driver_name"))
-        app_driver = normalize_person_key(app.get("driver_name"))
-        if doc_driver and app_driver and doc_driver == app_driver:
-            score += 6
-            reasons.append("водитель")
-        else:
-            doc_surname = _surname(doc.get("driver_name"))
-            app_surname = _surname(app.get("driver_name"))
-            if doc_surname and app_surname and doc_surname == app_surname:
-                score += 3
-                reasons.append("фамилия водителя")
 
-        app_amount = app.get("amount") or 0.0
-        doc_amount = doc.get("amount") or 0.0
-        try:
-            app_amount = float(app_amount)
-            doc_amount = float(doc_amount)
-        except (TypeError, ValueError):
-            app_amount = 0.0
-            doc_amount = 0.0
+def _person_surname(value: Optional[str]) -> str:
+    if not value:
+        return ""
+    tokens = str(value).strip().split()
+    if not tokens:
+        return ""
+    return re.sub(r'[^a-zа-я]', '', tokens[0].lower())
+
+
+def _date_delta_score(
+    first: Optional[datetime],
+    second: Optional[datetime],
+    full_points: int,
+    near_points: int,
+    near_days: int
+) -> int:
+    if not first or not second:
+        return 0
+    delta = abs((first - second).days)
+    if delta == 0:
+        return full_points
+    if delta <= near_days:
+        return near_points
+    return 0
+
+
+def _score_billing_doc(
+    doc: DocumentRecord,
+    app: DocumentRecord,
+    score_amount: bool
+) -> Tuple[int, List[str]]:
+    """Скоринг счёта или УПД относительно заявки."""
+    score = 0
+    reasons: List[str] = []
+
+    app_number = app.source.get("number")
+    doc_app_number = doc.source.get("application_number")
+    if app_number and doc_app_number and app_number == doc_app_number:
+        score += 25
+        reasons.append("номер заявки")
+
+    load_score = _date_delta_score(doc.load_date, app.load_date, 10, 5, 3)
+    if load_score:
+        score += load_score
+        reasons.append("дата погрузки")
+
+    unload_score = _date_delta_score(doc.unload_date, app.unload_date, 8, 4, 3)
+    if unload_score:
+        score += unload_score
+        reasons.append("дата разгрузки")
+
+    doc_score = _date_delta_score(doc.date, app.date, 4, 2, 3)
+    if doc_score:
+        score += doc_score
+        reasons.append("дата документа")
+
+    if doc.driver_key and app.driver_key and doc.driver_key == app.driver_key:
+        score += 6
+        reasons.append("водитель")
+    elif doc.driver_surname and app.driver_surname and doc.driver_surname == app.driver_surname:
+        score += 3
+        reasons.append("фамилия водителя")
+
+    if score_amount:
+        app_amount = app.amount
+        doc_amount = doc.amount
         if app_amount > 0 and doc_amount > 0:
             if abs(doc_amount - app_amount) / app_amount <= 0.05:
                 score += 6
@@ -5430,23 +5780,28 @@ def assign_invoices_to_applications(
                 score += 5
                 reasons.append("сумма с НДС")
 
-        doc_vehicle = normalize_vehicle_plate(doc.get("vehicle_plate") or "")
-        app_vehicle = normalize_vehicle_plate(app.get("vehicle_plate") or "")
-        if doc_vehicle and app_vehicle and doc_vehicle == app_vehicle:
-            score += 4
-            reasons.append("ТС")
+    if doc.vehicle_key and app.vehicle_key and doc.vehicle_key == app.vehicle_key:
+        score += 4
+        reasons.append("ТС")
+
+    if doc.trailer_key and app.trailer_key and doc.trailer_key == app.trailer_key:
+        score += 3
+        reasons.append("прицеп")
+
+    return score, reasons
 
-        doc_trailer = normalize_vehicle_plate(doc.get("trailer_plate") or "")
-        app_trailer = normalize_vehicle_plate(app.get("trailer_plate") or "")
-        if doc_trailer and app_trailer and doc_trailer == app_trailer:
-            score += 3
-            reasons.append("прицеп")
 
-        return score, reasons
+def _assign_billing_docs(
+    applications: List[Dict[str, Any]],
+    docs: List[Dict[str, Any]],
+    score_amount: bool
+) -> Dict[str, Dict[str, Any]]:
+    assignment: Dict[str, Dict[str, Any]] = {}
+    available = docs.copy()
 
     # Сначала жёсткое сопоставление по номеру заявки
-    for inv in list(available):
-        app_number = inv.get("application_number")
+    for doc in list(available):
+        app_number = doc.get("application_number")
         if not app_number:
             continue
         match_app = next(
@@ -5454,22 +5809,28 @@ def assign_invoices_to_applications(
             None
         )
         if match_app and match_app.get("label") not in assignment:
-            assignment[match_app["label"]] = inv
-            available.remove(inv)
+            assignment[match_app["label"]] = doc
+            available.remove(doc)
 
     remaining_apps = [
         app for app in applications
         if app.get("label") not in assignment
     ]
+    if not remaining_apps or not available:
+        return assignment
+
+    # Даты, суммы и ключи разбираются один раз, а не для каждой пары
+    doc_records = {id(doc): DocumentRecord.from_dict(doc) for doc in available}
 
     for app in sorted(remaining_apps, key=lambda item: item.get("date") or datetime.min):
         if not available:
             break
+        app_record = DocumentRecord.from_dict(app)
         scored = []
-        for inv in available:
-            score, reasons = score_doc_to_application(inv, app)
+        for doc in available:
+            score, reasons = _score_billing_doc(doc_records[id(doc)], app_record, score_amount)
             if score > 0:
-                scored.append((score, inv, reasons))
+                scored.append((score, doc, reasons))
         if scored:
             scored.sort(
                 key=lambda item: (
@@ -5482,15 +5843,15 @@ def assign_invoices_to_applications(
         else:
             app_date = app.get("date")
             candidates = [
-                inv for inv in available
-                if inv.get("date") and app_date and inv["date"] >= app_date
+                doc for doc in available
+                if doc.get("date") and app_date and doc["date"] >= app_date
             ]
             if candidates:
-                chosen = min(candidates, key=lambda inv: inv["date"])
+                chosen = min(candidates, key=lambda doc: doc["date"])
             else:
                 chosen = min(
                     available,
-                    key=lambda inv: inv.get("date") or datetime.max
+                    key=lambda doc: doc.get("date") or datetime.max
                 )
         assignment[app["label"]] = chosen
         available.remove(chosen)
@@ -5498,151 +5859,18 @@ def assign_invoices_to_applications(
     return assignment
 
 
-def assign_upd_to_applications(
+def assign_invoices_to_applications(
     applications: List[Dict[str, Any]],
-    upd_docs: List[Dict[str, Any]]
+    invoices: List[Dict[str, Any]]
 ) -> Dict[str, Dict[str, Any]]:
-    assignment: Dict[str, Dict[str, Any]] = {}
-    available = upd_docs.copy()
+    return _assign_billing_docs(applications, invoices, score_amount=True)
 
-    def score_doc_to_application(doc: Dict[str, Any], app: Dict[str, Any]) -> Tuple[int, List[str]]:
-        def _surname(value: Optional[str]) -> str:
-            if not value:
-                return ""
-            token = str(value).strip().split()[0]
-            return re.sub(r'[^a-zа-я]', '', token.lower())
-
-        def _score_date_relaxed(first, second, full_points: int, near_points: int, near_days: int = 3) -> int:
-            first_dt = _coerce_date(first)
-            second_dt = _coerce_date(second)
-            if not first_dt or not second_dt:
-                return 0
-            delta = abs((first_dt - second_dt).days)
-            if delta == 0:
-                return full_points
-            if delta <= near_days:
-                return near_points
-            return 0
-
-        score = 0
-        reasons: List[str] = []
-
-        app_number = app.get("number")
-        doc_app_number = doc.get("application_number")
-        if app_number and doc_app_number and app_number == doc_app_number:
-            score += 25
-            reasons.append("номер заявки")
-
-        load_score = _score_date_relaxed(
-            doc.get("load_date"),
-            app.get("load_date"),
-            10,
-            5,
-            3,
-        )
-        if load_score:
-            score += load_score
-            reasons.append("дата погрузки")
-
-        unload_score = _score_date_relaxed(
-            doc.get("unload_date"),
-            app.get("unload_date"),
-            8,
-            4,
-            3,
-        )
-        if unload_score:
-            score += unload_score
-            reasons.append("дата разгрузки")
-
-        doc_score = _score_date_relaxed(
-            doc.get("date"),
-            app.get("date"),
-            4,
-            2,
-            3,
-        )
-        if doc_score:
-            score += doc_score
-            reasons.append("дата документа")
-
-        doc_driver = normalize_person_key(doc.get("driver_name"))
-        app_driver = normalize_person_key(app.get("driver_name"))
-        if doc_driver and app_driver and doc_driver == app_driver:
-            score += 6
-            reasons.append("водитель")
-        else:
-            doc_surname = _surname(doc.get("driver_name"))
-            app_surname = _surname(app.get("driver_name"))
-            if doc_surname and app_surname and doc_surname == app_surname:
-                score += 3
-                reasons.append("фамилия водителя")
-
-        doc_vehicle = normalize_vehicle_plate(doc.get("vehicle_plate") or "")
-        app_vehicle = normalize_vehicle_plate(app.get("vehicle_plate") or "")
-        if doc_vehicle and app_vehicle and doc_vehicle == app_vehicle:
-            score += 4
-            reasons.append("ТС")
-
-        doc_trailer = normalize_vehicle_plate(doc.get("trailer_plate") or "")
-        app_trailer = normalize_vehicle_plate(app.get("trailer_plate") or "")
-        if doc_trailer and app_trailer and doc_trailer == app_trailer:
-            score += 3
-            reasons.append("прицеп")
-
-        return score, reasons
-
-    for upd in list(available):
-        app_number = upd.get("application_number")
-        if not app_number:
-            continue
-        match_app = next(
-            (app for app in applications if app.get("number") == app_number),
-            None
-        )
-        if match_app and match_app.get("label") not in assignment:
-            assignment[match_app["label"]] = upd
-            available.remove(upd)
-
-    remaining_apps = [
-        app for app in applications
-        if app.get("label") not in assignment
-    ]
-
-    for app in sorted(remaining_apps, key=lambda item: item.get("date") or datetime.min):
-        if not available:
-            break
-        scored = []
-        for upd in available:
-            score, reasons = score_doc_to_application(upd, app)
-            if score > 0:
-                scored.append((score, upd, reasons))
-        if scored:
-            scored.sort(
-                key=lambda item: (
-                    item[0],
-                    item[1].get("date") or datetime.min
-                ),
-                reverse=True,
-            )
-            chosen = scored[0][1]
-        else:
-            app_date = app.get("date")
-            candidates = [
-                upd for upd in available
-                if upd.get("date") and app_date and upd["date"] >= app_date
-            ]
-            if candidates:
-                chosen = min(candidates, key=lambda upd: upd["date"])
-            else:
-                chosen = min(
-                    available,
-                    key=lambda upd: upd.get("date") or datetime.max
-                )
-        assignment[app["label"]] = chosen
-        available.remove(chosen)
 
-    return assignment
+def assign_upd_to_applications(
+    applications: List[Dict[str, Any]],
+    upd_docs: List[Dict[str, Any]]
+) -> Dict[str, Dict[str, Any]]:
+    return _assign_billing_docs(applications, upd_docs, score_amount=False)
 
 
 PLATE_TRANSLIT = str.maketrans({
@@ -5700,16 +5928,13 @@ def score_date_match(
     full_points: int,
     near_points: int
 ) -> int:
-    first = _coerce_date(first)
-    second = _coerce_date(second)
-    if not first or not second:
-        return 0
-    delta = abs((first - second).days)
-    if delta == 0:
-        return full_points
-    if delta == 1:
-        return near_points
-    return 0
+    return _date_delta_score(
+        coerce_date(first),
+        coerce_date(second),
+        full_points,
+        near_points,
+        1,
+    )
 
 
 def score_token_overlap(tokens_a: Set[str], tokens_b: Set[str]) -> int:
@@ -5721,41 +5946,6 @@ def score_token_overlap(tokens_a: Set[str], tokens_b: Set[str]) -> int:
     return 6 + min(overlap - 2, 2) * 2
 
 
-def _coerce_date(value: Any) -> Optional[datetime]:
-    if not value:
-        return None
-    if isinstance(value, datetime):
-        return value
-    if hasattr(value, "year") and hasattr(value, "month") and hasattr(value, "day"):
-        try:
-            return datetime(value.year, value.month, value.day)
-        except Exception:
-            return None
-    if isinstance(value, str):
-        parsed = parse_date_str(value)
-        if not parsed:
-            parsed = parse_ru_text_date(value)
-        return parsed
-    return None
-
-
-def parse_short_date(value: Optional[str]) -> Optional[datetime]:
-    if not value:
-        return None
-    match = re.search(r'(\d{2})\.(\d{2})\.(\d{2})(\d{2})?', str(value))
-    if not match:
-        return None
-    day, month, year1, year2 = match.groups()
-    year_str = year1 + (year2 or "")
-    try:
-        year = int(year_str)
-        if len(year_str) == 2:
-            year = 2000 + year
-        return datetime(int(year), int(month), int(day))
-    except Exception:
-        return None
-
-
 def extract_reference_doc_numbers(text: str) -> List[str]:
     if not text:
         return []
@@ -5779,57 +5969,45 @@ def extract_reconciliation_payments(
     return [entry for entry in entries if entry.get("entry_type") == "payment"]
 
 
-def extract_reconciliation_entries(
-    pages: List[str]
-) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
-    if not pages:
-        return [], []
-    target_pages = [
-        page for page in pages
-        if "акт сверки" in page.lower() or "сверк" in page.lower()
-    ]
-    if not target_pages:
-        return [], []
-    text = " ".join(target_pages)
-    date_pattern = re.compile(r'\d{2}\.\d{2}\.\d{2,4}')
-    matches = list(date_pattern.finditer(text))
-    if not matches:
-        return [], []
+RECONCILIATION_PAYMENT_TOKENS = (
+    "оплата", "платеж", "платёж", "поступлен", "поступил", "перечисл",
+    "п/п", "взаимозачет", "взаимозачёт",
+)
+RECONCILIATION_SALE_TOKENS = ("продаж", "приход")
+RECONCILIATION_SKIP_TOKENS = ("сальдо", "обороты за")
+_RECONCILIATION_DATE_RE = re.compile(r'\d{2}\.\d{2}\.\d{2,4}')
+_RECONCILIATION_AMOUNT_RE = re.compile(r'\d[\d\s]*[.,]\d{2}')
 
-    entries: List[Dict[str, Any]] = []
-    sales: List[Dict[str, Any]] = []
-    seen_payments = set()
-    seen_sales = set()
 
-    for idx, match in enumerate(matches):
-        start = match.start()
-        end = matches[idx + 1].start() if idx + 1 < len(matches) else len(text)
-        segment = text[start:end]
-        segment_clean = re.sub(r'\s+', ' ', segment).strip()
-        if len(segment_clean) < 8:
-            continue
-        date_str = match.group(0)
-        date_value = parse_date_str(date_str) or parse_short_date(date_str)
-        if not date_value:
-            continue
+def is_reconciliation_page(text: str) -> bool:
+    lower = (text or "").lower()
+    return "акт сверки" in lower or "сверк" in lower
 
-        amount_matches = re.findall(r'\d[\d\s]*[.,]\d{2}', segment_clean)
-        if not amount_matches:
-            continue
-        amount = parse_amount(amount_matches[-1])
-        if amount <= 0:
-            continue
 
-        lower = segment_clean.lower()
-        entry_type = None
-        if any(token in lower for token in ("оплата", "платеж", "платёж", "поступлен", "поступил", "перечисл", "п/п", "взаимозачет", "взаимозачёт")):
-            entry_type = "payment"
-        elif any(token in lower for token in ("продаж", "приход")):
-            entry_type = "sale"
+def _reconciliation_entry_type(lower: str) -> Optional[str]:
+    if any(token in lower for token in RECONCILIATION_PAYMENT_TOKENS):
+        return "payment"
+    if any(token in lower for token in RECONCILIATION_SALE_TOKENS):
+        return "sale"
+    return None
+
 
-        if not entry_type:
-            continue
+class _ReconciliationRows:
+    """Накопитель строк акта сверки: разбор реквизитов и отсев дублей."""
 
+    def __init__(self) -> None:
+        self.entries: List[Dict[str, Any]] = []
+        self.sales: List[Dict[str, Any]] = []
+        self._seen_payments: Set[Tuple[str, float, str]] = set()
+        self._seen_sales: Set[Tuple[str, float, str]] = set()
+
+    def add(
+        self,
+        entry_type: str,
+        date_value: datetime,
+        amount: float,
+        segment_clean: str
+    ) -> None:
         payment_number = None
         doc_number = None
         doc_date = None
@@ -5867,57 +6045,212 @@ def extract_reconciliation_entries(
                 round(amount, 2),
                 str(payment_number or ""),
             )
-            if key in seen_payments:
-                continue
-            seen_payments.add(key)
+            if key in self._seen_payments:
+                return
+            self._seen_payments.add(key)
             entry["payment_number"] = payment_number
             entry["source"] = "reconciliation"
             entry["reference_numbers"] = extract_reference_doc_numbers(segment_clean)
-            entries.append(entry)
+            self.entries.append(entry)
         else:
             key = (
                 date_value.strftime("%d.%m.%Y"),
                 round(amount, 2),
                 str(doc_number or ""),
             )
-            if key in seen_sales:
-                continue
-            seen_sales.add(key)
-            sales.append(entry)
-
-    return entries, sales
-
+            if key in self._seen_sales:
+                return
+            self._seen_sales.add(key)
+            self.sales.append(entry)
 
-def match_reconciliation_payments_to_groups(
-    groups: List[Dict[str, Any]],
-    payments: List[Dict[str, Any]],
-    sales: Optional[List[Dict[str, Any]]] = None
-) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
-    if not groups or not payments:
-        return [], payments or []
+    def add_segment(self, date_str: str, segment: str) -> None:
+        """Строка текстового слоя: от даты до следующей даты."""
+        segment_clean = re.sub(r'\s+', ' ', segment).strip()
+        if len(segment_clean) < 8:
+            return
+        date_value = parse_date_str(date_str) or parse_short_date(date_str)
+        if not date_value:
+            return
+        amount_matches = _RECONCILIATION_AMOUNT_RE.findall(segment_clean)
+        if not amount_matches:
+            return
+        amount = parse_amount(amount_matches[-1])
+        if amount <= 0:
+            return
+        entry_type = _reconciliation_entry_type(segment_clean.lower())
+        if entry_type:
+            self.add(entry_type, date_value, amount, segment_clean)
 
-    def normalize_number(value: Optional[str]) -> str:
-        if not value:
-            return ""
-        return re.sub(r'[^A-Za-zА-Яа-я0-9]', '', str(value)).upper()
 
-    def extract_number_from_label(label: Optional[str]) -> str:
-        if not label:
-            return ""
-        match = re.search(r'№\s*([A-Za-zА-Яа-я0-9/\\-]+)', label)
-        if match:
-            return normalize_number(match.group(1))
-        return ""
+def _clean_cell(cell: Any) -> str:
+    return re.sub(r'\s+', ' ', str(cell)).strip() if cell else ""
 
-    number_to_group: Dict[str, Optional[int]] = {}
-    prepay_amount_map: Dict[float, List[int]] = {}
-    invoice_amount_map: Dict[float, List[int]] = {}
 
-    for idx, group in enumerate(groups):
-        invoice_number = extract_number_from_label(group.get("invoice"))
-        upd_number = extract_number_from_label(group.get("upd"))
-        app_number = extract_number_from_label(group.get("application"))
-        for number in (invoice_number, upd_number, app_number):
+def _reconciliation_columns(row: List[str]) -> Optional[Dict[str, int]]:
+    """Колонки первого блока («по данным ...») из строки заголовка таблицы."""
+    lowered = [cell.lower() for cell in row]
+    debit_col = next(
+        (idx for idx, cell in enumerate(lowered) if cell.startswith("дебет")), None
+    )
+    if debit_col is None:
+        return None
+    credit_col = next(
+        (
+            idx for idx, cell in enumerate(lowered)
+            if idx > debit_col and cell.startswith("кредит")
+        ),
+        None
+    )
+    if credit_col is None:
+        return None
+    date_col = next(
+        (
+            idx for idx, cell in enumerate(lowered[:debit_col])
+            if cell.startswith("дата")
+        ),
+        None
+    )
+    return {
+        "date": -1 if date_col is None else date_col,
+        "debit": debit_col,
+        "credit": credit_col,
+    }
+
+
+def extract_reconciliation_table_entries(
+    tables: Iterable[List[List[Any]]]
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Строки акта сверки из таблиц pdfplumber за один проход.
+
+    Колонки берутся из заголовка с «Дебет»/«Кредит» (первый блок — данные
+    стороны, составившей акт) и переносятся на продолжение таблицы на
+    следующих страницах. Тип строки определяется по названию документа;
+    строка без признаков оплаты с суммой по дебету считается реализацией,
+    по кредиту — пропускается.
+    """
+    rows = _ReconciliationRows()
+    columns: Optional[Dict[str, int]] = None
+    for table in tables:
+        for raw_row in table or []:
+            row = [_clean_cell(cell) for cell in raw_row or []]
+            header = _reconciliation_columns(row)
+            if header is not None:
+                columns = header
+                continue
+            if columns is None or len(row) <= columns["credit"]:
+                continue
+            block = row[:columns["credit"] + 1]
+            description = " ".join(
+                cell for idx, cell in enumerate(block)
+                if cell and idx not in (columns["debit"], columns["credit"])
+            )
+            lower = description.lower()
+            if not description or any(
+                token in lower for token in RECONCILIATION_SKIP_TOKENS
+            ):
+                continue
+            date_source = row[columns["date"]] if columns["date"] >= 0 else description
+            date_match = _RECONCILIATION_DATE_RE.search(date_source)
+            if not date_match:
+                continue
+            date_str = date_match.group(0)
+            date_value = parse_date_str(date_str) or parse_short_date(date_str)
+            if not date_value:
+                continue
+            debit = parse_amount(row[columns["debit"]])
+            credit = parse_amount(row[columns["credit"]])
+            entry_type = _reconciliation_entry_type(lower)
+            if entry_type is None:
+                # Оплатой считается только строка с признаками платежа:
+                # кредит без них — корректировка, возврат и т.п.
+                if debit <= 0:
+                    continue
+                entry_type = "sale"
+            if entry_type == "payment":
+                amount = credit if credit > 0 else debit
+            else:
+                amount = debit if debit > 0 else credit
+            if amount <= 0:
+                continue
+            segment_clean = " ".join(cell for cell in block if cell)
+            rows.add(entry_type, date_value, amount, segment_clean)
+    return rows.entries, rows.sales
+
+
+def extract_reconciliation_entries(
+    pages: List[str],
+    tables: Optional[Iterable[List[List[Any]]]] = None
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Оплаты и реализации из акта сверки.
+
+    Если переданы таблицы pdfplumber со страниц акта и в них нашлись
+    строки с «Дебет»/«Кредит», используются они. Иначе текстовый слой
+    разбирается потоково: строка — от даты до следующей даты.
+    """
+    if tables:
+        entries, sales = extract_reconciliation_table_entries(tables)
+        if entries or sales:
+            return entries, sales
+    if not pages:
+        return [], []
+
+    rows = _ReconciliationRows()
+    pending_date: Optional[str] = None
+    pending_parts: List[str] = []
+    first_page = True
+    for page in pages:
+        if not is_reconciliation_page(page):
+            continue
+        if not first_page and pending_date is not None:
+            pending_parts.append(" ")
+        first_page = False
+        position = 0
+        for match in _RECONCILIATION_DATE_RE.finditer(page):
+            if pending_date is not None:
+                pending_parts.append(page[position:match.start()])
+                rows.add_segment(pending_date, "".join(pending_parts))
+            pending_date = match.group(0)
+            pending_parts = [match.group(0)]
+            position = match.end()
+        if pending_date is not None:
+            pending_parts.append(page[position:])
+    if pending_date is not None:
+        rows.add_segment(pending_date, "".join(pending_parts))
+    return rows.entries, rows.sales
+
+
+def match_reconciliation_payments_to_groups(
+    groups: List[Dict[str, Any]],
+    payments: List[Dict[str, Any]],
+    sales: Optional[List[Dict[str, Any]]] = None
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    if not groups or not payments:
+        return [], payments or []
+
+    def normalize_number(value: Optional[str]) -> str:
+        if not value:
+            return ""
+        return re.sub(r'[^A-Za-zА-Яа-я0-9]', '', str(value)).upper()
+
+    def extract_number_from_label(label: Optional[str]) -> str:
+        if not label:
+            return ""
+        match = re.search(r'№\s*([A-Za-zА-Яа-я0-9/\\-]+)', label)
+        if match:
+            return normalize_number(match.group(1))
+        return ""
+
+    number_to_group: Dict[str, Optional[int]] = {}
+    prepay_amount_map: Dict[float, List[int]] = {}
+    invoice_amount_map: Dict[float, List[int]] = {}
+
+    for idx, group in enumerate(groups):
+        invoice_number = extract_number_from_label(group.get("invoice"))
+        upd_number = extract_number_from_label(group.get("upd"))
+        app_number = extract_number_from_label(group.get("application"))
+        for number in (invoice_number, upd_number, app_number):
             if not number:
                 continue
             existing = number_to_group.get(number)
@@ -6002,7 +6335,7 @@ def match_reconciliation_payments_to_groups(
             })
         sale_items.sort(key=lambda item: item.get("date") or datetime.min)
 
-        remaining_sales = sale_items[:]
+        remaining_sales = deque(sale_items)
         still_unassigned: List[Dict[str, Any]] = []
         for payment in unassigned:
             remaining = float(payment.get("amount") or 0.0)
@@ -6011,7 +6344,7 @@ def match_reconciliation_payments_to_groups(
             while remaining > 0 and remaining_sales:
                 sale = remaining_sales[0]
                 if sale["amount"] <= 0:
-                    remaining_sales.pop(0)
+                    remaining_sales.popleft()
                     continue
                 applied = min(remaining, sale["amount"])
                 sale["amount"] -= applied
@@ -6026,7 +6359,7 @@ def match_reconciliation_payments_to_groups(
                 group.setdefault("payments", []).append(payment_part)
                 allocated.append(payment_part)
                 if sale["amount"] <= 0:
-                    remaining_sales.pop(0)
+                    remaining_sales.popleft()
             if remaining > 0:
                 payment["amount"] = remaining
                 still_unassigned.append(payment)
@@ -6036,8 +6369,8 @@ def match_reconciliation_payments_to_groups(
 
 
 def score_cargo_to_application(
-    cargo: Dict[str, Any],
-    app: Dict[str, Any]
+    cargo: Union[Dict[str, Any], DocumentRecord],
+    app: Union[Dict[str, Any], DocumentRecord]
 ) -> Tuple[int, List[str]]:
     """
     Скоринг сопоставления cargo-документа с заявкой.
@@ -6054,86 +6387,59 @@ def score_cargo_to_application(
     - Грузоотправитель/получатель (до 12 баллов)
     - Номер заявки (3 балла, слабый сигнал)
     """
+    if isinstance(cargo, dict):
+        cargo = DocumentRecord.from_dict(cargo)
+    if isinstance(app, dict):
+        app = DocumentRecord.from_dict(app)
     score = 0
     reasons: List[str] = []
 
-    cargo_app_num = normalize_application_number(cargo.get("application_number"))
-    app_num = normalize_application_number(app.get("number"))
-    if cargo_app_num and app_num and cargo_app_num == app_num:
+    if cargo.application_number and app.number and cargo.application_number == app.number:
         score += 3
         reasons.append("номер заявки")
 
-    cargo_driver = normalize_person_key(cargo.get("driver_name"))
-    app_driver = normalize_person_key(app.get("driver_name"))
-    if cargo_driver and app_driver and cargo_driver == app_driver:
+    if cargo.driver_key and app.driver_key and cargo.driver_key == app.driver_key:
         score += 15
         reasons.append("водитель")
 
-    cargo_vehicle = normalize_vehicle_plate(cargo.get("vehicle_plate"))
-    app_vehicle = normalize_vehicle_plate(app.get("vehicle_plate"))
-    if cargo_vehicle and app_vehicle and cargo_vehicle == app_vehicle:
+    if cargo.vehicle_key and app.vehicle_key and cargo.vehicle_key == app.vehicle_key:
         score += 20
         reasons.append("транспорт")
 
-    cargo_trailer = normalize_vehicle_plate(cargo.get("trailer_plate"))
-    app_trailer = normalize_vehicle_plate(app.get("trailer_plate"))
-    if cargo_trailer and app_trailer and cargo_trailer == app_trailer:
+    if cargo.trailer_key and app.trailer_key and cargo.trailer_key == app.trailer_key:
         score += 10
         reasons.append("прицеп")
 
-    load_score = score_date_match(
-        cargo.get("load_date"),
-        app.get("load_date"),
-        12,
-        6,
-    )
+    load_score = _date_delta_score(cargo.load_date, app.load_date, 12, 6, 1)
     if load_score:
         score += load_score
         reasons.append("дата погрузки")
 
-    unload_score = score_date_match(
-        cargo.get("unload_date"),
-        app.get("unload_date"),
-        12,
-        6,
-    )
+    unload_score = _date_delta_score(cargo.unload_date, app.unload_date, 12, 6, 1)
     if unload_score:
         score += unload_score
         reasons.append("дата разгрузки")
 
-    doc_score = score_date_match(
-        cargo.get("date"),
-        app.get("date"),
-        6,
-        3,
-    )
+    doc_score = _date_delta_score(cargo.date, app.date, 6, 3, 1)
     if doc_score:
         score += doc_score
         reasons.append("дата документа")
 
-    load_tokens = normalize_address_tokens(cargo.get("load_address"))
-    app_load_tokens = normalize_address_tokens(app.get("load_address"))
-    load_addr_score = score_token_overlap(load_tokens, app_load_tokens)
+    load_addr_score = score_token_overlap(cargo.load_tokens, app.load_tokens)
     if load_addr_score:
         score += load_addr_score
         reasons.append("адрес погрузки")
 
-    unload_tokens = normalize_address_tokens(cargo.get("unload_address"))
-    app_unload_tokens = normalize_address_tokens(app.get("unload_address"))
-    unload_addr_score = score_token_overlap(unload_tokens, app_unload_tokens)
+    unload_addr_score = score_token_overlap(cargo.unload_tokens, app.unload_tokens)
     if unload_addr_score:
         score += unload_addr_score
         reasons.append("адрес разгрузки")
 
-    cargo_sender = normalize_person_key(cargo.get("sender_name"))
-    app_sender = normalize_person_key(app.get("sender_name"))
-    if cargo_sender and app_sender and cargo_sender == app_sender:
+    if cargo.sender_key and app.sender_key and cargo.sender_key == app.sender_key:
         score += 6
         reasons.append("грузоотправитель")
 
-    cargo_receiver = normalize_person_key(cargo.get("receiver_name"))
-    app_receiver = normalize_person_key(app.get("receiver_name"))
-    if cargo_receiver and app_receiver and cargo_receiver == app_receiver:
+    if cargo.receiver_key and app.receiver_key and cargo.receiver_key == app.receiver_key:
         score += 6
         reasons.append("грузополучатель")
 
@@ -6155,12 +6461,14 @@ def assign_cargo_to_applications(
         applications,
         key=lambda item: item.get("date") or datetime.min
     )
+    app_records = [DocumentRecord.from_dict(app) for app in apps_sorted]
     for cargo in sorted(cargo_docs, key=lambda item: item.get("date") or datetime.min):
         cargo_date = cargo.get("date")
+        cargo_record = DocumentRecord.from_dict(cargo)
         chosen = None
         scored = []
-        for app in apps_sorted:
-            score, reasons = score_cargo_to_application(cargo, app)
+        for app, app_record in zip(apps_sorted, app_records):
+            score, reasons = score_cargo_to_application(cargo_record, app_record)
             if score > 0:
                 scored.append((score, app, reasons))
         if scored:
@@ -6520,29 +6828,29 @@ def build_pretension_groups(
         app_load = app.get("load_date")
         app_unload = app.get("unload_date")
         if app_load:
-            app_load_dt = _coerce_date(app_load)
+            app_load_dt = coerce_date(app_load)
             if app_load_dt:
                 load_date = app_load_dt
         if app_unload:
-            app_unload_dt = _coerce_date(app_unload)
+            app_unload_dt = coerce_date(app_unload)
             if app_unload_dt:
                 unload_date = app_unload_dt
         if not load_date:
             load_candidates: List[datetime] = []
             for cargo in cargo_list:
-                cargo_load = _coerce_date(cargo.get("load_date"))
+                cargo_load = coerce_date(cargo.get("load_date"))
                 if cargo_load:
                     load_candidates.append(cargo_load)
             if not load_candidates:
                 for cargo in cargo_list:
-                    cargo_date = _coerce_date(cargo.get("date"))
+                    cargo_date = coerce_date(cargo.get("date"))
                     if cargo_date:
                         load_candidates.append(cargo_date)
             load_date = min(load_candidates) if load_candidates else None
         if not unload_date:
             unload_candidates: List[datetime] = []
             for cargo in cargo_list:
-                cargo_unload = _coerce_date(cargo.get("unload_date"))
+                cargo_unload = coerce_date(cargo.get("unload_date"))
                 if cargo_unload:
                     unload_candidates.append(cargo_unload)
             unload_date = min(unload_candidates) if unload_candidates else None
@@ -6580,61 +6888,106 @@ def build_pretension_groups(
     return groups
 
 
+@dataclass
+class _GroupSlot:
+    """Группа документов с датой выгрузки, разобранной один раз."""
+    unload_date: datetime
+    group: Dict[str, Any]
+
+
+@dataclass
+class _ShipmentSlot:
+    """Почтовое отправление с разобранными датами отправки и получения."""
+    send_date: datetime
+    received_date: Optional[datetime]
+    shipment: Dict[str, Any]
+
+
+@dataclass
+class ShipmentCoverage:
+    """Какие заявки закрыло отправление (для объяснения распределения)."""
+    track_number: str
+    send_date: datetime
+    groups: List[str]
+
+
+def _group_label(group: Dict[str, Any]) -> Optional[str]:
+    return group.get("application") or group.get("invoice") or group.get("upd")
+
+
+def _group_unload_date(group: Dict[str, Any]) -> Optional[datetime]:
+    unload = coerce_date(group.get("unload_date"))
+    if unload:
+        return unload
+    for cargo in group.get("cargo_docs_details") or []:
+        unload = coerce_date(cargo.get("unload_date"))
+        if unload:
+            return unload
+    return None
+
+
+def _shipment_send_date(shipment: Dict[str, Any]) -> Optional[datetime]:
+    return coerce_date(
+        shipment.get("send_date")
+        or shipment.get("sent_date")
+        or shipment.get("send_date_str")
+    )
+
+
+def _shipment_received_date(shipment: Dict[str, Any]) -> Optional[datetime]:
+    return coerce_date(
+        shipment.get("received_date")
+        or shipment.get("received_date_str")
+        or shipment.get("receive_date")
+    )
+
+
 def assign_shipments_to_groups(
     groups: List[Dict[str, Any]],
     shipments: List[Dict[str, Any]],
     force_use_all: bool = False
-) -> None:
+) -> List[ShipmentCoverage]:
+    """
+    Распределяет почтовые отправления документов по группам (заявкам).
+
+    Даты разбираются один раз; затем отсортированные даты выгрузки
+    проходятся одним проходом по отсортированным датам отправки.
+    Каждое отправление закрывает подряд идущие заявки, выгруженные до него,
+    оставляя хотя бы по одной заявке следующим отправлениям.
+    Возвращает, какие заявки закрыло каждое отправление.
+    """
     if not groups or not shipments:
-        return
+        return []
     shipments_to_use = shipments
     if any(item.get("api_records", 0) > 0 for item in shipments):
         shipments_to_use = [
             item for item in shipments if item.get("api_records", 0) > 0
         ]
 
-    def group_unload_date(item: Dict[str, Any]) -> Optional[datetime]:
-        unload = _coerce_date(item.get("unload_date"))
-        if unload:
-            return unload
-        for cargo in item.get("cargo_docs_details") or []:
-            unload = _coerce_date(cargo.get("unload_date"))
-            if unload:
-                return unload
-        return None
-
-    missing_unload = [
-        group.get("application") or group.get("invoice") or group.get("upd")
-        for group in groups
-        if not group_unload_date(group)
-    ]
+    group_slots: List[_GroupSlot] = []
+    missing_unload = []
+    for group in groups:
+        unload_date = _group_unload_date(group)
+        if unload_date:
+            group_slots.append(_GroupSlot(unload_date, group))
+        else:
+            missing_unload.append(_group_label(group))
     if missing_unload:
         raise ValueError(
             "Не указана дата выгрузки в заявке или сопроводительных документах: "
             + ", ".join([item for item in missing_unload if item])
         )
 
-    def group_date_value(item: Dict[str, Any]) -> datetime:
-        return group_unload_date(item) or datetime.min
-
-    def shipment_send_date(item: Dict[str, Any]) -> Optional[datetime]:
-        return _coerce_date(
-            item.get("send_date")
-            or item.get("sent_date")
-            or item.get("send_date_str")
-        )
-
-    def shipment_received_date(item: Dict[str, Any]) -> Optional[datetime]:
-        return _coerce_date(
-            item.get("received_date")
-            or item.get("received_date_str")
-            or item.get("receive_date")
-        )
-
-    missing_send = [
-        item for item in shipments_to_use
-        if not shipment_send_date(item)
-    ]
+    shipment_slots: List[_ShipmentSlot] = []
+    missing_send = []
+    for item in shipments_to_use:
+        send_date = _shipment_send_date(item)
+        if send_date:
+            shipment_slots.append(
+                _ShipmentSlot(send_date, _shipment_received_date(item), item)
+            )
+        else:
+            missing_send.append(item)
     if missing_send:
         missing_tracks = [
             str(item.get("track_number") or "") for item in missing_send
@@ -6644,51 +6997,42 @@ def assign_shipments_to_groups(
             + ", ".join([t for t in missing_tracks if t]) or "неизвестные"
         )
 
-    sorted_groups = sorted(groups, key=group_date_value)
-    sorted_shipments = sorted(
-        shipments_to_use,
-        key=lambda item: shipment_send_date(item) or datetime.max
-    )
+    group_slots.sort(key=lambda slot: slot.unload_date)
+    shipment_slots.sort(key=lambda slot: slot.send_date)
 
-    def apply_shipment(group: Dict[str, Any], shipment: Dict[str, Any]) -> None:
-        track_number = shipment.get("track_number")
-        received_date = shipment_received_date(shipment)
+    def apply_shipment(group: Dict[str, Any], slot: _ShipmentSlot) -> None:
+        track_number = slot.shipment.get("track_number")
         if track_number and not group.get("docs_track_number"):
             group["docs_track_number"] = track_number
-        if received_date and not group.get("docs_received_date"):
-            group["docs_received_date"] = received_date.strftime("%d.%m.%Y")
+        if slot.received_date and not group.get("docs_received_date"):
+            group["docs_received_date"] = slot.received_date.strftime("%d.%m.%Y")
         if not group.get("shipping_source"):
             group["shipping_source"] = normalize_shipping_source(
-                shipment.get("source")
+                slot.shipment.get("source")
             )
 
     # Количество отправлений не может быть больше количества заявок
-    if len(sorted_shipments) > len(sorted_groups):
+    if len(shipment_slots) > len(group_slots):
         raise ValueError("Количество отправлений больше количества заявок.")
 
     group_index = 0
-    total_groups = len(sorted_groups)
-    total_shipments = len(sorted_shipments)
-
-    group_dates = [group_date_value(group) for group in sorted_groups]
-
-    for ship_index, shipment in enumerate(sorted_shipments):
-        ship_date = shipment_send_date(shipment)
-        if not ship_date:
-            continue
+    total_groups = len(group_slots)
+    total_shipments = len(shipment_slots)
+    group_dates = [slot.unload_date for slot in group_slots]
 
+    def last_unloaded_before(send_date: datetime) -> int:
         # Максимальный индекс группы, чья дата выгрузки <= дате отправления
-        g_max = group_index - 1
-        for idx in range(group_index, total_groups):
-            if group_dates[idx] <= ship_date:
-                g_max = idx
-            else:
-                break
-        if g_max < group_index:
+        last = bisect_right(group_dates, send_date, group_index) - 1
+        if last < group_index:
             raise ValueError(
                 "Дата отправления меньше даты выгрузки для заявки: "
-                + (sorted_groups[group_index].get("application") or "")
+                + (group_slots[group_index].group.get("application") or "")
             )
+        return last
+
+    coverage: List[ShipmentCoverage] = []
+    for ship_index, slot in enumerate(shipment_slots):
+        g_max = last_unloaded_before(slot.send_date)
 
         # Ограничение по количеству, чтобы оставались группы на будущие отправления
         count_limit = total_groups - total_shipments + ship_index
@@ -6696,27 +7040,20 @@ def assign_shipments_to_groups(
 
         # Ограничение по следующему отправлению: следующая заявка должна успеть
         if ship_index < total_shipments - 1:
-            next_ship_date = shipment_send_date(sorted_shipments[ship_index + 1])
-            if not next_ship_date:
-                raise ValueError("Не найдена дата отправления для следующего трека.")
-            g_max_next = group_index - 1
-            for idx in range(group_index, total_groups):
-                if group_dates[idx] <= next_ship_date:
-                    g_max_next = idx
-                else:
-                    break
-            if g_max_next < group_index:
-                raise ValueError(
-                    "Дата отправления меньше даты выгрузки для заявки: "
-                    + (sorted_groups[group_index].get("application") or "")
-                )
+            g_max_next = last_unloaded_before(shipment_slots[ship_index + 1].send_date)
             assign_end = min(assign_end, g_max_next - 1)
 
         if assign_end < group_index:
             raise ValueError("Невозможно распределить отправления без остатка.")
 
-        for idx in range(group_index, assign_end + 1):
-            apply_shipment(sorted_groups[idx], shipment)
+        covered = group_slots[group_index:assign_end + 1]
+        for group_slot in covered:
+            apply_shipment(group_slot.group, slot)
+        coverage.append(ShipmentCoverage(
+            str(slot.shipment.get("track_number") or ""),
+            slot.send_date,
+            [_group_label(group_slot.group) or "" for group_slot in covered],
+        ))
         group_index = assign_end + 1
 
     if group_index < total_groups:
@@ -6724,6 +7061,15 @@ def assign_shipments_to_groups(
             "Есть заявки с датой выгрузки позже даты отправления документов."
         )
 
+    for item in coverage:
+        logger.info(
+            "Отправление %s от %s закрывает: %s",
+            item.track_number or "без трека",
+            item.send_date.strftime("%d.%m.%Y"),
+            ", ".join(label for label in item.groups if label) or "—"
+        )
+    return coverage
+
 
 def build_documents_list_structured_for_groups(
     groups: List[Dict[str, Any]]
@@ -7290,7 +7636,7 @@ def calculate_pretension_interest(
         events[start_date] = events.get(start_date, 0.0) + debt_amount
         for payment in payments:
             amount = parse_amount(payment.get("amount"))
-            date_value = _coerce_date(
+            date_value = coerce_date(
                 payment.get("date") or payment.get("payment_date")
             )
             if amount <= 0 or not date_value:
@@ -7358,6 +7704,15 @@ def calculate_pretension_interest_schedule(
     default_payment_days: int,
     payments: Optional[List[Dict[str, Any]]] = None
 ) -> Dict[str, Any]:
+    obligations = build_pretension_obligations(groups, default_payment_days)
+    return calculate_interest_for_obligations(obligations, payments=payments)
+
+
+def build_pretension_obligations(
+    groups: List[Dict[str, Any]],
+    default_payment_days: int
+) -> List[Dict[str, Any]]:
+    """Сроки оплаты (due_date) и суммы по частям оплаты каждой группы."""
     def calculate_due_date(base_date: Optional[datetime], days: int) -> Optional[datetime]:
         if not base_date:
             return None
@@ -7387,7 +7742,7 @@ def calculate_pretension_interest_schedule(
     # Собираем все docs_received_date для fallback
     all_received_dates = []
     for g in groups:
-        rd = _coerce_date(g.get("docs_received_date"))
+        rd = coerce_date(g.get("docs_received_date"))
         if rd:
             all_received_dates.append(rd)
     fallback_received_date = max(all_received_dates) if all_received_dates else None
@@ -7406,9 +7761,9 @@ def calculate_pretension_interest_schedule(
             continue
 
         received_str = group.get("docs_received_date")
-        received_date = _coerce_date(received_str)
-        load_date = _coerce_date(group.get("load_date"))
-        unload_date = _coerce_date(group.get("unload_date"))
+        received_date = coerce_date(received_str)
+        load_date = coerce_date(group.get("load_date"))
+        unload_date = coerce_date(group.get("unload_date"))
 
         group_payment_days = group.get("payment_days")
         if group_payment_days is None:
@@ -7528,7 +7883,14 @@ def calculate_pretension_interest_schedule(
                 "due_date": due_date,
                 "amount": part_amount,
             })
+    return obligations
+
 
+def calculate_interest_for_obligations(
+    obligations: List[Dict[str, Any]],
+    payments: Optional[List[Dict[str, Any]]] = None
+) -> Dict[str, Any]:
+    """Проценты по ст. 395 ГК РФ по списку обязательств с учётом оплат."""
     events: Dict[datetime, float] = {}
 
     payments_by_group: Dict[Optional[str], List[Dict[str, Any]]] = {}
@@ -7536,7 +7898,7 @@ def calculate_pretension_interest_schedule(
         for payment in payments:
             label = payment.get("group_label")
             payments_by_group.setdefault(label, []).append({
-                "date": _coerce_date(payment.get("date") or payment.get("payment_date")),
+                "date": coerce_date(payment.get("date") or payment.get("payment_date")),
                 "amount": parse_amount(payment.get("amount")),
             })
 
@@ -8316,7 +8678,7 @@ def create_f107_document(
     sender_name: str,
     sender_company: str,
     output_path: Optional[str] = None
-) -> str:
+) -> Union[str, bytes]:
     template_dir = os.path.dirname(__file__)
     candidate_templates = [
         os.path.join(template_dir, 'templates', 'F107.docx'),
@@ -8354,11 +8716,27 @@ def create_f107_document(
 
     replace_placeholders_simple(doc, replacements)
 
-    if output_path is None:
-        output_name = f"Опись_вложения_F107_{uuid.uuid4().hex}.docx"
-        output_path = os.path.join(os.path.dirname(__file__), output_name)
-    doc.save(output_path)
-    return output_path
+    return render_document(doc, "Опись_вложения_F107", output_path)
+
+
+# Документы finish_claim: имя файла, подпись и название для логов
+CLAIM_DOCUMENT_OUTPUTS = {
+    "claim": (
+        "Исковое_заявление.docx",
+        "Исковое заявление по ст. 395 ГК РФ",
+        "иска",
+    ),
+    "f107": (
+        "Опись_вложения_F107.docx",
+        "Опись вложения (форма Ф107)",
+        "Ф107",
+    ),
+    "poa": (
+        "Доверенность.docx",
+        "Доверенность на представителя",
+        "доверенности",
+    ),
+}
 
 
 def format_poa_date(value: Optional[datetime] = None) -> str:
@@ -8374,7 +8752,7 @@ def format_poa_date(value: Optional[datetime] = None) -> str:
 def create_power_of_attorney_document(
     replacements: Dict[str, str],
     output_path: Optional[str] = None
-) -> str:
+) -> Union[str, bytes]:
     template_dir = os.path.dirname(__file__)
     candidate_templates = [
         os.path.join(template_dir, 'templates', 'ДОВЕРЕННОСТЬ.docx'),
@@ -8390,11 +8768,7 @@ def create_power_of_attorney_document(
     doc = Document(template_path)
     replace_placeholders_simple(doc, replacements)
 
-    if output_path is None:
-        output_name = f"Доверенность_{uuid.uuid4().hex}.docx"
-        output_path = os.path.join(os.path.dirname(__file__), output_name)
-    doc.save(output_path)
-    return output_path
+    return render_document(doc, "Доверенность", output_path)
 
 
 def number_attachments_section(doc):
@@ -8544,7 +8918,7 @@ def create_isk_document(
     documents_list_structured: Optional[List[Tuple[int, str]]] = None,
     output_path: Optional[str] = None,
     proofread_protected_values: Optional[List[str]] = None
-) -> str:
+) -> Union[str, bytes]:
     template_dir = os.path.dirname(__file__)
     candidate_templates = [
         os.path.join(template_dir, 'templates', 'template_isk.docx'),
@@ -8611,11 +8985,7 @@ def create_isk_document(
         )
     proofread_docx_document(doc, protected_values=proofread_protected_values)
     enforce_times_new_roman(doc)
-    if output_path is None:
-        output_name = f"Исковое_заявление_{uuid.uuid4().hex}.docx"
-        output_path = os.path.join(os.path.dirname(__file__), output_name)
-    doc.save(output_path)
-    return output_path
+    return render_document(doc, "Исковое_заявление", output_path)
 
 
 def remove_legal_fees_section(doc) -> None:
@@ -8832,33 +9202,57 @@ def adjust_pretension_interest_section(doc, interest_data: Dict[str, Any]) -> No
             paragraph.text = f"{number - 1}. {match.group(2)}"
 
 
+DOCUMENT_FONT = 'Times New Roman'
+_DOCUMENT_FONT_ATTRS = (qn('w:ascii'), qn('w:hAnsi'), qn('w:eastAsia'))
+# Runs абзацев тела документа и ячеек его таблиц (как paragraph.runs / table.rows)
+_BODY_RUNS_XPATH = './w:p/w:r | ./w:tbl/w:tr/w:tc/w:p/w:r'
+_RPR_TAG = qn('w:rPr')
+_RFONTS_TAG = qn('w:rFonts')
+_RSTYLE_TAG = qn('w:rStyle')
+
+
 def enforce_times_new_roman(doc) -> None:
-    def apply_runs(paragraphs):
-        for paragraph in paragraphs:
-            for run in paragraph.runs:
-                run.font.name = 'Times New Roman'
-                run._element.rPr.rFonts.set(qn('w:eastAsia'), 'Times New Roman')
-    apply_runs(doc.paragraphs)
-    for table in doc.tables:
-        for row in table.rows:
-            for cell in row.cells:
-                apply_runs(cell.paragraphs)
+    """
+    Times New Roman во всех runs тела документа и таблиц.
+
+    Атрибуты rFonts выставляются одним проходом XPath по XML, без
+    объектов Run/Font python-docx. Стили и шрифт по умолчанию не меняются:
+    от них зависят колонтитулы и высота пустых строк.
+    """
+    fonts_template = OxmlElement('w:rFonts')
+    for attr in _DOCUMENT_FONT_ATTRS:
+        fonts_template.set(attr, DOCUMENT_FONT)
+    for run in doc.element.body.xpath(_BODY_RUNS_XPATH):
+        rPr = run.find(_RPR_TAG)
+        if rPr is None:
+            # rPr — первый дочерний элемент w:r
+            rPr = OxmlElement('w:rPr')
+            run.insert(0, rPr)
+        rFonts = rPr.find(_RFONTS_TAG)
+        if rFonts is None:
+            # rFonts идёт сразу после необязательного rStyle
+            position = 1 if len(rPr) and rPr[0].tag == _RSTYLE_TAG else 0
+            rPr.insert(position, copy.deepcopy(fonts_template))
+            continue
+        for attr in _DOCUMENT_FONT_ATTRS:
+            rFonts.set(attr, DOCUMENT_FONT)
+
+
+def _run_format_signature(run) -> Tuple[Any, ...]:
+    rPr = run.rPr
+    if rPr is None:
+        return (None, None, None, None, None)
+    bold = rPr.b.val if rPr.b is not None else None
+    italic = rPr.i.val if rPr.i is not None else None
+    return (bold, italic, rPr.u_val, rPr.rFonts_ascii, rPr.sz_val)
 
 
 def _paragraph_has_uniform_runs(paragraph) -> bool:
-    runs = paragraph.runs or []
+    runs = paragraph._p.r_lst
     if not runs:
         return True
-    def signature(run):
-        return (
-            run.bold,
-            run.italic,
-            run.underline,
-            run.font.name,
-            run.font.size,
-        )
-    first = signature(runs[0])
-    return all(signature(run) == first for run in runs[1:])
+    first = _run_format_signature(runs[0])
+    return all(_run_format_signature(run) == first for run in runs[1:])
 
 
 def proofread_docx_document(doc, protected_values: Optional[List[str]] = None) -> None:
@@ -8916,7 +9310,7 @@ def create_pretension_document(
     attachments: Optional[List[str]] = None,
     output_path: Optional[str] = None,
     proofread_protected_values: Optional[List[str]] = None
-) -> str:
+) -> Union[str, bytes]:
     template_dir = os.path.dirname(__file__)
     candidate_templates = [
         os.path.join(template_dir, "templates", "template_pretension.docx"),
@@ -8975,15 +9369,10 @@ def create_pretension_document(
     )
     proofread_docx_document(doc, protected_values=proofread_protected_values)
     enforce_times_new_roman(doc)
+    return render_document(doc, "Претензия", output_path)
 
-    if output_path is None:
-        output_name = f"Претензия_{uuid.uuid4().hex}.docx"
-        output_path = os.path.join(os.path.dirname(__file__), output_name)
-    doc.save(output_path)
-    return output_path
 
-
-async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+async def start(update, context) -> int:
     """
     Обработчик команды /start.
 
@@ -8991,6 +9380,7 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         update: Объект обновления Telegram
         context: Контекст бота
     """
+    from telegram import InlineKeyboardButton, InlineKeyboardMarkup
     if update.effective_user:
         logging.info(
             f"Received /start command from user {update.effective_user.id}"
@@ -9022,10 +9412,23 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     return ASK_FLOW
 
 
+def discard_upload_jobs(context) -> None:
+    """Снимает фоновую обработку файлов, загруженных в текущей сессии."""
+    entries = (
+        list(context.user_data.get("pretension_files") or [])
+        + list(context.user_data.get("external_claim_files") or [])
+    )
+    UPLOAD_PIPELINE.discard_many(
+        entry["path"] for entry in entries if entry.get("path")
+    )
+
+
 async def flow_chosen(update, context):
     query = update.callback_query
     await query.answer()
     choice = query.data
+    # Новый сценарий: результаты по файлам прошлой сессии больше не нужны
+    discard_upload_jobs(context)
 
     if choice == "flow_claim":
         context.user_data.clear()
@@ -9038,6 +9441,7 @@ async def flow_chosen(update, context):
 
     if choice == "flow_pretension":
         context.user_data.clear()
+        drop_pretension_stage_cache(update.effective_user.id)
         context.user_data["flow"] = "pretension"
         await query.edit_message_text(
             "Отправь PDF-файл с документами по перевозке. "
@@ -9060,10 +9464,11 @@ async def flow_chosen(update, context):
     await query.edit_message_text(
         "Не удалось определить выбор. Попробуй снова /start."
     )
-    return ConversationHandler.END
+    return CONVERSATION_END
 
 
 async def ask_claim_status(update, context):
+    from telegram import InlineKeyboardButton, InlineKeyboardMarkup
     keyboard = [
         [
             InlineKeyboardButton("✅ Да", callback_data='claim_received'),
@@ -9109,7 +9514,7 @@ async def ask_track(update, context):
             )
             return ASK_TRACK
         try:
-            records = fetch_russian_post_operations(track_number)
+            tracking = fetch_russian_post_tracking(track_number)
         except RussianPostTrackingError as exc:
             await update.message.reply_text(
                 f"Не удалось получить данные по трек-номеру. {exc} "
@@ -9117,7 +9522,8 @@ async def ask_track(update, context):
             )
             return ASK_TRACK
 
-        send_date, receive_date = extract_tracking_dates(records)
+        send_date = tracking.get("send_date")
+        receive_date = tracking.get("receive_date")
         if not send_date:
             await update.message.reply_text(
                 "Не удалось определить дату отправления по треку. "
@@ -9143,7 +9549,7 @@ async def ask_track(update, context):
             )
 
         await finish_claim(update, context)
-        return ConversationHandler.END
+        return CONVERSATION_END
 
     context.user_data['claim_number'] = raw_track
     if context.user_data.get('claim_status') == 'claim_received':
@@ -9151,23 +9557,23 @@ async def ask_track(update, context):
         return ASK_RECEIVE_DATE
     else:
         await finish_claim(update, context)
-        return ConversationHandler.END
+        return CONVERSATION_END
 
 
 async def ask_receive_date(update, context):
     context.user_data['postal_receive_date'] = update.message.text.strip()
     await finish_claim(update, context)
-    return ConversationHandler.END
+    return CONVERSATION_END
 
 
 async def ask_birth_date(update, context):
     if not update.message:
-        return ConversationHandler.END
+        return CONVERSATION_END
     value = update.message.text.strip()
     if value.lower() == 'пропустить':
         context.user_data['skip_birth_info'] = True
         await finish_claim(update, context)
-        return ConversationHandler.END
+        return CONVERSATION_END
     context.user_data['plaintiff_birth_date'] = value
     await update.message.reply_text(
         "Укажите место рождения истца или «пропустить»:"
@@ -9177,17 +9583,18 @@ async def ask_birth_date(update, context):
 
 async def ask_birth_place(update, context):
     if not update.message:
-        return ConversationHandler.END
+        return CONVERSATION_END
     value = update.message.text.strip()
     if value.lower() == 'пропустить':
         context.user_data['plaintiff_birth_place'] = ''
     else:
         context.user_data['plaintiff_birth_place'] = value
     await finish_claim(update, context)
-    return ConversationHandler.END
+    return CONVERSATION_END
 
 
 async def finish_claim(update, context):
+    from telegram import InputFile
     file_path = context.user_data.get('file_path')
     logging.info(
         "Trying to process file_path from user_data: %s",
@@ -9441,21 +9848,22 @@ async def finish_claim(update, context):
         '{plaintiff_ogrn_type}': plaintiff_ogrn_type,
         '{plaintiff_birth_info}': plaintiff_birth_info,
     }
-    result_docx = create_isk_document(
-        claim_data,
-        interest_data,
-        duty_data,
-        replacements,
-        documents_list_structured=documents_list_structured,
-        proofread_protected_values=[
-            plaintiff_name,
-            defendant_name,
-            plaintiff_name_short,
-            defendant_name_short,
-        ],
-    )
-    f107_path = None
-    poa_path = None
+    jobs = [
+        DocumentJob(
+            "claim",
+            create_isk_document,
+            (claim_data, interest_data, duty_data, replacements),
+            {
+                "documents_list_structured": documents_list_structured,
+                "proofread_protected_values": [
+                    plaintiff_name,
+                    defendant_name,
+                    plaintiff_name_short,
+                    defendant_name_short,
+                ],
+            },
+        )
+    ]
     try:
         defendant_display_name = resolve_defendant_display_name(
             defendant_name_short,
@@ -9482,76 +9890,71 @@ async def finish_claim(update, context):
             if plaintiff_name != 'Не указано'
             else plaintiff_name_short
         )
-        f107_path = create_f107_document(
-            f107_items,
-            sender_name,
-            sender_company
-        )
-    except FileNotFoundError as exc:
-        logging.warning("Не удалось сформировать Ф107: %s", exc)
+        jobs.append(DocumentJob(
+            "f107",
+            create_f107_document,
+            (f107_items, sender_name, sender_company)
+        ))
     except Exception as exc:
         logging.error("Ошибка формирования Ф107: %s", exc, exc_info=True)
-    try:
-        poa_replacements = {
-            '{poa_date}': format_poa_date(),
-            '{plaintiff_name}': normalize_str(plaintiff_name),
-            '{plaintiff_inn}': normalize_str(claim_data.get('plaintiff_inn')),
-            '{plaintiff_ogrn}': normalize_str(claim_data.get('plaintiff_ogrn')),
-            '{plaintiff_address}': normalize_str(
-                claim_data.get('plaintiff_address')
-            ).replace('\n', ' ').strip(),
-        }
-        poa_path = create_power_of_attorney_document(poa_replacements)
-    except FileNotFoundError as exc:
-        logging.warning("Не удалось сформировать доверенность: %s", exc)
-    except Exception as exc:
-        logging.error(
-            "Ошибка формирования доверенности: %s",
-            exc,
-            exc_info=True
-        )
-    with open(result_docx, 'rb') as f:
+    # Реквизиты истца уже нормализованы для иска — доверенность берёт их оттуда
+    poa_replacements = {
+        '{poa_date}': format_poa_date(),
+        '{plaintiff_name}': plaintiff_name,
+        '{plaintiff_inn}': replacements['{plaintiff_inn}'],
+        '{plaintiff_ogrn}': replacements['{plaintiff_ogrn}'],
+        '{plaintiff_address}': normalize_str(
+            claim_data.get('plaintiff_address')
+        ).replace('\n', ' ').strip(),
+    }
+    jobs.append(DocumentJob(
+        "poa",
+        create_power_of_attorney_document,
+        (poa_replacements,)
+    ))
+
+    claim_error: Optional[BaseException] = None
+    async for built in DOCUMENT_BUILDER.stream(*jobs):
+        filename, caption, label = CLAIM_DOCUMENT_OUTPUTS[built.name]
+        if built.error is not None:
+            if built.name == "claim":
+                claim_error = built.error
+            elif isinstance(built.error, FileNotFoundError):
+                logging.warning("Не удалось сформировать %s: %s", label, built.error)
+            else:
+                logging.error(
+                    "Ошибка формирования %s: %s",
+                    label,
+                    built.error,
+                    exc_info=built.error
+                )
+            continue
         await update.message.reply_document(
-            InputFile(f, filename="Исковое_заявление.docx"),
-            caption="Исковое заявление по ст. 395 ГК РФ"
-        )
-    if f107_path:
-        with open(f107_path, 'rb') as f:
-            await update.message.reply_document(
-                InputFile(f, filename="Опись_вложения_F107.docx"),
-                caption="Опись вложения (форма Ф107)"
-            )
-    if poa_path:
-        with open(poa_path, 'rb') as f:
-            await update.message.reply_document(
-                InputFile(f, filename="Доверенность.docx"),
-                caption="Доверенность на представителя"
-            )
+            InputFile(built.content, filename=filename),
+            caption=caption
+        )
     try:
         if os.path.exists(file_path):
             os.remove(file_path)
-        if os.path.exists(result_docx):
-            os.remove(result_docx)
-        if f107_path and os.path.exists(f107_path):
-            os.remove(f107_path)
-        if poa_path and os.path.exists(poa_path):
-            os.remove(poa_path)
     except Exception as e:
         logging.warning(
             f"Не удалось удалить файл {file_path}: {e}"
         )
+    if claim_error is not None:
+        raise claim_error
 
 
 async def ask_jurisdiction(update, context):
     """
     Спрашивает пользователя о подсудности спора.
     """
+    from telegram import InlineKeyboardButton, InlineKeyboardMarkup
     from jurisdiction import JurisdictionDetector, format_jurisdiction_for_user
 
     file_path = context.user_data.get('file_path')
     if not file_path or not os.path.exists(file_path):
         await update.message.reply_text('Ошибка: файл не найден.')
-        return ConversationHandler.END
+        return CONVERSATION_END
 
     # Извлекаем текст из документа
     doc = Document(file_path)
@@ -9718,6 +10121,7 @@ async def ask_claim_status_after_jurisdiction(update_or_query, context):
     """
     Переход к вопросам о претензии после определения подсудности.
     """
+    from telegram import InlineKeyboardButton, InlineKeyboardMarkup
     config = get_russian_post_config()
     if config.get("enabled"):
         context.user_data['use_tracking_api'] = True
@@ -9906,6 +10310,116 @@ async def ask_next_pretension_field(update, context):
     return ASK_PRETENSION_FIELD
 
 
+def collect_reconciliation_tables(
+    file_path: str,
+    pages: List[str]
+) -> List[List[List[Any]]]:
+    """Таблицы pdfplumber со страниц акта сверки (разбор PDF берётся из кэша)."""
+    if not any(is_reconciliation_page(page) for page in pages):
+        return []
+    try:
+        from pdf_extractor import load_document
+        document = load_document(file_path)
+    except Exception as exc:
+        logger.warning("Не удалось получить таблицы акта сверки: %s", exc)
+        return []
+    tables: List[List[List[Any]]] = []
+    for page in document.pages:
+        if is_reconciliation_page(page.get("raw_text", page.get("text", ""))):
+            tables.extend(page.get("tables") or [])
+    return tables
+
+
+@tracing.traced("prepare_pretension_file")
+def prepare_pretension_file(file_path: str) -> Dict[str, Any]:
+    """
+    Извлекает текст одного PDF претензионного пакета: текстовый слой,
+    Vision OCR плохо распознанных и ключевых страниц, Vision-анализ
+    нетипичных документов. Не зависит от других файлов, поэтому
+    запускается в фоне сразу после загрузки.
+    Результат сохраняется по хэшу файла и переживает перезапуск бота.
+    """
+    try:
+        digest = file_digest(file_path)
+    except OSError:
+        digest = ""
+    cached = EXTRACTION_STORE.get(digest)
+    if cached is not None:
+        logger.info("Результаты извлечения взяты из сохранённых: %s", file_path)
+        tracing.count("extraction_cache_hits")
+        return cached
+
+    tracing.stage("text_layer")
+    pages, low_text_pages = extract_pdf_pages(file_path)
+    tracing.count("pages", len(pages))
+    tracing.count("low_text_pages", len(low_text_pages))
+    tracing.count("bytes", os.path.getsize(file_path))
+    tracing.stage("ocr")
+    processed_low_pages: List[int] = []
+    if low_text_pages:
+        processed_low_pages = apply_vision_ocr_to_pages(
+            file_path,
+            pages,
+            low_text_pages
+        ) or []
+
+    tracing.count("ocr_pages", len(processed_low_pages))
+
+    # Дополнительный OCR по ключевым документам (заявки, накладные, счета, УПД, почтовые квитанции)
+    tracing.stage("targeted_ocr")
+    targeted_ocr_pages: List[int] = []
+    config = get_vision_config()
+    max_pages = int(config.get("max_pages") or 0)
+    targeted_pages = collect_targeted_ocr_pages(pages, processed_low_pages)
+    if targeted_pages:
+        if max_pages > 0:
+            remaining = max_pages - len(set(processed_low_pages))
+            if remaining <= 0:
+                targeted_pages = []
+            else:
+                targeted_pages = targeted_pages[:remaining]
+        if targeted_pages:
+            targeted_ocr_pages = apply_vision_ocr_to_pages(
+                file_path,
+                pages,
+                targeted_pages
+            ) or []
+
+    tracing.count("ocr_pages", len(targeted_ocr_pages))
+
+    # Vision-экстракция для нетипичных/уникальных документов
+    tracing.stage("vision_documents")
+    vision_doc_pages: List[int] = []
+    scan_limit_raw = os.getenv("VISION_DOC_SCAN_PAGES", "2")
+    try:
+        scan_limit = int(scan_limit_raw)
+    except ValueError:
+        scan_limit = 2
+    if scan_limit > 0:
+        vision_pages = collect_vision_doc_pages(
+            pages,
+            processed_low_pages,
+            limit=scan_limit
+        )
+        if vision_pages:
+            vision_doc_pages = apply_vision_document_extraction(
+                file_path,
+                pages,
+                vision_pages
+            ) or []
+
+    result = {
+        "pages": pages,
+        "low_text_pages": low_text_pages,
+        "ocr_pages": processed_low_pages,
+        "targeted_ocr_pages": targeted_ocr_pages,
+        "vision_doc_pages": vision_doc_pages,
+        "reconciliation_tables": collect_reconciliation_tables(file_path, pages),
+    }
+    EXTRACTION_STORE.set(digest, result)
+    return result
+
+
 async def handle_pretension_document(update, context):
     if update.message and update.message.document:
         doc = update.message.document
@@ -9922,6 +10436,7 @@ async def handle_pretension_document(update, context):
         files = context.user_data.get("pretension_files", [])
         files.append({"path": file_path, "name": doc.file_name})
         context.user_data["pretension_files"] = files
+        UPLOAD_PIPELINE.submit(file_path, prepare_pretension_file, file_path)
 
         await update.message.reply_text(
             "Файл получен. Если есть еще PDF — отправьте. "
@@ -9946,78 +10461,49 @@ async def handle_pretension_document(update, context):
         )
         return ASK_DOCUMENT
 
+    return await process_pretension_upload(update, context, files)
+
+
+@tracing.traced("pretension_document")
+async def process_pretension_upload(update, context, files):
+    """Разбор загруженного пакета после «готово» с трассировкой этапов."""
+    from telegram import InputFile
+    tracing.stage("extraction", files=len(files))
     combined_texts = []
     all_pages: List[str] = []
+    reconciliation_tables: List[List[List[Any]]] = []
     low_pages_info = []
     for entry in files:
         try:
-            pages, low_text_pages = extract_pdf_pages(entry["path"])
+            prepared = await UPLOAD_PIPELINE.result(
+                entry["path"],
+                prepare_pretension_file,
+                entry["path"]
+            )
         except Exception as exc:
             await update.message.reply_text(
                 f"Не удалось прочитать PDF {entry['name']}: {exc}"
             )
             return ASK_DOCUMENT
-        processed_low_pages: List[int] = []
-        if low_text_pages:
-            ocr_pages = apply_vision_ocr_to_pages(
-                entry["path"],
-                pages,
-                low_text_pages
+        pages = prepared["pages"]
+        low_text_pages = prepared["low_text_pages"]
+        if prepared["ocr_pages"]:
+            await update.message.reply_text(
+                "✅ Ollama Vision OCR применён к страницам: "
+                + ", ".join(str(page) for page in prepared["ocr_pages"])
             )
-            if ocr_pages:
-                processed_low_pages = ocr_pages
-                await update.message.reply_text(
-                    "✅ Ollama Vision OCR применён к страницам: "
-                    + ", ".join(str(page) for page in ocr_pages)
-                )
-
-        # Дополнительный OCR по ключевым документам (заявки, накладные, счета, УПД, почтовые квитанции)
-        config = get_vision_config()
-        max_pages = int(config.get("max_pages") or 0)
-        targeted_pages = collect_targeted_ocr_pages(pages, processed_low_pages)
-        if targeted_pages:
-            if max_pages > 0:
-                remaining = max_pages - len(set(processed_low_pages))
-                if remaining <= 0:
-                    targeted_pages = []
-                else:
-                    targeted_pages = targeted_pages[:remaining]
-            if targeted_pages:
-                ocr_pages = apply_vision_ocr_to_pages(
-                    entry["path"],
-                    pages,
-                    targeted_pages
-                )
-                if ocr_pages:
-                    await update.message.reply_text(
-                        "✅ OCR для ключевых документов применён к страницам: "
-                        + ", ".join(str(page) for page in ocr_pages)
-                    )
-
-        # Vision-экстракция для нетипичных/уникальных документов
-        scan_limit_raw = os.getenv("VISION_DOC_SCAN_PAGES", "2")
-        try:
-            scan_limit = int(scan_limit_raw)
-        except ValueError:
-            scan_limit = 2
-        if scan_limit > 0:
-            vision_pages = collect_vision_doc_pages(
-                pages,
-                processed_low_pages,
-                limit=scan_limit
+        if prepared["targeted_ocr_pages"]:
+            await update.message.reply_text(
+                "✅ OCR для ключевых документов применён к страницам: "
+                + ", ".join(str(page) for page in prepared["targeted_ocr_pages"])
+            )
+        if prepared["vision_doc_pages"]:
+            await update.message.reply_text(
+                "✅ Vision-анализ документов применён к страницам: "
+                + ", ".join(str(page) for page in prepared["vision_doc_pages"])
             )
-            if vision_pages:
-                processed = apply_vision_document_extraction(
-                    entry["path"],
-                    pages,
-                    vision_pages
-                )
-                if processed:
-                    await update.message.reply_text(
-                        "✅ Vision-анализ документов применён к страницам: "
-                        + ", ".join(str(page) for page in processed)
-                    )
         all_pages.extend(pages)
+        reconciliation_tables.extend(prepared.get("reconciliation_tables") or [])
         page_blocks = []
         for idx, page in enumerate(pages, start=1):
             page_blocks.append(f"[Страница {idx}]\n{page}")
@@ -10049,19 +10535,29 @@ async def handle_pretension_document(update, context):
                     except OSError:
                         pass
 
+    tracing.count("pages", len(all_pages))
+
     combined_text = "\n\n".join(combined_texts)
+    tracing.stage("sliding_window", chars=len(combined_text))
     claim_data = parse_documents_with_sliding_window(combined_text)
+    tracing.stage("llm_fallback")
     claim_data = apply_llm_fallback(combined_text, claim_data)
+    tracing.stage("document_groups")
     claim_data["document_groups"] = build_document_groups(
         combined_text,
         claim_data
     )
     claim_data["source_files"] = [entry.get("name") for entry in files if entry.get("name")]
 
+    tracing.stage("documents")
     applications = extract_applications_from_pages(all_pages)
     invoices = extract_invoices_from_pages(all_pages)
     upd_docs = extract_upd_from_pages(all_pages)
     cargo_docs = extract_cargo_docs_from_pages(all_pages)
+    tracing.count(
+        "regex_hits",
+        len(applications) + len(invoices) + len(upd_docs) + len(cargo_docs)
+    )
 
     # Vision LLM обогащение данных из cargo_docs при наличии low_pages_info
     if low_pages_info:
@@ -10069,6 +10565,7 @@ async def handle_pretension_document(update, context):
             cargo_docs, files, low_pages_info
         )
 
+    tracing.stage("shipments")
     shipments = extract_cdek_shipments_from_pages(all_pages)
     shipments.extend(extract_postal_shipments_from_pages(all_pages))
 
@@ -10116,25 +10613,8 @@ async def handle_pretension_document(update, context):
     if shipments:
         config = get_russian_post_config()
         if config.get("enabled") and not claim_data.get("skip_postal_lookup"):
-            for shipment in shipments:
-                if normalize_shipping_source(shipment.get("source")) != "post":
-                    continue
-                track_number = shipment.get("track_number") or ""
-                if not is_valid_tracking_number(track_number):
-                    continue
-                try:
-                    records = fetch_russian_post_operations(track_number)
-                    shipment["api_records"] = len(records)
-                    send_date, receive_date = extract_tracking_dates(records)
-                    if receive_date:
-                        shipment["received_date"] = parse_date_str(receive_date) or receive_date
-                        shipment["received_date_str"] = receive_date
-                    if send_date:
-                        shipment["send_date"] = send_date
-                except Exception as exc:
-                    logger.warning(
-                        f"Не удалось получить данные по треку {track_number}: {exc}"
-                    )
+            apply_tracking_to_shipments(shipments)
+    tracing.stage("matching")
     cargo_assignment_preview = assign_cargo_to_applications(applications, cargo_docs)
     matching_warnings = get_matching_warnings(cargo_assignment_preview)
     if matching_warnings:
@@ -10145,6 +10625,7 @@ async def handle_pretension_document(update, context):
         for warning in matching_warnings:
             await update.message.reply_text(warning)
 
+    tracing.stage("groups")
     payment_terms_by_application = extract_application_payment_terms(
         all_pages,
         applications
@@ -10194,6 +10675,7 @@ async def handle_pretension_document(update, context):
     if payment_days:
         claim_data["payment_days"] = str(payment_days)
 
+    tracing.stage("parties")
     parties = extract_parties_from_pages(all_pages)
     if parties:
         apply_extracted_parties(claim_data, parties)
@@ -10211,6 +10693,7 @@ async def handle_pretension_document(update, context):
     # Анализ "осознанности" документов: частичные оплаты, гарантийные письма и т.д.
     from decimal import Decimal
     original_debt_decimal = Decimal(str(total_debt)) if total_debt > 0 else None
+    tracing.stage("awareness")
     awareness_result = analyze_documents_for_special_cases(
         all_pages,
         original_debt=original_debt_decimal,
@@ -10242,7 +10725,8 @@ async def handle_pretension_document(update, context):
 
     # Обработка актов сверки: строгая привязка оплат к заявкам
     reconciliation_entries, reconciliation_sales = extract_reconciliation_entries(
-        all_pages
+        all_pages,
+        tables=reconciliation_tables
     )
     reconciliation_payments = [
         entry for entry in reconciliation_entries
@@ -10333,6 +10817,7 @@ async def handle_pretension_document(update, context):
     claim_data["pretension_groups"] = groups
     context.user_data["pretension_data"] = claim_data
 
+    tracing.stage("finish")
     missing = get_pretension_missing_fields(claim_data)
     context.user_data["pretension_missing_fields"] = missing
     if missing:
@@ -10343,11 +10828,31 @@ async def handle_pretension_document(update, context):
 async def handle_pretension_field(update, context):
     data = context.user_data.get("pretension_data", {})
     missing = context.user_data.get("pretension_missing_fields", [])
+    raw = update.message.text.strip() if update.message else ""
+    edited_shipping: Optional[Dict[str, Any]] = None
+    if not missing and context.user_data.get("pretension_edit_mode"):
+        has_label = ":" in raw
+        key, raw = parse_pretension_field_edit(raw)
+        if has_label and (not key or not raw):
+            await update.message.reply_text(pretension_edit_help())
+            return ASK_PRETENSION_FIELD
+        if not key or not raw:
+            context.user_data.pop("pretension_edit_mode", None)
+            drop_pretension_stage_cache(update.effective_user.id)
+            await update.message.reply_text("Готово. Претензия сформирована.")
+            return CONVERSATION_END
+        if key in ("docs_track_number", "docs_received_date"):
+            # Исправленные трек/даты заменяют ранее найденные отправления
+            for stale_key in ("shipments", "postal_numbers", "postal_dates"):
+                data.pop(stale_key, None)
+            edited_shipping = {
+                field: data.get(field) for field in PRETENSION_GROUP_SHIPPING_FIELDS
+            }
+        missing = [key]
     if not missing:
         return await finish_pretension(update, context)
 
     key = missing[0]
-    raw = update.message.text.strip() if update.message else ""
     field_def = PRETENSION_FIELD_DEFS.get(key, {})
     required = field_def.get("required", True)
 
@@ -10449,12 +10954,13 @@ async def handle_pretension_field(update, context):
                 config = get_russian_post_config()
                 if config.get("enabled"):
                     postal_dates = []
+                    tracking = fetch_russian_post_tracking_batch(track_numbers)
                     for track in track_numbers:
-                        try:
-                            records = fetch_russian_post_operations(track)
-                            _, receive_date = extract_tracking_dates(records)
-                        except Exception:
-                            receive_date = None
+                        result = tracking.get(track)
+                        receive_date = (
+                            result.get("receive_date")
+                            if isinstance(result, dict) else None
+                        )
                         if receive_date:
                             postal_dates.append(receive_date)
                     if postal_dates:
@@ -10478,6 +10984,8 @@ async def handle_pretension_field(update, context):
     else:
         data[key] = raw
 
+    if edited_shipping is not None:
+        apply_shipping_edit_to_groups(data, edited_shipping)
     context.user_data["pretension_data"] = data
     missing = get_pretension_missing_fields(data)
     context.user_data["pretension_missing_fields"] = missing
@@ -10486,24 +10994,33 @@ async def handle_pretension_field(update, context):
     return await finish_pretension(update, context)
 
 
-async def finish_pretension(update, context):
-    files = context.user_data.get("pretension_files", [])
-    file_paths = [entry["path"] for entry in files if entry.get("path")]
-    if not file_paths:
-        file_path = context.user_data.get("file_path")
-        if file_path:
-            file_paths = [file_path]
-    if not file_paths or not all(os.path.exists(path) for path in file_paths):
-        await update.message.reply_text(
-            "Ошибка: файл не найден на диске."
-        )
-        return ConversationHandler.END
+def apply_shipping_edit_to_groups(
+    data: Dict[str, Any],
+    previous: Dict[str, Any]
+) -> None:
+    """
+    Переносит исправленные трек-номер и дату получения в группы претензии:
+    найденные ранее по группам значения иначе остались бы в расчёте сроков.
+    """
+    for field in PRETENSION_GROUP_SHIPPING_FIELDS:
+        value = data.get(field)
+        if not value or value == previous.get(field):
+            continue
+        for group in data.get("pretension_groups") or []:
+            group[field] = value
 
-    claim_data = context.user_data.get("pretension_data", {})
-    groups = claim_data.get("pretension_groups", []) or []
-    document_groups = claim_data.get("document_groups", []) or []
-    shipments = claim_data.get("shipments") or []
 
+def _parse_pretension_payment_days(claim_data: Dict[str, Any]) -> int:
+    payment_days_raw = claim_data.get("payment_days", "0")
+    try:
+        return int(re.sub(r"[^\d]", "", str(payment_days_raw)))
+    except ValueError:
+        return 0
+
+
+def _pretension_stage_shipments(pipeline: StagedPipeline) -> List[Dict[str, Any]]:
+    claim_data = pipeline.data
+    shipments = copy.deepcopy(claim_data.get("shipments") or [])
     if not shipments and claim_data.get("postal_numbers"):
         numbers = claim_data.get("postal_numbers", []) or []
         dates = claim_data.get("postal_dates", []) or []
@@ -10516,47 +11033,24 @@ async def finish_pretension(update, context):
                 "received_date": parse_date_str(date_str),
                 "source": "cdek" if shipping_method == "сдэк" else "post",
             })
+    for shipment in shipments:
+        shipment["source"] = normalize_shipping_source(shipment.get("source"))
+    return shipments
 
-    if claim_data.get("docs_track_number") and not claim_data.get("postal_numbers"):
-        claim_data["postal_numbers"] = [claim_data.get("docs_track_number")]
-    if claim_data.get("docs_received_date") and not claim_data.get("postal_dates"):
-        claim_data["postal_dates"] = [claim_data.get("docs_received_date")]
-
-    if shipments:
-        for shipment in shipments:
-            shipment["source"] = normalize_shipping_source(shipment.get("source"))
-        if groups and any(
-            not group.get("docs_received_date") or not group.get("docs_track_number")
-            for group in groups
-        ):
-            assign_shipments_to_groups(groups, shipments)
 
-    raw_plaintiff_name = normalize_str(claim_data.get("plaintiff_name"))
-    raw_defendant_name = normalize_str(claim_data.get("defendant_name"))
-    plaintiff_name_short = format_organization_name_short(raw_plaintiff_name)
-    defendant_name_short = format_organization_name_short(raw_defendant_name)
-    plaintiff_name = plaintiff_name_short
-    defendant_name = defendant_name_short
-    is_plaintiff_ip = (
-        "ИП" in raw_plaintiff_name
-        or "Индивидуальный предприниматель" in raw_plaintiff_name
-    )
-    is_defendant_ip = (
-        "ИП" in raw_defendant_name
-        or "Индивидуальный предприниматель" in raw_defendant_name
-    )
-
-    debt_amount = parse_amount(claim_data.get("debt", "0"))
-    debt_decimal = parse_amount_decimal(claim_data.get("debt", "0"))
-    debt_rubles, debt_kopeks = split_rubles_kopeks(debt_decimal)
-    payment_days_raw = claim_data.get("payment_days", "0")
-    try:
-        payment_days = int(re.sub(r"[^\d]", "", str(payment_days_raw)))
-    except ValueError:
-        payment_days = 0
+def _pretension_stage_groups(pipeline: StagedPipeline) -> List[Dict[str, Any]]:
+    claim_data = pipeline.data
+    groups = copy.deepcopy(claim_data.get("pretension_groups", []) or [])
+    shipments = pipeline.get("shipments")
+    if shipments and groups and any(
+        not group.get("docs_received_date") or not group.get("docs_track_number")
+        for group in groups
+    ):
+        assign_shipments_to_groups(groups, shipments)
 
     # Подстраховка: если по отдельным заявкам нет условий оплаты,
     # используем общие условия/сроки (из текста или договора).
+    payment_days = _parse_pretension_payment_days(claim_data)
     default_terms_fallback = normalize_payment_terms(
         claim_data.get("payment_terms", "")
     )
@@ -10566,47 +11060,87 @@ async def finish_pretension(update, context):
                 group["payment_terms"] = default_terms_fallback
                 if payment_days and not group.get("payment_days"):
                     group["payment_days"] = payment_days
+    return groups
 
-    interest_data = {"total_interest": 0.0, "detailed_calc": []}
-    partial_payments = claim_data.get("partial_payments_info") or []
-    has_group_payment_days = False
-    if groups:
-        for group in groups:
-            try:
-                if int(group.get("payment_days") or 0) > 0:
-                    has_group_payment_days = True
-                    break
-            except (TypeError, ValueError):
-                continue
 
+def _pretension_stage_due_dates(pipeline: StagedPipeline) -> Dict[str, Any]:
+    claim_data = pipeline.data
+    groups = pipeline.get("groups")
+    payment_days = _parse_pretension_payment_days(claim_data)
+    has_group_payment_days = False
+    for group in groups:
+        try:
+            if int(group.get("payment_days") or 0) > 0:
+                has_group_payment_days = True
+                break
+        except (TypeError, ValueError):
+            continue
     has_group_terms = any(
         normalize_payment_terms(group.get("payment_terms") or "")
-        for group in (groups or [])
+        for group in groups
     )
-
     if groups and (payment_days > 0 or has_group_payment_days or has_group_terms):
-        interest_data = calculate_pretension_interest_schedule(
-            groups,
+        return {
+            "mode": "groups",
+            "obligations": build_pretension_obligations(groups, payment_days),
+        }
+
+    debt_amount = parse_amount(claim_data.get("debt", "0"))
+    docs_received_date = parse_date_str(claim_data.get("docs_received_date", ""))
+    if docs_received_date and payment_days > 0 and debt_amount > 0:
+        calendar = load_work_calendar(docs_received_date.year)
+        due_date = add_working_days(
+            docs_received_date,
             payment_days,
+            calendar
+        )
+        return {
+            "mode": "single",
+            "amount": debt_amount,
+            "interest_start": due_date + timedelta(days=1),
+        }
+    return {"mode": "none"}
+
+
+def _pretension_stage_interest(pipeline: StagedPipeline) -> Dict[str, Any]:
+    due_dates = pipeline.get("due_dates")
+    partial_payments = copy.deepcopy(
+        pipeline.data.get("partial_payments_info") or []
+    )
+    if due_dates.get("mode") == "groups":
+        return calculate_interest_for_obligations(
+            due_dates.get("obligations") or [],
             payments=partial_payments
         )
-    else:
-        docs_received_date = parse_date_str(claim_data.get("docs_received_date", ""))
-        if docs_received_date and payment_days > 0 and debt_amount > 0:
-            calendar = load_work_calendar(docs_received_date.year)
-            due_date = add_working_days(
-                docs_received_date,
-                payment_days,
-                calendar
-            )
-            interest_start = due_date + timedelta(days=1)
-            interest_data = calculate_pretension_interest(
-                debt_amount,
-                interest_start,
-                payments=partial_payments
-            )
-    total_interest = parse_amount(interest_data.get("total_interest", 0))
-    legal_fees_value = parse_amount(claim_data.get("legal_fees", "0"))
+    if due_dates.get("mode") == "single":
+        return calculate_pretension_interest(
+            due_dates["amount"],
+            due_dates["interest_start"],
+            payments=partial_payments
+        )
+    return {"total_interest": 0.0, "detailed_calc": []}
+
+
+def _pretension_stage_texts(pipeline: StagedPipeline) -> Dict[str, Any]:
+    claim_data = pipeline.data
+    groups = pipeline.get("groups")
+    document_groups = claim_data.get("document_groups", []) or []
+    payment_days = _parse_pretension_payment_days(claim_data)
+
+    raw_plaintiff_name = normalize_str(claim_data.get("plaintiff_name"))
+    raw_defendant_name = normalize_str(claim_data.get("defendant_name"))
+    plaintiff_name_short = format_organization_name_short(raw_plaintiff_name)
+    defendant_name_short = format_organization_name_short(raw_defendant_name)
+    plaintiff_name = plaintiff_name_short
+    defendant_name = defendant_name_short
+    is_plaintiff_ip = (
+        "ИП" in raw_plaintiff_name
+        or "Индивидуальный предприниматель" in raw_plaintiff_name
+    )
+    is_defendant_ip = (
+        "ИП" in raw_defendant_name
+        or "Индивидуальный предприниматель" in raw_defendant_name
+    )
 
     payment_terms_text = normalize_payment_terms(
         claim_data.get("payment_terms", "")
@@ -10643,26 +11177,34 @@ async def finish_pretension(update, context):
         include_docs=False
     )
 
-    # LLM-коррекция склонений/регистра/опечаток (без изменения реквизитов)
+    # LLM-коррекция склонений/регистра/опечаток (без изменения реквизитов);
+    # ответы кэшируются по тексту, чтобы правка поля не вызывала LLM повторно.
+    def proofread(text: str, protected_values: Optional[List[str]] = None) -> str:
+        return pipeline.memo(
+            "proofread",
+            [text, protected_values or []],
+            lambda: maybe_proofread_text(text, protected_values=protected_values)
+        )
+
     plaintiff_address_value = normalize_str(
         claim_data.get("plaintiff_address")
     ).replace("\n", " ").strip()
     defendant_address_value = normalize_str(
         claim_data.get("defendant_address")
     ).replace("\n", " ").strip()
-    plaintiff_address_value = maybe_proofread_text(
+    plaintiff_address_value = proofread(
         plaintiff_address_value,
         protected_values=[plaintiff_name, plaintiff_name_short]
     )
-    defendant_address_value = maybe_proofread_text(
+    defendant_address_value = proofread(
         defendant_address_value,
         protected_values=[defendant_name, defendant_name_short]
     )
-    intro_paragraph = maybe_proofread_text(
+    intro_paragraph = proofread(
         intro_paragraph,
         protected_values=[plaintiff_name_short]
     )
-    payment_terms_text = maybe_proofread_text(payment_terms_text)
+    payment_terms_text = proofread(payment_terms_text)
 
     plaintiff_ogrn_type = get_ogrn_label(
         plaintiff_name,
@@ -10695,6 +11237,31 @@ async def finish_pretension(update, context):
         plaintiff_address_value,
         is_plaintiff_ip
     )
+    return {
+        "plaintiff_name": plaintiff_name,
+        "defendant_name": defendant_name,
+        "plaintiff_name_short": plaintiff_name_short,
+        "defendant_name_short": defendant_name_short,
+        "plaintiff_block": plaintiff_block,
+        "defendant_block": defendant_block,
+        "intro_paragraph": intro_paragraph,
+        "payment_terms_text": payment_terms_text,
+    }
+
+
+def _pretension_stage_replacements(pipeline: StagedPipeline) -> Dict[str, Any]:
+    claim_data = pipeline.data
+    groups = pipeline.get("groups")
+    shipments = pipeline.get("shipments")
+    interest_data = pipeline.get("interest")
+    texts = pipeline.get("texts")
+    document_groups = claim_data.get("document_groups", []) or []
+
+    debt_amount = parse_amount(claim_data.get("debt", "0"))
+    debt_decimal = parse_amount_decimal(claim_data.get("debt", "0"))
+    debt_rubles, debt_kopeks = split_rubles_kopeks(debt_decimal)
+    total_interest = parse_amount(interest_data.get("total_interest", 0))
+    legal_fees_value = parse_amount(claim_data.get("legal_fees", "0"))
 
     if groups:
         documents_list_structured = build_documents_list_structured_for_groups(groups)
@@ -10707,13 +11274,13 @@ async def finish_pretension(update, context):
     )
 
     replacements = {
-        "{defendant_block}": defendant_block,
-        "{plaintiff_block}": plaintiff_block,
-        "{intro_paragraph}": intro_paragraph,
+        "{defendant_block}": texts["defendant_block"],
+        "{plaintiff_block}": texts["plaintiff_block"],
+        "{intro_paragraph}": texts["intro_paragraph"],
         "{documents_list}": build_documents_list(claim_data),
         "{debt_amount}": debt_rubles,
         "{debt_kopeks}": debt_kopeks,
-        "{payment_terms}": payment_terms_text,
+        "{payment_terms}": texts["payment_terms_text"],
         "{legal_fees_block}": build_legal_fees_block(claim_data),
         "{requirements_summary}": build_requirements_summary(
             debt_amount,
@@ -10730,8 +11297,8 @@ async def finish_pretension(update, context):
             claim_data.get("docs_received_date", ""),
             default=""
         ),
-        "{plaintiff_name}": plaintiff_name,
-        "{defendant_name}": defendant_name,
+        "{plaintiff_name}": texts["plaintiff_name"],
+        "{defendant_name}": texts["defendant_name"],
     }
 
     # Добавляем текст "осознанности" (частичные оплаты, гарантийные письма и т.д.)
@@ -10744,42 +11311,176 @@ async def finish_pretension(update, context):
     else:
         replacements["{awareness_block}"] = ""
 
-    result_docx = create_pretension_document(
-        claim_data,
-        interest_data,
-        replacements,
-        documents_list_structured=documents_list_structured,
-        attachments=attachments,
-        proofread_protected_values=[
-            plaintiff_name,
-            defendant_name,
-            plaintiff_name_short,
-            defendant_name_short,
+    return {
+        "replacements": replacements,
+        "documents_list_structured": documents_list_structured,
+        "attachments": attachments,
+        "protected_values": [
+            texts["plaintiff_name"],
+            texts["defendant_name"],
+            texts["plaintiff_name_short"],
+            texts["defendant_name_short"],
         ],
+    }
+
+
+def _pretension_stage_document(pipeline: StagedPipeline) -> bytes:
+    prepared = pipeline.get("replacements")
+    return create_pretension_document(
+        pipeline.data,
+        pipeline.get("interest"),
+        prepared["replacements"],
+        documents_list_structured=prepared["documents_list_structured"],
+        attachments=prepared["attachments"],
+        proofread_protected_values=prepared["protected_values"],
     )
 
-    with open(result_docx, "rb") as f:
-        await update.message.reply_document(
-            InputFile(f, filename="Претензия.docx"),
-            caption="Претензия по документам перевозки"
+
+PRETENSION_PARTY_FIELDS = (
+    "plaintiff_name", "plaintiff_inn", "plaintiff_kpp", "plaintiff_ogrn",
+    "plaintiff_address", "defendant_name", "defendant_inn", "defendant_kpp",
+    "defendant_ogrn", "defendant_address",
+)
+
+# Кэш этапов хранится в памяти процесса, а не в user_data: готовый DOCX
+# и результаты вычитки не должны попадать в файл сессий
+PRETENSION_STAGE_CACHE_USERS = env_int("PRETENSION_STAGE_CACHE_USERS", 32)
+_PRETENSION_STAGE_CACHES: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+
+# Извлечение → группы → сроки оплаты → проценты → замены → документ
+PRETENSION_STAGES = [
+    Stage(
+        "shipments",
+        _pretension_stage_shipments,
+        fields=("shipments", "postal_numbers", "postal_dates", "shipping_method"),
+    ),
+    Stage(
+        "groups",
+        _pretension_stage_groups,
+        fields=("pretension_groups", "payment_terms", "payment_days"),
+        depends=("shipments",),
+    ),
+    Stage(
+        "due_dates",
+        _pretension_stage_due_dates,
+        fields=("payment_days", "debt", "docs_received_date"),
+        depends=("groups",),
+    ),
+    Stage(
+        "interest",
+        _pretension_stage_interest,
+        fields=("partial_payments_info", "today"),
+        depends=("due_dates",),
+    ),
+    Stage(
+        "texts",
+        _pretension_stage_texts,
+        fields=PRETENSION_PARTY_FIELDS + (
+            "payment_terms", "payment_days", "cargo_docs", "document_groups",
+        ),
+        depends=("groups",),
+    ),
+    Stage(
+        "replacements",
+        _pretension_stage_replacements,
+        depends=("groups", "shipments", "interest", "texts"),
+    ),
+    Stage(
+        "document",
+        _pretension_stage_document,
+        depends=("replacements", "interest"),
+    ),
+]
+
+
+def get_pretension_stage_cache(user_id: int) -> Dict[str, Any]:
+    """Кэш этапов претензии пользователя (последние используемые остаются)."""
+    cache = _PRETENSION_STAGE_CACHES.pop(user_id, None)
+    if cache is None:
+        cache = {}
+    _PRETENSION_STAGE_CACHES[user_id] = cache
+    while len(_PRETENSION_STAGE_CACHES) > max(1, PRETENSION_STAGE_CACHE_USERS):
+        _PRETENSION_STAGE_CACHES.popitem(last=False)
+    return cache
+
+
+def drop_pretension_stage_cache(user_id: int) -> None:
+    _PRETENSION_STAGE_CACHES.pop(user_id, None)
+
+
+def build_pretension_pipeline(
+    claim_data: Dict[str, Any],
+    cache: Optional[Dict[str, Any]] = None
+) -> StagedPipeline:
+    return StagedPipeline(
+        PRETENSION_STAGES,
+        claim_data,
+        cache=cache,
+        inputs={"today": datetime.today().strftime("%Y-%m-%d")},
+    )
+
+
+@tracing.traced("finish_pretension")
+async def finish_pretension(update, context):
+    from telegram import InputFile
+    files = context.user_data.get("pretension_files", [])
+    file_paths = [entry["path"] for entry in files if entry.get("path")]
+    if not file_paths:
+        file_path = context.user_data.get("file_path")
+        if file_path:
+            file_paths = [file_path]
+    editing = bool(context.user_data.get("pretension_edit_mode"))
+    if not editing and (
+        not file_paths or not all(os.path.exists(path) for path in file_paths)
+    ):
+        await update.message.reply_text(
+            "Ошибка: файл не найден на диске."
         )
+        return CONVERSATION_END
 
+    claim_data = context.user_data.get("pretension_data", {})
+    if claim_data.get("docs_track_number") and not claim_data.get("postal_numbers"):
+        claim_data["postal_numbers"] = [claim_data.get("docs_track_number")]
+    if claim_data.get("docs_received_date") and not claim_data.get("postal_dates"):
+        claim_data["postal_dates"] = [claim_data.get("docs_received_date")]
+
+    stage_cache = get_pretension_stage_cache(update.effective_user.id)
+    pipeline = build_pretension_pipeline(claim_data, cache=stage_cache)
+    document_bytes = pipeline.get("document")
+    logger.info(
+        "Претензия сформирована, пересчитаны этапы: %s",
+        ", ".join(pipeline.recomputed) or "нет"
+    )
+
+    await update.message.reply_document(
+        InputFile(document_bytes, filename="Претензия.docx"),
+        caption="Претензия по документам перевозки"
+    )
+
+    UPLOAD_PIPELINE.discard_many(file_paths)
     try:
         for path in file_paths:
             if os.path.exists(path):
                 os.remove(path)
-        if os.path.exists(result_docx):
-            os.remove(result_docx)
     except Exception as exc:
         logging.warning("Не удалось удалить временные файлы: %s", exc)
 
-    return ConversationHandler.END
+    context.user_data["pretension_edit_mode"] = True
+    context.user_data["pretension_missing_fields"] = []
+    await update.message.reply_text(
+        "Если нужно исправить значение, отправьте его в виде «поле: значение», "
+        "например «дата получения: 12.03.2025» или «долг: 210000». "
+        "Пересчитаю только то, что от него зависит. "
+        "Если всё верно, напишите «готово»."
+    )
+    return ASK_PRETENSION_FIELD
 
 
 # ============ ОБРАБОТЧИКИ ВНЕШНИХ ПРЕТЕНЗИЙ ============
 
 async def handle_external_claim_document(update, context):
     """Обработчик загрузки документов для внешних претензий."""
+    from telegram import InlineKeyboardButton, InlineKeyboardMarkup
     stage = context.user_data.get("external_claim_stage", "claim")
     files = context.user_data.get("external_claim_files", [])
 
@@ -10802,6 +11503,10 @@ async def handle_external_claim_document(update, context):
             "type": stage  # claim, docs, legal
         })
         context.user_data["external_claim_files"] = files
+        if stage == "claim":
+            UPLOAD_PIPELINE.submit(file_path, parse_external_claim, file_path)
+        elif stage == "docs":
+            UPLOAD_PIPELINE.submit(file_path, parse_document_package_in_pool, file_path)
 
         if stage == "claim":
             await update.message.reply_text(
@@ -10908,20 +11613,34 @@ async def process_external_claim(update, context):
             legal_file = f["path"]
 
     if not claim_file:
+        discard_upload_jobs(context)
         message = update.message or update.callback_query.message
         await message.reply_text("Ошибка: файл претензии не найден.")
-        return ConversationHandler.END
+        return CONVERSATION_END
 
     message = update.message or update.callback_query.message
     await message.reply_text("⏳ Анализирую документы с помощью LLM...")
 
     try:
-        # Парсим претензию
-        claim_data = parse_external_claim(claim_file)
+        # Парсим претензию (обычно уже разобрана в фоне при загрузке)
+        claim_data = await UPLOAD_PIPELINE.result(
+            claim_file,
+            parse_external_claim,
+            claim_file
+        )
 
         # Парсим пакеты документов
         if doc_files:
-            doc_packages = parse_document_packages(doc_files)
+            doc_packages = []
+            for doc_file in doc_files:
+                try:
+                    doc_packages.append(await UPLOAD_PIPELINE.result(
+                        doc_file,
+                        parse_document_package_in_pool,
+                        doc_file
+                    ))
+                except Exception as e:
+                    logger.error(f"Error parsing document package {doc_file}: {e}")
 
             # Связываем документы
             claim_data = link_documents_full(claim_data, doc_packages)
@@ -10931,6 +11650,7 @@ async def process_external_claim(update, context):
 
         # Формируем данные для искового
         lawsuit_data = convert_external_to_lawsuit(claim_data)
+        enrich_parties_with_dadata(lawsuit_data, external_data=claim_data)
 
         # Выводим результат
         apps = claim_data.applications or []
@@ -10962,10 +11682,11 @@ async def process_external_claim(update, context):
 
     except Exception as exc:
         logging.exception("Error processing external claim")
+        discard_upload_jobs(context)
         await message.reply_text(
             f"❌ Ошибка при обработке документов: {exc}"
         )
-        return ConversationHandler.END
+        return CONVERSATION_END
 
 
 def convert_external_to_lawsuit(claim_data: ExternalClaimData) -> dict:
@@ -11197,6 +11918,7 @@ async def finish_external_claim(update, context):
         )
 
         # Очистка временных файлов
+        discard_upload_jobs(context)
         files = context.user_data.get("external_claim_files", [])
         for f in files:
             try:
@@ -11205,12 +11927,12 @@ async def finish_external_claim(update, context):
             except Exception:
                 pass
 
-        return ConversationHandler.END
+        return CONVERSATION_END
 
     except Exception as exc:
         logging.exception("Error finishing external claim")
         await message.reply_text(f"❌ Ошибка: {exc}")
-        return ConversationHandler.END
+        return CONVERSATION_END
 
 
 async def handle_document(update, context):
@@ -11225,60 +11947,67 @@ async def handle_document(update, context):
         await update.message.reply_text(
             "Сначала выбери тип документа через /start."
         )
-    return ConversationHandler.END
+    return CONVERSATION_END
 
 
-conv_handler = ConversationHandler(
-    entry_points=[CommandHandler("start", start)],
-    states={
-        ASK_FLOW: [CallbackQueryHandler(flow_chosen)],
-        ASK_DOCUMENT: [
-            MessageHandler(filters.Document.ALL, handle_document),
-            MessageHandler(filters.TEXT & ~filters.COMMAND, handle_document),
-        ],
-        ASK_JURISDICTION: [CallbackQueryHandler(jurisdiction_chosen)],
-        ASK_CUSTOM_COURT: [
-            MessageHandler(filters.TEXT & ~filters.COMMAND, handle_custom_court)
-        ],
-        ASK_CLAIM_STATUS: [CallbackQueryHandler(claim_status_chosen)],
-        ASK_TRACK: [
-            MessageHandler(filters.TEXT & ~filters.COMMAND, ask_track)
-        ],
-        ASK_RECEIVE_DATE: [
-            MessageHandler(filters.TEXT & ~filters.COMMAND, ask_receive_date)
-        ],
-        ASK_SEND_DATE: [
-            MessageHandler(filters.TEXT & ~filters.COMMAND, ask_send_date)
-        ],
-        ASK_BIRTH_DATE: [
-            MessageHandler(filters.TEXT & ~filters.COMMAND, ask_birth_date)
-        ],
-        ASK_BIRTH_PLACE: [
-            MessageHandler(filters.TEXT & ~filters.COMMAND, ask_birth_place)
-        ],
-        ASK_PRETENSION_FIELD: [
-            MessageHandler(
-                filters.TEXT & ~filters.COMMAND, handle_pretension_field
-            )
-        ],
-        ASK_EXTERNAL_CLAIM_DOCUMENT: [
-            MessageHandler(
-                filters.Document.ALL, handle_external_claim_document
-            ),
-            MessageHandler(
-                filters.TEXT & ~filters.COMMAND, handle_external_claim_document
-            ),
-            CallbackQueryHandler(handle_external_legal_choice),
-        ],
-        ASK_EXTERNAL_CLAIM_FIELD: [
-            MessageHandler(
-                filters.TEXT & ~filters.COMMAND, handle_external_claim_field
-            )
-        ],
-    },
-    fallbacks=[],
-    per_message=False,
-)
+def build_conversation_handler():
+    """Собирает ConversationHandler; telegram.ext импортируется только здесь."""
+    from telegram.ext import (CallbackQueryHandler, CommandHandler,
+                              ConversationHandler, MessageHandler, filters)
+
+    return ConversationHandler(
+        entry_points=[CommandHandler("start", start)],
+        states={
+            ASK_FLOW: [CallbackQueryHandler(flow_chosen)],
+            ASK_DOCUMENT: [
+                MessageHandler(filters.Document.ALL, handle_document),
+                MessageHandler(filters.TEXT & ~filters.COMMAND, handle_document),
+            ],
+            ASK_JURISDICTION: [CallbackQueryHandler(jurisdiction_chosen)],
+            ASK_CUSTOM_COURT: [
+                MessageHandler(filters.TEXT & ~filters.COMMAND, handle_custom_court)
+            ],
+            ASK_CLAIM_STATUS: [CallbackQueryHandler(claim_status_chosen)],
+            ASK_TRACK: [
+                MessageHandler(filters.TEXT & ~filters.COMMAND, ask_track)
+            ],
+            ASK_RECEIVE_DATE: [
+                MessageHandler(filters.TEXT & ~filters.COMMAND, ask_receive_date)
+            ],
+            ASK_SEND_DATE: [
+                MessageHandler(filters.TEXT & ~filters.COMMAND, ask_send_date)
+            ],
+            ASK_BIRTH_DATE: [
+                MessageHandler(filters.TEXT & ~filters.COMMAND, ask_birth_date)
+            ],
+            ASK_BIRTH_PLACE: [
+                MessageHandler(filters.TEXT & ~filters.COMMAND, ask_birth_place)
+            ],
+            ASK_PRETENSION_FIELD: [
+                MessageHandler(
+                    filters.TEXT & ~filters.COMMAND, handle_pretension_field
+                )
+            ],
+            ASK_EXTERNAL_CLAIM_DOCUMENT: [
+                MessageHandler(
+                    filters.Document.ALL, handle_external_claim_document
+                ),
+                MessageHandler(
+                    filters.TEXT & ~filters.COMMAND, handle_external_claim_document
+                ),
+                CallbackQueryHandler(handle_external_legal_choice),
+            ],
+            ASK_EXTERNAL_CLAIM_FIELD: [
+                MessageHandler(
+                    filters.TEXT & ~filters.COMMAND, handle_external_claim_field
+                )
+            ],
+        },
+        fallbacks=[],
+        per_message=False,
+        name="iskbot_conversation",
+        persistent=True,
+    )
 
 
 def generate_postal_block(postal_numbers, postal_dates):
@@ -11299,14 +12028,22 @@ def generate_postal_block(postal_numbers, postal_dates):
         )
 
 
-def clean_uploads_folder():
-    """Удаляет все файлы из папки uploads при запуске бота."""
+def clean_uploads_folder(max_age_seconds: float = 0):
+    """
+    Удаляет файлы из папки uploads при запуске бота.
+
+    Если задан max_age_seconds, файлы моложе этого срока остаются:
+    они могут принадлежать сессиям, восстановленным после перезапуска.
+    """
     uploads_dir = os.path.join(os.path.dirname(__file__), 'uploads')
     if not os.path.exists(uploads_dir):
         return
+    now = time.time()
     for filename in os.listdir(uploads_dir):
         file_path = os.path.join(uploads_dir, filename)
         try:
+            if max_age_seconds > 0 and now - os.path.getmtime(file_path) <= max_age_seconds:
+                continue
             if os.path.isfile(file_path):
                 os.remove(file_path)
                 logging.info(f"Удален файл из uploads: {file_path}")
@@ -11317,19 +12054,50 @@ def clean_uploads_folder():
             logging.warning(f"Не удалось удалить {file_path}: {e}")
 
 
+async def shutdown_workers(application) -> None:
+    """Останавливает фоновые потоки и пулы процессов при остановке бота."""
+    COURT_DIRECTORY.stop_refresh()
+    UPLOAD_PIPELINE.shutdown()
+    DOCUMENT_BUILDER.shutdown()
+    shutdown_package_pool()
+    logging.info("Фоновые обработчики остановлены")
+
+
 def main() -> None:
     """Запускает Telegram бота."""
     logging.info("Starting bot...")
-    clean_uploads_folder()  # Очищаем uploads при запуске
+    # Очищаем uploads при запуске, кроме файлов активных сессий
+    clean_uploads_folder(SESSION_TTL_SECONDS)
+    EXTRACTION_STORE.prune()
+    # Настройки LLM читаются один раз; kill -HUP перечитывает .env
+    install_reload_signal()
     if not TOKEN:
         logging.error(
             "TOKEN is not set. Please provide a valid Telegram bot token."
         )
         raise ValueError(
             "TOKEN is not set. Please provide a valid Telegram bot token.")
-    app = Application.builder().token(TOKEN).build()
+    # Карточки судов DaData обновляются в фоне, запросы идут из справочника
+    start_court_directory_refresh()
+    from telegram.ext import Application
+
+    from session_persistence import ExpiringPicklePersistence
+
+    os.makedirs(SESSION_STATE_DIR, exist_ok=True)
+    persistence = ExpiringPicklePersistence(
+        os.path.join(SESSION_STATE_DIR, "conversations.pickle"),
+        ttl_seconds=SESSION_TTL_SECONDS,
+        update_interval=env_float("SESSION_SAVE_INTERVAL", 10),
+    )
+    app = (
+        Application.builder()
+        .token(TOKEN)
+        .persistence(persistence)
+        .post_shutdown(shutdown_workers)
+        .build()
+    )
     logging.info("Bot initialized")
-    app.add_handler(conv_handler)
+    app.add_handler(build_conversation_handler())
     logging.info("Handlers added")
     app.run_polling()
     logging.info("Bot is polling")
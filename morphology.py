@@ -0,0 +1,101 @@
+"""
+Морфология для нормализации имён и заголовков документов.
+
+MorphAnalyzer создаётся при первом обращении. Результаты разбора слов
+кэшируются (LRU, размер — MORPH_CACHE_SIZE): в пакете документов одни и
+те же фамилии, слова из названий организаций и заголовков повторяются
+тысячи раз, и после прогрева нормализация сводится к поиску в словаре.
+"""
+
+import importlib.util
+import logging
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional
+
+from lookup_cache import env_int
+
+logger = logging.getLogger(__name__)
+
+# Словари pymorphy2 загружаются при первом обращении, а не при импорте
+HAS_PYMORPHY = importlib.util.find_spec("pymorphy2") is not None
+MORPH_CACHE_SIZE = env_int("MORPH_CACHE_SIZE", 20000)
+
+
+@lru_cache(maxsize=1)
+def get_morph():
+    """Общий MorphAnalyzer; None, если pymorphy2 недоступен."""
+    if not HAS_PYMORPHY:
+        return None
+    try:
+        import pymorphy2
+        return pymorphy2.MorphAnalyzer()
+    except Exception as exc:
+        logger.warning("Не удалось загрузить pymorphy2: %s", exc)
+        return None
+
+
+# pymorphy2 разбирает слово в нижнем регистре, поэтому ключ кэша — word.lower()
+@lru_cache(maxsize=MORPH_CACHE_SIZE)
+def _normal_form(word: str) -> Optional[str]:
+    morph = get_morph()
+    if morph is None:
+        return None
+    try:
+        parsed = morph.parse(word)
+    except Exception:
+        return None
+    return parsed[0].normal_form if parsed else None
+
+
+@lru_cache(maxsize=MORPH_CACHE_SIZE)
+def _nominative_word(word: str) -> Optional[str]:
+    morph = get_morph()
+    if morph is None:
+        return None
+    try:
+        parsed = morph.parse(word)
+    except Exception:
+        return None
+    for item in parsed:
+        if 'nomn' in item.tag:
+            return item.word
+    return None
+
+
+def normal_form(word: str) -> str:
+    """Начальная форма слова; само слово, если разобрать не удалось."""
+    if not word:
+        return word
+    return _normal_form(word.lower()) or word
+
+
+def nominative_word(word: str) -> Optional[str]:
+    """Слово, если у него есть разбор в именительном падеже, иначе None."""
+    if not word:
+        return None
+    return _nominative_word(word.lower())
+
+
+def normalize_words(words: Iterable[str]) -> List[str]:
+    """Начальные формы списка слов; повторы внутри списка разбираются один раз."""
+    seen: Dict[str, str] = {}
+    result = []
+    for word in words:
+        normalized = seen.get(word)
+        if normalized is None:
+            normalized = seen[word] = normal_form(word)
+        result.append(normalized)
+    return result
+
+
+def cache_info() -> Dict[str, object]:
+    """Статистика кэшей разбора (для логов и отладки)."""
+    return {
+        "normal_form": _normal_form.cache_info(),
+        "nominative": _nominative_word.cache_info(),
+    }
+
+
+def clear_cache() -> None:
+    _normal_form.cache_clear()
+    _nominative_word.cache_clear()
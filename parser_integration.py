@@ -6,8 +6,12 @@
 """
 
 import logging
-from typing import Dict, List, Optional
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
 
+import tracing
 from data_recovery import DataRecovery
 from enhanced_parser import EnhancedParser, ParsingResult
 from sliding_window_parser import (SlidingWindowParser,
@@ -16,70 +20,179 @@ from validators import DataValidator
 
 logger = logging.getLogger(__name__)
 
+# Режимы интегрированного парсинга
+MODE_SEQUENTIAL = "sequential"  # legacy, затем enhanced
+MODE_PARALLEL = "parallel"      # оба парсера одновременно
+MODE_AUTO = "auto"              # enhanced только если legacy не прошёл проверки
+PARSER_MODES = (MODE_SEQUENTIAL, MODE_PARALLEL, MODE_AUTO)
+
+# Поля, которые enhanced дополняет, если legacy их не нашёл; в режиме auto
+# без любого из них enhanced всё равно запускается
+AUTO_REQUIRED_FIELDS = (
+    'debt', 'payment_days', 'payment_terms',
+    'legal_fees', 'signatory', 'attachments',
+)
+
+
+def default_parser_mode() -> str:
+    mode = os.getenv("INTEGRATED_PARSER_MODE", MODE_SEQUENTIAL).strip().lower()
+    return mode if mode in PARSER_MODES else MODE_SEQUENTIAL
+
 
 class IntegratedParser:
     """
     Интегрированный парсер, объединяющий старый и новый подходы.
 
     Стратегия работы:
-    1. Запускает оба парсера параллельно
+    1. Запускает парсеры согласно режиму (sequential / parallel / auto)
     2. Объединяет результаты, выбирая лучшие данные
     3. Применяет валидацию и восстановление
     4. Возвращает максимально полный результат
+
+    Время и уверенность каждого парсера последнего вызова — в last_stats.
     """
 
-    def __init__(self):
+    def __init__(self, mode: Optional[str] = None):
         self.legacy_parser = SlidingWindowParser()
         self.enhanced_parser = EnhancedParser()
         self.validator = DataValidator()
         self.recovery = DataRecovery()
+        self.mode = mode or default_parser_mode()
+        self.last_stats: Dict[str, Dict[str, any]] = {}
 
-    def parse(self, text: str, use_legacy_only: bool = False) -> Dict[str, any]:
+    def parse(
+        self,
+        text: str,
+        use_legacy_only: bool = False,
+        mode: Optional[str] = None
+    ) -> Dict[str, any]:
         """
         Основной метод парсинга.
 
         Args:
             text: Текст претензии
             use_legacy_only: Использовать только старый парсер (для обратной совместимости)
+            mode: sequential | parallel | auto (по умолчанию self.mode)
 
         Returns:
             Словарь с извлеченными данными
         """
         if use_legacy_only:
-            logger.info("Используется только legacy парсер")
+            logger.debug("Используется только legacy парсер")
             return parse_documents_with_sliding_window(text)
 
-        logger.info("=" * 70)
-        logger.info("Начало интегрированного парсинга")
-        logger.info("=" * 70)
+        mode = mode or self.mode
+        with tracing.span("integrated_parse", mode=mode):
+            legacy_data, enhanced_result = self._run_parsers(text, mode)
+
+            if enhanced_result is None:
+                merged_data = legacy_data.copy()
+            else:
+                merged_data = self._merge_results(legacy_data, enhanced_result)
 
-        # Запускаем legacy парсер
-        logger.info("Шаг 1: Запуск legacy парсера")
-        legacy_data = self._safe_parse_legacy(text)
-        logger.info(f"Legacy парсер извлек {len(legacy_data)} полей")
+            final_data = self._apply_final_processing(merged_data)
 
-        # Запускаем enhanced парсер
-        logger.info("Шаг 2: Запуск enhanced парсера")
-        enhanced_result = self._safe_parse_enhanced(text)
         logger.info(
-            f"Enhanced парсер извлек {len(enhanced_result.data)} полей, "
-            f"confidence: {enhanced_result.confidence:.2f}"
+            "Интегрированный парсинг (%s): %s полей; %s",
+            mode,
+            len(final_data),
+            self._format_stats()
         )
+        return final_data
 
-        # Объединяем результаты
-        logger.info("Шаг 3: Объединение результатов")
-        merged_data = self._merge_results(legacy_data, enhanced_result)
-        logger.info(f"После объединения: {len(merged_data)} полей")
-
-        # Применяем финальную валидацию и восстановление
-        logger.info("Шаг 4: Финальная валидация и восстановление")
-        final_data = self._apply_final_processing(merged_data)
-
-        logger.info("=" * 70)
-        logger.info(f"Парсинг завершен. Итоговых полей: {len(final_data)}")
-        logger.info("=" * 70)
+    def _run_parsers(
+        self,
+        text: str,
+        mode: str
+    ) -> Tuple[Dict[str, any], Optional[ParsingResult]]:
+        """
+        Запускает парсеры. Возвращает enhanced_result=None,
+        если в режиме auto legacy-результата достаточно.
+        """
+        self.last_stats = {}
+        if mode == MODE_PARALLEL:
+            with ThreadPoolExecutor(max_workers=2) as pool:
+                legacy_future = pool.submit(tracing.bind(self._timed_legacy), text)
+                enhanced_future = pool.submit(tracing.bind(self._timed_enhanced), text)
+                return legacy_future.result(), enhanced_future.result()
+
+        legacy_data = self._timed_legacy(text)
+        if mode == MODE_AUTO and self._legacy_is_sufficient(legacy_data):
+            self.last_stats["enhanced"] = {"skipped": True}
+            return legacy_data, None
+        return legacy_data, self._timed_enhanced(text)
+
+    def _timed_legacy(self, text: str) -> Dict[str, any]:
+        started = time.perf_counter()
+        with tracing.span("legacy_parser"):
+            legacy_data = self._safe_parse_legacy(text)
+        self.last_stats["legacy"] = {
+            "seconds": round(time.perf_counter() - started, 4),
+            "fields": len(legacy_data),
+            "confidence": self._legacy_confidence(legacy_data),
+        }
+        return legacy_data
+
+    def _timed_enhanced(self, text: str) -> ParsingResult:
+        started = time.perf_counter()
+        with tracing.span("enhanced_parser"):
+            enhanced_result = self._safe_parse_enhanced(text)
+        self.last_stats["enhanced"] = {
+            "seconds": round(time.perf_counter() - started, 4),
+            "fields": len(enhanced_result.data),
+            "confidence": enhanced_result.confidence,
+            "skipped": False,
+        }
+        return enhanced_result
+
+    def _entity_checks(self, data: Dict[str, any]) -> List[bool]:
+        """Проверки DataValidator для истца и ответчика из результата парсинга."""
+        checks = []
+        for entity in ('defendant', 'plaintiff'):
+            inn = data.get(f'{entity}_inn')
+            name = data.get(f'{entity}_name')
+            if not inn or not name or name == 'Не указано':
+                checks.append(False)
+                continue
+            report = self.validator.validate_entity(
+                inn,
+                data.get(f'{entity}_kpp'),
+                data.get(f'{entity}_ogrn')
+            )
+            checks.append(report.is_valid)
+        return checks
+
+    def _legacy_confidence(self, data: Dict[str, any]) -> float:
+        """Доля пройденных проверок реквизитов сторон (0-1)."""
+        checks = self._entity_checks(data)
+        return round(sum(checks) / len(checks), 2) if checks else 0.0
+
+    def _legacy_is_sufficient(self, data: Dict[str, any]) -> bool:
+        """
+        Реквизиты сторон проходят проверки и все AUTO_REQUIRED_FIELDS
+        заполнены — enhanced нечего дополнять.
+        """
+        if not all(self._entity_checks(data)):
+            return False
+        return all(
+            data.get(field) and (not isinstance(data[field], str) or data[field].strip())
+            for field in AUTO_REQUIRED_FIELDS
+        )
 
-        return final_data
+    def _format_stats(self) -> str:
+        parts = []
+        for name in ('legacy', 'enhanced'):
+            stats = self.last_stats.get(name)
+            if not stats:
+                continue
+            if stats.get("skipped"):
+                parts.append(f"{name}: пропущен")
+            else:
+                parts.append(
+                    f"{name}: {stats['seconds']:.2f}s, "
+                    f"confidence {stats['confidence']:.2f}"
+                )
+        return "; ".join(parts)
 
     def _safe_parse_legacy(self, text: str) -> Dict[str, any]:
         """
@@ -260,17 +373,19 @@ class IntegratedParser:
             Отчет с метаинформацией
         """
         # Запускаем оба парсера
-        legacy_data = self._safe_parse_legacy(text)
-        enhanced_result = self._safe_parse_enhanced(text)
+        legacy_data, enhanced_result = self._run_parsers(text, MODE_PARALLEL)
 
         # Формируем отчет
         report = {
             'legacy': {
                 'fields_extracted': len(legacy_data),
+                'seconds': self.last_stats['legacy']['seconds'],
+                'confidence': self.last_stats['legacy']['confidence'],
                 'data': legacy_data,
             },
             'enhanced': {
                 'fields_extracted': len(enhanced_result.data),
+                'seconds': self.last_stats['enhanced']['seconds'],
                 'confidence': enhanced_result.confidence,
                 'warnings': enhanced_result.warnings,
                 'errors': enhanced_result.errors,
@@ -286,7 +401,8 @@ class IntegratedParser:
 # Удобная функция для использования в main.py
 def parse_document_integrated(
     text: str,
-    use_legacy_only: bool = False
+    use_legacy_only: bool = False,
+    mode: Optional[str] = None
 ) -> Dict[str, any]:
     """
     Парсит документ с использованием интегрированного парсера.
@@ -294,11 +410,12 @@ def parse_document_integrated(
     Args:
         text: Текст претензии
         use_legacy_only: Использовать только старый парсер
+        mode: sequential | parallel | auto (по умолчанию INTEGRATED_PARSER_MODE)
 
     Returns:
         Словарь с извлеченными данными
     """
-    parser = IntegratedParser()
+    parser = IntegratedParser(mode=mode)
     return parser.parse(text, use_legacy_only=use_legacy_only)
 
 
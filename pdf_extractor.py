@@ -10,66 +10,48 @@
 """
 
 import base64
+import copy
+import importlib.util
 import io
 import json
 import logging
 import os
 import re
-from typing import Any, Dict, List, Optional, Tuple
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple, Union
 
 import requests
-from dotenv import load_dotenv
+
+from lookup_cache import env_int
+from session_store import file_digest
+from settings import get_settings
 
 logger = logging.getLogger(__name__)
 
-# Пробуем импортировать библиотеки
-try:
-    import pdfplumber
-    HAS_PDFPLUMBER = True
-except ImportError:
-    HAS_PDFPLUMBER = False
+# Библиотеки импортируются при первом использовании: при импорте модуля
+# проверяется только их наличие
+HAS_PDFPLUMBER = importlib.util.find_spec("pdfplumber") is not None
+if not HAS_PDFPLUMBER:
     logger.warning("pdfplumber не установлен. pip install pdfplumber")
 
-try:
-    import fitz  # PyMuPDF
-    HAS_PYMUPDF = True
-except ImportError:
-    HAS_PYMUPDF = False
+HAS_PYMUPDF = importlib.util.find_spec("fitz") is not None
+if not HAS_PYMUPDF:
     logger.warning("PyMuPDF не установлен. pip install pymupdf")
 
 
-def _get_env(name: str, default: str = "") -> str:
-    value = os.getenv(name)
-    return value if value is not None else default
-
-
 def get_vision_config() -> Dict[str, Any]:
     """
-    Загружает конфигурацию Vision LLM из переменных окружения.
+    Конфигурация Vision LLM из настроек процесса (см. settings.get_settings).
     """
-    load_dotenv()
-    base_url = (
-        _get_env("OLLAMA_BASE_URL")
-        or _get_env("OLLAMA_HOST")
-        or ""
-    ).strip()
-
-    # Модель для Vision (по умолчанию qwen3-vl:8b)
-    vision_model = _get_env("OLLAMA_VISION_MODEL", "qwen3-vl:8b").strip()
-
-    enabled_raw = os.getenv("VISION_LLM_ENABLED")
-    if enabled_raw is None:
-        enabled = bool(base_url)
-    else:
-        enabled = enabled_raw.lower() in ("1", "true", "yes", "on")
-
-    timeout = int(_get_env("OLLAMA_VISION_TIMEOUT", "120"))  # Vision модели медленнее
-
+    settings = get_settings()
     return {
-        "enabled": enabled,
-        "base_url": base_url.rstrip("/"),
-        "model": vision_model,
-        "timeout": timeout,
+        "enabled": settings.enabled(settings.vision_llm_enabled),
+        "base_url": settings.base_url,
+        # Модель для Vision (по умолчанию qwen3-vl:8b)
+        "model": settings.vision_model or "qwen3-vl:8b",
+        "timeout": settings.vision_timeout,  # Vision модели медленнее
     }
 
 
@@ -118,6 +100,7 @@ def extract_with_pdfplumber(pdf_path: str) -> List[Dict[str, Any]]:
     """
     if not HAS_PDFPLUMBER:
         raise ImportError("pdfplumber не установлен")
+    import pdfplumber
 
     pages_data = []
 
@@ -133,6 +116,7 @@ def extract_with_pdfplumber(pdf_path: str) -> List[Dict[str, Any]]:
             # Извлекаем текст
             text = page.extract_text() or ""
             page_data["text"] = text
+            page_data["raw_text"] = text
 
             # Извлекаем таблицы
             tables = page.extract_tables() or []
@@ -213,6 +197,7 @@ def extract_with_pymupdf(pdf_path: str) -> List[Dict[str, Any]]:
     """
     if not HAS_PYMUPDF:
         raise ImportError("PyMuPDF не установлен")
+    import fitz  # PyMuPDF
 
     pages_data = []
 
@@ -222,6 +207,7 @@ def extract_with_pymupdf(pdf_path: str) -> List[Dict[str, Any]]:
         pages_data.append({
             "page_num": i + 1,
             "text": text,
+            "raw_text": text,
             "tables": [],
             "text_quality": _estimate_text_quality(text)
         })
@@ -230,6 +216,108 @@ def extract_with_pymupdf(pdf_path: str) -> List[Dict[str, Any]]:
     return pages_data
 
 
+# ============================================================
+# Извлечённый документ (один разбор PDF на запрос)
+# ============================================================
+
+@dataclass
+class ExtractedDocument:
+    """
+    Результат разбора PDF: страницы (текст, таблицы, качество)
+    и наложенный OCR Vision LLM. Кэшируется по хэшу содержимого,
+    поэтому функции разбора принимают его вместо пути.
+    """
+    path: str
+    digest: str
+    pages: List[Dict[str, Any]]
+    ocr: Dict[int, Dict[str, Any]] = field(default_factory=dict)
+    # Только текст страниц (без таблиц и оценки качества), см. texts_only()
+    text_only: bool = False
+
+    @property
+    def page_texts(self) -> List[str]:
+        """Текст страниц как его отдаёт pdfplumber (без таблиц)."""
+        return [page.get("raw_text", page.get("text", "")) for page in self.pages]
+
+    @property
+    def source_file(self) -> str:
+        return os.path.basename(self.path)
+
+    def texts_only(self) -> "ExtractedDocument":
+        """Копия с одним текстом страниц — для передачи между процессами."""
+        pages = [
+            {"page_num": page.get("page_num", idx), "raw_text": text}
+            for idx, (page, text) in enumerate(zip(self.pages, self.page_texts), start=1)
+        ]
+        return ExtractedDocument(self.path, self.digest, pages, text_only=True)
+
+
+PdfSource = Union[str, ExtractedDocument]
+
+_DOCUMENT_CACHE: "OrderedDict[str, ExtractedDocument]" = OrderedDict()
+_DOCUMENT_CACHE_SIZE = env_int("EXTRACTED_DOCUMENT_CACHE_SIZE", 32)
+_DOCUMENT_LOCK = threading.Lock()
+
+
+def remember_document(document: ExtractedDocument) -> ExtractedDocument:
+    """Кладёт документ в кэш (например, разобранный в другом процессе)."""
+    with _DOCUMENT_LOCK:
+        cached = _DOCUMENT_CACHE.get(document.digest)
+        if document.text_only and cached is not None and not cached.text_only:
+            # Полный разбор не заменяется урезанным
+            _DOCUMENT_CACHE.move_to_end(document.digest)
+            return cached
+        _DOCUMENT_CACHE[document.digest] = document
+        _DOCUMENT_CACHE.move_to_end(document.digest)
+        while len(_DOCUMENT_CACHE) > _DOCUMENT_CACHE_SIZE:
+            _DOCUMENT_CACHE.popitem(last=False)
+    return document
+
+
+def load_document(source: PdfSource, text_only: bool = False) -> ExtractedDocument:
+    """
+    Возвращает разобранный документ: из кэша по хэшу файла
+    или через pdfplumber (PyMuPDF как fallback).
+
+    text_only=True — вызывающему нужен только текст страниц, подходит
+    и урезанный документ из другого процесса.
+    """
+    if isinstance(source, ExtractedDocument):
+        return source
+    digest = file_digest(source)
+    with _DOCUMENT_LOCK:
+        cached = _DOCUMENT_CACHE.get(digest)
+        if cached is not None and cached.text_only and not text_only:
+            cached = None
+        if cached is not None:
+            _DOCUMENT_CACHE.move_to_end(digest)
+    if cached is not None:
+        if cached.path != source:
+            # Тот же файл под другим именем: страницы общие, путь свой
+            return ExtractedDocument(
+                source, digest, cached.pages, cached.ocr, cached.text_only
+            )
+        return cached
+
+    pages: List[Dict[str, Any]] = []
+    if HAS_PDFPLUMBER:
+        try:
+            pages = extract_with_pdfplumber(source)
+            logger.info(f"pdfplumber extracted {len(pages)} pages")
+        except Exception as e:
+            logger.warning(f"pdfplumber failed: {e}")
+    if not pages and HAS_PYMUPDF:
+        try:
+            pages = extract_with_pymupdf(source)
+            logger.info(f"PyMuPDF extracted {len(pages)} pages")
+        except Exception as e:
+            logger.warning(f"PyMuPDF failed: {e}")
+    document = ExtractedDocument(source, digest, pages)
+    if pages:
+        remember_document(document)
+    return document
+
+
 def convert_page_to_image(pdf_path: str, page_num: int, dpi: int = 150) -> bytes:
     """
     Конвертирует страницу PDF в изображение PNG.
@@ -244,6 +332,7 @@ def convert_page_to_image(pdf_path: str, page_num: int, dpi: int = 150) -> bytes
     """
     if not HAS_PYMUPDF:
         raise ImportError("PyMuPDF не установлен")
+    import fitz  # PyMuPDF
 
     doc = fitz.open(pdf_path)
     page = doc[page_num]
@@ -291,6 +380,7 @@ def extract_with_vision_llm(
     if not HAS_PYMUPDF:
         logger.error("PyMuPDF нужен для конвертации PDF в изображения")
         return []
+    import fitz  # PyMuPDF
 
     # Открываем PDF для определения количества страниц
     doc = fitz.open(pdf_path)
@@ -669,7 +759,7 @@ def _call_vision_llm(
 # ============================================================
 
 def extract_pdf_hybrid(
-    pdf_path: str,
+    pdf_path: PdfSource,
     quality_threshold: float = 0.7,
     use_vision_fallback: bool = True
 ) -> List[Dict[str, Any]]:
@@ -682,61 +772,51 @@ def extract_pdf_hybrid(
     3. Если качество всё ещё низкое и включен vision, используем Vision LLM
 
     Args:
-        pdf_path: Путь к PDF файлу
+        pdf_path: Путь к PDF файлу или ExtractedDocument
         quality_threshold: Порог качества для vision fallback (0-1)
         use_vision_fallback: Использовать Vision LLM для плохих страниц
 
     Returns:
         Список данных по страницам
     """
-    results = []
-    low_quality_pages = []
-
-    # Шаг 1: pdfplumber
-    if HAS_PDFPLUMBER:
-        try:
-            results = extract_with_pdfplumber(pdf_path)
-            logger.info(f"pdfplumber extracted {len(results)} pages")
-        except Exception as e:
-            logger.warning(f"pdfplumber failed: {e}")
-
-    # Шаг 2: PyMuPDF fallback
-    if not results and HAS_PYMUPDF:
-        try:
-            results = extract_with_pymupdf(pdf_path)
-            logger.info(f"PyMuPDF extracted {len(results)} pages")
-        except Exception as e:
-            logger.warning(f"PyMuPDF failed: {e}")
-
-    if not results:
+    # Шаги 1-2: pdfplumber / PyMuPDF (один раз на файл, см. load_document)
+    document = load_document(pdf_path)
+    if not document.pages:
         logger.error("No PDF extraction method available")
         return []
+    results = copy.deepcopy(document.pages)
 
     # Определяем страницы с низким качеством
-    for page_data in results:
-        if page_data["text_quality"] < quality_threshold:
-            low_quality_pages.append(page_data["page_num"] - 1)  # 0-indexed
+    low_quality_pages = [
+        page_data["page_num"] - 1  # 0-indexed
+        for page_data in results
+        if page_data["text_quality"] < quality_threshold
+    ]
 
     # Шаг 3: Vision LLM для страниц с низким качеством
     if low_quality_pages and use_vision_fallback:
-        config = get_vision_config()
-        if config["enabled"] and check_vision_model_available(config):
-            logger.info(f"Using Vision LLM for {len(low_quality_pages)} low-quality pages")
+        pending = [idx for idx in low_quality_pages if idx not in document.ocr]
+        config = get_vision_config() if pending else None
+        if config and config["enabled"] and check_vision_model_available(config):
+            logger.info(f"Using Vision LLM for {len(pending)} low-quality pages")
 
             vision_results = extract_with_vision_llm(
-                pdf_path,
-                page_nums=low_quality_pages
+                document.path,
+                page_nums=pending
             )
-
-            # Заменяем результаты для этих страниц
             for vision_page in vision_results:
-                page_idx = vision_page["page_num"] - 1
-                if page_idx < len(results):
-                    # Объединяем данные
-                    results[page_idx]["text"] = vision_page.get("text", results[page_idx]["text"])
-                    results[page_idx]["extracted_data"] = vision_page.get("extracted_data", {})
-                    results[page_idx]["text_quality"] = vision_page.get("text_quality", 0.0)
-                    results[page_idx]["vision_processed"] = True
+                document.ocr[vision_page["page_num"] - 1] = vision_page
+
+        # Заменяем результаты для этих страниц
+        for page_idx in low_quality_pages:
+            vision_page = document.ocr.get(page_idx)
+            if vision_page is None or page_idx >= len(results):
+                continue
+            # Объединяем данные
+            results[page_idx]["text"] = vision_page.get("text", results[page_idx]["text"])
+            results[page_idx]["extracted_data"] = vision_page.get("extracted_data", {})
+            results[page_idx]["text_quality"] = vision_page.get("text_quality", 0.0)
+            results[page_idx]["vision_processed"] = True
 
     return results
 
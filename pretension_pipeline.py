@@ -0,0 +1,140 @@
+"""
+Модель результатов претензионного конвейера с отслеживанием зависимостей.
+
+Каждый этап (группы → сроки оплаты → проценты → замены → документ)
+объявляет, какие поля данных претензии и какие предыдущие этапы он читает.
+Результат этапа хранится вместе с отпечатком входов; при правке одного поля
+пересчитываются только зависящие от него этапы, остальные берутся из кэша.
+"""
+
+import copy
+import hashlib
+import json
+import logging
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import tracing
+
+logger = logging.getLogger(__name__)
+
+# Поля, которые не участвуют в отпечатке «всех данных»
+_INTERNAL_PREFIX = "_"
+
+
+@dataclass
+class Stage:
+    """Описание этапа конвейера."""
+    name: str
+    func: Callable[["StagedPipeline"], Any]
+    fields: Optional[Sequence[str]] = None  # None — зависит от всех полей
+    depends: Sequence[str] = ()
+
+
+def _fingerprint(payload: Any) -> str:
+    raw = json.dumps(payload, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+class StagedPipeline:
+    """
+    Вычисляет этапы лениво и переиспользует результаты из cache,
+    если отпечаток входов этапа не изменился.
+
+    cache — обычный словарь (например, кэш пользователя в памяти
+    процесса), поэтому состояние переживает повторные вызовы обработчика.
+    """
+
+    def __init__(
+        self,
+        stages: Sequence[Stage],
+        data: Dict[str, Any],
+        cache: Optional[Dict[str, Any]] = None,
+        inputs: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        self.stages: Dict[str, Stage] = {stage.name: stage for stage in stages}
+        self.data = data
+        # Внешние входы, не хранящиеся в данных претензии (например, текущая дата)
+        self.inputs = inputs or {}
+        self.cache = cache if cache is not None else {}
+        self.cache.setdefault("stages", {})
+        self.cache.setdefault("memo", {})
+        self._fingerprints: Dict[str, str] = {}
+        self.recomputed: List[str] = []
+
+    def _field_values(self, stage: Stage) -> Dict[str, Any]:
+        if stage.fields is None:
+            values = {
+                key: value for key, value in self.data.items()
+                if not str(key).startswith(_INTERNAL_PREFIX)
+            }
+            values.update(self.inputs)
+            return values
+        return {
+            key: self.inputs[key] if key in self.inputs else self.data.get(key)
+            for key in stage.fields
+        }
+
+    def fingerprint(self, name: str) -> str:
+        if name in self._fingerprints:
+            return self._fingerprints[name]
+        stage = self.stages[name]
+        payload = {
+            "fields": self._field_values(stage),
+            "depends": {dep: self.fingerprint(dep) for dep in stage.depends},
+        }
+        value = _fingerprint(payload)
+        self._fingerprints[name] = value
+        return value
+
+    def get(self, name: str) -> Any:
+        """Возвращает результат этапа, пересчитывая его только при необходимости."""
+        fingerprint = self.fingerprint(name)
+        cached = self.cache["stages"].get(name)
+        if cached and cached.get("fingerprint") == fingerprint:
+            tracing.count("stage_cache_hits")
+            return copy.deepcopy(cached["value"])
+        with tracing.span(f"stage:{name}"):
+            value = self.stages[name].func(self)
+        self.cache["stages"][name] = {
+            "fingerprint": fingerprint,
+            "value": copy.deepcopy(value),
+        }
+        self.recomputed.append(name)
+        logger.info("Этап претензии пересчитан: %s", name)
+        return value
+
+    def affected_by(self, fields: Sequence[str]) -> List[str]:
+        """Этапы, которые затронет изменение указанных полей."""
+        changed = set(fields)
+        affected: List[str] = []
+
+        def touches(stage: Stage) -> bool:
+            if stage.fields is None or changed.intersection(stage.fields):
+                return True
+            return any(dep in affected for dep in stage.depends)
+
+        pending = list(self.stages.values())
+        progress = True
+        while progress:
+            progress = False
+            for stage in list(pending):
+                if touches(stage):
+                    affected.append(stage.name)
+                    pending.remove(stage)
+                    progress = True
+        return [name for name in self.stages if name in affected]
+
+    def update(self, field_name: str, value: Any) -> List[str]:
+        """Меняет поле и возвращает список этапов, которые будут пересчитаны."""
+        self.data[field_name] = value
+        self._fingerprints.clear()
+        return self.affected_by([field_name])
+
+    def memo(self, namespace: str, key: Any, func: Callable[[], Any]) -> Any:
+        """Кэширует вспомогательный результат (например, ответ LLM) по ключу."""
+        bucket = self.cache["memo"].setdefault(namespace, {})
+        memo_key = _fingerprint(key)
+        if memo_key not in bucket:
+            bucket[memo_key] = func()
+        return bucket[memo_key]
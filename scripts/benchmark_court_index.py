@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк определения суда по адресу: индекс court_index против прежнего
+линейного поиска подстрок по базе судов и CITY_TO_REGION.
+
+Адреса берутся из файла (--addresses, по одному на строку); без файла —
+адреса судов из courts_database.json и их варианты с городами из
+CITY_TO_REGION (улицы, индексы, сокращения).
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from court_index import CourtIndex  # noqa: E402
+from courts_code import ARBITRATION_COURTS, CITY_TO_REGION  # noqa: E402
+
+STREETS = ("ул. Ленина", "ул. Кирова", "пр-т Мира", "ул. Московская", "ш. Энтузиастов")
+
+
+def legacy_resolve(address: str) -> Optional[str]:
+    """Прежний алгоритм: подстрока региона, затем подстрока города."""
+    lowered = address.lower()
+    for region in ARBITRATION_COURTS:
+        if region.lower() in lowered:
+            return region
+    for city, region in CITY_TO_REGION.items():
+        if city in lowered and region in ARBITRATION_COURTS:
+            return region
+    return None
+
+
+def synthetic_addresses(count: int, seed: int) -> List[str]:
+    rng = random.Random(seed)
+    base = [info["address"] for info in ARBITRATION_COURTS.values()]
+    cities = list(CITY_TO_REGION)
+    addresses = list(base)
+    while len(addresses) < count:
+        city = rng.choice(cities).title()
+        street = rng.choice(STREETS)
+        house = rng.randint(1, 120)
+        postal = f"{rng.randint(101, 694):03d}{rng.randint(0, 999):03d}"
+        template = rng.choice((
+            "{postal}, г. {city}, {street}, д. {house}",
+            "г {city}, {street} {house}",
+            "{postal}, Россия, {city}, {street}, стр. {house}",
+            "{postal}, {street}, д. {house}",
+        ))
+        addresses.append(template.format(
+            postal=postal, city=city, street=street, house=house
+        ))
+    return addresses[:count]
+
+
+def timed(func, addresses: List[str], repeat: int) -> Tuple[float, Dict[str, Optional[str]]]:
+    results: Dict[str, Optional[str]] = {}
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for address in addresses:
+            results[address] = func(address)
+    return time.perf_counter() - started, results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Бенчмарк индекса судов по адресу.")
+    parser.add_argument("--addresses", help="Файл с адресами, по одному на строку.")
+    parser.add_argument("--count", type=int, default=3000, help="Число синтетических адресов.")
+    parser.add_argument("--repeat", type=int, default=5, help="Повторов прохода.")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--show", type=int, default=10, help="Сколько расхождений показать.")
+    args = parser.parse_args()
+
+    if args.addresses:
+        lines = Path(args.addresses).read_text(encoding="utf-8").splitlines()
+        addresses = [line.strip() for line in lines if line.strip()]
+    else:
+        addresses = synthetic_addresses(args.count, args.seed)
+
+    started = time.perf_counter()
+    index = CourtIndex(ARBITRATION_COURTS, CITY_TO_REGION)
+    build_time = time.perf_counter() - started
+
+    def indexed(address: str) -> Optional[str]:
+        match = index.resolve(address)
+        return match.region if match else None
+
+    legacy_time, legacy = timed(legacy_resolve, addresses, args.repeat)
+    index_time, indexed_results = timed(indexed, addresses, args.repeat)
+    calls = len(addresses) * args.repeat
+
+    print(f"Адресов: {len(addresses)}, повторов: {args.repeat}")
+    print(f"Построение индекса: {build_time * 1000:.1f} мс")
+    print(f"Линейный поиск: {legacy_time / calls * 1e6:.1f} мкс/адрес")
+    print(f"Индекс:         {index_time / calls * 1e6:.1f} мкс/адрес")
+    print(
+        "Найдено: линейный {} / индекс {}".format(
+            sum(1 for value in legacy.values() if value),
+            sum(1 for value in indexed_results.values() if value),
+        )
+    )
+    differences = [
+        address for address in addresses
+        if legacy[address] != indexed_results[address]
+    ]
+    print(f"Расхождений: {len(differences)}")
+    for address in differences[:args.show]:
+        match = index.resolve(address)
+        evidence = f"{match.source}: {match.evidence}" if match else "-"
+        print(f"  {address!r}: {legacy[address]} -> {indexed_results[address]} ({evidence})")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
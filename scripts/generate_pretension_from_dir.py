@@ -2,20 +2,26 @@
 # -*- coding: utf-8 -*-
 
 import argparse
+import contextlib
 import json
+import multiprocessing
 import os
 import re
 import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime, timedelta
 from decimal import Decimal
 from pathlib import Path
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 
 ROOT = Path(__file__).resolve().parents[1]
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
 import main as m
+import tracing
 
 
 def log(message: str) -> None:
@@ -82,6 +88,28 @@ def parse_args() -> argparse.Namespace:
         action="store_true",
         help="Skip LLM in special cases analysis.",
     )
+    parser.add_argument(
+        "--input-dirs",
+        nargs="+",
+        default=[],
+        help="Batch mode: several debtor directories, one pretension per directory.",
+    )
+    parser.add_argument(
+        "--manifest",
+        default="",
+        help="Batch mode: JSON list or text file (one directory per line).",
+    )
+    parser.add_argument(
+        "--output-dir",
+        default="",
+        help="Batch mode output directory. Default: isk_outputs/batch_<timestamp>",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=min(4, os.cpu_count() or 1),
+        help="Batch mode: number of worker processes.",
+    )
     return parser.parse_args()
 
 
@@ -343,33 +371,41 @@ def extract_prior_pretensions(pages_by_file: dict) -> List[dict]:
     return pretensions
 
 
-def main() -> int:
-    args = parse_args()
-    input_dir = Path(args.input_dir)
+class CaseError(Exception):
+    """Folder cannot be processed (missing directory, no PDFs)."""
+
+
+def generate_pretension(
+    input_dir: Path,
+    args: argparse.Namespace,
+    output_path: Optional[Path] = None
+) -> str:
     if not input_dir.exists():
-        print(f"Input directory not found: {input_dir}")
-        return 1
+        raise CaseError(f"Input directory not found: {input_dir}")
 
     files = collect_pdfs(input_dir)
     if not files:
-        print(f"No PDF files found in {input_dir}")
-        return 1
+        raise CaseError(f"No PDF files found in {input_dir}")
 
     log(f"Found {len(files)} PDF files in {input_dir}")
+    tracing.stage("extraction", files=len(files))
     combined_text, all_pages, low_pages_info, pages_by_file = build_combined_text(
         files,
         args.use_vision,
         args.fast
     )
     log(f"Extracted {len(all_pages)} pages")
+    tracing.count("pages", len(all_pages))
 
     if args.skip_sliding_window:
         claim_data = {}
     else:
         log("Parsing documents with sliding window")
+        tracing.stage("sliding_window")
         claim_data = m.parse_documents_with_sliding_window(combined_text)
         if not args.no_llm_fallback:
             log("Applying LLM fallback")
+            tracing.stage("llm_fallback")
             claim_data = m.apply_llm_fallback(combined_text, claim_data)
 
     if args.no_document_groups_llm or args.skip_sliding_window:
@@ -378,6 +414,7 @@ def main() -> int:
         )
     else:
         log("Building document groups with LLM")
+        tracing.stage("document_groups")
         claim_data["document_groups"] = m.build_document_groups(
             combined_text,
             claim_data
@@ -406,6 +443,7 @@ def main() -> int:
     ) or all_pages
 
     log("Extracting applications")
+    tracing.stage("documents")
     allow_transport_llm = not args.no_transport_llm
     applications = m.extract_applications_from_pages(
         app_pages,
@@ -438,6 +476,7 @@ def main() -> int:
 
     if args.use_vision and low_pages_info:
         log("Enriching cargo docs with vision")
+        tracing.stage("vision_cargo")
         cargo_docs = m.enrich_cargo_docs_with_vision(
             cargo_docs,
             [{"path": str(path), "name": path.name} for path in files],
@@ -445,6 +484,7 @@ def main() -> int:
         )
 
     log("Extracting shipments")
+    tracing.stage("shipments")
     shipments = m.extract_cdek_shipments_from_pages(shipment_pages)
     shipments.extend(m.extract_postal_shipments_from_pages(shipment_pages))
     shipments, manual_used = apply_manual_shipments(shipments, input_dir)
@@ -452,25 +492,10 @@ def main() -> int:
     # Обогащаем почтовые отправления через API Почты России (если настроено)
     config = m.get_russian_post_config()
     if shipments and config.get("enabled") and not manual_used:
-        for shipment in shipments:
-            if m.normalize_shipping_source(shipment.get("source")) != "post":
-                continue
-            track = shipment.get("track_number") or ""
-            if not m.is_valid_tracking_number(track):
-                continue
-            try:
-                records = m.fetch_russian_post_operations(track)
-                shipment["api_records"] = len(records)
-                send_date, receive_date = m.extract_tracking_dates(records)
-                if receive_date:
-                    shipment["received_date"] = m.parse_date_str(receive_date) or receive_date
-                    shipment["received_date_str"] = receive_date
-                if send_date:
-                    shipment["send_date"] = send_date
-            except Exception:
-                continue
+        m.apply_tracking_to_shipments(shipments)
 
     log("Extracting payment terms")
+    tracing.stage("groups")
     payment_terms_by_application = {}
     allow_payment_llm = not args.no_payment_llm
     if not args.skip_application_terms:
@@ -557,6 +582,7 @@ def main() -> int:
                 if payment_days and not group.get("payment_days"):
                     group["payment_days"] = payment_days
 
+    tracing.stage("parties")
     parties = m.extract_parties_from_pages(all_pages)
     if parties:
         m.apply_extracted_parties(claim_data, parties)
@@ -588,6 +614,7 @@ def main() -> int:
     if total_debt > 0:
         claim_data["debt"] = m.format_money(total_debt, 2)
 
+    tracing.stage("awareness")
     use_awareness_llm = not args.no_awareness_llm
     original_debt_decimal = Decimal(str(total_debt)) if total_debt > 0 else None
     awareness_result = m.analyze_documents_for_special_cases(
@@ -709,6 +736,7 @@ def main() -> int:
     except ValueError:
         payment_days_val = 0
 
+    tracing.stage("interest")
     interest_data = {"total_interest": 0.0, "detailed_calc": []}
     has_group_payment_days = False
     if groups:
@@ -765,6 +793,7 @@ def main() -> int:
         else:
             payment_terms_text = "Не указано"
 
+    tracing.stage("texts")
     payment_terms_text = m.build_payment_terms_summary(
         groups,
         payment_terms_text,
@@ -880,9 +909,9 @@ def main() -> int:
     else:
         replacements["{awareness_block}"] = ""
 
-    if args.output:
+    if output_path is None and args.output:
         output_path = Path(args.output)
-    else:
+    if output_path is None:
         output_dir = Path("isk_outputs")
         output_dir.mkdir(parents=True, exist_ok=True)
         stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -910,6 +939,7 @@ def main() -> int:
             for attachment in pretension.get("attachments") or []:
                 protected_values.append(attachment)
 
+    tracing.stage("docx")
     result_docx = m.create_pretension_document(
         claim_data,
         interest_data,
@@ -921,6 +951,165 @@ def main() -> int:
     )
 
     log(f"Generated: {result_docx}")
+    return str(result_docx)
+
+
+def load_manifest(manifest_path: Path) -> List[dict]:
+    """Reads a batch manifest: JSON list (paths or objects) or plain text."""
+    raw = manifest_path.read_text(encoding="utf-8")
+    if manifest_path.suffix.lower() == ".json":
+        entries = []
+        for item in json.loads(raw):
+            if isinstance(item, str):
+                entries.append({"input_dir": item})
+            elif isinstance(item, dict) and item.get("input_dir"):
+                entries.append(item)
+        return entries
+    return [
+        {"input_dir": line.strip()}
+        for line in raw.splitlines()
+        if line.strip() and not line.strip().startswith("#")
+    ]
+
+
+def collect_batch_cases(args: argparse.Namespace, output_dir: Path) -> List[dict]:
+    entries = [{"input_dir": path} for path in args.input_dirs]
+    if args.manifest:
+        entries.extend(load_manifest(Path(args.manifest)))
+    cases = []
+    used_names = set()
+    for entry in entries:
+        input_dir = Path(entry["input_dir"])
+        name = input_dir.name or "case"
+        base_name = name
+        index = 2
+        while name in used_names:
+            name = f"{base_name}_{index}"
+            index += 1
+        used_names.add(name)
+        output = entry.get("output") or str(output_dir / f"{name}.docx")
+        cases.append({
+            "name": name,
+            "input_dir": str(input_dir),
+            "output": output,
+            "log": str(output_dir / f"{name}.log"),
+        })
+    return cases
+
+
+def warm_shared_caches() -> None:
+    """Loads key rates and work calendars once, before workers start."""
+    from calc_395 import get_key_rates_from_395gk
+
+    started = time.perf_counter()
+    get_key_rates_from_395gk()
+    current_year = datetime.now().year
+    for year in range(current_year - 2, current_year + 1):
+        m.load_work_calendar(year)
+    log(f"Caches warmed in {time.perf_counter() - started:.1f}s")
+
+
+def run_case(case: dict, args: argparse.Namespace) -> dict:
+    """Worker entry point: generates one pretension, never raises."""
+    started = time.perf_counter()
+    result = dict(case, status="ok", error="")
+    Path(case["output"]).parent.mkdir(parents=True, exist_ok=True)
+    with open(case["log"], "w", encoding="utf-8") as handle:
+        with contextlib.redirect_stdout(handle):
+            try:
+                with tracing.trace(f"generate_pretension:{case['name']}"):
+                    result["output"] = generate_pretension(
+                        Path(case["input_dir"]),
+                        args,
+                        output_path=Path(case["output"])
+                    )
+            except Exception as exc:
+                result["status"] = "failed"
+                result["error"] = f"{type(exc).__name__}: {exc}"
+                traceback.print_exc(file=handle)
+    result["seconds"] = round(time.perf_counter() - started, 2)
+    return result
+
+
+def run_batch(args: argparse.Namespace) -> int:
+    if args.output_dir:
+        output_dir = Path(args.output_dir)
+    else:
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        output_dir = Path("isk_outputs") / f"batch_{stamp}"
+    output_dir.mkdir(parents=True, exist_ok=True)
+    cases = collect_batch_cases(args, output_dir)
+    if not cases:
+        print("No input directories given for batch mode")
+        return 1
+
+    started = time.perf_counter()
+    warm_shared_caches()
+    workers = max(1, min(args.workers, len(cases)))
+    log(f"Processing {len(cases)} directories with {workers} workers")
+
+    results = []
+    if workers == 1:
+        for case in cases:
+            results.append(run_case(case, args))
+            log(f"{case['name']}: {results[-1]['status']}")
+    else:
+        # fork: workers inherit imported main and warmed in-memory caches
+        context = (
+            multiprocessing.get_context("fork")
+            if "fork" in multiprocessing.get_all_start_methods() else None
+        )
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            futures = {pool.submit(run_case, case, args): case for case in cases}
+            for future in as_completed(futures):
+                case = futures[future]
+                try:
+                    result = future.result()
+                except Exception as exc:
+                    result = dict(
+                        case,
+                        status="failed",
+                        error=f"{type(exc).__name__}: {exc}",
+                        seconds=0.0,
+                    )
+                results.append(result)
+                log(f"{case['name']}: {result['status']} ({result['seconds']}s)")
+
+    order = {case["name"]: index for index, case in enumerate(cases)}
+    results.sort(key=lambda item: order[item["name"]])
+    failed = [item for item in results if item["status"] != "ok"]
+    report = {
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "workers": workers,
+        "total_seconds": round(time.perf_counter() - started, 2),
+        "succeeded": len(results) - len(failed),
+        "failed": len(failed),
+        "cases": results,
+    }
+    report_path = output_dir / "batch_report.json"
+    with open(report_path, "w", encoding="utf-8") as handle:
+        json.dump(report, handle, ensure_ascii=False, indent=2)
+
+    for item in failed:
+        log(f"FAILED {item['name']}: {item['error']}")
+    log(
+        f"Done: {report['succeeded']} ok, {report['failed']} failed "
+        f"in {report['total_seconds']}s. Report: {report_path}"
+    )
+    return 1 if failed else 0
+
+
+def main() -> int:
+    args = parse_args()
+    if args.input_dirs or args.manifest:
+        return run_batch(args)
+    input_dir = Path(args.input_dir)
+    try:
+        with tracing.trace(f"generate_pretension:{input_dir.name}"):
+            generate_pretension(input_dir, args)
+    except CaseError as exc:
+        print(exc)
+        return 1
     return 0
 
 
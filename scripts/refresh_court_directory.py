@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Загрузка карточек DaData в справочник судов (COURT_DIRECTORY_PATH).
+
+Без аргументов обновляет все суды из courts_database.json; с --max-age-days
+— только записи старше указанного срока. Нужен настроенный DADATA_API_KEY.
+"""
+
+import argparse
+import logging
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import main as bot  # noqa: E402
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Обновление справочника судов из DaData.")
+    parser.add_argument(
+        "--max-age-days",
+        type=float,
+        default=None,
+        help="Обновлять только записи старше N дней."
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if not bot.get_dadata_court_config().get("enabled"):
+        print("DaData не настроена (DADATA_API_KEY)")
+        return 1
+    updated = bot.refresh_court_directory(args.max_age_days)
+    print(f"Обновлено записей: {updated}")
+    print(f"Справочник: {bot.COURT_DIRECTORY.path}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,96 @@
+"""
+Хранение состояния ConversationHandler и user_data между перезапусками бота.
+
+Сессии без активности дольше TTL удаляются из файла при загрузке. Сессия
+без отметки активности (ещё не сохранённая обработчиками) просроченной
+не считается: при загрузке ей ставится текущее время. Модуль импортирует
+telegram.ext и подключается только при запуске бота.
+"""
+
+import logging
+import time
+from typing import Any, Dict
+
+from telegram.ext import PersistenceInput, PicklePersistence
+
+from session_store import SESSION_TS_KEY
+
+logger = logging.getLogger(__name__)
+
+
+class ExpiringPicklePersistence(PicklePersistence):
+    """PicklePersistence, забывающий сессии без активности дольше ttl_seconds."""
+
+    def __init__(self, filepath: str, ttl_seconds: float = 0, **kwargs: Any) -> None:
+        kwargs.setdefault(
+            "store_data",
+            PersistenceInput(bot_data=False, chat_data=False, callback_data=False)
+        )
+        super().__init__(filepath, **kwargs)
+        self.ttl_seconds = float(ttl_seconds or 0)
+
+    def _is_expired(self, data: Any, now: float) -> bool:
+        if self.ttl_seconds <= 0 or not isinstance(data, dict):
+            return False
+        stamp = data.get(SESSION_TS_KEY)
+        if stamp is None:
+            return False
+        return now - float(stamp) > self.ttl_seconds
+
+    async def _drop_expired(self) -> None:
+        """Удаляет просроченные сессии и их диалоги из сохраняемых данных."""
+        stored = self.user_data or {}
+        now = time.time()
+        for user_data in stored.values():
+            # Отсчёт TTL для сессий без отметки — с момента загрузки
+            if isinstance(user_data, dict):
+                user_data.setdefault(SESSION_TS_KEY, now)
+        expired = [
+            user_id for user_id, user_data in stored.items()
+            if self._is_expired(user_data, now)
+        ]
+        expired_ids = set(expired)
+        dropped_conversations = 0
+        for conversations in (self.conversations or {}).values():
+            for key in list(conversations):
+                if key and key[-1] in expired_ids:
+                    del conversations[key]
+                    dropped_conversations += 1
+        if not expired and not dropped_conversations:
+            return
+        logger.info(
+            "Устаревших сессий отброшено: %s, диалогов: %s",
+            len(expired),
+            dropped_conversations
+        )
+        for user_id in expired[:-1]:
+            stored.pop(user_id, None)
+        if expired:
+            # drop_user_data сохраняет файл с учётом всех удалений
+            await self.drop_user_data(expired[-1])
+        else:
+            await self.flush()
+
+    async def get_user_data(self) -> Dict[int, Any]:
+        data = await super().get_user_data()
+        await self._drop_expired()
+        restored = {}
+        for user_id in self.user_data or {}:
+            user_data = data[user_id]
+            if isinstance(user_data, dict):
+                user_data.pop(SESSION_TS_KEY, None)
+            restored[user_id] = user_data
+        return restored
+
+    async def update_user_data(self, user_id: int, data: Any) -> None:
+        if isinstance(data, dict) and data:
+            # Отметка активности — только в сохраняемой копии, обработчики её не видят
+            data = {**data, SESSION_TS_KEY: time.time()}
+        await super().update_user_data(user_id, data)
+
+    async def get_conversations(self, name: str) -> Dict[Any, Any]:
+        await super().get_conversations(name)
+        if self.user_data is None:
+            await super().get_user_data()
+        await self._drop_expired()
+        return await super().get_conversations(name)
@@ -0,0 +1,91 @@
+"""
+Сохранение состояния диалогов и результатов извлечения между перезапусками бота.
+
+Состояние ConversationHandler и user_data хранятся через
+session_persistence.ExpiringPicklePersistence (модуль импортирует telegram
+и поэтому вынесен отдельно). Результаты извлечения текста из загруженных PDF
+(страницы, список плохо распознанных страниц, OCR) хранятся в сжатых
+JSON-файлах по хэшу содержимого файла.
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+SESSION_TS_KEY = "_session_ts"
+
+
+def file_digest(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    """SHA-1 содержимого файла."""
+    digest = hashlib.sha1()
+    with open(file_path, "rb") as handle:
+        for chunk in iter(lambda: handle.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ExtractionStore:
+    """Сжатые результаты извлечения текста, ключ — хэш содержимого файла."""
+
+    def __init__(self, directory: Optional[str], ttl_seconds: float = 0) -> None:
+        self.directory = directory
+        self.ttl_seconds = float(ttl_seconds or 0)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory or "", f"{key}.json.gz")
+
+    def _is_expired(self, path: str, now: float) -> bool:
+        if self.ttl_seconds <= 0:
+            return False
+        return now - os.path.getmtime(path) > self.ttl_seconds
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        if not self.directory or not key:
+            return None
+        path = self._path(key)
+        try:
+            if self._is_expired(path, time.time()):
+                os.remove(path)
+                return None
+            with gzip.open(path, "rt", encoding="utf-8") as handle:
+                return json.load(handle)
+        except FileNotFoundError:
+            return None
+        except Exception as exc:
+            logger.warning("Ошибка чтения результатов извлечения %s: %s", path, exc)
+            return None
+
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        if not self.directory or not key:
+            return
+        path = self._path(key)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            with gzip.open(tmp_path, "wt", encoding="utf-8") as handle:
+                json.dump(value, handle, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except Exception as exc:
+            logger.warning("Ошибка сохранения результатов извлечения %s: %s", path, exc)
+
+    def prune(self) -> int:
+        """Удаляет просроченные записи, возвращает их количество."""
+        if not self.directory or not os.path.isdir(self.directory):
+            return 0
+        removed = 0
+        now = time.time()
+        for filename in os.listdir(self.directory):
+            path = os.path.join(self.directory, filename)
+            try:
+                if os.path.isfile(path) and self._is_expired(path, now):
+                    os.remove(path)
+                    removed += 1
+            except OSError as exc:
+                logger.warning("Не удалось удалить %s: %s", path, exc)
+        return removed
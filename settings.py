@@ -0,0 +1,149 @@
+"""
+Настройки LLM/Vision, загружаемые из окружения и .env один раз на процесс.
+
+get_settings() возвращает закэшированный объект, reload_settings() заново
+читает .env (значения из файла перекрывают прежние) и пересобирает его.
+В боте перечитывание повешено на SIGHUP: install_reload_signal().
+"""
+
+import logging
+import os
+import signal
+import threading
+from dataclasses import dataclass
+from typing import Optional
+
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+
+_TRUE_VALUES = ("1", "true", "yes", "on")
+
+
+def _env_str(name: str, default: str = "") -> str:
+    value = os.getenv(name)
+    return value if value is not None else default
+
+
+def _env_flag(name: str) -> Optional[bool]:
+    """True/False для заданной переменной, None — если она не задана."""
+    raw = os.getenv(name)
+    if raw is None or not raw.strip():
+        return None
+    return raw.strip().lower() in _TRUE_VALUES
+
+
+def _env_positive_int(name: str, default: Optional[int] = None) -> Optional[int]:
+    """
+    Положительное целое из переменной, default — если она не задана.
+    Ноль, отрицательные и нечисловые значения отклоняются: иначе
+    `value or default` у потребителей молча подменял бы их значением
+    по умолчанию.
+    """
+    raw = os.getenv(name)
+    if raw is None or not raw.strip():
+        return default
+    try:
+        value = int(raw)
+    except ValueError:
+        value = 0
+    if value <= 0:
+        raise ValueError(f"{name} должен быть положительным числом, получено {raw!r}")
+    return value
+
+
+@dataclass(frozen=True)
+class Settings:
+    """Параметры Ollama для текстовой и Vision-моделей."""
+
+    base_url: str
+    llm_enabled: Optional[bool]
+    llm_model: Optional[str]
+    llm_model_large: Optional[str]
+    llm_timeout: Optional[int]
+    llm_max_chars: Optional[int]
+    vision_enabled: Optional[bool]
+    vision_llm_enabled: Optional[bool]
+    vision_model: Optional[str]
+    vision_timeout: int
+    vision_max_pages: int
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        base_url = (
+            _env_str("OLLAMA_BASE_URL")
+            or _env_str("OLLAMA_HOST")
+            or ""
+        ).strip().rstrip("/")
+        llm_model = os.getenv("OLLAMA_MODEL")
+        llm_model_large = os.getenv("OLLAMA_MODEL_LARGE")
+        vision_model = os.getenv("OLLAMA_VISION_MODEL")
+        return cls(
+            base_url=base_url,
+            llm_enabled=_env_flag("LLM_ENABLED"),
+            llm_model=llm_model.strip() if llm_model is not None else None,
+            llm_model_large=(
+                llm_model_large.strip() if llm_model_large is not None else None
+            ),
+            llm_timeout=_env_positive_int("OLLAMA_TIMEOUT"),
+            llm_max_chars=_env_positive_int("OLLAMA_MAX_CHARS"),
+            vision_enabled=_env_flag("LLM_VISION_ENABLED"),
+            vision_llm_enabled=_env_flag("VISION_LLM_ENABLED"),
+            vision_model=vision_model.strip() if vision_model is not None else None,
+            vision_timeout=_env_positive_int("OLLAMA_VISION_TIMEOUT", 120),
+            vision_max_pages=_env_positive_int("OLLAMA_VISION_MAX_PAGES", 5),
+        )
+
+    def enabled(self, *flags: Optional[bool]) -> bool:
+        """Первый заданный флаг; если ни один не задан — есть ли base_url."""
+        for flag in flags:
+            if flag is not None:
+                return flag
+        return bool(self.base_url)
+
+
+_SETTINGS: Optional[Settings] = None
+_LOCK = threading.Lock()
+
+
+def get_settings() -> Settings:
+    """Настройки процесса; .env читается только при первом обращении."""
+    global _SETTINGS
+    settings = _SETTINGS
+    if settings is None:
+        with _LOCK:
+            if _SETTINGS is None:
+                load_dotenv()
+                _SETTINGS = Settings.from_env()
+            settings = _SETTINGS
+    return settings
+
+
+def reload_settings() -> Settings:
+    """Перечитывает .env и окружение."""
+    global _SETTINGS
+    with _LOCK:
+        load_dotenv(override=True)
+        _SETTINGS = Settings.from_env()
+        settings = _SETTINGS
+    logger.info("Настройки перечитаны")
+    return settings
+
+
+def install_reload_signal() -> bool:
+    """Перечитывать настройки по SIGHUP (если сигнал есть на платформе)."""
+    if not hasattr(signal, "SIGHUP"):
+        return False
+
+    def _handler(signum, frame):
+        try:
+            reload_settings()
+        except Exception as exc:
+            logger.warning("Не удалось перечитать настройки: %s", exc)
+
+    try:
+        signal.signal(signal.SIGHUP, _handler)
+    except ValueError:
+        # Не главный поток
+        return False
+    return True
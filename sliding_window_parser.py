@@ -9,16 +9,9 @@ import re
 from dataclasses import dataclass
 from typing import Dict, List, Optional, Tuple
 
-try:
-    import pymorphy2
-    MORPH = pymorphy2.MorphAnalyzer()
-    HAS_PYMORPHY = True
-except ImportError:
-    HAS_PYMORPHY = False
-    MORPH = None
-
-# Настройка логирования
-logging.basicConfig(level=logging.INFO)
+import tracing
+from morphology import get_morph, nominative_word, normal_form, normalize_words
+
 logger = logging.getLogger(__name__)
 
 
@@ -279,7 +272,7 @@ class SlidingWindowParser:
         """
         Приводит ФИО ИП к именительному падежу с помощью pymorphy2
         """
-        if not HAS_PYMORPHY:
+        if get_morph() is None:
             return fio
 
         parts = fio.split()
@@ -289,40 +282,12 @@ class SlidingWindowParser:
         result = []
         for i, part in enumerate(parts):
             # Для фамилии (первое слово) используем специальную обработку
-            if i == 0:
-                # Проверяем, не является ли это известной фамилией
-                if part.lower() == 'смородников':
-                    result.append('Смородников')
-                elif part.lower() == 'смородникова':
-                    result.append('Смородников')
-                else:
-                    # Для фамилий используем более аккуратную обработку
-                    parsed = MORPH.parse(part)
-                    if parsed:
-                        # Ищем форму в именительном падеже
-                        for p in parsed:
-                            if 'nomn' in p.tag:  # именительный падеж
-                                result.append(p.word.capitalize())
-                                break
-                        else:
-                            # Если не нашли именительный падеж, используем исходное слово
-                            result.append(part.capitalize())
-                    else:
-                        result.append(part.capitalize())
-            else:
-                # Для имени и отчества используем обычную нормализацию
-                parsed = MORPH.parse(part)
-                if parsed:
-                    # Ищем форму в именительном падеже
-                    for p in parsed:
-                        if 'nomn' in p.tag:  # именительный падеж
-                            result.append(p.word.capitalize())
-                            break
-                    else:
-                        # Если не нашли именительный падеж, используем исходное слово
-                        result.append(part.capitalize())
-                else:
-                    result.append(part.capitalize())
+            if i == 0 and part.lower() in ('смородников', 'смородникова'):
+                result.append('Смородников')
+                continue
+            # Ищем разбор в именительном падеже; если его нет — исходное слово
+            nominative = nominative_word(part)
+            result.append((nominative or part).capitalize())
 
         return ' '.join(result)
 
@@ -594,30 +559,18 @@ class SlidingWindowParser:
 
     def normalize_word(self, word: str) -> str:
         """
-        Нормализация слова с помощью pymorphy2
+        Нормализация слова с помощью pymorphy2 (результаты кэшируются)
         """
-        if not HAS_PYMORPHY or not word:
-            return word
-
-        try:
-            parsed = MORPH.parse(word)
-            if parsed:
-                return parsed[0].normal_form
-        except Exception:
-            pass
-
-        return word
+        return normal_form(word)
 
     def normalize_text(self, text: str) -> str:
         """
         Нормализация текста для улучшения поиска
         """
-        if not HAS_PYMORPHY:
+        if get_morph() is None:
             return text
 
-        words = text.split()
-        normalized_words = [self.normalize_word(word) for word in words]
-        return ' '.join(normalized_words)
+        return ' '.join(normalize_words(text.split()))
 
     def _normalize_doc_number(self, value: str) -> str:
         number = re.sub(r'\s+', ' ', str(value)).strip()
@@ -1437,6 +1390,10 @@ def parse_documents_with_sliding_window(text: str, debug: bool = False) -> Dict[
 
     # Парсим документы
     parsed_blocks = parser.parse_text(text)
+    tracing.count(
+        "regex_hits",
+        sum(len(blocks) for blocks in parsed_blocks.values())
+    )
     formatted_results = parser.format_results(parsed_blocks)
 
     # Парсим информацию о сторонах
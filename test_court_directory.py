@@ -0,0 +1,143 @@
+"""
+Тесты справочника судов.
+"""
+
+import os
+import tempfile
+import time
+import unittest
+
+from court_directory import CourtDirectory
+
+COURTS = {
+    "Тверская область": {
+        "name": "Арбитражный суд Тверской области",
+        "address": "170100, г. Тверь, ул. Советская, д. 23",
+    },
+    "Омская область": {
+        "name": "Арбитражный суд Омской области",
+        "address": "644024, г. Омск, ул. Учебная, д. 51",
+    },
+}
+
+
+def fake_fetch(calls):
+    def fetch(name):
+        calls.append(name)
+        suggestion = {"value": name, "data": {"code": "A66"}}
+        card = {
+            "name": name,
+            "address": "170100, Тверская обл., г. Тверь, ул. Советская, д. 23",
+            "code": "A66",
+            "website": "tver.arbitr.ru",
+        }
+        return card, suggestion
+    return fetch
+
+
+class TestCourtDirectory(unittest.TestCase):
+    """Тесты локального справочника судов без сети"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "court_directory.json")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_lookup_from_base(self):
+        """Тест: суды из базы находятся без карточек DaData"""
+        directory = CourtDirectory(self.path, COURTS)
+        record = directory.lookup("арбитражный  суд «Омской» области")
+        self.assertEqual(record["region"], "Омская область")
+        self.assertNotIn("refreshed_at", record)
+        self.assertIsNone(directory.lookup("Суд по интеллектуальным правам"))
+
+    def test_import_and_reload(self):
+        """Тест: загруженные карточки сохраняются и читаются без запросов"""
+        calls = []
+        directory = CourtDirectory(self.path, {"Тверская область": COURTS["Тверская область"]})
+        self.assertEqual(directory.import_dadata(fake_fetch(calls)), 1)
+        self.assertEqual(calls, ["Арбитражный суд Тверской области"])
+
+        reloaded = CourtDirectory(self.path, COURTS)
+        record = reloaded.lookup("Арбитражный суд Тверской области")
+        self.assertEqual(record["website"], "tver.arbitr.ru")
+        self.assertEqual(reloaded.lookup_code("A66")["region"], "Тверская область")
+        self.assertEqual(reloaded.lookup_code("A66")["suggestion"]["data"]["code"], "A66")
+
+    def test_import_only_stale(self):
+        """Тест: свежие записи при обновлении не запрашиваются"""
+        calls = []
+        directory = CourtDirectory(self.path, COURTS)
+        directory.update("Тверская область", {"name": "Арбитражный суд Тверской области"})
+        directory.import_dadata(fake_fetch(calls), max_age_seconds=3600)
+        self.assertEqual(calls, ["Арбитражный суд Омской области"])
+        self.assertEqual(
+            directory.stale_regions(3600, now=time.time() + 7200),
+            ["Тверская область", "Омская область"]
+        )
+
+    def test_failed_fetch_keeps_base(self):
+        """Тест: ошибки и пустые ответы DaData не портят справочник"""
+        def broken(name):
+            raise OSError("network is unreachable")
+
+        directory = CourtDirectory(self.path, COURTS)
+        self.assertEqual(directory.import_dadata(broken), 0)
+        self.assertEqual(directory.import_dadata(lambda name: None), 0)
+        self.assertFalse(os.path.exists(self.path))
+        self.assertEqual(
+            directory.lookup("Арбитражный суд Тверской области")["address"],
+            COURTS["Тверская область"]["address"]
+        )
+
+    def test_background_refresh(self):
+        """Тест: фоновое обновление загружает карточки сразу после запуска"""
+        calls = []
+        directory = CourtDirectory(self.path, COURTS)
+        thread = directory.start_refresh(fake_fetch(calls), 3600, 3600)
+        self.assertIs(directory.start_refresh(fake_fetch(calls), 3600, 3600), thread)
+        directory.stop_refresh()
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(len(calls), 2)
+        self.assertIsNone(directory.start_refresh(fake_fetch(calls), 0, 3600))
+
+    def test_mismatched_card_not_saved(self):
+        """Тест: подсказка DaData про другой суд не попадает в справочник"""
+        directory = CourtDirectory(self.path, COURTS)
+        wrong = {"name": "Арбитражный суд Томской области", "code": "A67"}
+        self.assertFalse(directory.update("Омская область", wrong))
+        self.assertFalse(os.path.exists(self.path))
+        self.assertIsNone(directory.lookup_code("A67"))
+        self.assertEqual(
+            directory.import_dadata(lambda name: (wrong, {"value": wrong["name"]})), 0
+        )
+        self.assertEqual(directory.stale_regions(3600), ["Тверская область", "Омская область"])
+
+        moscow = CourtDirectory(self.path, {
+            "Москва": {"name": "Арбитражный суд города Москвы", "address": ""},
+        })
+        self.assertTrue(moscow.update("Москва", {"name": "Арбитражный суд г. Москвы", "code": "A40"}))
+        self.assertEqual(moscow.lookup_code("A40")["region"], "Москва")
+
+    def test_refresh_paced(self):
+        """Тест: запросы идут с паузой, первый проход откладывается и прерывается остановкой"""
+        calls = []
+        directory = CourtDirectory(self.path, COURTS)
+        started = time.monotonic()
+        self.assertEqual(directory.import_dadata(fake_fetch(calls), pause_seconds=0.2), 2)
+        self.assertGreaterEqual(time.monotonic() - started, 0.2)
+
+        calls = []
+        delayed = CourtDirectory(os.path.join(self.tmp.name, "delayed.json"), COURTS)
+        thread = delayed.start_refresh(fake_fetch(calls), 3600, 3600, start_delay=3600)
+        delayed.stop_refresh()
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(calls, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+"""
+Тесты индекса судов по адресу.
+"""
+
+import unittest
+
+from court_index import CourtIndex, default_index, region_phrases
+from jurisdiction import JurisdictionDetector
+
+
+class TestCourtIndex(unittest.TestCase):
+    """Тесты поиска суда по словам адреса"""
+
+    def setUp(self):
+        self.index = default_index()
+
+    def resolve(self, address):
+        match = self.index.resolve(address)
+        return (match.region, match.source, match.evidence) if match else None
+
+    def test_whole_words_only(self):
+        """Тест: улица Кирова и «Томск» не путаются с Кировской и Омской областью"""
+        self.assertEqual(
+            self.resolve("г. Томск, ул. Кирова, д. 5"),
+            ("Томская область", "city", "Томск")
+        )
+        self.assertEqual(
+            self.resolve("Алтайский край, г. Бийск"),
+            ("Алтайский край", "region", "Алтайский край")
+        )
+
+    def test_inflected_region_and_postal_code(self):
+        """Тест: падежные формы региона и почтовый индекс без города"""
+        self.assertEqual(
+            self.resolve("143400, Московская обл., г. Красногорск"),
+            ("Московская область", "region", "Московская обл")
+        )
+        self.assertEqual(self.resolve("620014, ул. Ленина, д. 1"), ("Свердловская область", "postal", "620014"))
+        self.assertIsNone(self.resolve("г. Подольск, ул. Ленина, д. 1"))
+        self.assertIn(("краснодарского", "края"), region_phrases("Краснодарский край"))
+
+    def test_detector_uses_index(self):
+        """Тест: договорная подсудность в родительном падеже находит суд"""
+        detector = JurisdictionDetector()
+        court = detector._find_court_by_region("Свердловской области")
+        self.assertEqual(court["name"], "Арбитражный суд Свердловской области")
+        self.assertIn("Москвы", detector._find_court_by_region("города Москвы")["name"])
+
+    def test_custom_directory(self):
+        """Тест: индекс строится по любой базе судов"""
+        courts = {"Тульская область": {"name": "АС Тульской области", "address": "Тула"}}
+        index = CourtIndex(courts, {"тула": "Тульская область", "омск": "Омская область"})
+        self.assertEqual(index.resolve("г. Тула").court["name"], "АС Тульской области")
+        self.assertIsNone(index.resolve("г. Омск"))
+
+
+if __name__ == "__main__":
+    unittest.main()
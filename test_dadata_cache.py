@@ -0,0 +1,68 @@
+"""
+Тесты кэширования ответов DaData (в том числе «не найдено»).
+"""
+
+import time
+import unittest
+from unittest import mock
+
+import main
+from lookup_cache import PersistentCache
+
+
+def dadata_response(suggestions):
+    return mock.Mock(
+        raise_for_status=mock.Mock(),
+        json=mock.Mock(return_value={"suggestions": suggestions}),
+    )
+
+
+class TestDadataMissCache(unittest.TestCase):
+    """Тесты короткого кэша пустых ответов DaData"""
+
+    def setUp(self):
+        self.addCleanup(mock.patch.stopall)
+        mock.patch.dict(main.os.environ, {"DADATA_API_KEY": "token"}).start()
+        self.party_cache = PersistentCache(None, ttl_seconds=86400)
+        self.court_cache = PersistentCache(None, ttl_seconds=86400)
+        mock.patch.object(main, "_DADATA_CACHE", self.party_cache).start()
+        mock.patch.object(main, "_DADATA_COURT_CACHE", self.court_cache).start()
+        mock.patch.object(main, "DADATA_MISS_TTL_HOURS", 1.0).start()
+
+    def test_unresolved_inn_cached_briefly(self):
+        """Тест: ненайденный ИНН не запрашивается повторно до истечения короткого TTL"""
+        post = mock.patch.object(main.requests, "post", return_value=dadata_response([])).start()
+        self.assertIsNone(main.fetch_dadata_party_by_inn("7707083893"))
+        self.assertIsNone(main.fetch_dadata_party_by_inn("7707083893"))
+        resolved = main.resolve_dadata_parties([("7707083893", None)])
+        self.assertEqual(list(resolved.values()), [None])
+        self.assertEqual(post.call_count, 1)
+
+        with mock.patch.object(main.time, "time", return_value=time.time() + 7200):
+            self.assertIsNone(main.fetch_dadata_party_by_inn("7707083893"))
+        self.assertEqual(post.call_count, 2)
+
+    def test_network_error_not_cached(self):
+        """Тест: ошибка сети не считается ответом «не найдено»"""
+        post = mock.patch.object(main.requests, "post", side_effect=OSError("timeout")).start()
+        self.assertIsNone(main.fetch_dadata_party_by_inn("7707083893"))
+        self.assertIsNone(main.fetch_dadata_court_suggest("Суд по месту ответчика", "AS"))
+        self.assertEqual(len(self.party_cache) + len(self.court_cache), 0)
+        self.assertEqual(post.call_count, 2)
+
+    def test_unresolved_court_cached_briefly(self):
+        """Тест: суд, не найденный по адресу, не запрашивается повторно"""
+        post = mock.patch.object(main.requests, "post", return_value=dadata_response([])).start()
+        name, address = main.resolve_court_from_dadata(
+            "Арбитражный суд по месту нахождения ответчика",
+            "Адрес суда не определен"
+        )
+        self.assertEqual(address, "Адрес суда не определен")
+        main.resolve_court_from_dadata(name, address)
+        self.assertIsNone(main.fetch_dadata_court_by_code("A99"))
+        self.assertIsNone(main.fetch_dadata_court_by_code("A99"))
+        self.assertEqual(post.call_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
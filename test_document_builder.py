@@ -0,0 +1,91 @@
+"""
+Тесты параллельной сборки документов.
+"""
+
+import asyncio
+import io
+import os
+import threading
+import unittest
+
+from document_builder import DocumentBuildPipeline, DocumentJob
+
+
+def build_docx(text):
+    """Задача для пула: DOCX с текстом и PID собравшего процесса."""
+    from docx import Document
+
+    document = Document()
+    document.add_paragraph(text)
+    document.add_paragraph(str(os.getpid()))
+    buffer = io.BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+
+class TestDocumentBuildPipeline(unittest.TestCase):
+    """Тесты выдачи документов по мере готовности"""
+
+    def test_stream_in_completion_order(self):
+        """Тест: быстрый документ приходит раньше, ошибка не прерывает остальные"""
+        release = threading.Event()
+
+        def slow(name):
+            release.wait(5)
+            return name
+
+        def fast(name):
+            release.set()
+            return name
+
+        def broken():
+            raise FileNotFoundError("нет шаблона")
+
+        async def collect():
+            pipeline = DocumentBuildPipeline(max_workers=0)
+            return [
+                built async for built in pipeline.stream(
+                    DocumentJob("claim", slow, ("claim.docx",)),
+                    DocumentJob("poa", broken),
+                    DocumentJob("f107", fast, ("f107.docx",)),
+                )
+            ]
+
+        results = asyncio.run(collect())
+        names = [item.name for item in results]
+        self.assertEqual(names[-1], "claim")
+        self.assertEqual(set(names), {"claim", "poa", "f107"})
+        by_name = {item.name: item for item in results}
+        self.assertEqual(by_name["claim"].content, "claim.docx")
+        self.assertIsInstance(by_name["poa"].error, FileNotFoundError)
+        self.assertIsNone(by_name["poa"].content)
+
+    def test_build_in_process_pool(self):
+        """Тест: документ собирается в отдельном процессе, пул останавливается"""
+        from docx import Document
+
+        pipeline = DocumentBuildPipeline(max_workers=2)
+        self.addCleanup(pipeline.shutdown)
+
+        async def collect():
+            return [
+                built async for built in pipeline.stream(
+                    DocumentJob("claim", build_docx, ("Исковое заявление",)),
+                )
+            ]
+
+        (built,) = asyncio.run(collect())
+        self.assertIsNone(built.error)
+        paragraphs = [p.text for p in Document(io.BytesIO(built.content)).paragraphs]
+        self.assertEqual(paragraphs[0], "Исковое заявление")
+        self.assertNotEqual(paragraphs[1], str(os.getpid()))
+
+        pool = pipeline._pool
+        self.assertIsNotNone(pool)
+        pipeline.shutdown()
+        self.assertIsNone(pipeline._pool)
+        self.assertEqual(pipeline._pending, set())
+
+
+if __name__ == "__main__":
+    unittest.main()
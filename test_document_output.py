@@ -0,0 +1,58 @@
+"""
+Тесты вывода сформированных документов.
+"""
+
+import io
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from docx import Document
+
+import document_output
+
+
+class TestDocumentOutput(unittest.TestCase):
+    """Тесты вывода в память и архива"""
+
+    def test_render_to_bytes_without_files(self):
+        """Тест: без output_path документ возвращается байтами"""
+        doc = Document()
+        doc.add_paragraph("Претензия")
+        with mock.patch.object(document_output, "DOCUMENT_ARCHIVE_DIR", ""):
+            data = document_output.render_document(doc, "Претензия")
+        self.assertIsInstance(data, bytes)
+        self.assertEqual(Document(io.BytesIO(data)).paragraphs[0].text, "Претензия")
+
+    def test_archive_with_retention(self):
+        """Тест: копия сохраняется в архив, старые файлы удаляются"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            stale = os.path.join(tmpdir, "Претензия_" + "0" * 32 + ".docx")
+            with open(stale, "wb") as handle:
+                handle.write(b"x")
+            old_time = time.time() - 10 * 86400
+            os.utime(stale, (old_time, old_time))
+            with mock.patch.object(document_output, "DOCUMENT_ARCHIVE_DAYS", 7), \
+                    mock.patch.object(document_output, "_last_purge", None):
+                path = document_output.archive_document(b"docx", "Иск", directory=tmpdir)
+            self.assertEqual(os.listdir(tmpdir), [os.path.basename(path)])
+            self.assertTrue(os.path.basename(path).startswith("Иск_"))
+
+    def test_purge_keeps_foreign_files(self):
+        """Тест: чистка не трогает файлы, которые архив не создавал"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            names = ["main.py", "old.docx", "Претензия_draft.docx", "Иск_" + "a" * 32 + ".docx"]
+            old_time = time.time() - 10 * 86400
+            for name in names:
+                path = os.path.join(tmpdir, name)
+                with open(path, "wb") as handle:
+                    handle.write(b"x")
+                os.utime(path, (old_time, old_time))
+            self.assertEqual(document_output.purge_archive(tmpdir, 7), 1)
+            self.assertEqual(sorted(os.listdir(tmpdir)), sorted(names[:3]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+"""
+Тесты записей документов для сопоставления с заявками.
+"""
+
+import unittest
+from datetime import datetime
+
+from main import DocumentRecord, assign_invoices_to_applications, score_cargo_to_application
+
+
+class TestDocumentRecord(unittest.TestCase):
+    """Тесты разбора полей один раз при создании записи"""
+
+    def test_fields_parsed_once(self):
+        """Тест: строки дат, сумма и госномер приводятся к типам"""
+        source = {
+            "label": "Счет № 5 от 10.01.2024",
+            "date": datetime(2024, 1, 10),
+            "load_date": "09.01.2024",
+            "amount": "120000",
+            "driver_name": "Иванов Иван",
+            "vehicle_plate": "А123ВС77",
+        }
+        record = DocumentRecord.from_dict(source)
+        self.assertEqual(record.load_date, datetime(2024, 1, 9))
+        self.assertEqual(record.amount, 120000.0)
+        self.assertEqual(record.driver_surname, "иванов")
+        self.assertEqual(record.vehicle_key, "A123BC77")
+        self.assertIs(record.to_dict(), source)
+        self.assertFalse(hasattr(record, "__dict__"))
+
+    def test_invoice_matched_by_amount_with_vat(self):
+        """Тест: счёт с суммой заявки плюс НДС выбирается для своей заявки"""
+        applications = [
+            {"label": "Заявка № 1", "date": datetime(2024, 1, 1), "amount": 100000.0},
+            {"label": "Заявка № 2", "date": datetime(2024, 1, 2), "amount": 50000.0},
+        ]
+        invoices = [
+            {"label": "Счет № 7", "date": datetime(2024, 1, 20), "amount": 60000.0},
+            {"label": "Счет № 8", "date": datetime(2024, 1, 20), "amount": 120000.0},
+        ]
+        assignment = assign_invoices_to_applications(applications, invoices)
+        self.assertEqual(assignment["Заявка № 1"]["label"], "Счет № 8")
+        self.assertEqual(assignment["Заявка № 2"]["label"], "Счет № 7")
+
+    def test_cargo_score_accepts_dicts(self):
+        """Тест: скоринг накладной работает и со словарями"""
+        cargo = {"driver_name": "Петров П.П.", "load_date": "01.02.2024"}
+        app = {"driver_name": "петров п п", "load_date": datetime(2024, 2, 2)}
+        score, reasons = score_cargo_to_application(cargo, app)
+        self.assertEqual(score, 21)
+        self.assertEqual(reasons, ["водитель", "дата погрузки"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,48 @@
+"""
+Тесты нормализации шрифта в сформированных DOCX.
+"""
+
+import unittest
+
+from docx import Document
+from docx.oxml.ns import qn
+from docx.shared import Pt
+
+from main import _paragraph_has_uniform_runs, enforce_times_new_roman
+
+
+class TestEnforceTimesNewRoman(unittest.TestCase):
+    """Тесты прохода по runs документа"""
+
+    def test_fonts_set_in_body_and_tables(self):
+        """Тест: шрифт выставлен в абзацах и таблицах, порядок rPr не нарушен"""
+        doc = Document()
+        styled = doc.add_paragraph().add_run("Текст", style="Strong")
+        plain = doc.add_paragraph().add_run("Сумма")
+        plain._element.get_or_add_rPr().get_or_add_rFonts().set(qn("w:cs"), "Arial")
+        cell_run = doc.add_table(rows=1, cols=1).cell(0, 0).paragraphs[0].add_run("1,00")
+
+        enforce_times_new_roman(doc)
+
+        for run in (styled, plain, cell_run):
+            self.assertEqual(run.font.name, "Times New Roman")
+            self.assertEqual(
+                run._element.rPr.rFonts.get(qn("w:eastAsia")),
+                "Times New Roman"
+            )
+        self.assertEqual(styled._element.rPr[0].tag, qn("w:rStyle"))
+        self.assertEqual(plain._element.rPr.rFonts.get(qn("w:cs")), "Arial")
+
+    def test_uniform_runs(self):
+        """Тест: абзац с разным форматированием runs не считается однородным"""
+        doc = Document()
+        paragraph = doc.add_paragraph()
+        paragraph.add_run("Первая ")
+        paragraph.add_run("вторая")
+        self.assertTrue(_paragraph_has_uniform_runs(paragraph))
+        paragraph.runs[1].font.size = Pt(10)
+        self.assertFalse(_paragraph_has_uniform_runs(paragraph))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,43 @@
+"""
+Тесты для скомпилированного плана извлечения EnhancedParser.
+"""
+
+import unittest
+
+from enhanced_parser import EnhancedParser, ExtractionPlan
+
+
+class TestExtractionPlan(unittest.TestCase):
+    """Тесты приоритета паттернов и источников полей"""
+
+    def test_priority_follows_pattern_order(self):
+        """Тест: побеждает первый по списку паттерн, а не первое совпадение"""
+        plan = ExtractionPlan({'inn': [r'ИНН:\s*(\d{10})', r'ИНН\s+(\d{10})']})
+        found = plan.scan("ИНН 1111111111\nИНН: 2222222222")
+        self.assertEqual(found['inn'], ('2222222222', 'inn_0'))
+
+    def test_converter_skips_rejected_values(self):
+        """Тест: значение, отвергнутое converter, не блокирует следующий паттерн"""
+        plan = ExtractionPlan(
+            {'debt': [r'долг\s+([\d,]+)', r'сумма\s+([\d ]+)']},
+            ignore_case=('debt',),
+            converters={'debt': lambda raw: raw if ',' not in raw else None}
+        )
+        found = plan.scan("ДОЛГ 1,2,3\nсумма 500")
+        self.assertEqual(found['debt'], ('500', 'debt_1'))
+
+    def test_parser_reports_sources(self):
+        """Тест: для каждого поля известен сработавший паттерн"""
+        text = (
+            "ИНН: 7707083893 КПП 773601001 ОГРН 1027700132195\n"
+            "Размер задолженности составляет 120 000 рублей"
+        )
+        result = EnhancedParser().parse_with_strategy(text)
+        self.assertEqual(result.data['debt'], '120 000')
+        self.assertEqual(result.extraction_methods['defendant_inn'], 'direct:inn_0')
+        self.assertEqual(result.extraction_methods['plaintiff_kpp'], 'direct:kpp_0')
+        self.assertEqual(result.extraction_methods['debt'], 'direct:debt_1')
+
+
+if __name__ == "__main__":
+    unittest.main()
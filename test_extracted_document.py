@@ -0,0 +1,91 @@
+"""
+Тесты для кэша разобранных PDF (один разбор файла на запрос).
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import pdf_extractor
+from pdf_extractor import ExtractedDocument, extract_pdf_hybrid, load_document
+
+
+class TestExtractedDocument(unittest.TestCase):
+    """Тесты load_document и повторного использования страниц"""
+
+    PAGES = [
+        {"page_num": 1, "text": "Заявка № 1\n\nA | B", "raw_text": "Заявка № 1",
+         "tables": [[["A", "B"]]], "text_quality": 0.9},
+        {"page_num": 2, "text": "", "raw_text": "", "tables": [], "text_quality": 0.0},
+    ]
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.path = os.path.join(self.tmpdir, "package.pdf")
+        with open(self.path, "wb") as handle:
+            handle.write(b"%PDF-1.4 package")
+        self.addCleanup(mock.patch.stopall)
+        mock.patch.object(pdf_extractor, "_DOCUMENT_CACHE", pdf_extractor.OrderedDict()).start()
+        mock.patch.object(pdf_extractor, "HAS_PDFPLUMBER", True).start()
+        self.extract = mock.patch.object(
+            pdf_extractor, "extract_with_pdfplumber", return_value=self.PAGES
+        ).start()
+
+    def test_file_parsed_once_by_content(self):
+        """Тест: повторный разбор и копия файла берутся из кэша"""
+        document = load_document(self.path)
+        self.assertEqual(document.page_texts, ["Заявка № 1", ""])
+        self.assertIs(load_document(self.path), document)
+        self.assertIs(load_document(document), document)
+
+        copy_path = os.path.join(self.tmpdir, "copy.pdf")
+        shutil.copyfile(self.path, copy_path)
+        copied = load_document(copy_path)
+        self.assertEqual(copied.source_file, "copy.pdf")
+        self.assertIs(copied.pages, document.pages)
+        self.assertEqual(self.extract.call_count, 1)
+
+    def test_hybrid_reuses_ocr_overlay(self):
+        """Тест: OCR плохой страницы запрашивается один раз и не портит кэш"""
+        vision = mock.patch.object(
+            pdf_extractor, "extract_with_vision_llm",
+            return_value=[{"page_num": 2, "text": "Скан", "text_quality": 0.8}]
+        ).start()
+        mock.patch.object(pdf_extractor, "get_vision_config", return_value={"enabled": True}).start()
+        mock.patch.object(pdf_extractor, "check_vision_model_available", return_value=True).start()
+
+        first = extract_pdf_hybrid(self.path)
+        second = extract_pdf_hybrid(self.path)
+        self.assertEqual(first[1]["text"], "Скан")
+        self.assertEqual(second, first)
+        self.assertEqual(vision.call_count, 1)
+        self.assertIsInstance(load_document(self.path), ExtractedDocument)
+        self.assertEqual(load_document(self.path).pages[1]["text"], "")
+
+    def test_text_only_copy_from_worker(self):
+        """Тест: из процесса пула приходит только текст, полный разбор его не теряет"""
+        import pickle
+
+        light = load_document(self.path).texts_only()
+        self.assertEqual(light.pages, [
+            {"page_num": 1, "raw_text": "Заявка № 1"},
+            {"page_num": 2, "raw_text": ""},
+        ])
+        self.assertLess(len(pickle.dumps(light)), len(pickle.dumps(load_document(self.path))))
+
+        pdf_extractor._DOCUMENT_CACHE.clear()
+        pdf_extractor.remember_document(light)
+        self.assertIs(load_document(self.path, text_only=True), light)
+        self.assertEqual(self.extract.call_count, 1)
+        full = load_document(self.path)
+        self.assertFalse(full.text_only)
+        self.assertEqual(self.extract.call_count, 2)
+        self.assertIs(pdf_extractor.remember_document(light), full)
+        self.assertIs(load_document(self.path, text_only=True), full)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+"""
+Тесты таблицы расчёта процентов.
+"""
+
+import unittest
+from datetime import datetime
+
+from docx import Document
+
+from calc_395 import summarize_interest_periods
+from main import insert_pretension_interest_table
+
+
+def make_row(date_from, date_to, days, rate, interest, increase_sum=0.0, year_days=365):
+    return {
+        "sum": 1000.0 + increase_sum,
+        "date_from": date_from,
+        "date_to": date_to,
+        "days": days,
+        "rate": rate,
+        "year_days": year_days,
+        "interest": interest,
+        "increase_sum": increase_sum,
+        "increase_date": date_from if increase_sum else None,
+    }
+
+
+class TestSummarizeInterestPeriods(unittest.TestCase):
+    """Тесты сворачивания периодов с одной ставкой"""
+
+    def test_consecutive_same_rate_collapsed(self):
+        """Тест: подряд идущие периоды с одной ставкой сводятся, итог сохраняется"""
+        details = [
+            make_row(datetime(2023, 11, 1), datetime(2023, 11, 30), 30, 16.0, 13.15),
+            make_row(datetime(2023, 12, 1), datetime(2023, 12, 31), 31, 16.0, 13.59),
+            make_row(datetime(2024, 1, 11), datetime(2024, 1, 20), 10, 18.0, 4.93,
+                     year_days=366),
+            make_row("22.01.2024", "25.01.2024", 4, 18.0, 1.97, year_days=366),
+        ]
+        summary = summarize_interest_periods(details)
+        self.assertEqual(len(summary), 3)
+        first = summary[0]
+        self.assertEqual(first["date_to"], datetime(2023, 12, 31))
+        self.assertEqual(first["days"], 61)
+        self.assertAlmostEqual(first["interest"], 26.74)
+        self.assertEqual(first["merged_periods"], 2)
+        # Разрыв в датах: строки не объединяются
+        self.assertEqual(summary[2]["date_from"], "22.01.2024")
+        self.assertEqual(details[1]["days"], 31)
+
+    def test_increase_and_year_change_keep_rows(self):
+        """Тест: увеличение долга и смена дней в году начинают новую строку"""
+        details = [
+            make_row(datetime(2023, 12, 1), datetime(2023, 12, 31), 31, 16.0, 13.59),
+            make_row(datetime(2024, 1, 1), datetime(2024, 1, 10), 10, 16.0, 4.37,
+                     year_days=366),
+            make_row(datetime(2024, 1, 11), datetime(2024, 1, 20), 10, 16.0, 6.56,
+                     increase_sum=500.0, year_days=366),
+        ]
+        summary = summarize_interest_periods(details)
+        self.assertEqual(len(summary), 3)
+        for row in summary:
+            self.assertNotIn("merged_periods", row)
+            expected = row["sum"] * row["rate"] / 100 * row["days"] / row["year_days"]
+            self.assertAlmostEqual(row["interest"], expected, places=2)
+
+
+class TestPretensionInterestTable(unittest.TestCase):
+    """Тесты вставки таблицы процентов в претензию"""
+
+    def test_summarized_table(self):
+        """Тест: в сводном режиме строк меньше, итог тот же"""
+        details = [
+            make_row(datetime(2024, 1, day), datetime(2024, 1, day), 1, 16.0, 0.44)
+            for day in range(1, 11)
+        ]
+        doc = Document()
+        doc.add_paragraph("{interest_table}")
+        insert_pretension_interest_table(doc, details, summarize=True)
+        table = doc.tables[0]
+        # Три строки шапки, одна сводная строка и итог
+        self.assertEqual(len(table.rows), 5)
+        self.assertEqual(table.rows[3].cells[3].text, "10")
+        self.assertEqual(table.rows[4].cells[8].text, "4,40")
+        self.assertEqual(table.rows[3].cells[0].paragraphs[0].runs[0].font.name, "Times New Roman")
+
+
+if __name__ == "__main__":
+    unittest.main()
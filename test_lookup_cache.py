@@ -0,0 +1,63 @@
+"""
+Тесты для персистентного кэша внешних запросов.
+"""
+
+import os
+import tempfile
+import time
+import unittest
+
+from lookup_cache import PersistentCache
+
+
+class TestPersistentCache(unittest.TestCase):
+    """Тесты LRU/TTL кэша с сохранением на диск"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "cache.json")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_persists_between_instances(self):
+        """Тест сохранения записей между перезапусками"""
+        cache = PersistentCache(self.path, ttl_seconds=3600)
+        cache.set("7736207543::MAIN", {"value": "ООО «Яндекс»"})
+        reloaded = PersistentCache(self.path, ttl_seconds=3600)
+        self.assertEqual(
+            reloaded.get("7736207543::MAIN"),
+            {"value": "ООО «Яндекс»"}
+        )
+
+    def test_lru_bound(self):
+        """Тест вытеснения самых старых по использованию записей"""
+        cache = PersistentCache(self.path, max_entries=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        self.assertIn("a", cache)
+        self.assertNotIn("b", cache)
+        self.assertIn("c", cache)
+
+    def test_ttl_expiry(self):
+        """Тест истечения срока жизни записи"""
+        cache = PersistentCache(self.path, ttl_seconds=3600)
+        cache.set("short", 1, ttl_seconds=0.01)
+        cache.set("long", 2)
+        time.sleep(0.05)
+        self.assertIsNone(cache.get("short"))
+        self.assertEqual(cache.get("long"), 2)
+
+    def test_deferred_persist(self):
+        """Тест отложенной записи на диск через flush()"""
+        cache = PersistentCache(self.path)
+        cache.set("a", 1, persist=False)
+        self.assertFalse(os.path.exists(self.path))
+        cache.flush()
+        self.assertEqual(PersistentCache(self.path).get("a"), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,41 @@
+"""
+Тесты кэширующего слоя морфологии.
+"""
+
+import unittest
+
+import morphology
+
+
+@unittest.skipIf(morphology.get_morph() is None, "pymorphy2 недоступен")
+class TestMorphology(unittest.TestCase):
+    """Тесты нормализации слов с кэшем разбора"""
+
+    def setUp(self):
+        morphology.clear_cache()
+
+    def test_normal_form_cached_case_insensitive(self):
+        """Тест: слово в разном регистре разбирается один раз"""
+        self.assertEqual(morphology.normal_form("Заявки"), "заявка")
+        self.assertEqual(morphology.normal_form("ЗАЯВКИ"), "заявка")
+        info = morphology.cache_info()["normal_form"]
+        self.assertEqual((info.hits, info.misses), (1, 1))
+
+    def test_normalize_words_batch(self):
+        """Тест: пакетная нормализация сохраняет порядок и повторы"""
+        words = ["счета", "поставки", "счета"]
+        self.assertEqual(
+            morphology.normalize_words(words),
+            ["счёт", "поставка", "счёт"]
+        )
+        self.assertEqual(morphology.cache_info()["normal_form"].misses, 2)
+
+    def test_nominative_word(self):
+        """Тест: форма без именительного падежа не подменяется"""
+        self.assertEqual(morphology.nominative_word("Иван"), "иван")
+        self.assertIsNone(morphology.nominative_word("Ивану"))
+        self.assertEqual(morphology.normal_form(""), "")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+"""
+Тесты разбора пакетов документов в пуле процессов.
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import external_claim_parser
+import pdf_extractor
+
+
+def write_pdf(path, lines):
+    import fitz
+
+    document = fitz.open()
+    page = document.new_page()
+    page.insert_text((72, 72), "\n".join(lines))
+    document.save(path)
+    document.close()
+
+
+class TestPackagePool(unittest.TestCase):
+    """Тесты разбора пакета в дочернем процессе"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.path = os.path.join(self.tmpdir, "package.pdf")
+        write_pdf(self.path, ["Package 139948", "Vehicle A123BC77"])
+        self.addCleanup(mock.patch.stopall)
+        mock.patch.object(
+            pdf_extractor, "_DOCUMENT_CACHE", pdf_extractor.OrderedDict()
+        ).start()
+
+    def test_single_upload_parsed_in_pool(self):
+        """Тест: загруженный файл разбирается в процессе пула, текст попадает в кэш"""
+        self.addCleanup(external_claim_parser.shutdown_package_pool)
+        with mock.patch.object(external_claim_parser, "PACKAGE_WORKERS", 2):
+            package = external_claim_parser.parse_document_package_in_pool(self.path)
+        self.assertEqual(package["source_file"], "package.pdf")
+        self.assertIn("Package 139948", package["full_text"])
+        self.assertIsNotNone(external_claim_parser._PACKAGE_POOL)
+
+        with mock.patch.object(pdf_extractor, "extract_with_pdfplumber") as extract, \
+                mock.patch.object(pdf_extractor, "extract_with_pymupdf") as fallback:
+            document = pdf_extractor.load_document(self.path, text_only=True)
+        self.assertTrue(document.text_only)
+        self.assertIn("Vehicle A123BC77", document.page_texts[0])
+        extract.assert_not_called()
+        fallback.assert_not_called()
+
+    def test_without_pool_parsed_in_process(self):
+        """Тест: PACKAGE_PARSE_WORKERS=1 — разбор в текущем процессе"""
+        with mock.patch.object(external_claim_parser, "PACKAGE_WORKERS", 1), \
+                mock.patch.object(external_claim_parser, "_get_package_pool") as pool:
+            package = external_claim_parser.parse_document_package_in_pool(self.path)
+        pool.assert_not_called()
+        self.assertIn("Package 139948", package["full_text"])
+
+    def test_max_workers_limits_parallel_jobs(self):
+        """Тест: max_workers ограничивает число одновременно разбираемых пакетов"""
+        lock = threading.Lock()
+        state = {"running": 0, "peak": 0}
+
+        def job(pdf_path):
+            with lock:
+                state["running"] += 1
+                state["peak"] = max(state["peak"], state["running"])
+            time.sleep(0.05)
+            with lock:
+                state["running"] -= 1
+            return {"source_file": os.path.basename(pdf_path)}, None
+
+        paths = [f"{index}.pdf" for index in range(6)]
+        with ThreadPoolExecutor(max_workers=8) as pool, \
+                mock.patch.object(external_claim_parser, "PACKAGE_WORKERS", 8), \
+                mock.patch.object(external_claim_parser, "_get_package_pool", return_value=pool), \
+                mock.patch.object(external_claim_parser, "_parse_package_job", job):
+            packages = external_claim_parser.parse_document_packages(paths, max_workers=2)
+        self.assertEqual([item["source_file"] for item in packages], paths)
+        self.assertEqual(state["peak"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
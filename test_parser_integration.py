@@ -0,0 +1,92 @@
+"""
+Тесты для режимов интегрированного парсера.
+"""
+
+import unittest
+from unittest import mock
+
+import parser_integration
+from enhanced_parser import ParsingResult
+from parser_integration import IntegratedParser
+
+VALID_PARTIES = {
+    'defendant_inn': '7707083893',
+    'defendant_kpp': '773601001',
+    'defendant_ogrn': '1027700132195',
+    'defendant_name': 'ПАО Сбербанк',
+    'plaintiff_inn': '7707083893',
+    'plaintiff_kpp': '773601001',
+    'plaintiff_ogrn': '1027700132195',
+    'plaintiff_name': 'ПАО Сбербанк',
+}
+COMPLETE_LEGACY = {
+    **VALID_PARTIES,
+    'debt': '100 000,00',
+    'payment_days': '10',
+    'payment_terms': 'в течение 10 дней',
+    'legal_fees': '5000',
+    'signatory': 'Иванов И.И.',
+    'attachments': ['Копия договора'],
+}
+
+
+class TestIntegratedParserModes(unittest.TestCase):
+    """Тесты запуска enhanced парсера только при необходимости"""
+
+    def _parse(self, legacy_data, mode):
+        parser = IntegratedParser(mode=mode)
+        parser.recovery = mock.Mock()
+        parser.recovery.recover_missing_fields.return_value = {'kpp': None, 'name': None}
+        enhanced = mock.Mock(
+            return_value=ParsingResult(data={'debt': '100'}, confidence=0.5)
+        )
+        parser.enhanced_parser.parse_with_strategy = enhanced
+        with mock.patch.object(
+            parser_integration,
+            'parse_documents_with_sliding_window',
+            return_value=dict(legacy_data)
+        ):
+            result = parser.parse('текст претензии')
+        return parser, enhanced, result
+
+    def test_auto_skips_enhanced_for_valid_legacy(self):
+        """Тест: полный legacy-результат — enhanced не запускается"""
+        parser, enhanced, result = self._parse(COMPLETE_LEGACY, 'auto')
+        enhanced.assert_not_called()
+        self.assertTrue(parser.last_stats['enhanced']['skipped'])
+        self.assertEqual(parser.last_stats['legacy']['confidence'], 1.0)
+        self.assertEqual(result['defendant_inn'], '7707083893')
+
+    def test_auto_runs_enhanced_when_legacy_incomplete(self):
+        """Тест: без реквизитов истца результат дополняется enhanced"""
+        legacy = {k: v for k, v in VALID_PARTIES.items() if not k.startswith('plaintiff')}
+        parser, enhanced, result = self._parse(legacy, 'auto')
+        enhanced.assert_called_once()
+        self.assertEqual(parser.last_stats['legacy']['confidence'], 0.5)
+        self.assertEqual(result['debt'], '100')
+
+    def test_auto_runs_enhanced_when_debt_missing(self):
+        """Тест: без суммы долга enhanced запускается и дополняет её"""
+        legacy = {k: v for k, v in COMPLETE_LEGACY.items() if k != 'debt'}
+        parser, enhanced, result = self._parse(legacy, 'auto')
+        enhanced.assert_called_once()
+        self.assertFalse(parser.last_stats['enhanced']['skipped'])
+        self.assertEqual(result['debt'], '100')
+
+    def test_sequential_is_default(self):
+        """Тест: без настройки оба парсера работают последовательно"""
+        with mock.patch.dict(parser_integration.os.environ, {}, clear=True):
+            self.assertEqual(parser_integration.default_parser_mode(), 'sequential')
+        parser, enhanced, _ = self._parse(COMPLETE_LEGACY, None)
+        enhanced.assert_called_once()
+
+    def test_parallel_collects_stats_for_both(self):
+        """Тест: в параллельном режиме работают оба парсера"""
+        parser, enhanced, _ = self._parse(VALID_PARTIES, 'parallel')
+        enhanced.assert_called_once()
+        self.assertEqual(set(parser.last_stats), {'legacy', 'enhanced'})
+        self.assertEqual(parser.last_stats['enhanced']['confidence'], 0.5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+"""
+Тесты правки готовой претензии («поле: значение»).
+"""
+
+import asyncio
+import os
+import unittest
+from datetime import datetime
+from types import SimpleNamespace
+from unittest import mock
+
+import main
+
+
+def make_update(text, replies):
+    async def reply_text(message):
+        replies.append(message)
+
+    return SimpleNamespace(
+        message=SimpleNamespace(text=text, reply_text=reply_text),
+        effective_user=SimpleNamespace(id=1),
+    )
+
+
+class TestPretensionEdit(unittest.TestCase):
+    """Тесты пересчёта претензии после правки поля"""
+
+    def test_received_date_edit_reaches_groups(self):
+        """Тест: новая дата получения попадает в группы и сдвигает срок оплаты"""
+        data = {
+            "pretension_groups": [{
+                "invoice_amount": 1000,
+                "docs_received_date": "01.03.2024",
+                "docs_track_number": "80081234567890",
+                "payment_days": 5,
+            }],
+            "payment_days": "5",
+            "docs_received_date": "01.03.2024",
+        }
+        cache = {}
+        with mock.patch.dict(os.environ, {"STRICT_WORK_CALENDAR": "0"}), \
+                mock.patch.object(main, "load_work_calendar", return_value={}):
+            first = main.build_pretension_pipeline(data, cache=cache).get("due_dates")
+            previous = {
+                field: data.get(field)
+                for field in main.PRETENSION_GROUP_SHIPPING_FIELDS
+            }
+            data["docs_received_date"] = "11.03.2024"
+            main.apply_shipping_edit_to_groups(data, previous)
+            pipeline = main.build_pretension_pipeline(data, cache=cache)
+            second = pipeline.get("due_dates")
+
+        self.assertEqual(first["obligations"][0]["due_date"], datetime(2024, 3, 8))
+        self.assertEqual(second["obligations"][0]["due_date"], datetime(2024, 3, 18))
+        self.assertEqual(data["pretension_groups"][0]["docs_track_number"], "80081234567890")
+        self.assertIn("due_dates", pipeline.recomputed)
+
+    def test_unknown_field_keeps_editing(self):
+        """Тест: неизвестное поле — подсказка со списком полей, диалог продолжается"""
+        replies = []
+        context = SimpleNamespace(user_data={
+            "pretension_data": {},
+            "pretension_missing_fields": [],
+            "pretension_edit_mode": True,
+        })
+        state = asyncio.run(main.handle_pretension_field(
+            make_update("номер договора: 15", replies), context
+        ))
+        self.assertEqual(state, main.ASK_PRETENSION_FIELD)
+        self.assertTrue(context.user_data["pretension_edit_mode"])
+        self.assertIn("дата получения", replies[0])
+
+        state = asyncio.run(main.handle_pretension_field(
+            make_update("готово", replies), context
+        ))
+        self.assertEqual(state, main.CONVERSATION_END)
+        self.assertNotIn("pretension_edit_mode", context.user_data)
+
+    def test_stage_cache_outside_user_data(self):
+        """Тест: кэш этапов хранится в процессе и ограничен по числу пользователей"""
+        with mock.patch.object(main, "PRETENSION_STAGE_CACHE_USERS", 2):
+            first = main.get_pretension_stage_cache(101)
+            first["stages"] = {"document": b"docx"}
+            main.get_pretension_stage_cache(102)
+            self.assertIs(main.get_pretension_stage_cache(101), first)
+            main.get_pretension_stage_cache(103)
+            self.assertNotIn(102, main._PRETENSION_STAGE_CACHES)
+            main.drop_pretension_stage_cache(101)
+            self.assertNotIn(101, main._PRETENSION_STAGE_CACHES)
+        main.drop_pretension_stage_cache(103)
+
+
+if __name__ == "__main__":
+    unittest.main()
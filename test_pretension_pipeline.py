@@ -0,0 +1,69 @@
+"""
+Тесты для инкрементального пересчёта этапов претензии.
+"""
+
+import unittest
+
+from pretension_pipeline import Stage, StagedPipeline
+
+
+class TestStagedPipeline(unittest.TestCase):
+    """Тесты кэширования этапов по отпечатку входов"""
+
+    def setUp(self):
+        self.calls = []
+
+        def groups(pipeline):
+            self.calls.append("groups")
+            return [pipeline.data["payment_days"]]
+
+        def interest(pipeline):
+            self.calls.append("interest")
+            return pipeline.get("groups")[0] * pipeline.data["debt"]
+
+        def texts(pipeline):
+            self.calls.append("texts")
+            return pipeline.data["plaintiff_name"].upper()
+
+        self.stages = [
+            Stage("groups", groups, fields=("payment_days",)),
+            Stage("interest", interest, fields=("debt",), depends=("groups",)),
+            Stage("texts", texts, fields=("plaintiff_name",)),
+        ]
+        self.data = {"payment_days": 5, "debt": 100, "plaintiff_name": "ооо"}
+        self.cache = {}
+
+    def _run(self):
+        pipeline = StagedPipeline(self.stages, self.data, cache=self.cache)
+        return pipeline, pipeline.get("interest"), pipeline.get("texts")
+
+    def test_unchanged_data_uses_cache(self):
+        """Тест: повторный запуск без правок ничего не пересчитывает"""
+        self._run()
+        self.calls.clear()
+        pipeline, interest, text = self._run()
+        self.assertEqual((interest, text), (500, "ООО"))
+        self.assertEqual(self.calls, [])
+        self.assertEqual(pipeline.recomputed, [])
+
+    def test_edit_recomputes_only_downstream(self):
+        """Тест: правка поля пересчитывает только зависящие этапы"""
+        self._run()
+        self.calls.clear()
+        self.data["debt"] = 200
+        pipeline, interest, _ = self._run()
+        self.assertEqual(interest, 1000)
+        self.assertEqual(self.calls, ["interest"])
+        self.assertEqual(pipeline.affected_by(["payment_days"]), ["groups", "interest"])
+
+    def test_memo(self):
+        """Тест: вспомогательные результаты кэшируются по ключу"""
+        pipeline = StagedPipeline(self.stages, self.data, cache=self.cache)
+        calls = []
+        for _ in range(2):
+            pipeline.memo("proofread", ["текст"], lambda: calls.append(1) or "ok")
+        self.assertEqual(len(calls), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+"""
+Тесты разбора акта сверки и привязки оплат к группам документов.
+"""
+
+import unittest
+from datetime import datetime
+
+from main import extract_reconciliation_entries, match_reconciliation_payments_to_groups
+
+HEADER = [
+    ["Акт сверки взаимных расчетов", None, None, None, None, None, None, None],
+    ["Дата", "Документ", "Дебет", "Кредит", "Дата", "Документ", "Дебет", "Кредит"],
+]
+
+
+class TestReconciliationTables(unittest.TestCase):
+    """Тесты табличного разбора акта сверки"""
+
+    def test_rows_from_debit_credit_columns(self):
+        """Тест: строки типизируются по колонкам, заголовок переносится на продолжение"""
+        first_page = HEADER + [
+            ["", "Сальдо начальное", "", "", "", "", "", ""],
+            ["01.02.2024", "Продажа (УПД № 55 от 01.02.2024)", "15 000,00", "", "", "", "", "15 000,00"],
+        ]
+        second_page = [
+            ["12.03.2024", "Оплата (п/п 1234 от 12.03.2024)", "", "10 000,00", "", "", "10 000,00", ""],
+            ["20.03.2024", "Поступление на р/с", "", "500,00", "", "", "", ""],
+            ["", "Обороты за период", "15 000,00", "10 500,00", "", "", "", ""],
+        ]
+        entries, sales = extract_reconciliation_entries([], tables=[first_page, second_page])
+        self.assertEqual([item["amount"] for item in sales], [15000.0])
+        self.assertEqual(len(entries), 2)
+        self.assertEqual(entries[0]["payment_number"], "1234")
+        self.assertEqual(entries[0]["date"], datetime(2024, 3, 12))
+        self.assertEqual(entries[1]["amount"], 500.0)
+        self.assertEqual(entries[1]["source"], "reconciliation")
+
+    def test_correction_row_is_not_payment(self):
+        """Тест: строка по кредиту без признаков оплаты (корректировка) не считается оплатой"""
+        table = HEADER + [
+            ["01.02.2024", "Продажа (УПД № 55 от 01.02.2024)", "15 000,00", "", "", "", "", ""],
+            ["20.03.2024", "Корректировка № 7", "", "500,00", "", "", "", ""],
+            ["25.03.2024", "Оплата (п/п 77 от 25.03.2024)", "", "14 500,00", "", "", "", ""],
+        ]
+        entries, sales = extract_reconciliation_entries([], tables=[table])
+        self.assertEqual([item["amount"] for item in sales], [15000.0])
+        self.assertEqual([item["amount"] for item in entries], [14500.0])
+
+    def test_text_fallback_without_tables(self):
+        """Тест: без таблиц строки берутся из текста между датами, в том числе через страницы"""
+        pages = [
+            "Акт сверки 01.02.2024 Продажа (УПД № 55) 15 000,00 12.03.2024 Оплата",
+            "сверка (п/п 1234) 10 000,00",
+        ]
+        entries, sales = extract_reconciliation_entries(pages, tables=[[["нет заголовка"]]])
+        self.assertEqual([item["amount"] for item in sales], [15000.0])
+        self.assertEqual([item["amount"] for item in entries], [10000.0])
+        self.assertEqual(entries[0]["payment_number"], "1234")
+
+
+class TestReconciliationMatching(unittest.TestCase):
+    """Тесты привязки оплат из акта сверки"""
+
+    def test_fifo_allocation_by_sales(self):
+        """Тест: нераспознанная оплата раскладывается по реализациям по порядку дат"""
+        groups = [
+            {"upd": "УПД № 10", "amount": 700.0},
+            {"upd": "УПД № 11", "amount": 900.0},
+        ]
+        sales = [
+            {"doc_number": "11", "amount": 900.0, "date": datetime(2024, 2, 5)},
+            {"doc_number": "10", "amount": 700.0, "date": datetime(2024, 2, 1)},
+        ]
+        payments = [{"amount": 1000.0, "date": datetime(2024, 3, 1)}]
+        allocated, unassigned = match_reconciliation_payments_to_groups(
+            groups, payments, sales=sales
+        )
+        self.assertEqual([item["amount"] for item in allocated], [700.0, 300.0])
+        self.assertEqual(allocated[0]["group_label"], "УПД № 10")
+        self.assertEqual(unassigned, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
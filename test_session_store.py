@@ -0,0 +1,134 @@
+"""
+Тесты для сохранения сессий и результатов извлечения между перезапусками.
+"""
+
+import asyncio
+import os
+import tempfile
+import time
+import unittest
+
+from session_persistence import ExpiringPicklePersistence
+from session_store import SESSION_TS_KEY, ExtractionStore, file_digest
+
+
+class TestExtractionStore(unittest.TestCase):
+    """Тесты хранилища результатов извлечения"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_roundtrip_by_file_digest(self):
+        """Тест сохранения и чтения результата по хэшу файла"""
+        pdf_path = os.path.join(self.tmpdir.name, "a.pdf")
+        with open(pdf_path, "wb") as handle:
+            handle.write(b"%PDF-1.4 test")
+        store = ExtractionStore(os.path.join(self.tmpdir.name, "extraction"))
+        key = file_digest(pdf_path)
+        store.set(key, {"pages": ["Заявка № 1"], "low_text_pages": [2]})
+        self.assertEqual(
+            store.get(key),
+            {"pages": ["Заявка № 1"], "low_text_pages": [2]}
+        )
+        self.assertIsNone(store.get("missing"))
+
+    def test_expired_entries_are_dropped(self):
+        """Тест удаления просроченных результатов"""
+        store = ExtractionStore(self.tmpdir.name, ttl_seconds=60)
+        store.set("old", {"pages": []})
+        stale = time.time() - 120
+        os.utime(os.path.join(self.tmpdir.name, "old.json.gz"), (stale, stale))
+        store.set("new", {"pages": []})
+        self.assertEqual(store.prune(), 1)
+        self.assertIsNone(store.get("old"))
+        self.assertIsNotNone(store.get("new"))
+
+
+class TestExpiringPicklePersistence(unittest.TestCase):
+    """Тесты восстановления диалогов после перезапуска"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "conversations.pickle")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_restores_only_active_sessions(self):
+        """Тест: сессии без активности дольше TTL не восстанавливаются"""
+        async def scenario():
+            persistence = ExpiringPicklePersistence(self.path, ttl_seconds=60)
+            await persistence.get_user_data()
+            await persistence.get_conversations("conv")
+            await persistence.update_user_data(1, {"flow": "pretension"})
+            await persistence.update_user_data(2, {"flow": "claim"})
+            await persistence.update_conversation("conv", (10, 1), 5)
+            await persistence.update_conversation("conv", (20, 2), 1)
+            persistence.user_data[2][SESSION_TS_KEY] = time.time() - 120
+            await persistence.flush()
+
+            restored = ExpiringPicklePersistence(self.path, ttl_seconds=60)
+            user_data = await restored.get_user_data()
+            conversations = await restored.get_conversations("conv")
+            return user_data, conversations
+
+        user_data, conversations = asyncio.run(scenario())
+        self.assertEqual(list(user_data), [1])
+        self.assertEqual(user_data[1], {"flow": "pretension"})
+        self.assertEqual(conversations, {(10, 1): 5})
+
+    def test_expired_sessions_removed_from_file(self):
+        """Тест: просроченные сессии удаляются из файла, отметка не попадает в user_data"""
+        async def scenario():
+            persistence = ExpiringPicklePersistence(self.path, ttl_seconds=60)
+            await persistence.get_user_data()
+            await persistence.get_conversations("conv")
+            live = {"flow": "pretension"}
+            await persistence.update_user_data(1, live)
+            await persistence.update_user_data(2, {"flow": "claim"})
+            await persistence.update_conversation("conv", (20, 2), 1)
+            persistence.user_data[2][SESSION_TS_KEY] = time.time() - 120
+            await persistence.flush()
+
+            restored = ExpiringPicklePersistence(self.path, ttl_seconds=60)
+            await restored.get_user_data()
+            await restored.get_conversations("conv")
+
+            reread = ExpiringPicklePersistence(self.path)
+            stored_users = await reread.get_user_data()
+            stored_conversations = await reread.get_conversations("conv")
+            return live, stored_users, stored_conversations
+
+        live, stored_users, stored_conversations = asyncio.run(scenario())
+        self.assertEqual(live, {"flow": "pretension"})
+        self.assertEqual(list(stored_users), [1])
+        self.assertEqual(stored_conversations, {})
+
+    def test_unstamped_session_kept(self):
+        """Тест: сессия без отметки активности не считается просроченной"""
+        async def scenario():
+            persistence = ExpiringPicklePersistence(self.path, ttl_seconds=60)
+            await persistence.get_user_data()
+            await persistence.get_conversations("conv")
+            await persistence.update_user_data(1, {"flow": "claim"})
+            await persistence.update_conversation("conv", (10, 1), 3)
+            await persistence.update_conversation("conv", (30, 3), 5)
+            persistence.user_data[1].pop(SESSION_TS_KEY)
+            await persistence.flush()
+
+            restored = ExpiringPicklePersistence(self.path, ttl_seconds=60)
+            users = await restored.get_user_data()
+            conversations = await restored.get_conversations("conv")
+            return users, conversations, restored.user_data[1]
+
+        users, conversations, stored = asyncio.run(scenario())
+        self.assertEqual(users, {1: {"flow": "claim"}})
+        self.assertEqual(conversations, {(10, 1): 3, (30, 3): 5})
+        self.assertAlmostEqual(stored[SESSION_TS_KEY], time.time(), delta=5)
+
+
+if __name__ == "__main__":
+    unittest.main()
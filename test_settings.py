@@ -0,0 +1,82 @@
+"""
+Тесты для настроек LLM, загружаемых один раз на процесс.
+"""
+
+import os
+import unittest
+from unittest import mock
+
+import settings
+from llm_fallback import get_llm_config, get_vision_config
+from pdf_extractor import get_vision_config as get_pdf_vision_config
+
+
+class TestSettings(unittest.TestCase):
+    """Тесты кэширования и перечитывания настроек"""
+
+    ENV = {
+        "OLLAMA_BASE_URL": "http://ollama:11434/",
+        "OLLAMA_MODEL": "qwen2.5:14b-instruct",
+        "OLLAMA_TIMEOUT": "90",
+        "OLLAMA_VISION_MODEL": "qwen3-vl:8b",
+    }
+
+    def setUp(self):
+        # После теста настройки перечитываются при следующем обращении
+        self.addCleanup(setattr, settings, "_SETTINGS", None)
+        patcher = mock.patch.dict(os.environ, self.ENV)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        for name in ("LLM_ENABLED", "LLM_VISION_ENABLED", "VISION_LLM_ENABLED"):
+            os.environ.pop(name, None)
+        dotenv = mock.patch.object(settings, "load_dotenv")
+        dotenv.start()
+        self.addCleanup(dotenv.stop)
+        settings.reload_settings()
+
+    def test_configs_built_from_settings(self):
+        """Тест: конфигурации собираются из общих настроек"""
+        config = get_llm_config()
+        self.assertTrue(config["enabled"])
+        self.assertEqual(config["base_url"], "http://ollama:11434")
+        self.assertEqual(config["model"], "qwen2.5:14b-instruct")
+        self.assertEqual(config["timeout"], 90)
+        self.assertEqual(config["max_chars"], 12000)
+        self.assertEqual(get_vision_config()["model"], "qwen3-vl:8b")
+        self.assertTrue(get_pdf_vision_config()["enabled"])
+
+    def test_environment_read_once_until_reload(self):
+        """Тест: изменения окружения видны только после reload_settings"""
+        first = settings.get_settings()
+        os.environ["LLM_ENABLED"] = "false"
+        self.assertIs(settings.get_settings(), first)
+        self.assertTrue(get_llm_config()["enabled"])
+        settings.reload_settings()
+        self.assertFalse(get_llm_config()["enabled"])
+
+    def test_non_positive_timeout_rejected(self):
+        """Тест: нулевой таймаут — ошибка настройки, а не значение по умолчанию"""
+        first = settings.get_settings()
+        for value in ("0", "-5"):
+            os.environ["OLLAMA_TIMEOUT"] = value
+            with self.assertRaises(ValueError):
+                settings.reload_settings()
+            self.assertIs(settings.get_settings(), first)
+        os.environ["OLLAMA_TIMEOUT"] = " "
+        self.assertIsNone(settings.reload_settings().llm_timeout)
+        self.assertEqual(get_llm_config()["timeout"], 60)
+
+    def test_vision_limits_validated(self):
+        """Тест: таймаут и число страниц Vision проверяются так же"""
+        for name in ("OLLAMA_VISION_TIMEOUT", "OLLAMA_VISION_MAX_PAGES"):
+            for value in ("0", "-1", "abc"):
+                with mock.patch.dict(os.environ, {name: value}):
+                    with self.assertRaisesRegex(ValueError, name):
+                        settings.reload_settings()
+        loaded = settings.reload_settings()
+        self.assertEqual((loaded.vision_timeout, loaded.vision_max_pages), (120, 5))
+        self.assertEqual(get_vision_config()["max_pages"], 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
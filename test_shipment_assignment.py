@@ -0,0 +1,45 @@
+"""
+Тесты распределения почтовых отправлений по заявкам.
+"""
+
+import unittest
+from datetime import datetime
+
+from main import assign_shipments_to_groups
+
+
+class TestAssignShipments(unittest.TestCase):
+    """Тесты сопоставления дат выгрузки и дат отправки"""
+
+    def test_sweep_with_coverage(self):
+        """Тест: каждое отправление закрывает заявки, выгруженные до него"""
+        groups = [
+            {"application": "Заявка № 3", "unload_date": "20.02.2024"},
+            {"application": "Заявка № 1", "unload_date": "10.01.2024"},
+            {
+                "application": "Заявка № 2",
+                "cargo_docs_details": [{"unload_date": datetime(2024, 1, 15)}],
+            },
+        ]
+        shipments = [
+            {"track_number": "T2", "send_date": "01.03.2024", "received_date": "05.03.2024"},
+            {"track_number": "T1", "send_date": "20.01.2024", "received_date": "25.01.2024"},
+        ]
+        coverage = assign_shipments_to_groups(groups, shipments)
+        self.assertEqual(
+            [(item.track_number, item.groups) for item in coverage],
+            [("T1", ["Заявка № 1", "Заявка № 2"]), ("T2", ["Заявка № 3"])]
+        )
+        self.assertEqual(groups[2]["docs_track_number"], "T1")
+        self.assertEqual(groups[0]["docs_received_date"], "05.03.2024")
+
+    def test_shipment_before_unload_rejected(self):
+        """Тест: отправление раньше выгрузки — ошибка с номером заявки"""
+        groups = [{"application": "Заявка № 7", "unload_date": "10.02.2024"}]
+        shipments = [{"track_number": "T1", "send_date": "01.02.2024"}]
+        with self.assertRaisesRegex(ValueError, "Заявка № 7"):
+            assign_shipments_to_groups(groups, shipments)
+
+
+if __name__ == "__main__":
+    unittest.main()
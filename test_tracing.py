@@ -0,0 +1,91 @@
+"""
+Тесты для трассировки этапов обработки.
+"""
+
+import json
+import os
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import tracing
+
+
+class TestTracing(unittest.TestCase):
+    """Тесты вложенных интервалов, счётчиков и выгрузки трассы"""
+
+    def test_noop_outside_trace(self):
+        """Тест: вне трассы интервалы и счётчики ничего не делают"""
+        with tracing.span("orphan") as item:
+            tracing.count("pages", 3)
+            tracing.stage("ignored")
+        self.assertIsNone(item)
+        self.assertIsNone(tracing.current_span())
+
+    def test_nested_spans_and_stages(self):
+        """Тест: последовательные этапы и вложенные интервалы"""
+        with tracing.trace("request") as root:
+            tracing.stage("extraction")
+            tracing.count("pages", 5)
+            tracing.stage("groups")
+            with tracing.span("interest"):
+                tracing.count("periods", 2)
+        payload = root.to_dict()
+        names = [child["name"] for child in payload["children"]]
+        self.assertEqual(names, ["extraction", "groups"])
+        self.assertEqual(payload["children"][0]["counters"], {"pages": 5})
+        interest = payload["children"][1]["children"][0]
+        self.assertEqual(interest["name"], "interest")
+        self.assertEqual(interest["counters"], {"periods": 2})
+        self.assertIsNone(tracing.current_span())
+
+    def test_bind_counts_from_threads(self):
+        """Тест: счётчики из пула потоков попадают в текущий интервал"""
+        def work(_):
+            tracing.count("http_calls")
+
+        with tracing.trace("batch") as root:
+            with ThreadPoolExecutor(max_workers=3) as pool:
+                list(pool.map(tracing.bind(work), range(6)))
+        self.assertEqual(root.counters["http_calls"], 6)
+
+    def test_export_to_trace_dir(self):
+        """Тест: трасса сохраняется в TRACE_DIR"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            with mock.patch.dict(os.environ, {"TRACE_DIR": tmpdir}):
+                with tracing.trace("finish pretension"):
+                    tracing.stage("docx")
+            files = os.listdir(tmpdir)
+            self.assertEqual(len(files), 1)
+            with open(os.path.join(tmpdir, files[0]), encoding="utf-8") as handle:
+                payload = json.load(handle)
+        self.assertEqual(payload["name"], "finish pretension")
+        self.assertEqual(payload["children"][0]["name"], "docx")
+
+    def test_http_counters_by_kind(self):
+        """Тест: запросы к LLM и OCR считаются отдельно, итог — по всему дереву"""
+        import requests
+
+        response = requests.models.Response()
+        response.status_code = 200
+        response._content = b"{}"
+        with mock.patch.object(requests.Session, "send", return_value=response):
+            with tracing.trace("case") as root:
+                requests.post("http://ollama/api/generate", json={"prompt": "x"})
+                with tracing.span("ocr"):
+                    requests.post(
+                        "http://ollama/api/chat",
+                        json={"messages": [{"images": ["..."]}]}
+                    )
+                requests.get("http://dadata/suggest")
+        totals = root.total_counters()
+        self.assertEqual(totals["http_calls"], 3)
+        self.assertEqual(totals["llm_calls"], 1)
+        self.assertEqual(totals["ocr_calls"], 1)
+        self.assertEqual(totals["http_bytes"], 6)
+        self.assertEqual(root.counters["http_calls"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+"""
+Тесты для фоновой обработки загруженных файлов.
+"""
+
+import asyncio
+import threading
+import time
+import unittest
+
+from upload_pipeline import UploadPipeline
+
+
+class TestUploadPipeline(unittest.TestCase):
+    """Тесты спекулятивной обработки загрузок"""
+
+    def setUp(self):
+        self.pipeline = UploadPipeline(max_workers=2)
+
+    def tearDown(self):
+        self.pipeline.shutdown()
+
+    def test_result_reuses_background_job(self):
+        """Тест: результат берётся из уже запущенной задачи"""
+        calls = []
+        release = threading.Event()
+
+        def work(path):
+            calls.append(path)
+            release.wait(1)
+            return path.upper()
+
+        self.pipeline.submit("a.pdf", work, "a.pdf")
+        release.set()
+        result = asyncio.run(self.pipeline.result("a.pdf", work, "a.pdf"))
+        self.assertEqual(result, "A.PDF")
+        self.assertEqual(calls, ["a.pdf"])
+
+    def test_result_without_submit(self):
+        """Тест: задача запускается при запросе, если не была запущена"""
+        result = asyncio.run(self.pipeline.result("b.pdf", len, "b.pdf"))
+        self.assertEqual(result, 5)
+
+    def test_error_is_raised(self):
+        """Тест: исключение фоновой задачи пробрасывается"""
+        def fail(path):
+            raise ValueError(path)
+
+        self.pipeline.submit("c.pdf", fail, "c.pdf")
+        with self.assertRaises(ValueError):
+            asyncio.run(self.pipeline.result("c.pdf", fail, "c.pdf"))
+
+    def test_discard_cancels_pending_jobs(self):
+        """Тест: снятые задачи забываются, ожидающие в очереди отменяются"""
+        pipeline = UploadPipeline(max_workers=1)
+        started = threading.Event()
+        release = threading.Event()
+
+        def work(timeout):
+            started.set()
+            return release.wait(timeout)
+
+        running = pipeline.submit("a.pdf", work, 1)
+        pending = pipeline.submit("b.pdf", len, "b.pdf")
+        started.wait(1)
+        pipeline.discard_many(["a.pdf", "b.pdf", "missing.pdf"])
+        self.assertEqual(len(pipeline), 0)
+        self.assertTrue(pending.cancelled())
+        release.set()
+        self.assertTrue(running.result(1))
+        pipeline.shutdown()
+
+    def test_unclaimed_results_expire(self):
+        """Тест: невостребованные завершённые задачи удаляются по истечении TTL"""
+        pipeline = UploadPipeline(max_workers=1, job_ttl=60)
+        pipeline.submit("old.pdf", len, "old.pdf").result(1)
+        future, _ = pipeline._jobs["old.pdf"]
+        pipeline._jobs["old.pdf"] = (future, time.time() - 120)
+        pipeline.submit("new.pdf", len, "new.pdf")
+        self.assertFalse(pipeline.is_ready("old.pdf"))
+        self.assertIn("new.pdf", pipeline._jobs)
+        pipeline.shutdown()
+
+    def test_shutdown_cancels_queue(self):
+        """Тест: shutdown отменяет задачи, которые ещё не начали выполняться"""
+        pipeline = UploadPipeline(max_workers=1)
+        started = threading.Event()
+        release = threading.Event()
+
+        def work(timeout):
+            started.set()
+            return release.wait(timeout)
+
+        pipeline.submit("a.pdf", work, 1)
+        pending = pipeline.submit("b.pdf", len, "b.pdf")
+        started.wait(1)
+        pipeline.shutdown()
+        release.set()
+        self.assertTrue(pending.cancelled())
+        self.assertEqual(len(pipeline), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+"""
+Тесты общего разбора дат и сумм.
+"""
+
+import unittest
+from datetime import date, datetime
+from decimal import Decimal
+
+import value_parsing
+from value_parsing import (coerce_date, format_date, parse_amount,
+                           parse_amount_text, parse_date, parse_date_str,
+                           parse_exact_date, parse_iso_date, parse_short_date)
+
+
+class TestDates(unittest.TestCase):
+    """Тесты разбора дат"""
+
+    def test_formats(self):
+        """Тест: каждый формат разбирается без strptime"""
+        self.assertEqual(parse_date_str("от 1О.О3.2024 г."), datetime(2024, 3, 10))
+        self.assertIsNone(parse_date_str("31.02.2024"))
+        self.assertEqual(coerce_date("5 мар. 2024"), datetime(2024, 3, 5))
+        self.assertEqual(coerce_date(date(2024, 3, 5)), datetime(2024, 3, 5))
+        self.assertEqual(parse_short_date("05.03.24"), datetime(2024, 3, 5))
+        self.assertEqual(parse_exact_date(" 5.3.2024 "), datetime(2024, 3, 5))
+        self.assertIsNone(parse_exact_date("05.03.2024 г."))
+        self.assertEqual(parse_iso_date("2024-03-05T10:00:00Z"), date(2024, 3, 5))
+        self.assertEqual(parse_iso_date("2024-03-05 г."), date(2024, 3, 5))
+
+    def test_free_text_date(self):
+        """Тест: числовые форматы, затем месяц словом"""
+        self.assertEqual(parse_date("по 5/3/2024"), datetime(2024, 3, 5))
+        self.assertEqual(parse_date("до 05.03.24"), datetime(2024, 3, 5))
+        self.assertEqual(parse_date("с 1 МАЯ 2024 по 2 января 2025"), datetime(2024, 5, 1))
+        self.assertEqual(format_date(parse_date("1/2/2024")), "01.02.2024")
+
+    def test_tracking_page_dates(self):
+        """Тест: даты отслеживания отправления — общий разбор, неизвестный месяц не становится январём"""
+        from external_claim_parser import _parse_postal_tracking_page
+
+        shipment = _parse_postal_tracking_page(
+            "с почтовым идентификатором 80514110186166\n"
+            "5 июня 2025, 10:00 Присвоен трек-номер\n"
+            "23 юня 2025, 12:07 Адресату по ОК коду",
+            1
+        )
+        self.assertEqual(shipment.send_date, "05.06.2025")
+        self.assertEqual(shipment.received_date, "")
+
+    def test_repeated_literals_cached(self):
+        """Тест: повторная строка берётся из кэша, длинный текст не кэшируется"""
+        value_parsing.clear_cache()
+        parse_date_str("15.01.2024")
+        parse_date_str("15.01.2024")
+        parse_date_str("Акт сверки " * 20 + "15.01.2024")
+        info = value_parsing.cache_info()["date_str"]
+        self.assertEqual((info.hits, info.currsize), (1, 1))
+
+
+class TestAmounts(unittest.TestCase):
+    """Тесты разбора сумм"""
+
+    def test_amounts(self):
+        """Тест: пробелы, запятая и «руб.» не мешают разбору"""
+        self.assertEqual(parse_amount("1 234,56"), 1234.56)
+        self.assertEqual(parse_amount("нет", default=-1.0), -1.0)
+        self.assertEqual(parse_amount_text("12 345,00 р."), Decimal("12345.00"))
+        self.assertEqual(parse_amount_text("1.234.567,89"), Decimal("1234567.89"))
+        self.assertIsNone(parse_amount_text("руб."))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,343 @@
+"""
+Лёгкая трассировка этапов обработки: вложенные интервалы со счётчиками,
+опциональное профилирование и выгрузка трассы в JSON.
+
+Использование:
+    with trace("finish_pretension"):
+        with span("interest"):
+            ...
+        stage("docx")          # последовательный этап без отступов
+        count("pages", 12)
+
+Вне активной трассы span/stage/count ничего не делают. HTTP-запросы
+requests считаются автоматически: http_calls, http_bytes, а обращения
+к LLM дополнительно — llm_calls или ocr_calls (запросы с изображениями).
+
+Переменные окружения:
+    TRACE_DIR      — каталог для JSON-трасс (без него трасса только логируется);
+    TRACE_PROFILE  — cprofile | pyinstrument: профиль корневой трассы.
+"""
+
+import contextvars
+import inspect
+import functools
+import json
+import logging
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_CURRENT: "contextvars.ContextVar[Optional[Span]]" = contextvars.ContextVar(
+    "tracing_current_span",
+    default=None
+)
+_LOCK = threading.Lock()
+_HTTP_INSTALLED = False
+# Адреса API LLM (Ollama и OpenAI-совместимые)
+LLM_URL_MARKERS = ("/api/generate", "/api/chat", "/chat/completions")
+
+
+class Span:
+    """Интервал трассы: длительность, счётчики и вложенные интервалы."""
+
+    def __init__(self, name: str, parent: Optional["Span"] = None, **attrs: Any) -> None:
+        self.name = name
+        self.parent = parent
+        self.attrs = attrs
+        self.counters: Dict[str, float] = {}
+        self.children: List["Span"] = []
+        self.started = time.perf_counter()
+        self.started_at = datetime.now().isoformat(timespec="milliseconds")
+        self.duration: Optional[float] = None
+        self.thread = threading.current_thread().name
+        self._open_stage: Optional["Span"] = None
+        self._stage_token: Optional[contextvars.Token] = None
+        if parent is not None:
+            with _LOCK:
+                parent.children.append(self)
+
+    def finish(self) -> None:
+        self._close_stage()
+        if self.duration is None:
+            self.duration = time.perf_counter() - self.started
+
+    def _close_stage(self) -> None:
+        if self._open_stage is None:
+            return
+        self._open_stage.finish()
+        if self._stage_token is not None:
+            try:
+                _CURRENT.reset(self._stage_token)
+            except ValueError:
+                _CURRENT.set(self)
+        self._open_stage = None
+        self._stage_token = None
+
+    def count(self, name: str, value: float = 1) -> None:
+        with _LOCK:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def total_counters(self) -> Dict[str, float]:
+        """Счётчики интервала вместе со всеми вложенными."""
+        with _LOCK:
+            totals = dict(self.counters)
+            children = list(self.children)
+        for child in children:
+            for name, value in child.total_counters().items():
+                totals[name] = totals.get(name, 0) + value
+        return totals
+
+    def to_dict(self) -> Dict[str, Any]:
+        duration = self.duration
+        if duration is None:
+            duration = time.perf_counter() - self.started
+        payload: Dict[str, Any] = {
+            "name": self.name,
+            "started_at": self.started_at,
+            "duration": round(duration, 4),
+            "thread": self.thread,
+        }
+        if self.attrs:
+            payload["attrs"] = self.attrs
+        if self.counters:
+            payload["counters"] = dict(self.counters)
+        if self.children:
+            payload["children"] = [child.to_dict() for child in self.children]
+        return payload
+
+
+def current_span() -> Optional[Span]:
+    return _CURRENT.get()
+
+
+@contextmanager
+def span(name: str, **attrs: Any) -> Iterator[Optional[Span]]:
+    """Вложенный интервал; вне трассы ничего не делает."""
+    parent = _CURRENT.get()
+    if parent is None:
+        yield None
+        return
+    item = Span(name, parent, **attrs)
+    token = _CURRENT.set(item)
+    try:
+        yield item
+    finally:
+        item.finish()
+        _CURRENT.reset(token)
+
+
+def stage(name: str, **attrs: Any) -> None:
+    """
+    Начинает последовательный этап внутри текущего интервала,
+    закрывая предыдущий этап. Удобно для длинных линейных функций.
+    """
+    current = _CURRENT.get()
+    if current is None:
+        return
+    owner = current
+    # Если сейчас открыт этап, новый этап — его сосед
+    while owner.parent is not None and owner.parent._open_stage is owner:
+        owner = owner.parent
+    owner._close_stage()
+    item = Span(name, owner, **attrs)
+    owner._open_stage = item
+    owner._stage_token = _CURRENT.set(item)
+
+
+def count(name: str, value: float = 1) -> None:
+    """Увеличивает счётчик текущего интервала."""
+    current = _CURRENT.get()
+    if current is not None:
+        current.count(name, value)
+
+
+def bind(func: Callable[..., Any]) -> Callable[..., Any]:
+    """Привязывает func к текущей трассе для запуска в другом потоке."""
+    if _CURRENT.get() is None:
+        return func
+    context = contextvars.copy_context()
+
+    @functools.wraps(func)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        # Копия на каждый вызов: один контекст нельзя войти из двух потоков
+        return context.copy().run(func, *args, **kwargs)
+    return wrapper
+
+
+@contextmanager
+def trace(name: str, **attrs: Any) -> Iterator[Span]:
+    """
+    Корневая трасса запроса. Внутри уже активной трассы
+    работает как обычный вложенный интервал.
+    """
+    if _CURRENT.get() is not None:
+        with span(name, **attrs) as item:
+            yield item
+        return
+
+    install_http_counters()
+    root = Span(name, None, **attrs)
+    token = _CURRENT.set(root)
+    profiler = _start_profiler()
+    try:
+        yield root
+    finally:
+        root.finish()
+        _CURRENT.reset(token)
+        _log_summary(root)
+        export_path = export_trace(root)
+        if profiler is not None:
+            _stop_profiler(profiler, export_path, root)
+
+
+def traced(name: Optional[str] = None) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """Декоратор: оборачивает функцию (в т.ч. async) в trace()."""
+    def decorator(func: Callable[..., Any]) -> Callable[..., Any]:
+        trace_name = name or func.__name__
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+                with trace(trace_name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with trace(trace_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _log_summary(root: Span) -> None:
+    parts = [
+        f"{child.name} {child.duration or 0:.2f}s"
+        for child in sorted(
+            root.children,
+            key=lambda item: item.duration or 0,
+            reverse=True
+        )[:5]
+    ]
+    logger.info(
+        "Трасса %s: %.2fs%s",
+        root.name,
+        root.duration or 0,
+        f" ({', '.join(parts)})" if parts else ""
+    )
+
+
+def _safe_name(name: str) -> str:
+    return re.sub(r"[^\w.-]+", "_", name)[:60] or "trace"
+
+
+def export_trace(root: Span, directory: Optional[str] = None) -> Optional[str]:
+    """Сохраняет трассу в TRACE_DIR (или directory) и возвращает путь."""
+    directory = directory or os.getenv("TRACE_DIR", "").strip()
+    if not directory:
+        return None
+    safe_name = _safe_name(root.name)
+    stamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    path = os.path.join(directory, f"trace_{safe_name}_{stamp}.json")
+    try:
+        os.makedirs(directory, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as handle:
+            json.dump(root.to_dict(), handle, ensure_ascii=False, indent=2)
+    except Exception as exc:
+        logger.warning("Не удалось сохранить трассу %s: %s", path, exc)
+        return None
+    return path
+
+
+def _start_profiler() -> Optional[Any]:
+    mode = os.getenv("TRACE_PROFILE", "").strip().lower()
+    if not mode:
+        return None
+    if mode == "pyinstrument":
+        try:
+            from pyinstrument import Profiler
+            profiler = Profiler()
+            profiler.start()
+            return profiler
+        except ImportError:
+            logger.warning("pyinstrument не установлен, используется cProfile")
+    import cProfile
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return profiler
+
+
+def _stop_profiler(profiler: Any, export_path: Optional[str], root: Span) -> None:
+    directory = (
+        os.path.dirname(export_path) if export_path
+        else os.getenv("TRACE_DIR", "").strip() or "."
+    )
+    base = (
+        os.path.splitext(export_path)[0] if export_path
+        else os.path.join(directory, f"trace_{_safe_name(root.name)}")
+    )
+    try:
+        if hasattr(profiler, "disable"):
+            profiler.disable()
+            profiler.dump_stats(f"{base}.prof")
+            logger.info("Профиль сохранён: %s.prof", base)
+        else:
+            profiler.stop()
+            with open(f"{base}.html", "w", encoding="utf-8") as handle:
+                handle.write(profiler.output_html())
+            logger.info("Профиль сохранён: %s.html", base)
+    except Exception as exc:
+        logger.warning("Не удалось сохранить профиль: %s", exc)
+
+
+def _has_images(payload: Dict[str, Any]) -> bool:
+    if payload.get("images"):
+        return True
+    for message in payload.get("messages") or []:
+        if isinstance(message, dict) and message.get("images"):
+            return True
+    return False
+
+
+def _count_request(current: Span, url: Any, kwargs: Dict[str, Any]) -> None:
+    current.count("http_calls")
+    if any(marker in str(url) for marker in LLM_URL_MARKERS):
+        payload = kwargs.get("json") if isinstance(kwargs.get("json"), dict) else {}
+        current.count("ocr_calls" if _has_images(payload) else "llm_calls")
+
+
+def install_http_counters() -> None:
+    """
+    Считает HTTP-запросы (в том числе неудачные), обращения к LLM/OCR
+    и полученные байты в текущем интервале.
+    """
+    global _HTTP_INSTALLED
+    if _HTTP_INSTALLED:
+        return
+    try:
+        import requests
+    except ImportError:
+        return
+    original_request = requests.sessions.Session.request
+
+    @functools.wraps(original_request)
+    def counted_request(session, method, url, *args, **kwargs):
+        current = _CURRENT.get()
+        if current is not None:
+            _count_request(current, url, kwargs)
+        response = original_request(session, method, url, *args, **kwargs)
+        if current is not None:
+            if kwargs.get("stream"):
+                size = int(response.headers.get("Content-Length") or 0)
+            else:
+                size = len(response.content or b"")
+            current.count("http_bytes", size)
+        return response
+
+    requests.sessions.Session.request = counted_request
+    _HTTP_INSTALLED = True
@@ -0,0 +1,108 @@
+"""
+Фоновая (спекулятивная) обработка загруженных пользователем файлов.
+
+Обработчик загрузки ставит извлечение текста в очередь сразу после
+скачивания файла, а шаг «готово» только дожидается готовых результатов.
+Задачи, результат которых так и не забрали (отмена, новый сценарий),
+снимаются через discard() или удаляются спустя job_ttl после завершения.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+import tracing
+
+logger = logging.getLogger(__name__)
+
+
+class UploadPipeline:
+    """Пул фоновых задач, привязанных к пути загруженного файла."""
+
+    def __init__(self, max_workers: int = 2, job_ttl: float = 3600) -> None:
+        self.max_workers = max(1, int(max_workers or 1))
+        self.job_ttl = float(job_ttl or 0)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        # key -> (задача, время запуска)
+        self._jobs: Dict[str, Tuple[Future, float]] = {}
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix="upload"
+            )
+        return self._executor
+
+    def _prune_locked(self, now: float) -> None:
+        """Удаляет завершённые задачи, результат которых не забрали за job_ttl."""
+        if self.job_ttl <= 0:
+            return
+        expired = [
+            key for key, (future, started) in self._jobs.items()
+            if future.done() and now - started > self.job_ttl
+        ]
+        for key in expired:
+            del self._jobs[key]
+        if expired:
+            logger.info("Невостребованных фоновых задач удалено: %s", len(expired))
+
+    def submit(self, key: str, func: Callable[..., Any], *args: Any) -> Future:
+        """Запускает func(*args) в фоне, если задача для key ещё не запущена."""
+        now = time.time()
+        with self._lock:
+            self._prune_locked(now)
+            job = self._jobs.get(key)
+            if job is None:
+                future = self._get_executor().submit(tracing.bind(func), *args)
+                job = self._jobs[key] = (future, now)
+                logger.info("Фоновая обработка файла запущена: %s", key)
+            return job[0]
+
+    def is_ready(self, key: str) -> bool:
+        with self._lock:
+            job = self._jobs.get(key)
+        return job is not None and job[0].done()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._jobs)
+
+    async def result(self, key: str, func: Callable[..., Any], *args: Any) -> Any:
+        """
+        Возвращает результат фоновой задачи для key.
+
+        Если задача не запускалась (например, после перезапуска бота),
+        она запускается сейчас. Исключение задачи пробрасывается.
+        """
+        future = self.submit(key, func, *args)
+        try:
+            return await asyncio.wrap_future(future)
+        finally:
+            self.discard(key)
+
+    def discard(self, key: str) -> None:
+        self.discard_many([key])
+
+    def discard_many(self, keys: Iterable[str]) -> None:
+        """Забывает задачи и отменяет те, что ещё не начали выполняться."""
+        with self._lock:
+            jobs = [self._jobs.pop(key, None) for key in keys]
+        for job in jobs:
+            if job is not None and not job[0].done():
+                job[0].cancel()
+
+    def shutdown(self) -> None:
+        with self._lock:
+            jobs = list(self._jobs.values())
+            self._jobs.clear()
+            executor, self._executor = self._executor, None
+        # cancel_futures у shutdown() есть только с Python 3.9
+        for future, _ in jobs:
+            future.cancel()
+        if executor is not None:
+            executor.shutdown(wait=False)
@@ -0,0 +1,317 @@
+"""
+Разбор дат и сумм из текста документов.
+
+Общие функции для main.py, парсеров и калькулятора процентов. Формат
+даты определяется одним регулярным выражением, дата собирается из групп
+без перебора strptime. Повторяющиеся строки (одни и те же даты и суммы
+встречаются в заявках, счетах, УПД и актах сверки десятки раз) берутся
+из ограниченного кэша VALUE_PARSE_CACHE_SIZE.
+"""
+
+import re
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from functools import lru_cache
+from typing import Any, Optional
+
+from lookup_cache import env_int
+
+VALUE_PARSE_CACHE_SIZE = env_int("VALUE_PARSE_CACHE_SIZE", 8192)
+# Кэшируются только короткие строки: целые страницы не повторяются
+# и заняли бы память кэша
+_CACHEABLE_LENGTH = 64
+
+RU_MONTHS = {
+    "января": 1,
+    "янв": 1,
+    "февраля": 2,
+    "фев": 2,
+    "марта": 3,
+    "мар": 3,
+    "апреля": 4,
+    "апр": 4,
+    "мая": 5,
+    "май": 5,
+    "июня": 6,
+    "июн": 6,
+    "июля": 7,
+    "июл": 7,
+    "августа": 8,
+    "авг": 8,
+    "сентября": 9,
+    "сен": 9,
+    "сент": 9,
+    "октября": 10,
+    "окт": 10,
+    "ноября": 11,
+    "ноя": 11,
+    "нояб": 11,
+    "декабря": 12,
+    "дек": 12,
+}
+
+_OCR_ZERO = str.maketrans({"О": "0", "о": "0", "O": "0"})
+_DMY_STRICT_RE = re.compile(r'(\d{2})\.(\d{2})\.(\d{4})')
+_DMY_EXACT_RE = re.compile(r'(\d{1,2})\.(\d{1,2})\.(\d{4})')
+_DMY_RE = re.compile(r'(\d{1,2})[./](\d{1,2})[./](\d{4})')
+_DMY_SHORT_YEAR_RE = re.compile(r'(\d{1,2})[./](\d{1,2})[./](\d{2})\b')
+_SHORT_DATE_RE = re.compile(r'(\d{2})\.(\d{2})\.(\d{2})(\d{2})?')
+_RU_TEXT_DATE_RE = re.compile(r'(\d{1,2})\s+([А-Яа-яЁё\.]+)\s+(\d{4})')
+_RU_MONTHS_GENITIVE = (
+    "января", "февраля", "марта", "апреля", "мая", "июня",
+    "июля", "августа", "сентября", "октября", "ноября", "декабря",
+)
+_RU_MONTH_DATE_RE = re.compile(
+    r'(\d{1,2})\s+(' + "|".join(_RU_MONTHS_GENITIVE) + r')\s+(\d{4})',
+    re.IGNORECASE
+)
+_ISO_DATE_RE = re.compile(r'(\d{4})-(\d{2})-(\d{2})')
+_WHITESPACE_RE = re.compile(r'\s+')
+_NON_AMOUNT_RE = re.compile(r'[^\d.,]')
+
+
+def _cached(func, text: str):
+    if len(text) > _CACHEABLE_LENGTH:
+        return func.__wrapped__(text)
+    return func(text)
+
+
+def _make_date(year: Any, month: Any, day: Any) -> Optional[datetime]:
+    try:
+        return datetime(int(year), int(month), int(day))
+    except ValueError:
+        return None
+
+
+def parse_ru_month(value: str) -> Optional[int]:
+    """Номер месяца по названию или сокращению («марта», «мар.»)."""
+    return RU_MONTHS.get(str(value).strip().lower().rstrip("."))
+
+
+@lru_cache(maxsize=VALUE_PARSE_CACHE_SIZE)
+def _parse_date_str(text: str) -> Optional[datetime]:
+    match = _DMY_STRICT_RE.search(text.translate(_OCR_ZERO))
+    if not match:
+        return None
+    day, month, year = match.groups()
+    return _make_date(year, month, day)
+
+
+def parse_date_str(value: Optional[str]) -> Optional[datetime]:
+    """Первая дата ДД.ММ.ГГГГ в строке (О/о/O распознаются как ноль)."""
+    if not value:
+        return None
+    return _cached(_parse_date_str, str(value))
+
+
+@lru_cache(maxsize=VALUE_PARSE_CACHE_SIZE)
+def _parse_ru_text_date(text: str) -> Optional[datetime]:
+    match = _RU_TEXT_DATE_RE.search(text)
+    if not match:
+        return None
+    day_raw, month_raw, year_raw = match.groups()
+    month = parse_ru_month(month_raw)
+    if not month:
+        return None
+    return _make_date(year_raw, month, day_raw)
+
+
+def parse_ru_text_date(value: Optional[str]) -> Optional[datetime]:
+    """Дата вида «5 марта 2024» / «5 мар. 2024»."""
+    if not value:
+        return None
+    return _cached(_parse_ru_text_date, str(value))
+
+
+def parse_exact_date(value: Optional[str]) -> Optional[datetime]:
+    """Строка целиком — дата Д.М.ГГГГ (как strptime с "%d.%m.%Y")."""
+    if not value:
+        return None
+    match = _DMY_EXACT_RE.fullmatch(str(value).strip())
+    if not match:
+        return None
+    day, month, year = match.groups()
+    return _make_date(year, month, day)
+
+
+def parse_short_date(value: Optional[str]) -> Optional[datetime]:
+    """Дата ДД.ММ.ГГ или ДД.ММ.ГГГГ; двузначный год — 20ГГ."""
+    if not value:
+        return None
+    match = _SHORT_DATE_RE.search(str(value))
+    if not match:
+        return None
+    day, month, year1, year2 = match.groups()
+    year_str = year1 + (year2 or "")
+    year = int(year_str)
+    if len(year_str) == 2:
+        year = 2000 + year
+    return _make_date(year, month, day)
+
+
+@lru_cache(maxsize=VALUE_PARSE_CACHE_SIZE)
+def _parse_date(text: str) -> Optional[datetime]:
+    match = _DMY_RE.search(text)
+    if match:
+        day, month, year = match.groups()
+        parsed = _make_date(year, month, day)
+        if parsed:
+            return parsed
+    match = _DMY_SHORT_YEAR_RE.search(text)
+    if match:
+        day, month, year = match.groups()
+        year_value = int(year)
+        year_value = 2000 + year_value if year_value < 50 else 1900 + year_value
+        parsed = _make_date(year_value, month, day)
+        if parsed:
+            return parsed
+    for match in _RU_MONTH_DATE_RE.finditer(text):
+        day, month_name, year = match.groups()
+        parsed = _make_date(year, RU_MONTHS[month_name.lower()], day)
+        if parsed:
+            return parsed
+    return None
+
+
+def parse_date(text: Optional[str]) -> Optional[datetime]:
+    """
+    Дата из произвольного текста: Д.М.ГГГГ или Д/М/ГГГГ, затем Д.М.ГГ,
+    затем «Д месяца ГГГГ».
+    """
+    if not text:
+        return None
+    return _cached(_parse_date, str(text))
+
+
+def parse_numeric_date(text: Optional[str]) -> Optional[datetime]:
+    """Первая дата Д.М.ГГГГ или Д/М/ГГГГ в тексте."""
+    if not text:
+        return None
+    match = _DMY_RE.search(str(text))
+    if not match:
+        return None
+    day, month, year = match.groups()
+    return _make_date(year, month, day)
+
+
+def format_date(value: Optional[datetime]) -> str:
+    """Дата в виде ДД.ММ.ГГГГ; пустая строка, если даты нет."""
+    if not value:
+        return ""
+    return f"{value.day:02d}.{value.month:02d}.{value.year:04d}"
+
+
+def parse_iso_date(value: Optional[str]) -> Optional[date]:
+    """Дата из ISO-строки (2024-03-05, 2024-03-05T10:00:00Z)."""
+    if not value:
+        return None
+    raw = str(value).strip()
+    if not raw:
+        return None
+    try:
+        return datetime.fromisoformat(raw.replace("Z", "+00:00")).date()
+    except ValueError:
+        match = _ISO_DATE_RE.match(raw)
+        if not match:
+            return None
+        parsed = _make_date(*match.groups())
+        return parsed.date() if parsed else None
+
+
+def coerce_date(value: Any) -> Optional[datetime]:
+    """datetime из datetime, date или строки «ДД.ММ.ГГГГ» / «Д месяца ГГГГ»."""
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        return value
+    if hasattr(value, "year") and hasattr(value, "month") and hasattr(value, "day"):
+        try:
+            return datetime(value.year, value.month, value.day)
+        except Exception:
+            return None
+    if isinstance(value, str):
+        return _cached(_parse_date_str, value) or _cached(_parse_ru_text_date, value)
+    return None
+
+
+@lru_cache(maxsize=VALUE_PARSE_CACHE_SIZE)
+def _parse_float(text: str) -> Optional[float]:
+    try:
+        return float(_WHITESPACE_RE.sub('', text).replace(',', '.'))
+    except ValueError:
+        return None
+
+
+def parse_amount(value: Optional[str], default: float = 0.0) -> float:
+    """Сумма из строки вида «1 234,56»; default, если это не число."""
+    if value is None:
+        return default
+    if isinstance(value, (int, float)):
+        return float(value)
+    parsed = _cached(_parse_float, str(value))
+    return default if parsed is None else parsed
+
+
+@lru_cache(maxsize=VALUE_PARSE_CACHE_SIZE)
+def _parse_decimal(text: str) -> Optional[Decimal]:
+    try:
+        return Decimal(_WHITESPACE_RE.sub('', text).replace(',', '.'))
+    except InvalidOperation:
+        return None
+
+
+def parse_amount_decimal(
+    value: Optional[str],
+    default: Decimal = Decimal("0")
+) -> Decimal:
+    """Сумма в Decimal из строки вида «1 234,56»."""
+    if value is None:
+        return default
+    if isinstance(value, Decimal):
+        return value
+    if isinstance(value, (int, float)):
+        return Decimal(str(value))
+    parsed = _cached(_parse_decimal, str(value))
+    return default if parsed is None else parsed
+
+
+@lru_cache(maxsize=VALUE_PARSE_CACHE_SIZE)
+def _parse_amount_text(text: str) -> Optional[Decimal]:
+    # Точки по краям — от «руб.», «р.»
+    cleaned = _NON_AMOUNT_RE.sub('', text).replace(',', '.').strip('.')
+    # Последняя точка — десятичный разделитель, остальные — разряды
+    parts = cleaned.split('.')
+    if len(parts) > 2:
+        cleaned = ''.join(parts[:-1]) + '.' + parts[-1]
+    try:
+        return Decimal(cleaned)
+    except InvalidOperation:
+        return None
+
+
+def parse_amount_text(text: Optional[str]) -> Optional[Decimal]:
+    """Сумма из фрагмента текста («1.234.567,89 руб.»); None, если цифр нет."""
+    if not text:
+        return None
+    return _cached(_parse_amount_text, str(text))
+
+
+def cache_info() -> dict:
+    """Статистика кэшей разбора (для логов и отладки)."""
+    return {
+        "date_str": _parse_date_str.cache_info(),
+        "ru_text_date": _parse_ru_text_date.cache_info(),
+        "date": _parse_date.cache_info(),
+        "float": _parse_float.cache_info(),
+        "decimal": _parse_decimal.cache_info(),
+        "amount_text": _parse_amount_text.cache_info(),
+    }
+
+
+def clear_cache() -> None:
+    _parse_date_str.cache_clear()
+    _parse_ru_text_date.cache_clear()
+    _parse_date.cache_clear()
+    _parse_float.cache_clear()
+    _parse_decimal.cache_clear()
+    _parse_amount_text.cache_clear()